@@ -8,9 +8,6 @@ import io
 import csv
 import json
 import logging
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-from openpyxl.utils import get_column_letter
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +16,9 @@ from app.auth.dependencies import require_roles, get_current_user
 from app.core.models_base import UserRole
 from app.models import User
 from app.analytics.service import AnalyticsService
+from app.jobs.handlers import ANALYTICS_EXPORT
+from app.jobs.router import job_accepted
+from app.jobs.service import JobService
 from app.analytics.schemas import (
     PeriodCostReport, ObjectDetailedReport,
     CostTrendReport, CostBreakdown, ObjectCostSummary,
@@ -27,6 +27,9 @@ from app.analytics.schemas import (
 
 router = APIRouter()
 
+# Размер части при отдаче xlsx клиенту
+EXCEL_CHUNK_SIZE = 64 * 1024
+
 
 @router.get("/", response_model=list)
 @router.get("/costs", response_model=list)
@@ -226,10 +229,7 @@ async def export_analytics(
         logger.error(f"РћС€РёР±РєР° СЌРєСЃРїРѕСЂС‚Р° Excel: {str(e)}")
         
         # Fallback РЅР° CSV РµСЃР»Рё Excel РЅРµ СЂР°Р±РѕС‚Р°РµС‚
-        summary = await service.get_all_objects_summary(period_start, period_end)
-        
-        if object_id:
-            summary = [s for s in summary if s['object_id'] == object_id]
+        summary = await service.get_all_objects_summary(period_start, period_end, object_id)
         
         output = io.StringIO()
         if summary:
@@ -422,271 +422,89 @@ async def get_object_costs_detailed(
 
 @router.get("/export-excel", response_class=StreamingResponse)
 async def export_analytics_to_excel(
-    period_start: date = Query(..., description="РќР°С‡Р°Р»Рѕ РїРµСЂРёРѕРґР° (Р“Р“Р“Р“-РњРњ-Р”Р”)"),
-    period_end: date = Query(..., description="РљРѕРЅРµС† РїРµСЂРёРѕРґР° (Р“Р“Р“Р“-РњРњ-Р”Р”)"),
-    object_id: Optional[int] = Query(None, description="ID РѕР±СЉРµРєС‚Р° (РµСЃР»Рё None - РІСЃРµ РѕР±СЉРµРєС‚С‹)"),
+    period_start: date = Query(..., description="Начало периода (ГГГГ-ММ-ДД)"),
+    period_end: date = Query(..., description="Конец периода (ГГГГ-ММ-ДД)"),
+    object_id: Optional[int] = Query(None, description="ID объекта (если None - все объекты)"),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(require_roles([UserRole.MANAGER, UserRole.ACCOUNTANT, UserRole.ADMIN]))
 ):
     """
-    Р­РєСЃРїРѕСЂС‚ Р°РЅР°Р»РёС‚РёРєРё Р·Р°С‚СЂР°С‚ РІ Excel
+    Экспорт аналитики затрат в Excel
     
-    - Р›РёСЃС‚ 1: РЎРІРѕРґРєР° РїРѕ РѕР±СЉРµРєС‚Р°Рј
-    - Р›РёСЃС‚ 2: Р”РёРЅР°РјРёРєР° Р·Р°С‚СЂР°С‚ РїРѕ РґР°С‚Р°Рј
-    - Р›РёСЃС‚ 3: Р”РµС‚Р°Р»РёР·Р°С†РёСЏ РїРѕ РІРёРґР°Рј Р·Р°С‚СЂР°С‚
-    - Р”РѕСЃС‚СѓРїРЅРѕ: MANAGER, ACCOUNTANT, ADMIN
+    - Лист 1: Сводка по объектам
+    - Лист 2: Динамика затрат по датам
+    - Лист 3: Детализация по видам затрат
+    - Доступно: MANAGER, ACCOUNTANT, ADMIN
     
-    Р¤РѕСЂРјР°С‚ РІРѕР·РІСЂР°С‚Р°: .xlsx С„Р°Р№Р»
+    Книга собирается в write-only режиме с чтением динамики через серверный
+    курсор и отдается клиенту частями, без копии всего файла в памяти.
+    
+    Формат возврата: .xlsx файл
     """
+    if object_id:
+        from app.models import CostObject
+        obj = await db.get(CostObject, object_id)
+        if not obj:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Объект {object_id} не найден"
+            )
+    
     try:
         service = AnalyticsService(db)
-        
-        # РџРѕР»СѓС‡РµРЅРёРµ РґР°РЅРЅС‹С…
-        if object_id:
-            # Р•СЃР»Рё СѓРєР°Р·Р°РЅ object_id - СЌРєСЃРїРѕСЂС‚ РїРѕ РѕРґРЅРѕРјСѓ РѕР±СЉРµРєС‚Сѓ
-            from app.models import CostObject
-            obj = await db.get(CostObject, object_id)
-            if not obj:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail=f"РћР±СЉРµРєС‚ {object_id} РЅРµ РЅР°Р№РґРµРЅ"
-                )
-            
-            costs = await service.get_object_costs(object_id, period_start, period_end)
-            all_objects = [(obj, costs)]
-        else:
-            # РџРѕР»СѓС‡РёС‚СЊ РІСЃРµ РѕР±СЉРµРєС‚С‹ СЃ РёС… Р·Р°С‚СЂР°С‚Р°РјРё
-            from app.models import CostObject
-            from sqlalchemy import select
-            result = await db.execute(select(CostObject).order_by(CostObject.name))
-            objects = result.scalars().all()
-            
-            all_objects = []
-            for obj in objects:
-                costs = await service.get_object_costs(obj.id, period_start, period_end)
-                all_objects.append((obj, costs))
-        
-        # РџРѕР»СѓС‡РµРЅРёРµ РґРёРЅР°РјРёРєРё
-        try:
-            dynamics = await service.get_cost_dynamics(
-                object_id=object_id,
-                period_start=period_start,
-                period_end=period_end,
-                grouping='day'
-            )
-        except:
-            dynamics = None
-        
-        # РЎРѕР·РґР°РЅРёРµ Excel РєРЅРёРіРё
-        wb = Workbook()
-        
-        # ===== Р›РРЎРў 1: РЎР’РћР”РљРђ РџРћ РћР‘РЄР•РљРўРђРњ =====
-        ws_summary = wb.active
-        ws_summary.title = "РЎРІРѕРґРєР° РїРѕ РѕР±СЉРµРєС‚Р°Рј"
-        
-        # РЎС‚РёР»Рё
-        header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF", size=11)
-        title_font = Font(bold=True, size=14)
-        info_font = Font(size=10)
-        total_fill = PatternFill(start_color="FFF2CC", end_color="FFF2CC", fill_type="solid")
-        total_font = Font(bold=True, size=10)
-        border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
-        
-        # Р—Р°РіРѕР»РѕРІРѕРє
-        ws_summary['A1'] = "РђРЅР°Р»РёС‚РёРєР° Р·Р°С‚СЂР°С‚ РїРѕ РѕР±СЉРµРєС‚Р°Рј"
-        ws_summary['A1'].font = title_font
-        ws_summary.merge_cells('A1:E1')
-        ws_summary['A1'].alignment = Alignment(horizontal='center', vertical='center')
-        
-        # РџРµСЂРёРѕРґ
-        ws_summary['A2'] = f"РџРµСЂРёРѕРґ: {period_start.strftime('%d.%m.%Y')} - {period_end.strftime('%d.%m.%Y')}"
-        ws_summary['A2'].font = info_font
-        ws_summary.merge_cells('A2:E2')
-        
-        # Р—Р°РіРѕР»РѕРІРєРё С‚Р°Р±Р»РёС†С‹
-        headers = ["РћР±СЉРµРєС‚", "Р—Р°С‚СЂР°С‚С‹ С‚СЂСѓРґР°", "Р—Р°С‚СЂР°С‚С‹ РјР°С‚РµСЂРёР°Р»С‹", "Р—Р°С‚СЂР°С‚С‹ С‚РµС…РЅРёРєР°", "Р’РЎР•Р“Рћ"]
-        for col, header in enumerate(headers, 1):
-            cell = ws_summary.cell(row=4, column=col)
-            cell.value = header
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-            cell.border = border
-        
-        # Р”Р°РЅРЅС‹Рµ
-        total_labor = 0
-        total_material = 0
-        total_equipment = 0
-        total_all = 0
-        
-        for row_idx, (obj, costs) in enumerate(all_objects, 5):
-            labor = float(costs.get('labor', 0))
-            material = float(costs.get('material', 0))
-            equipment = float(costs.get('equipment', 0))
-            total = float(costs.get('total', 0))
-            
-            total_labor += labor
-            total_material += material
-            total_equipment += equipment
-            total_all += total
-            
-            row_data = [obj.name, labor, material, equipment, total]
-            for col_idx, value in enumerate(row_data, 1):
-                cell = ws_summary.cell(row=row_idx, column=col_idx)
-                cell.value = value
-                cell.border = border
-                cell.alignment = Alignment(horizontal='left' if col_idx == 1 else 'right', vertical='center')
-                
-                if col_idx > 1:
-                    cell.number_format = '#,##0.00 "в‚Ѕ"'
-        
-        # РС‚РѕРіРѕРІР°СЏ СЃС‚СЂРѕРєР°
-        total_row = len(all_objects) + 5
-        ws_summary.cell(row=total_row, column=1).value = "РРўРћР“Рћ:"
-        ws_summary.cell(row=total_row, column=1).font = total_font
-        
-        total_row_data = [total_labor, total_material, total_equipment, total_all]
-        for col_idx, value in enumerate(total_row_data, 2):
-            cell = ws_summary.cell(row=total_row, column=col_idx)
-            cell.value = value
-            cell.font = total_font
-            cell.fill = total_fill
-            cell.border = border
-            cell.alignment = Alignment(horizontal='right', vertical='center')
-            cell.number_format = '#,##0.00 "в‚Ѕ"'
-        
-        # РЁРёСЂРёРЅР° РєРѕР»РѕРЅРѕРє
-        ws_summary.column_dimensions['A'].width = 25
-        ws_summary.column_dimensions['B'].width = 18
-        ws_summary.column_dimensions['C'].width = 18
-        ws_summary.column_dimensions['D'].width = 18
-        ws_summary.column_dimensions['E'].width = 18
-        
-        # ===== Р›РРЎРў 2: Р”РРќРђРњРРљРђ Р—РђРўР РђРў =====
-        ws_dynamics = wb.create_sheet("Р”РёРЅР°РјРёРєР° РїРѕ РґР°С‚Р°Рј")
-        
-        ws_dynamics['A1'] = "Р”РёРЅР°РјРёРєР° Р·Р°С‚СЂР°С‚ РїРѕ РґР°С‚Р°Рј"
-        ws_dynamics['A1'].font = title_font
-        ws_dynamics.merge_cells('A1:D1')
-        ws_dynamics['A1'].alignment = Alignment(horizontal='center', vertical='center')
-        
-        if dynamics and hasattr(dynamics, 'items') and dynamics.items:
-            # Р—Р°РіРѕР»РѕРІРєРё
-            dyn_headers = ["Р”Р°С‚Р°", "Р—Р°С‚СЂР°С‚С‹ С‚СЂСѓРґР°", "Р—Р°С‚СЂР°С‚С‹ РјР°С‚РµСЂРёР°Р»С‹", "Р’РЎР•Р“Рћ"]
-            for col, header in enumerate(dyn_headers, 1):
-                cell = ws_dynamics.cell(row=3, column=col)
-                cell.value = header
-                cell.font = header_font
-                cell.fill = header_fill
-                cell.alignment = Alignment(horizontal='center', vertical='center')
-                cell.border = border
-            
-            # Р”Р°РЅРЅС‹Рµ
-            for row_idx, item in enumerate(dynamics.items, 4):
-                date_val = item.get('date', '')
-                labor = float(item.get('labor_cost', 0))
-                material = float(item.get('material_cost', 0))
-                total = labor + material
-                
-                ws_dynamics.cell(row=row_idx, column=1).value = date_val
-                ws_dynamics.cell(row=row_idx, column=2).value = labor
-                ws_dynamics.cell(row=row_idx, column=3).value = material
-                ws_dynamics.cell(row=row_idx, column=4).value = total
-                
-                for col in range(1, 5):
-                    cell = ws_dynamics.cell(row=row_idx, column=col)
-                    cell.border = border
-                    if col > 1:
-                        cell.number_format = '#,##0.00 "в‚Ѕ"'
-                    cell.alignment = Alignment(horizontal='right' if col > 1 else 'center', vertical='center')
-        else:
-            ws_dynamics['A4'] = "Р”Р°РЅРЅС‹Рµ РЅРµ РЅР°Р№РґРµРЅС‹"
-        
-        # РЁРёСЂРёРЅР° РєРѕР»РѕРЅРѕРє
-        ws_dynamics.column_dimensions['A'].width = 15
-        ws_dynamics.column_dimensions['B'].width = 18
-        ws_dynamics.column_dimensions['C'].width = 18
-        ws_dynamics.column_dimensions['D'].width = 18
-        
-        # ===== Р›РРЎРў 3: Р”Р•РўРђР›РР—РђР¦РРЇ РџРћ Р’РР”РђРњ =====
-        ws_details = wb.create_sheet("Р”РµС‚Р°Р»РёР·Р°С†РёСЏ РїРѕ РІРёРґР°Рј")
-        
-        ws_details['A1'] = "Р”РµС‚Р°Р»РёР·Р°С†РёСЏ Р·Р°С‚СЂР°С‚ РїРѕ РІРёРґР°Рј"
-        ws_details['A1'].font = title_font
-        ws_details.merge_cells('A1:C1')
-        ws_details['A1'].alignment = Alignment(horizontal='center', vertical='center')
-        
-        # РЎС‚Р°С‚РёСЃС‚РёРєР°
-        stat_row = 3
-        ws_details[f'A{stat_row}'] = "Р’РёРґ Р·Р°С‚СЂР°С‚"
-        ws_details[f'B{stat_row}'] = "РЎСѓРјРјР° (в‚Ѕ)"
-        ws_details[f'C{stat_row}'] = "% РѕС‚ РІСЃРµРіРѕ"
-        
-        for col in range(1, 4):
-            cell = ws_details.cell(row=stat_row, column=col)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.border = border
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-        
-        stat_data = [
-            ("Р—Р°С‚СЂР°С‚С‹ РЅР° С‚СЂСѓРґ", total_labor),
-            ("Р—Р°С‚СЂР°С‚С‹ РЅР° РјР°С‚РµСЂРёР°Р»С‹", total_material),
-            ("Р—Р°С‚СЂР°С‚С‹ РЅР° С‚РµС…РЅРёРєСѓ", total_equipment),
-        ]
-        
-        for row_idx, (name, value) in enumerate(stat_data, stat_row + 1):
-            ws_details.cell(row=row_idx, column=1).value = name
-            ws_details.cell(row=row_idx, column=2).value = value
-            
-            if total_all > 0:
-                percentage = (value / total_all) * 100
-            else:
-                percentage = 0
-            
-            ws_details.cell(row=row_idx, column=3).value = percentage
-            
-            for col in range(1, 4):
-                cell = ws_details.cell(row=row_idx, column=col)
-                cell.border = border
-                cell.alignment = Alignment(horizontal='left' if col == 1 else 'right', vertical='center')
-                
-                if col == 2:
-                    cell.number_format = '#,##0.00 "в‚Ѕ"'
-                elif col == 3:
-                    cell.number_format = '0.00"%"'
-        
-        # РЁРёСЂРёРЅР° РєРѕР»РѕРЅРѕРє
-        ws_details.column_dimensions['A'].width = 25
-        ws_details.column_dimensions['B'].width = 18
-        ws_details.column_dimensions['C'].width = 15
-        
-        # РЎРѕС…СЂР°РЅРµРЅРёРµ РІ BytesIO
-        output = io.BytesIO()
-        wb.save(output)
-        output.seek(0)
-        
-        # Р“РµРЅРµСЂРёСЂРѕРІР°РЅРёРµ РёРјРµРЅРё С„Р°Р№Р»Р°
-        filename = f"Analytics_Export_{period_start.strftime('%Y%m%d')}_to_{period_end.strftime('%Y%m%d')}.xlsx"
-        
-        return StreamingResponse(
-            iter([output.getvalue()]),
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
-        )
-        
+        output = await service.build_excel_export(period_start, period_end, object_id)
     except Exception as e:
-        logger.error(f"РћС€РёР±РєР° РїСЂРё СЌРєСЃРїРѕСЂС‚Рµ Р°РЅР°Р»РёС‚РёРєРё: {str(e)}")
+        logger.error(f"Ошибка при экспорте аналитики: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"РћС€РёР±РєР° РїСЂРё СЃРѕР·РґР°РЅРёРё РѕС‚С‡РµС‚Р°: {str(e)}"
+            detail=f"Ошибка при создании отчета: {str(e)}"
         )
+    
+    def iter_file():
+        # Синхронный генератор: Starlette читает его в пуле потоков
+        try:
+            while chunk := output.read(EXCEL_CHUNK_SIZE):
+                yield chunk
+        finally:
+            output.close()
+    
+    filename = f"Analytics_Export_{period_start.strftime('%Y%m%d')}_to_{period_end.strftime('%Y%m%d')}.xlsx"
+    
+    return StreamingResponse(
+        iter_file(),
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+@router.post("/export-excel/jobs", status_code=status.HTTP_202_ACCEPTED)
+async def export_analytics_to_excel_job(
+    period_start: date = Query(..., description="Начало периода (ГГГГ-ММ-ДД)"),
+    period_end: date = Query(..., description="Конец периода (ГГГГ-ММ-ДД)"),
+    object_id: Optional[int] = Query(None, description="ID объекта (если None - все объекты)"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(require_roles([UserRole.MANAGER, UserRole.ACCOUNTANT, UserRole.ADMIN]))
+):
+    """
+    Экспорт аналитики в Excel фоновой задачей
+    
+    Тот же отчет, что /export-excel, но собирается исполнителем задач.
+    Возвращает job_id; файл - GET /jobs/{job_id}/result.
+    """
+    if object_id:
+        from app.models import CostObject
+        if not await db.get(CostObject, object_id):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Объект {object_id} не найден"
+            )
+    
+    job = await JobService.enqueue(
+        db,
+        ANALYTICS_EXPORT,
+        {"period_start": period_start.isoformat(), "period_end": period_end.isoformat(), "object_id": object_id},
+        user_id=current_user.id
+    )
+    return job_accepted(job)
 
 @router.get("/top-objects-by-deliveries")
 async def get_top_objects_by_deliveries(
@@ -1,19 +1,40 @@
 ﻿"""Бизнес-логика модуля аналитики"""
 from datetime import date
 from decimal import Decimal
-from typing import List, Optional
-from sqlalchemy import select, func
+from typing import AsyncIterator, List, Optional
+from sqlalchemy import select, func, case, and_
 from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
 import io
+import tempfile
 
 from app.models import (
-    CostEntry, CostObject, EquipmentOrder,
+    CostDailyRollup, CostObject, EquipmentOrder,
     MaterialRequest, MaterialCost
 )
 
 
+# Порог, после которого потоковый Excel-экспорт уходит из памяти во временный файл
+EXCEL_SPOOL_MAX_SIZE = 8 * 1024 * 1024
+# Размер пачки строк, забираемых с серверного курсора
+DYNAMICS_BATCH_SIZE = 1000
+
+
+def rollup_type_sum(cost_type: str):
+    """SUM(amount) по одному типу затрат из cost_daily_rollup (0, если строк нет)"""
+    return func.coalesce(
+        func.sum(case((CostDailyRollup.type == cost_type, CostDailyRollup.amount), else_=0)),
+        0
+    )
+
+
 class AnalyticsService:
-    """Сервис для аналитики и отчетности"""
+    """
+    Сервис для аналитики и отчетности
+
+    Суммы затрат читаются из дневной сводки cost_daily_rollup
+    (см. CostRollupService), а не из сырых cost_entries.
+    """
     
     def __init__(self, db: AsyncSession):
         self.db = db
@@ -31,17 +52,17 @@ class AnalyticsService:
             Словарь с разбивкой затрат по типам
         """
         query = select(
-            CostEntry.type,
-            func.sum(CostEntry.amount).label('total')
-        ).where(CostEntry.cost_object_id == object_id)
+            CostDailyRollup.type,
+            func.sum(CostDailyRollup.amount).label('total')
+        ).where(CostDailyRollup.cost_object_id == object_id)
         
         if period_start:
-            query = query.where(CostEntry.date >= period_start)
+            query = query.where(CostDailyRollup.date >= period_start)
         
         if period_end:
-            query = query.where(CostEntry.date <= period_end)
+            query = query.where(CostDailyRollup.date <= period_end)
         
-        query = query.group_by(CostEntry.type)
+        query = query.group_by(CostDailyRollup.type)
         
         result = await self.db.execute(query)
         costs = {row.type: row.total for row in result}
@@ -56,40 +77,68 @@ class AnalyticsService:
     async def get_all_objects_summary(
         self,
         period_start: Optional[date] = None,
-        period_end: Optional[date] = None
+        period_end: Optional[date] = None,
+        object_id: Optional[int] = None
     ) -> List[dict]:
-        """Сводка по всем объектам"""
-        # Получение всех объектов
-        objects_query = select(CostObject)
-        objects_result = await self.db.execute(objects_query)
-        objects = objects_result.scalars().all()
-        
+        """
+        Сводка по всем объектам
+
+        Все суммы считаются одним сгруппированным запросом (объекты LEFT JOIN
+        затраты), поэтому число запросов не зависит от количества объектов.
+        """
+        # Фильтр периода кладём в условие JOIN, чтобы объекты без затрат
+        # за период тоже попадали в сводку
+        join_condition = CostDailyRollup.cost_object_id == CostObject.id
+        if period_start:
+            join_condition = and_(join_condition, CostDailyRollup.date >= period_start)
+        if period_end:
+            join_condition = and_(join_condition, CostDailyRollup.date <= period_end)
+
+        query = select(
+            CostObject.id,
+            CostObject.name,
+            CostObject.contract_amount,
+            CostObject.labor_amount,
+            CostObject.material_amount,
+            rollup_type_sum('labor').label('labor'),
+            rollup_type_sum('equipment').label('equipment'),
+            rollup_type_sum('material').label('material'),
+            func.coalesce(func.sum(CostDailyRollup.amount), 0).label('total')
+        ).outerjoin(
+            CostDailyRollup, join_condition
+        ).group_by(
+            CostObject.id
+        ).order_by(CostObject.id)
+
+        if object_id:
+            query = query.where(CostObject.id == object_id)
+
+        result = await self.db.execute(query)
+
         summary = []
-        for obj in objects:
-            costs = await self.get_object_costs(obj.id, period_start, period_end)
-            
+        for row in result:
             # Расчет оставшегося бюджета
             remaining_budget = None
             budget_utilization = None
-            
-            if obj.contract_amount and obj.contract_amount > 0:
-                remaining_budget = obj.contract_amount - costs['total']
-                budget_utilization = (costs['total'] / obj.contract_amount) * 100
-            
+
+            if row.contract_amount and row.contract_amount > 0:
+                remaining_budget = row.contract_amount - row.total
+                budget_utilization = (row.total / row.contract_amount) * 100
+
             summary.append({
-                'object_id': obj.id,
-                'object_name': obj.name,
-                'total_labor_cost': costs['labor'],
-                'total_equipment_cost': costs['equipment'],
-                'total_material_cost': costs['material'],
-                'total_cost': costs['total'],
-                'contract_amount': obj.contract_amount,
+                'object_id': row.id,
+                'object_name': row.name,
+                'total_labor_cost': row.labor,
+                'total_equipment_cost': row.equipment,
+                'total_material_cost': row.material,
+                'total_cost': row.total,
+                'contract_amount': row.contract_amount,
                 'remaining_budget': remaining_budget,
                 'budget_utilization_percent': budget_utilization,
-                'planned_labor_cost': obj.labor_amount,
-                'planned_material_cost': obj.material_amount
+                'planned_labor_cost': row.labor_amount,
+                'planned_material_cost': row.material_amount
             })
-        
+
         return summary
     
     async def export_to_excel(
@@ -117,10 +166,7 @@ class AnalyticsService:
             raise ImportError("openpyxl не установлен. Выполните: pip install openpyxl")
         
         # Получение данных
-        summary = await self.get_all_objects_summary(period_start, period_end)
-        
-        if object_id:
-            summary = [s for s in summary if s['object_id'] == object_id]
+        summary = await self.get_all_objects_summary(period_start, period_end, object_id)
         
         # Создание Excel файла
         wb = Workbook()
@@ -248,6 +294,214 @@ class AnalyticsService:
         
         return output.getvalue()
     
+    async def iter_daily_costs(
+        self,
+        period_start: date,
+        period_end: date,
+        object_id: Optional[int] = None
+    ) -> AsyncIterator:
+        """
+        Дневные затраты по типам потоком через серверный курсор
+
+        Строки не материализуются целиком: при многолетнем периоде в памяти
+        находится не более DYNAMICS_BATCH_SIZE строк.
+
+        Yields:
+            Строки (date, labor, material, equipment, total)
+        """
+        query = select(
+            CostDailyRollup.date,
+            rollup_type_sum('labor').label('labor'),
+            rollup_type_sum('material').label('material'),
+            rollup_type_sum('equipment').label('equipment'),
+            func.sum(CostDailyRollup.amount).label('total')
+        ).where(
+            CostDailyRollup.date >= period_start,
+            CostDailyRollup.date <= period_end
+        ).group_by(
+            CostDailyRollup.date
+        ).order_by(
+            CostDailyRollup.date
+        ).execution_options(yield_per=DYNAMICS_BATCH_SIZE)
+
+        if object_id:
+            query = query.where(CostDailyRollup.cost_object_id == object_id)
+
+        result = await self.db.stream(query)
+        try:
+            async for row in result:
+                yield row
+        finally:
+            await result.close()
+
+    async def build_excel_export(
+        self,
+        period_start: date,
+        period_end: date,
+        object_id: Optional[int] = None
+    ) -> tempfile.SpooledTemporaryFile:
+        """
+        Excel-отчет для /analytics/export-excel в режиме write-only
+
+        Листы: сводка по объектам, дневная динамика, детализация по видам.
+        Строки пишутся в write-only книгу сразу по мере чтения из БД
+        (openpyxl сбрасывает их во временные файлы), стили общие для всех
+        ячеек. Упаковка xlsx выполняется в потоке, чтобы не блокировать event loop.
+
+        Returns:
+            Файл с готовым xlsx, позиция в начале (закрывает вызывающий)
+        """
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font, Alignment, PatternFill, Border, Side, NamedStyle
+        from openpyxl.utils import get_column_letter
+
+        wb = Workbook(write_only=True)
+
+        # Общие стили: регистрируются в книге один раз и переиспользуются ячейками
+        border = Border(
+            left=Side(style='thin'),
+            right=Side(style='thin'),
+            top=Side(style='thin'),
+            bottom=Side(style='thin')
+        )
+        money_format = '#,##0.00 "₽"'
+        styles = {
+            'title': NamedStyle(name='export_title', font=Font(bold=True, size=14)),
+            'info': NamedStyle(name='export_info', font=Font(size=10)),
+            'header': NamedStyle(
+                name='export_header',
+                font=Font(bold=True, color="FFFFFF", size=11),
+                fill=PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid"),
+                alignment=Alignment(horizontal='center', vertical='center', wrap_text=True),
+                border=border
+            ),
+            'text': NamedStyle(
+                name='export_text',
+                alignment=Alignment(horizontal='left', vertical='center'),
+                border=border
+            ),
+            'date': NamedStyle(
+                name='export_date',
+                alignment=Alignment(horizontal='center', vertical='center'),
+                border=border,
+                number_format='DD.MM.YYYY'
+            ),
+            'money': NamedStyle(
+                name='export_money',
+                alignment=Alignment(horizontal='right', vertical='center'),
+                border=border,
+                number_format=money_format
+            ),
+            'percent': NamedStyle(
+                name='export_percent',
+                alignment=Alignment(horizontal='right', vertical='center'),
+                border=border,
+                number_format='0.00"%"'
+            ),
+            'total_text': NamedStyle(name='export_total_text', font=Font(bold=True, size=10)),
+            'total_money': NamedStyle(
+                name='export_total_money',
+                font=Font(bold=True, size=10),
+                fill=PatternFill(start_color="FFF2CC", end_color="FFF2CC", fill_type="solid"),
+                alignment=Alignment(horizontal='right', vertical='center'),
+                border=border,
+                number_format=money_format
+            ),
+        }
+        for style in styles.values():
+            wb.add_named_style(style)
+
+        def styled_row(ws, values, style_names):
+            row = []
+            for value, style_name in zip(values, style_names):
+                cell = WriteOnlyCell(ws, value=value)
+                if style_name:
+                    cell.style = styles[style_name].name
+                row.append(cell)
+            ws.append(row)
+
+        def create_sheet(title: str, heading: str, widths: List[int]):
+            ws = wb.create_sheet(title)
+            # В write-only режиме ширины задаются до первой строки
+            for idx, width in enumerate(widths, 1):
+                ws.column_dimensions[get_column_letter(idx)].width = width
+            styled_row(ws, [heading], ['title'])
+            return ws
+
+        period_text = f"Период: {period_start.strftime('%d.%m.%Y')} - {period_end.strftime('%d.%m.%Y')}"
+
+        # ===== ЛИСТ 1: СВОДКА ПО ОБЪЕКТАМ =====
+        ws_summary = create_sheet("Сводка по объектам", "Аналитика затрат по объектам", [25, 18, 18, 18, 18])
+        styled_row(ws_summary, [period_text], ['info'])
+        ws_summary.append([])
+        styled_row(
+            ws_summary,
+            ["Объект", "Затраты труда", "Затраты материалы", "Затраты техника", "ВСЕГО"],
+            ['header'] * 5
+        )
+
+        summary = await self.get_all_objects_summary(period_start, period_end, object_id)
+        totals = {'labor': 0.0, 'material': 0.0, 'equipment': 0.0, 'total': 0.0}
+        for item in sorted(summary, key=lambda x: x['object_name'] or ''):
+            labor = float(item['total_labor_cost'] or 0)
+            material = float(item['total_material_cost'] or 0)
+            equipment = float(item['total_equipment_cost'] or 0)
+            total = float(item['total_cost'] or 0)
+            totals['labor'] += labor
+            totals['material'] += material
+            totals['equipment'] += equipment
+            totals['total'] += total
+            styled_row(
+                ws_summary,
+                [item['object_name'], labor, material, equipment, total],
+                ['text', 'money', 'money', 'money', 'money']
+            )
+
+        styled_row(
+            ws_summary,
+            ["ИТОГО:", totals['labor'], totals['material'], totals['equipment'], totals['total']],
+            ['total_text'] + ['total_money'] * 4
+        )
+
+        # ===== ЛИСТ 2: ДИНАМИКА ЗАТРАТ =====
+        ws_dynamics = create_sheet("Динамика по датам", "Динамика затрат по датам", [15, 18, 18, 18, 18])
+        styled_row(
+            ws_dynamics,
+            ["Дата", "Затраты труда", "Затраты материалы", "Затраты техника", "ВСЕГО"],
+            ['header'] * 5
+        )
+        has_dynamics = False
+        async for row in self.iter_daily_costs(period_start, period_end, object_id):
+            has_dynamics = True
+            styled_row(
+                ws_dynamics,
+                [row.date, float(row.labor), float(row.material), float(row.equipment), float(row.total)],
+                ['date', 'money', 'money', 'money', 'money']
+            )
+        if not has_dynamics:
+            ws_dynamics.append(["Данные не найдены"])
+
+        # ===== ЛИСТ 3: ДЕТАЛИЗАЦИЯ ПО ВИДАМ =====
+        ws_details = create_sheet("Детализация по видам", "Детализация затрат по видам", [25, 18, 15])
+        styled_row(ws_details, ["Вид затрат", "Сумма (₽)", "% от всего"], ['header'] * 3)
+        for name, key in (
+            ("Затраты на труд", 'labor'),
+            ("Затраты на материалы", 'material'),
+            ("Затраты на технику", 'equipment'),
+        ):
+            percentage = (totals[key] / totals['total'] * 100) if totals['total'] > 0 else 0
+            styled_row(ws_details, [name, totals[key], percentage], ['text', 'money', 'percent'])
+
+        output = tempfile.SpooledTemporaryFile(max_size=EXCEL_SPOOL_MAX_SIZE)
+        try:
+            await asyncio.to_thread(wb.save, output)
+        except Exception:
+            output.close()
+            raise
+        output.seek(0)
+        return output
+
     async def get_cost_breakdown(
         self,
         period_start: Optional[date] = None,
@@ -255,17 +509,17 @@ class AnalyticsService:
     ) -> List[dict]:
         """Разбивка затрат по типам"""
         query = select(
-            CostEntry.type,
-            func.sum(CostEntry.amount).label('total')
+            CostDailyRollup.type,
+            func.sum(CostDailyRollup.amount).label('total')
         )
         
         if period_start:
-            query = query.where(CostEntry.date >= period_start)
+            query = query.where(CostDailyRollup.date >= period_start)
         
         if period_end:
-            query = query.where(CostEntry.date <= period_end)
+            query = query.where(CostDailyRollup.date <= period_end)
         
-        query = query.group_by(CostEntry.type)
+        query = query.group_by(CostDailyRollup.type)
         
         result = await self.db.execute(query)
         costs = {row.type: row.total for row in result}
@@ -364,14 +618,14 @@ class AnalyticsService:
     ) -> List[dict]:
         """Динамика затрат по объекту"""
         query = select(
-            CostEntry.date,
-            CostEntry.type,
-            func.sum(CostEntry.amount).label('amount')
+            CostDailyRollup.date,
+            CostDailyRollup.type,
+            func.sum(CostDailyRollup.amount).label('amount')
         ).where(
-            CostEntry.cost_object_id == object_id,
-            CostEntry.date >= period_start,
-            CostEntry.date <= period_end
-        ).group_by(CostEntry.date, CostEntry.type).order_by(CostEntry.date)
+            CostDailyRollup.cost_object_id == object_id,
+            CostDailyRollup.date >= period_start,
+            CostDailyRollup.date <= period_end
+        ).group_by(CostDailyRollup.date, CostDailyRollup.type).order_by(CostDailyRollup.date)
        
     async def get_top_5_objects(
         self,
@@ -381,20 +635,19 @@ class AnalyticsService:
     ) -> List:
         """TOP-5 objects by cost or budget utilization"""
         from app.analytics.schemas import Top5Object
-        from app.core.models_base import CostType
         
         # Get all objects with costs
         query = select(
-            CostEntry.cost_object_id,
-            func.sum(CostEntry.amount).label('total_cost')
+            CostDailyRollup.cost_object_id,
+            func.sum(CostDailyRollup.amount).label('total_cost')
         )
         
         if period_start:
-            query = query.where(CostEntry.date >= period_start)
+            query = query.where(CostDailyRollup.date >= period_start)
         if period_end:
-            query = query.where(CostEntry.date <= period_end)
+            query = query.where(CostDailyRollup.date <= period_end)
         
-        query = query.group_by(CostEntry.cost_object_id)
+        query = query.group_by(CostDailyRollup.cost_object_id)
         
         result = await self.db.execute(query)
         object_costs = {row.cost_object_id: row.total_cost for row in result.all()}
@@ -450,27 +703,26 @@ class AnalyticsService:
     ):
         """Cost dynamics by periods"""
         from app.analytics.schemas import CostDynamics, CostDynamicsPoint
-        from app.core.models_base import CostType
         from collections import defaultdict
         from datetime import timedelta
         
         # Base query
         query = select(
-            CostEntry.date,
-            CostEntry.type,
-            func.sum(CostEntry.amount).label('amount')
+            CostDailyRollup.date,
+            CostDailyRollup.type,
+            func.sum(CostDailyRollup.amount).label('amount')
         )
         
         # Filters
         if object_id:
-            query = query.where(CostEntry.cost_object_id == object_id)
+            query = query.where(CostDailyRollup.cost_object_id == object_id)
         if period_start:
-            query = query.where(CostEntry.date >= period_start)
+            query = query.where(CostDailyRollup.date >= period_start)
         if period_end:
-            query = query.where(CostEntry.date <= period_end)
+            query = query.where(CostDailyRollup.date <= period_end)
         
-        query = query.group_by(CostEntry.date, CostEntry.type)
-        query = query.order_by(CostEntry.date)
+        query = query.group_by(CostDailyRollup.date, CostDailyRollup.type)
+        query = query.order_by(CostDailyRollup.date)
         
         result = await self.db.execute(query)
         raw_data = result.all()
@@ -493,7 +745,7 @@ class AnalyticsService:
         # Grouping
         for row in raw_data:
             period_key = get_period_key(row.date)
-            period_costs[period_key][row.type] += row.amount
+            period_costs[period_key][row.type] += Decimal(str(row.amount))
         
         # Form points
         points = []
@@ -11,6 +11,8 @@ from app.auth.dependencies import get_current_user, require_roles
 from app.models import User
 from app.core.models_base import UserRole
 from app.services.audit_service import AuditService
+from app.services.audit_storage_service import AuditStorageService
+from app.middleware.audit_sink import get_audit_sink
 from pydantic import BaseModel, Field
 
 
@@ -170,64 +172,27 @@ async def get_audit_stats(
 ):
     """
     Статистика по журналу аудита
+    
+    Считается по дневной статистике (audit_daily_stats): период -
+    целые дни, начиная с даты days дней назад.
     """
     from datetime import datetime, timedelta
-    from sqlalchemy import func, select
-    from app.models import AuditLog
-    
-    date_from = datetime.now() - timedelta(days=days)
-    
-    # Общее количество
-    total_query = select(func.count(AuditLog.id)).where(AuditLog.timestamp >= date_from)
-    total_result = await db.execute(total_query)
-    total_logs = total_result.scalar()
-    
-    # По действиям
-    actions_query = select(
-        AuditLog.action,
-        func.count(AuditLog.id).label('count')
-    ).where(
-        AuditLog.timestamp >= date_from
-    ).group_by(AuditLog.action)
-    
-    actions_result = await db.execute(actions_query)
-    actions = {row.action: row.count for row in actions_result}
-    
-    # По типам сущностей
-    entities_query = select(
-        AuditLog.entity_type,
-        func.count(AuditLog.id).label('count')
-    ).where(
-        AuditLog.timestamp >= date_from
-    ).group_by(AuditLog.entity_type)
-    
-    entities_result = await db.execute(entities_query)
-    entities = {row.entity_type: row.count for row in entities_result}
-    
-    # Топ пользователей
-    top_users_query = select(
-        AuditLog.user_id,
-        User.username,
-        func.count(AuditLog.id).label('count')
-    ).join(
-        User, AuditLog.user_id == User.id
-    ).where(
-        AuditLog.timestamp >= date_from
-    ).group_by(
-        AuditLog.user_id, User.username
-    ).order_by(
-        func.count(AuditLog.id).desc()
-    ).limit(10)
     
-    top_users_result = await db.execute(top_users_query)
-    top_users = [
-        {"user_id": row.user_id, "username": row.username, "actions_count": row.count}
-        for row in top_users_result
-    ]
+    date_from = (datetime.utcnow() - timedelta(days=days)).date()
+    stats = await AuditStorageService(db).get_stats(date_from)
     
-    return AuditStatsResponse(
-        total_logs=total_logs,
-        actions=actions,
-        entities=entities,
-        top_users=top_users
-    )
+    return AuditStatsResponse(**stats)
+
+
+@router.get("/sink/metrics")
+async def get_audit_sink_metrics(
+    current_user: User = Depends(require_roles([UserRole.ADMIN]))
+):
+    """
+    Метрики очереди записи аудита этого процесса
+
+    - queued: записей ждут записи в БД
+    - written / batches: записано записей и пачек
+    - dropped: отброшено при переполнении очереди или остановке
+    """
+    return get_audit_sink().metrics()
@@ -10,6 +10,7 @@ from sqlalchemy import select
 from app.core.database import get_db
 from app.models import User
 from app.auth.security import decode_token
+from app.auth.user_cache import get_user_cache, user_to_snapshot, user_from_snapshot
 from app.core.models_base import UserRole
 
 logger = logging.getLogger(__name__)
@@ -49,13 +50,21 @@ async def get_current_user(
             logger.error(f"Invalid user_id format in token: {user_id_str}")
             raise credentials_exception
         
-        # Получение пользователя из БД
-        result = await db.execute(select(User).where(User.id == user_id))
-        user = result.scalar_one_or_none()
-        
-        if user is None:
-            logger.warning(f"User not found: {user_id}")
-            raise credentials_exception
+        # Получение пользователя из кэша или БД
+        cache = get_user_cache()
+        snapshot = await cache.get(user_id)
+        if snapshot is not None:
+            # Присоединяем к сессии без SELECT: изменения сохранятся обычным commit
+            user = await db.merge(user_from_snapshot(snapshot), load=False)
+        else:
+            result = await db.execute(select(User).where(User.id == user_id))
+            user = result.scalar_one_or_none()
+            
+            if user is None:
+                logger.warning(f"User not found: {user_id}")
+                raise credentials_exception
+            
+            await cache.set(user_id, user_to_snapshot(user))
         
         if not user.is_active:
             logger.warning(f"Inactive user attempted access: {user_id}")
@@ -64,6 +73,12 @@ async def get_current_user(
                 detail="Inactive user"
             )
         
+        # Токен бота (вход по Telegram ID) отзывается отвязкой аккаунта
+        telegram_id = payload.get("tg")
+        if telegram_id is not None and user.telegram_chat_id != telegram_id:
+            logger.warning(f"Token of unlinked Telegram account {telegram_id} for user {user_id}")
+            raise credentials_exception
+        
         return user
         
     except HTTPException:
@@ -18,7 +18,8 @@ from app.auth import schemas
 from app.auth.security import (
     verify_password, get_password_hash, create_access_token, create_refresh_token, decode_token
 )
-from app.auth.dependencies import get_current_user
+from app.auth.dependencies import get_current_user, require_roles
+from app.auth.user_cache import get_user_cache, invalidate_cached_user
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
@@ -235,12 +236,22 @@ async def refresh_token(
                 detail="User not found or inactive"
             )
         
+        # Токены входа бота действительны, пока Telegram аккаунт привязан
+        telegram_id = payload.get("tg")
+        if telegram_id is not None and user.telegram_chat_id != telegram_id:
+            logger.warning(f"Refresh rejected: Telegram {telegram_id} is no longer linked to user {user_id}")
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Telegram account is no longer linked"
+            )
+        
         # Парсинг ролей из JSON (для SQLite совместимости)
         roles = user.roles if isinstance(user.roles, list) else json.loads(user.roles) if isinstance(user.roles, str) else []
         
         # Создание новых токенов
-        access_token = create_access_token(data={"sub": user_id_str, "roles": roles})
-        new_refresh_token = create_refresh_token(data={"sub": user_id_str})
+        extra = {"tg": telegram_id} if telegram_id is not None else {}
+        access_token = create_access_token(data={"sub": user_id_str, "roles": roles, **extra})
+        new_refresh_token = create_refresh_token(data={"sub": user_id_str, **extra})
         
         logger.info(f"Tokens refreshed successfully for user_id: {user_id}")
         
@@ -278,6 +289,20 @@ async def get_me(current_user: User = Depends(get_current_user)):
     }
 
 
+@router.get("/user-cache/metrics")
+async def get_user_cache_metrics(
+    current_user: User = Depends(require_roles(["ADMIN"]))
+):
+    """
+    Метрики кэша пользователей этого процесса
+
+    - backend: memory | redis | off
+    - hits / misses / hit_rate: попадания и промахи get_current_user
+    - invalidations / errors: сбросы и ошибки хранилища
+    """
+    return get_user_cache().metrics()
+
+
 @router.patch("/me/profile")
 async def update_profile(
     full_name: Optional[str] = Body(None),
@@ -319,6 +344,7 @@ async def update_profile(
         current_user.profile_photo_url = profile_photo_url
     
     await db.commit()
+    await invalidate_cached_user(current_user.id)
     await db.refresh(current_user)
     
     return {
@@ -390,6 +416,7 @@ async def upload_profile_photo(
     current_user.profile_photo_url = photo_url
     
     await db.commit()
+    await invalidate_cached_user(current_user.id)
     await db.refresh(current_user)
     
     return {
@@ -424,6 +451,7 @@ async def delete_profile_photo(
     # Очистка URL в БД
     current_user.profile_photo_url = None
     await db.commit()
+    await invalidate_cached_user(current_user.id)
     
     return {"message": "Фото профиля удалено"}
 
@@ -460,11 +488,13 @@ async def telegram_login(
                 detail="Аккаунт деактивирован"
             )
         
-        # Создание токенов (sub должен быть user.id как строка)
+        # Создание токенов (sub должен быть user.id как строка).
+        # tg - Telegram ID входа: после отвязки/перепривязки токены бота
+        # отклоняются (см. get_current_user и /refresh)
         user_id_str = str(user.id)
         roles = user.roles or []
-        access_token = create_access_token(data={"sub": user_id_str, "roles": roles})
-        refresh_token = create_refresh_token(data={"sub": user_id_str})
+        access_token = create_access_token(data={"sub": user_id_str, "roles": roles, "tg": telegram_user_id})
+        refresh_token = create_refresh_token(data={"sub": user_id_str, "tg": telegram_user_id})
         
         logger.info(f"Telegram login successful for user {user.username} (TG ID: {telegram_user_id})")
         
@@ -0,0 +1,247 @@
+"""
+Кэш аутентифицированных пользователей
+
+get_current_user вызывается почти на каждый запрос API. Чтобы не читать
+пользователя из БД каждый раз, снимок его полей (SNAPSHOT_FIELDS: роли,
+is_active, профиль; без хэша пароля) кэшируется по user_id на короткий TTL.
+
+Режимы (auth_user_cache_backend):
+    memory - словарь в памяти процесса (сброс виден только этому процессу,
+             остальные воркеры увидят изменения по истечении TTL)
+    redis  - общий кэш всех воркеров в Redis (redis_url)
+    off    - кэш отключен
+
+Эндпоинты, меняющие пользователя (роли, активность, профиль, привязка
+Telegram, одобрение заявки), вызывают invalidate_cached_user.
+"""
+import json
+import logging
+import time
+from datetime import date, datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy import Date, DateTime
+from sqlalchemy.orm import make_transient_to_detached
+
+from app.core.config import settings
+from app.models import User
+
+logger = logging.getLogger(__name__)
+
+# Предел записей в памяти процесса (защита от неограниченного роста)
+MEMORY_CACHE_MAX_USERS = 10000
+REDIS_KEY_PREFIX = "auth:user:"
+
+
+# Поля снимка: то, что читают get_current_user, require_roles и эндпоинты
+# профиля (/auth/me, привязка Telegram). Хэш пароля и служебные метки
+# времени в кэш не попадают
+SNAPSHOT_FIELDS = (
+    "id", "username", "phone", "email", "full_name", "birth_date",
+    "profile_photo_url", "roles", "telegram_chat_id", "is_active",
+)
+
+
+def user_to_snapshot(user: User) -> str:
+    """Снимок полей SNAPSHOT_FIELDS пользователя в JSON"""
+    data = {}
+    for key in SNAPSHOT_FIELDS:
+        value = getattr(user, key)
+        if isinstance(value, (date, datetime)):
+            value = value.isoformat()
+        data[key] = value
+    return json.dumps(data, ensure_ascii=False)
+
+
+def user_from_snapshot(snapshot: str) -> User:
+    """
+    Пользователь из снимка в состоянии detached
+
+    Объект нужно присоединить к сессии через merge(load=False) - тогда его
+    изменения в эндпоинтах сохраняются обычным commit без лишнего SELECT.
+    Поля вне SNAPSHOT_FIELDS не загружены (expired); если они нужны, их
+    читают через await db.refresh(user, [...]).
+    """
+    raw = json.loads(snapshot)
+    data = {}
+    for key in SNAPSHOT_FIELDS:
+        # Снимки старого формата могут содержать лишние поля - берем только свои
+        if key not in raw:
+            continue
+        value = raw[key]
+        column_type = User.__table__.columns[key].type
+        if value is not None and isinstance(column_type, DateTime):
+            value = datetime.fromisoformat(value)
+        elif value is not None and isinstance(column_type, Date):
+            value = date.fromisoformat(value)
+        data[key] = value
+
+    user = User(**data)
+    make_transient_to_detached(user)
+    return user
+
+
+class UserCache:
+    """Базовый кэш (режим off): всегда промах"""
+
+    backend = "off"
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+        self._errors = 0
+
+    async def _load(self, user_id: int) -> Optional[str]:
+        return None
+
+    async def _store(self, user_id: int, snapshot: str) -> None:
+        pass
+
+    async def _delete(self, user_id: int) -> None:
+        pass
+
+    async def get(self, user_id: int) -> Optional[str]:
+        """Снимок пользователя из кэша или None"""
+        try:
+            snapshot = await self._load(user_id)
+        except Exception as e:
+            # Недоступный кэш не должен ломать аутентификацию
+            self._errors += 1
+            logger.warning(f"Кэш пользователей недоступен ({self.backend}): {e}")
+            snapshot = None
+
+        if snapshot is None:
+            self._misses += 1
+        else:
+            self._hits += 1
+        return snapshot
+
+    async def set(self, user_id: int, snapshot: str) -> None:
+        try:
+            await self._store(user_id, snapshot)
+        except Exception as e:
+            self._errors += 1
+            logger.warning(f"Не удалось сохранить пользователя {user_id} в кэш ({self.backend}): {e}")
+
+    async def invalidate(self, user_id: int) -> None:
+        self._invalidations += 1
+        try:
+            await self._delete(user_id)
+        except Exception as e:
+            self._errors += 1
+            logger.warning(f"Не удалось сбросить пользователя {user_id} в кэше ({self.backend}): {e}")
+
+    def metrics(self) -> Dict[str, Any]:
+        """Счетчики попаданий и промахов этого процесса"""
+        requests = self._hits + self._misses
+        return {
+            "backend": self.backend,
+            "ttl": self.ttl,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": round(self._hits / requests, 4) if requests else 0.0,
+            "invalidations": self._invalidations,
+            "errors": self._errors,
+        }
+
+    async def close(self) -> None:
+        pass
+
+
+class MemoryUserCache(UserCache):
+    """Кэш в памяти процесса"""
+
+    backend = "memory"
+
+    def __init__(self, ttl: float, max_users: int = MEMORY_CACHE_MAX_USERS):
+        super().__init__(ttl)
+        self.max_users = max_users
+        self._entries: Dict[int, tuple] = {}
+
+    async def _load(self, user_id: int) -> Optional[str]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        expires_at, snapshot = entry
+        if expires_at <= time.monotonic():
+            del self._entries[user_id]
+            return None
+        return snapshot
+
+    async def _store(self, user_id: int, snapshot: str) -> None:
+        self._entries.pop(user_id, None)
+        while len(self._entries) >= self.max_users:
+            # Словарь хранит порядок вставки - удаляем самую старую запись
+            del self._entries[next(iter(self._entries))]
+        self._entries[user_id] = (time.monotonic() + self.ttl, snapshot)
+
+    async def _delete(self, user_id: int) -> None:
+        self._entries.pop(user_id, None)
+
+    def metrics(self) -> Dict[str, Any]:
+        metrics = super().metrics()
+        metrics["size"] = len(self._entries)
+        return metrics
+
+
+class RedisUserCache(UserCache):
+    """Общий кэш в Redis; TTL ключей выставляет сам Redis"""
+
+    backend = "redis"
+
+    def __init__(self, ttl: float, redis_url: str):
+        super().__init__(ttl)
+        from redis import asyncio as aioredis
+
+        self._redis = aioredis.from_url(redis_url, socket_timeout=1.0, socket_connect_timeout=1.0)
+
+    @staticmethod
+    def _key(user_id: int) -> str:
+        return f"{REDIS_KEY_PREFIX}{user_id}"
+
+    async def _load(self, user_id: int) -> Optional[str]:
+        snapshot = await self._redis.get(self._key(user_id))
+        return snapshot.decode("utf-8") if snapshot is not None else None
+
+    async def _store(self, user_id: int, snapshot: str) -> None:
+        await self._redis.set(self._key(user_id), snapshot, px=int(self.ttl * 1000))
+
+    async def _delete(self, user_id: int) -> None:
+        await self._redis.delete(self._key(user_id))
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+_cache: Optional[UserCache] = None
+
+
+def get_user_cache() -> UserCache:
+    """Общий кэш пользователей процесса (режим из настроек)"""
+    global _cache
+    if _cache is None:
+        backend = settings.auth_user_cache_backend.lower()
+        ttl = settings.auth_user_cache_ttl
+        if backend == "redis":
+            _cache = RedisUserCache(ttl, settings.redis_url)
+        elif backend == "memory" and ttl > 0:
+            _cache = MemoryUserCache(ttl)
+        else:
+            _cache = UserCache(ttl)
+        logger.info(f"Кэш пользователей: {_cache.backend}, TTL {ttl:g} с")
+    return _cache
+
+
+async def invalidate_cached_user(user_id: int) -> None:
+    """Сбросить кэш пользователя после изменения его данных"""
+    await get_user_cache().invalidate(user_id)
+
+
+async def close_user_cache() -> None:
+    """Закрыть кэш (при завершении приложения)"""
+    global _cache
+    if _cache is not None:
+        await _cache.close()
+        _cache = None
@@ -12,9 +12,33 @@ class BotConfig:
     token: str
     admin_ids: list[int]
     api_base_url: str
+    # Получение updates: "polling" - long polling, "webhook" - HTTP сервер бота (webhook_url)
+    mode: str = "polling"
     webhook_url: str | None = None
     webhook_path: str = "/bot/webhook"
+    webhook_secret: str | None = None
+    webhook_host: str = "0.0.0.0"
+    webhook_port: int = 8081
+    webhook_workers: int = 16  # параллельная обработка updates
+    webhook_max_pending: int = 1000  # сверх - 503, Telegram повторит
     web_app_url: str = "https://D1sssyaaaa.github.io/Foremen_V3_Clean/index.html"
+    # Транспорт к backend API: "http" - по сети, "asgi" - в процессе бота
+    api_transport: str = "http"
+    # Общий пул HTTP соединений к backend API
+    api_timeout: float = 30.0
+    api_max_connections: int = 100
+    api_max_keepalive_connections: int = 20
+    api_keepalive_expiry: float = 30.0
+    # Кэш JWT токенов пользователей: memory | redis
+    token_store: str = "memory"
+    redis_url: str = "redis://localhost:6379/0"
+    token_refresh_margin: float = 300.0  # сек до истечения access токена
+    token_unknown_ttl: float = 60.0  # сек, повторный вход непривязанного пользователя
+    # Хранилище состояний диалогов (FSM): memory | sql | redis
+    fsm_storage: str = "memory"
+    fsm_ttl: float = 86400.0  # сек, заброшенные диалоги удаляются
+    fsm_flush_interval: float = 0.2  # сек, запись изменений вне обработки update в режиме sql
+    fsm_cache_ttl: float = 0.0  # сек, локальный кэш чтений в режиме sql (только одна реплика)
     
     @classmethod
     def from_env(cls) -> "BotConfig":
@@ -27,15 +51,68 @@ class BotConfig:
         admin_ids = [int(id.strip()) for id in admin_ids_str.split(",") if id.strip()]
         
         api_base_url = os.getenv("API_BASE_URL", "http://localhost:8000/api/v1")
+        # Webhook включается только явно: TELEGRAM_WEBHOOK_URL из примера .env
+        # без BOT_MODE=webhook не отключает polling
+        mode = os.getenv("BOT_MODE", "polling").lower()
+        if mode not in ("polling", "webhook"):
+            raise ValueError("BOT_MODE должен быть polling или webhook")
         webhook_url = os.getenv("TELEGRAM_WEBHOOK_URL")
+        if mode == "webhook" and not webhook_url:
+            raise ValueError("Для BOT_MODE=webhook задайте TELEGRAM_WEBHOOK_URL")
+        webhook_path = os.getenv("TELEGRAM_WEBHOOK_PATH", "/bot/webhook")
+        webhook_secret = os.getenv("TELEGRAM_WEBHOOK_SECRET")
+        webhook_host = os.getenv("BOT_WEBHOOK_HOST", "0.0.0.0")
+        webhook_port = int(os.getenv("BOT_WEBHOOK_PORT", "8081"))
+        webhook_workers = int(os.getenv("BOT_WEBHOOK_WORKERS", "16"))
+        webhook_max_pending = int(os.getenv("BOT_WEBHOOK_MAX_PENDING", "1000"))
         web_app_url = os.getenv("TELEGRAM_WEB_APP_URL", "http://10.170.65.240:3000")
         
+        api_transport = os.getenv("BOT_API_TRANSPORT", "http").lower()
+        if api_transport not in ("http", "asgi"):
+            raise ValueError("BOT_API_TRANSPORT должен быть http или asgi")
+        api_timeout = float(os.getenv("BOT_API_TIMEOUT", "30"))
+        api_max_connections = int(os.getenv("BOT_API_MAX_CONNECTIONS", "100"))
+        api_max_keepalive_connections = int(os.getenv("BOT_API_MAX_KEEPALIVE_CONNECTIONS", "20"))
+        api_keepalive_expiry = float(os.getenv("BOT_API_KEEPALIVE_EXPIRY", "30"))
+        
+        token_store = os.getenv("BOT_TOKEN_STORE", "memory").lower()
+        redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+        token_refresh_margin = float(os.getenv("BOT_TOKEN_REFRESH_MARGIN", "300"))
+        token_unknown_ttl = float(os.getenv("BOT_TOKEN_UNKNOWN_TTL", "60"))
+        
+        fsm_storage = os.getenv("BOT_FSM_STORAGE", "memory").lower()
+        if fsm_storage not in ("memory", "sql", "redis"):
+            raise ValueError("BOT_FSM_STORAGE должен быть memory, sql или redis")
+        fsm_ttl = float(os.getenv("BOT_FSM_TTL", "86400"))
+        fsm_flush_interval = float(os.getenv("BOT_FSM_FLUSH_INTERVAL", "0.2"))
+        fsm_cache_ttl = float(os.getenv("BOT_FSM_CACHE_TTL", "0"))
+        
         return cls(
             token=token,
             admin_ids=admin_ids,
             api_base_url=api_base_url,
+            mode=mode,
             webhook_url=webhook_url,
-            web_app_url=web_app_url
+            webhook_path=webhook_path,
+            webhook_secret=webhook_secret,
+            webhook_host=webhook_host,
+            webhook_port=webhook_port,
+            webhook_workers=webhook_workers,
+            webhook_max_pending=webhook_max_pending,
+            web_app_url=web_app_url,
+            api_transport=api_transport,
+            api_timeout=api_timeout,
+            api_max_connections=api_max_connections,
+            api_max_keepalive_connections=api_max_keepalive_connections,
+            api_keepalive_expiry=api_keepalive_expiry,
+            token_store=token_store,
+            redis_url=redis_url,
+            token_refresh_margin=token_refresh_margin,
+            token_unknown_ttl=token_unknown_ttl,
+            fsm_storage=fsm_storage,
+            fsm_ttl=fsm_ttl,
+            fsm_flush_interval=fsm_flush_interval,
+            fsm_cache_ttl=fsm_cache_ttl
         )
 
 
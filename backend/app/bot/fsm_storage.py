@@ -0,0 +1,261 @@
+"""
+Хранилища состояний диалогов (FSM) бота
+
+MemoryStorage aiogram держит состояния в памяти одного процесса: они
+теряются при перезапуске, и несколько реплик бота не видят друг друга.
+Режимы (BOT_FSM_STORAGE):
+    memory - MemoryStorage aiogram (по умолчанию, для разработки)
+    sql    - таблица bot_fsm_states в основной БД (SQLite/PostgreSQL)
+    redis  - RedisStorage aiogram (REDIS_URL)
+
+SQLStorage пишет отложенно: изменения одного update копятся в буфере
+и записываются одной транзакцией, когда его обработка завершена
+(FSMFlushMiddleware), а записи вне обработки update - раз в
+flush_interval. Чтения сначала проверяют буфер, затем локальный кэш
+(cache_ttl, по умолчанию выключен) и БД. Диалоги, не менявшиеся
+дольше ttl, не читаются и периодически удаляются.
+
+Несколько реплик: после обработки update его изменения уже в БД, и
+следующий update того же чата на другой реплике их видит. cache_ttl > 0
+допустим только для одной реплики (или при привязке чата к реплике):
+иначе реплика может прочитать состояние из своего кэша, не увидев
+изменения другой реплики.
+"""
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.bot.config import config
+from app.bot.models import BotFSMState
+
+logger = logging.getLogger(__name__)
+
+# (состояние, данные) диалога; пустая запись означает "нет диалога"
+Record = Tuple[Optional[str], Dict[str, Any]]
+EMPTY_RECORD: Record = (None, {})
+
+
+def storage_key(key: StorageKey) -> str:
+    """Строковый ключ записи в таблице bot_fsm_states"""
+    parts = [str(key.bot_id), str(key.chat_id), str(key.user_id)]
+    if key.thread_id:
+        parts.append(str(key.thread_id))
+    parts.append(key.destiny)
+    return ":".join(parts)
+
+
+def _state_name(state: StateType) -> Optional[str]:
+    return state.state if isinstance(state, State) else state
+
+
+def _copy_data(data: Dict[str, Any]) -> Dict[str, Any]:
+    # Через JSON: как при чтении из БД, и ошибка сериализации видна сразу
+    return json.loads(json.dumps(data))
+
+
+class SQLStorage(BaseStorage):
+    """FSM хранилище в таблице bot_fsm_states с пакетной записью"""
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker,
+        ttl: float = 86400.0,
+        flush_interval: float = 0.2,
+        cache_ttl: float = 0.0,
+        cache_size: int = 10000,
+        evict_interval: float = 300.0
+    ):
+        self.session_factory = session_factory
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self.evict_interval = evict_interval
+
+        self._pending: Dict[str, Record] = {}
+        self._cache: "OrderedDict[str, Tuple[float, Record]]" = OrderedDict()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        self._last_evict = time.monotonic()
+        self.reads = 0
+        self.flushes = 0
+
+    # ===== Записи =====
+
+    def _remember(self, key: str, record: Record) -> None:
+        self._cache[key] = (time.monotonic(), record)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def _get_record(self, key: StorageKey) -> Record:
+        name = storage_key(key)
+        if name in self._pending:
+            return self._pending[name]
+        cached = self._cache.get(name)
+        if cached is not None and time.monotonic() - cached[0] < self.cache_ttl:
+            return cached[1]
+
+        self.reads += 1
+        async with self.session_factory() as session:
+            row = (await session.execute(
+                select(BotFSMState.state, BotFSMState.data, BotFSMState.updated_at)
+                .where(BotFSMState.key == name)
+            )).one_or_none()
+        if row is None or row.updated_at < datetime.utcnow() - timedelta(seconds=self.ttl):
+            record = EMPTY_RECORD
+        else:
+            record = (row.state, row.data or {})
+        self._remember(name, record)
+        return record
+
+    async def _set_record(self, key: StorageKey, record: Record) -> None:
+        name = storage_key(key)
+        self._pending[name] = record
+        self._remember(name, record)
+        self._ensure_flusher()
+
+    # ===== BaseStorage =====
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        _, data = await self._get_record(key)
+        await self._set_record(key, (_state_name(state), data))
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        state, _ = await self._get_record(key)
+        return state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        state, _ = await self._get_record(key)
+        await self._set_record(key, (state, _copy_data(data)))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, data = await self._get_record(key)
+        return _copy_data(data)
+
+    async def close(self) -> None:
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+
+    # ===== Пакетная запись =====
+
+    def _ensure_flusher(self) -> None:
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+                if time.monotonic() - self._last_evict >= self.evict_interval:
+                    await self.evict_expired()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ FSM storage flush failed: {e}")
+            if not self._pending:
+                # Следующая запись запустит цикл заново
+                self._flush_task = None
+                return
+
+    def _upsert(self, session: AsyncSession, rows: list):
+        dialect = session.bind.dialect.name
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        elif dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            return None
+        stmt = insert(BotFSMState).values(rows)
+        return stmt.on_conflict_do_update(
+            index_elements=[BotFSMState.key],
+            set_={
+                "state": stmt.excluded.state,
+                "data": stmt.excluded.data,
+                "updated_at": stmt.excluded.updated_at,
+            }
+        )
+
+    async def flush(self) -> int:
+        """Записать накопленные изменения одной транзакцией; возвращает их число"""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, {}
+            now = datetime.utcnow()
+            removed = [name for name, record in batch.items() if record == EMPTY_RECORD]
+            rows = [
+                {"key": name, "state": state, "data": data, "updated_at": now}
+                for name, (state, data) in batch.items()
+                if (state, data) != EMPTY_RECORD
+            ]
+            try:
+                async with self.session_factory() as session:
+                    if removed:
+                        await session.execute(delete(BotFSMState).where(BotFSMState.key.in_(removed)))
+                    if rows:
+                        stmt = self._upsert(session, rows)
+                        if stmt is not None:
+                            await session.execute(stmt)
+                        else:
+                            for row in rows:
+                                await session.merge(BotFSMState(**row))
+                    await session.commit()
+            except BaseException:
+                # Вернуть в буфер то, что не перезаписано новыми изменениями
+                for name, record in batch.items():
+                    self._pending.setdefault(name, record)
+                raise
+            self.flushes += 1
+            return len(batch)
+
+    async def evict_expired(self) -> int:
+        """Удалить диалоги, не менявшиеся дольше ttl"""
+        self._last_evict = time.monotonic()
+        threshold = datetime.utcnow() - timedelta(seconds=self.ttl)
+        async with self.session_factory() as session:
+            result = await session.execute(delete(BotFSMState).where(BotFSMState.updated_at < threshold))
+            await session.commit()
+        if result.rowcount:
+            logger.info(f"🧹 Evicted {result.rowcount} stale FSM states")
+        return result.rowcount
+
+
+def create_fsm_storage() -> BaseStorage:
+    """FSM хранилище бота по конфигурации (BOT_FSM_STORAGE)"""
+    backend = config.fsm_storage
+    if backend == "sql":
+        from app.core.database import AsyncSessionLocal
+
+        storage = SQLStorage(
+            AsyncSessionLocal,
+            ttl=config.fsm_ttl,
+            flush_interval=config.fsm_flush_interval,
+            cache_ttl=config.fsm_cache_ttl
+        )
+    elif backend == "redis":
+        from aiogram.fsm.storage.redis import RedisStorage
+
+        ttl = int(config.fsm_ttl)
+        storage = RedisStorage.from_url(config.redis_url, state_ttl=ttl, data_ttl=ttl)
+    else:
+        storage = MemoryStorage()
+    logger.info(f"💾 FSM storage: {backend}")
+    return storage
@@ -10,7 +10,7 @@ from app.core.models_base import UserRole
 router = Router()
 
 @router.callback_query(F.data.startswith("admin:reg:"))
-async def process_registration_decision(callback: CallbackQuery, state: FSMContext):
+async def process_registration_decision(callback: CallbackQuery, state: FSMContext, api: APIClient):
     """Обработка решения по регистрации (Принять/Отклонить)"""
     # admin:reg:confirm:{id} или admin:reg:reject:{id}
     parts = callback.data.split(":")
@@ -30,14 +30,12 @@ async def process_registration_decision(callback: CallbackQuery, state: FSMConte
         await callback.answer("❌ Вы не авторизованы как администратор.", show_alert=True)
         return
 
-    api = APIClient(token=token)
-    
     try:
         if action == "confirm":
             # Пока по умолчанию даем роль, которая была запрошена (нужно получить детали заявки)
             # Или спросить роль? Для простоты пока FOREMAN или то что в заявке.
             # Мы можем запросить детали заявки:
-            request_details = await api.get_registration_request_details(request_id) # Need adding get_details too?
+            request_details = await api.get_registration_request_details(request_id, token=token) # Need adding get_details too?
             # Или просто сразу апрувим c ролью из коллбэка (если бы мы её туда зашили)
             
             # Для простоты: апрувим как FOREMAN если роль не ясна, или берем из текста сообщения если парсить?
@@ -51,7 +49,7 @@ async def process_registration_decision(callback: CallbackQuery, state: FSMConte
             # For now default to FOREMAN
             roles = [UserRole.FOREMAN.value]
             
-            await api.approve_registration(request_id, roles)
+            await api.approve_registration(request_id, roles, token=token)
             await callback.message.edit_reply_markup(reply_markup=None)
             await callback.message.answer(f"✅ Заявка #{request_id} одобрена.")
             await callback.answer("Одобрено!")
@@ -59,7 +57,7 @@ async def process_registration_decision(callback: CallbackQuery, state: FSMConte
         elif action == "reject":
             # Спрашиваем причину (можно через State)
             # Для простоты пока "Отклонено администратором"
-            await api.reject_registration(request_id, "Отклонено администратором")
+            await api.reject_registration(request_id, "Отклонено администратором", token=token)
             await callback.message.edit_reply_markup(reply_markup=None)
             await callback.message.answer(f"❌ Заявка #{request_id} отклонена.")
             await callback.answer("Отклонено!")
@@ -67,5 +65,3 @@ async def process_registration_decision(callback: CallbackQuery, state: FSMConte
     except Exception as e:
         await callback.message.answer(f"Ошибка: {str(e)}")
         await callback.answer("Ошибка", show_alert=True)
-    finally:
-        await api.close()
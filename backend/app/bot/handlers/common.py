@@ -15,20 +15,20 @@ from app.bot.keyboards import (
 )
 from app.bot.config import config
 from app.bot.utils import APIClient
+from app.bot.token_manager import TokenManager
 from app.bot.states import RegistrationStates
 
 router = Router()
 
 
 @router.message(CommandStart())
-async def cmd_start(message: Message, state: FSMContext):
+async def cmd_start(message: Message, state: FSMContext, api: APIClient, token_manager: TokenManager):
     """Команда /start"""
     await state.clear()
     
-    # Авторизация через Telegram ID
-    api = APIClient()
-    login_data = await api.login_telegram(message.from_user.id)
-    await api.close()
+    # Авторизация через Telegram ID: всегда новый вход - аккаунт мог быть
+    # отвязан, перепривязан или одобрен с момента последнего входа
+    login_data = await token_manager.get_tokens(message.from_user.id, force_login=True)
     
     if login_data and "access_token" in login_data:
         token = login_data["access_token"]
@@ -51,9 +51,7 @@ async def cmd_start(message: Message, state: FSMContext):
         )
     else:
         # Проверяем, может ли пользователь подать заявку на регистрацию
-        api2 = APIClient()
-        registration_request = await api2.check_registration_request_status(message.from_user.id)
-        await api2.close()
+        registration_request = await api.check_registration_request_status(message.from_user.id)
         
         if registration_request:
             # Заявка уже подана
@@ -128,7 +126,7 @@ async def cmd_manager(message: Message, state: FSMContext):
 # ===== Мои заявки =====
 
 @router.message(F.text == "📈 Мои заявки")
-async def my_requests(message: Message, state: FSMContext):
+async def my_requests(message: Message, state: FSMContext, api: APIClient):
     """Просмотр своих заявок"""
     data = await state.get_data()
     token = data.get('token')
@@ -140,12 +138,10 @@ async def my_requests(message: Message, state: FSMContext):
         )
         return
     
-    api = APIClient(token)
     try:
         # Получаем заявки на материалы и технику
-        material_requests = await api.get_my_material_requests()
-        equipment_requests = await api.get_my_equipment_requests()
-        await api.close()
+        material_requests = await api.get_my_material_requests(token=token)
+        equipment_requests = await api.get_my_equipment_requests(token=token)
         
         if not material_requests and not equipment_requests:
             await message.answer(
@@ -239,7 +235,6 @@ async def my_requests(message: Message, state: FSMContext):
         )
         
     except Exception as e:
-        await api.close()
         await message.answer(
             f"❌ Ошибка при загрузке заявок: {str(e)}",
             reply_markup=get_main_menu_keyboard()
@@ -247,7 +242,7 @@ async def my_requests(message: Message, state: FSMContext):
 
 
 @router.callback_query(F.data.startswith("view_material_"))
-async def view_material_request_details(callback: CallbackQuery, state: FSMContext):
+async def view_material_request_details(callback: CallbackQuery, state: FSMContext, api: APIClient):
     """Просмотр деталей заявки на материалы"""
     request_id = callback.data.split("_")[2]
     
@@ -258,11 +253,9 @@ async def view_material_request_details(callback: CallbackQuery, state: FSMConte
         await callback.answer("❌ Ошибка авторизации", show_alert=True)
         return
     
-    api = APIClient(token)
     try:
         # Получаем детальную информацию о заявке (включая items)
-        request = await api.get_material_request_details(int(request_id))
-        await api.close()
+        request = await api.get_material_request_details(int(request_id), token=token)
         
         if not request:
             await callback.answer("❌ Заявка не найдена", show_alert=True)
@@ -339,12 +332,11 @@ async def view_material_request_details(callback: CallbackQuery, state: FSMConte
         await callback.answer()
         
     except Exception as e:
-        await api.close()
         await callback.answer(f"❌ Ошибка: {str(e)}", show_alert=True)
 
 
 @router.callback_query(F.data.startswith("view_equipment_"))
-async def view_equipment_request_details(callback: CallbackQuery, state: FSMContext):
+async def view_equipment_request_details(callback: CallbackQuery, state: FSMContext, api: APIClient):
     """Просмотр деталей заявки на технику"""
     request_id = callback.data.split("_")[2]
     
@@ -355,11 +347,9 @@ async def view_equipment_request_details(callback: CallbackQuery, state: FSMCont
         await callback.answer("❌ Ошибка авторизации", show_alert=True)
         return
     
-    api = APIClient(token)
     try:
         # Получаем все заявки и находим нужную
-        requests = await api.get_my_equipment_requests()
-        await api.close()
+        requests = await api.get_my_equipment_requests(token=token)
         
         request = next((r for r in requests if str(r.get('id')) == request_id), None)
         
@@ -445,7 +435,6 @@ async def view_equipment_request_details(callback: CallbackQuery, state: FSMCont
         await callback.answer()
         
     except Exception as e:
-        await api.close()
         await callback.answer(f"❌ Ошибка: {str(e)}", show_alert=True)
 
 
@@ -474,7 +463,7 @@ async def start_cancel_equipment(callback: CallbackQuery, state: FSMContext):
 from app.bot.states import EquipmentOrderStates as EqStates
 
 @router.message(EqStates.cancel_reason)
-async def process_cancel_reason(message: Message, state: FSMContext):
+async def process_cancel_reason(message: Message, state: FSMContext, api: APIClient):
     """Обработка причины отмены заявки на технику"""
     data = await state.get_data()
     token = data.get('token')
@@ -495,10 +484,8 @@ async def process_cancel_reason(message: Message, state: FSMContext):
         )
         return
     
-    api = APIClient(token)
     try:
-        result = await api.request_cancel_equipment(int(order_id), reason)
-        await api.close()
+        result = await api.request_cancel_equipment(int(order_id), reason, token=token)
         
         await message.answer(
             f"✅ <b>Запрос на отмену заявки #{order_id} отправлен!</b>\n\n"
@@ -510,7 +497,6 @@ async def process_cancel_reason(message: Message, state: FSMContext):
         )
         
     except Exception as e:
-        await api.close()
         error_msg = str(e)
         if "422" in error_msg or "400" in error_msg:
             await message.answer(
@@ -586,7 +572,7 @@ async def cmd_cancel(message: Message, state: FSMContext):
     )
 
 @router.message(Command("link"))
-async def cmd_link(message: Message, state: FSMContext):
+async def cmd_link(message: Message, state: FSMContext, api: APIClient, token_manager: TokenManager):
     """
     Команда /link для привязки аккаунта
     Используется: /link <код>
@@ -622,7 +608,6 @@ async def cmd_link(message: Message, state: FSMContext):
         return
     
     # Отправляем запрос на привязку
-    api = APIClient()
     try:
         result = await api.link_telegram_account(
             code=code,
@@ -631,6 +616,8 @@ async def cmd_link(message: Message, state: FSMContext):
         )
         
         if result and result.get("success"):
+            # Прежние токены могли принадлежать другому аккаунту
+            await token_manager.get_tokens(message.from_user.id, force_login=True)
             success_text = (
                 f"✅ <b>Успешно!</b>\n\n"
                 f"{result.get('message', 'Аккаунт привязан')}\n\n"
@@ -661,8 +648,6 @@ async def cmd_link(message: Message, state: FSMContext):
             f"❌ <b>Ошибка при привязке аккаунта</b>\n\n{str(e)}",
             parse_mode="HTML"
         )
-    finally:
-        await api.close()
 
 
 # ===== Запрос доступа =====
@@ -22,11 +22,10 @@ async def get_user_token(user_id: int, db_session=None) -> str:
     return ""
 
 
-async def get_available_objects(token: str) -> list:
+async def get_available_objects(api: APIClient, token: str) -> list:
     """Получение доступных объектов пользователя"""
-    api = APIClient(token)
     try:
-        objects = await api.get_objects()
+        objects = await api.get_objects(token=token)
         return objects if objects else []
     except Exception as e:
         logger.error(f"Ошибка при получении объектов: {e}")
@@ -73,13 +72,14 @@ def delivery_date_keyboard() -> ReplyKeyboardMarkup:
 
 
 @router.message(F.text == "🚚 Создать доставку")
-async def cmd_delivery_start(message: types.Message, state: FSMContext):
+async def cmd_delivery_start(message: types.Message, state: FSMContext, api: APIClient):
     """Начало процесса создания доставки"""
     user_id = message.from_user.id
     
     try:
         # Получение доступных объектов
-        objects = await get_available_objects("")  # TODO: получить реальный токен
+        data = await state.get_data()
+        objects = await get_available_objects(api, data.get("token"))
         
         if not objects:
             await message.answer(
@@ -288,7 +288,7 @@ async def delivery_input_comment(message: types.Message, state: FSMContext):
 
 
 @router.message(DeliveryStates.confirm)
-async def delivery_confirm(message: types.Message, state: FSMContext):
+async def delivery_confirm(message: types.Message, state: FSMContext, api: APIClient):
     """Финальное подтверждение и создание доставки"""
     if message.text == "❌ Отмена":
         await state.clear()
@@ -306,10 +306,9 @@ async def delivery_confirm(message: types.Message, state: FSMContext):
         amount = data.get("amount", 0)
         delivery_date = data.get("delivery_date", "")
         comment = data.get("comment")
+        token = data.get("token")
         
         # Создание доставки через API
-        api = APIClient("")  # TODO: получить реальный токен
-        
         delivery_payload = {
             "cost_object_id": selected_object.get("id"),
             "amount": amount,
@@ -323,7 +322,7 @@ async def delivery_confirm(message: types.Message, state: FSMContext):
         )
         
         # TODO: Вызвать API для создания доставки
-        # response = await api.create_delivery(delivery_payload)
+        # response = await api.create_delivery(delivery_payload, token=token)
         
         # На данный момент заглушка
         await message.answer(
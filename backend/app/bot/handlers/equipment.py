@@ -19,7 +19,7 @@ router = Router()
 
 
 @router.message(F.text == "🚜 Заявка на технику")
-async def start_equipment_order(message: Message, state: FSMContext):
+async def start_equipment_order(message: Message, state: FSMContext, api: APIClient):
     """Начало создания заявки на технику"""
     # Получаем токен из состояния
     data = await state.get_data()
@@ -33,10 +33,8 @@ async def start_equipment_order(message: Message, state: FSMContext):
         return
     
     # Получаем список объектов из API
-    api = APIClient(token)
     try:
-        objects = await api.get_objects()
-        await api.close()
+        objects = await api.get_objects(token=token)
         
         if not objects:
             await message.answer(
@@ -55,7 +53,6 @@ async def start_equipment_order(message: Message, state: FSMContext):
         )
         await state.set_state(EquipmentOrderStates.select_object)
     except Exception as e:
-        await api.close()
         await message.answer(
             f"❌ Ошибка при загрузке объектов: {str(e)}",
             reply_markup=get_main_menu_keyboard()
@@ -219,7 +216,7 @@ async def process_description(message: Message, state: FSMContext):
 
 
 @router.callback_query(F.data == "confirm_yes", EquipmentOrderStates.confirm)
-async def process_confirm_yes(callback: CallbackQuery, state: FSMContext):
+async def process_confirm_yes(callback: CallbackQuery, state: FSMContext, api: APIClient):
     """Подтверждение и создание заявки"""
     data = await state.get_data()
     token = data.get('token')
@@ -236,8 +233,6 @@ async def process_confirm_yes(callback: CallbackQuery, state: FSMContext):
         await callback.answer()
         return
     
-    api = APIClient(token)
-    
     try:
         # Вычисляем end_date из start_date + duration_days
         from datetime import datetime, timedelta
@@ -255,8 +250,7 @@ async def process_confirm_yes(callback: CallbackQuery, state: FSMContext):
         }
         
         # Отправляем заявку
-        result = await api.create_equipment_request(request_data)
-        await api.close()
+        result = await api.create_equipment_request(request_data, token=token)
         
         await callback.message.edit_text(
             f"✅ <b>Заявка на технику создана!</b>\n\n"
@@ -272,7 +266,6 @@ async def process_confirm_yes(callback: CallbackQuery, state: FSMContext):
         )
         
     except Exception as e:
-        await api.close()
         await callback.message.edit_text(
             f"❌ <b>Ошибка при создании заявки:</b>\n\n"
             f"{str(e)}",
@@ -350,7 +343,7 @@ async def process_hours_input(message: Message, state: FSMContext):
         await message.answer("❌ Введите корректное число (например: 8 или 4.5)")
 
 @router.message(EquipmentOrderStates.input_hours_description)
-async def process_hours_description(message: Message, state: FSMContext):
+async def process_hours_description(message: Message, state: FSMContext, api: APIClient):
     """Ввод описания и сохранение"""
     description = message.text.strip()
     if description == "-":
@@ -366,7 +359,6 @@ async def process_hours_description(message: Message, state: FSMContext):
         await state.clear()
         return
 
-    api = APIClient(token)
     try:
         payload = {
             "hours_worked": hours,
@@ -374,7 +366,7 @@ async def process_hours_description(message: Message, state: FSMContext):
             "description": description
         }
         
-        await api.add_equipment_hours(order_id, payload)
+        await api.add_equipment_hours(order_id, payload, token=token)
         
         await message.answer(
             f"✅ <b>Часы приняты!</b>\n"
@@ -389,7 +381,6 @@ async def process_hours_description(message: Message, state: FSMContext):
         # Не сбрасываем состояние полностью чтобы можно было повторить?
         # Или сбрасываем и просим начать заново
     finally:
-        await api.close()
         # Сохраняем токен
         await state.clear()
         if token:
@@ -9,7 +9,7 @@ from app.bot.states import EquipmentOrderStates
 router = Router()
 
 @router.message(F.text == "📋 Новые заявки")
-async def show_new_equipment_requests(message: Message, state: FSMContext):
+async def show_new_equipment_requests(message: Message, state: FSMContext, api: APIClient):
     """Показать список новых заявок на технику"""
     data = await state.get_data()
     token = data.get("token")
@@ -17,10 +17,9 @@ async def show_new_equipment_requests(message: Message, state: FSMContext):
         await message.answer("❌ Ошибка авторизации. Введите /start")
         return
 
-    api = APIClient(token)
     try:
         # TODO: Реализовать фильтрацию по статусу в API
-        requests = await api.get_equipment_requests(status="NEW") 
+        requests = await api.get_equipment_requests(status="NEW", token=token) 
         
         if not requests:
             await message.answer("📭 Новых заявок на технику нет.")
@@ -47,21 +46,18 @@ async def show_new_equipment_requests(message: Message, state: FSMContext):
             
     except Exception as e:
         await message.answer(f"❌ Ошибка при загрузке заявок: {str(e)}")
-    finally:
-        await api.close()
 
 @router.callback_query(F.data.startswith("eq_mgr:approve:"))
-async def approve_equipment_request(callback: CallbackQuery, state: FSMContext):
+async def approve_equipment_request(callback: CallbackQuery, state: FSMContext, api: APIClient):
     """Одобрение заявки (без ввода номера, просто статус APPROVED)"""
     req_id = int(callback.data.split(":")[2])
     data = await state.get_data()
     token = data.get("token")
     
-    api = APIClient(token)
     try:
         # Ставим статус APPROVED. 
         # TODO: Добавить метод в APIClient
-        await api.update_equipment_request_status(req_id, "APPROVED")
+        await api.update_equipment_request_status(req_id, "APPROVED", token=token)
         
         await callback.message.edit_text(
             f"✅ Заявка #{req_id} одобрена! Уведомление отправлено прорабу.",
@@ -71,8 +67,6 @@ async def approve_equipment_request(callback: CallbackQuery, state: FSMContext):
         
     except Exception as e:
         await callback.answer(f"Ошибка: {str(e)}", show_alert=True)
-    finally:
-        await api.close()
 
 @router.callback_query(F.data.startswith("eq_mgr:reject:"))
 async def reject_equipment_start(callback: CallbackQuery, state: FSMContext):
@@ -91,30 +85,26 @@ async def reject_equipment_start(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
 @router.message(StateFilter(EquipmentOrderStates.manager_reject_reason))
-async def process_equipment_reject_reason(message: Message, state: FSMContext):
+async def process_equipment_reject_reason(message: Message, state: FSMContext, api: APIClient):
     data = await state.get_data()
     req_id = data.get("rejecting_eq_id")
     token = data.get("token")
     reason = message.text
     
-    api = APIClient(token)
     try:
-        await api.update_equipment_request_status(req_id, "REJECTED", reason=reason)
+        await api.update_equipment_request_status(req_id, "REJECTED", reason=reason, token=token)
         await message.answer(f"❌ Заявка #{req_id} отклонена.")
         await state.set_state(None)
     except Exception as e:
         await message.answer(f"Ошибка: {str(e)}")
-    finally:
-        await api.close()
 
 @router.message(F.text == "✅ Активная техника")
-async def show_active_equipment(message: Message, state: FSMContext):
+async def show_active_equipment(message: Message, state: FSMContext, api: APIClient):
     """Показать активную технику (статус APPROVED)"""
     data = await state.get_data()
     token = data.get("token")
-    api = APIClient(token)
     try:
-        requests = await api.get_equipment_requests(status="APPROVED")
+        requests = await api.get_equipment_requests(status="APPROVED", token=token)
         
         if not requests:
             await message.answer("Нет активной техники.")
@@ -137,24 +127,21 @@ async def show_active_equipment(message: Message, state: FSMContext):
             
     except Exception as e:
         await message.answer(f"Ошибка: {str(e)}")
-    finally:
-        await api.close()
 
 @router.callback_query(F.data.startswith("eq_mgr:finish:"))
-async def finish_equipment_work(callback: CallbackQuery, state: FSMContext):
+async def finish_equipment_work(callback: CallbackQuery, state: FSMContext, api: APIClient):
     """Завершение работ менеджером -> Триггер сбора часов у Прораба"""
     req_id = int(callback.data.split(":")[2])
     data = await state.get_data()
     token = data.get("token")
     
-    api = APIClient(token)
     try:
         # Меняем статус на COMPLETED (или WORK_DONE, чтобы ждать часы)
         # В текущей схеме можно сразу COMPLETED, но нам нужно чтобы бот запросил часы у прораба.
         # Это должно происходить через Notification Worker, который увидит смену статуса
         # и отправит сообщение прорабу.
         
-        await api.update_equipment_request_status(req_id, "COMPLETED")
+        await api.update_equipment_request_status(req_id, "COMPLETED", token=token)
         
         await callback.message.edit_text(
             f"🏁 Работы по заявке #{req_id} завершены.\n"
@@ -163,5 +150,3 @@ async def finish_equipment_work(callback: CallbackQuery, state: FSMContext):
         )
     except Exception as e:
         await callback.answer(f"Ошибка: {str(e)}", show_alert=True)
-    finally:
-        await api.close()
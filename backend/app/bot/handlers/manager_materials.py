@@ -9,7 +9,7 @@ from app.bot.states import MaterialRequestStates
 router = Router()
 
 @router.message(F.text == "📋 Активные заявки")
-async def show_active_requests(message: Message, state: FSMContext):
+async def show_active_requests(message: Message, state: FSMContext, api: APIClient):
     """Показать список активных заявок (для Менеджера)"""
     data = await state.get_data()
     token = data.get("token")
@@ -17,11 +17,10 @@ async def show_active_requests(message: Message, state: FSMContext):
         await message.answer("❌ Ошибка авторизации. Введите /start")
         return
 
-    api = APIClient(token)
     try:
         # Получаем список заявок со статусом NEW (или всеми активными)
         # TODO: Реализовать фильтрацию в API
-        requests = await api.get_material_requests(status="NEW") 
+        requests = await api.get_material_requests(status="NEW", token=token) 
         
         if not requests:
             await message.answer("📭 Новых заявок нет.")
@@ -50,19 +49,16 @@ async def show_active_requests(message: Message, state: FSMContext):
             
     except Exception as e:
         await message.answer(f"❌ Ошибка при загрузке заявок: {str(e)}")
-    finally:
-        await api.close()
 
 @router.callback_query(F.data.startswith("mat_mgr:view:"))
-async def view_request_details(callback: CallbackQuery, state: FSMContext):
+async def view_request_details(callback: CallbackQuery, state: FSMContext, api: APIClient):
     """Просмотр деталей заявки"""
     req_id = int(callback.data.split(":")[2])
     data = await state.get_data()
     token = data.get("token")
     
-    api = APIClient(token)
     try:
-        req = await api.get_material_request(req_id)
+        req = await api.get_material_request(req_id, token=token)
         
         # Формируем полный текст
         items_text = "\n".join([
@@ -92,21 +88,18 @@ async def view_request_details(callback: CallbackQuery, state: FSMContext):
         
     except Exception as e:
         await callback.answer(f"Ошибка: {str(e)}", show_alert=True)
-    finally:
-        await api.close()
 
 @router.callback_query(F.data.startswith("mat_mgr:approve:"))
-async def approve_request(callback: CallbackQuery, state: FSMContext):
+async def approve_request(callback: CallbackQuery, state: FSMContext, api: APIClient):
     """Перевод заявки в статус IN_PROGRESS"""
     req_id = int(callback.data.split(":")[2])
     data = await state.get_data()
     token = data.get("token")
     
-    api = APIClient(token)
     try:
         # Обновляем статус
         # TODO: Добавить метод update_status в APIClient
-        await api.update_material_request_status(req_id, "IN_PROGRESS")
+        await api.update_material_request_status(req_id, "IN_PROGRESS", token=token)
         
         await callback.message.edit_text(
             f"✅ Заявка #{req_id} принята в работу!",
@@ -116,8 +109,6 @@ async def approve_request(callback: CallbackQuery, state: FSMContext):
         
     except Exception as e:
         await callback.answer(f"Ошибка: {str(e)}", show_alert=True)
-    finally:
-        await api.close()
 
 @router.callback_query(F.data.startswith("mat_mgr:reject:"))
 async def reject_request_start(callback: CallbackQuery, state: FSMContext):
@@ -143,19 +134,16 @@ async def cancel_reject(callback: CallbackQuery, state: FSMContext):
     await callback.answer("Отменено")
 
 @router.message(StateFilter(MaterialRequestStates.manager_reject_reason))
-async def process_reject_reason(message: Message, state: FSMContext):
+async def process_reject_reason(message: Message, state: FSMContext, api: APIClient):
     """Обработка ввода причины отклонения"""
     data = await state.get_data()
     req_id = data.get("rejecting_request_id")
     token = data.get("token")
     reason = message.text
     
-    api = APIClient(token)
     try:
-        await api.update_material_request_status(req_id, "REJECTED", reason=reason)
+        await api.update_material_request_status(req_id, "REJECTED", reason=reason, token=token)
         await message.answer(f"❌ Заявка #{req_id} отклонена.\nПричина: {reason}")
         await state.set_state(None)
     except Exception as e:
         await message.answer(f"Ошибка: {str(e)}")
-    finally:
-        await api.close()
@@ -122,7 +122,7 @@ def parse_materials_multiline(text: str) -> tuple[list[dict], list[str]]:
 
 
 @router.message(F.text == "📦 Заявка на материалы")
-async def start_material_request(message: Message, state: FSMContext):
+async def start_material_request(message: Message, state: FSMContext, api: APIClient):
     """Начало создания заявки на материалы"""
     # Получаем токен из состояния СНАЧАЛА
     data = await state.get_data()
@@ -139,10 +139,8 @@ async def start_material_request(message: Message, state: FSMContext):
         return
     
     # Получаем список объектов из API
-    api = APIClient(token)
     try:
-        objects = await api.get_objects()
-        await api.close()
+        objects = await api.get_objects(token=token)
         
         if not objects:
             await message.answer(
@@ -161,7 +159,6 @@ async def start_material_request(message: Message, state: FSMContext):
         )
         await state.set_state(MaterialRequestStates.select_object)
     except Exception as e:
-        await api.close()
         await message.answer(
             f"❌ Ошибка при загрузке объектов: {str(e)}",
             reply_markup=get_main_menu_keyboard()
@@ -542,7 +539,7 @@ async def show_request_summary(message: Message, state: FSMContext, edit: bool =
 
 
 @router.callback_query(F.data == "confirm_yes", MaterialRequestStates.confirm)
-async def confirm_request(callback: CallbackQuery, state: FSMContext):
+async def confirm_request(callback: CallbackQuery, state: FSMContext, api: APIClient):
     """Подтверждение и отправка заявки"""
     await callback.answer("⏳ Отправка заявки...")
     
@@ -566,9 +563,7 @@ async def confirm_request(callback: CallbackQuery, state: FSMContext):
     
     try:
         if token:
-            api = APIClient(token)
-            result = await api.create_material_request(request_data)
-            await api.close()
+            result = await api.create_material_request(request_data, token=token)
             
             request_id = result.get('id', 'N/A')
             await callback.message.edit_text(
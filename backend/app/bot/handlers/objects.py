@@ -18,7 +18,7 @@ class ObjectAccessStates(StatesGroup):
 
 
 @router.message(Command("request-access"))
-async def cmd_request_access(message: Message, state: FSMContext):
+async def cmd_request_access(message: Message, state: FSMContext, api: APIClient):
     """Команда /request-access - начало процесса запроса доступа"""
     # Проверяем что пользователь авторизован
     data = await state.get_data()
@@ -34,9 +34,7 @@ async def cmd_request_access(message: Message, state: FSMContext):
     
     # Получаем список доступных объектов
     try:
-        api = APIClient(token=token)
         objects = await api.get_objects(token=token)
-        await api.close()
         
         # Логирование для отладки
         import logging
@@ -129,7 +127,7 @@ async def process_object_selection(callback: CallbackQuery, state: FSMContext):
 
 
 @router.message(ObjectAccessStates.waiting_for_reason)
-async def process_reason(message: Message, state: FSMContext):
+async def process_reason(message: Message, state: FSMContext, api: APIClient):
     """Обработка причины запроса"""
     try:
         data = await state.get_data()
@@ -144,13 +142,11 @@ async def process_reason(message: Message, state: FSMContext):
         reason = message.text.strip() if message.text else None
         
         # Отправляем запрос на доступ через API
-        api = APIClient(token=token)
         result = await api.request_object_access(
             object_id=selected_object["id"],
             reason=reason,
             token=token
         )
-        await api.close()
         
         if result:
             # Успешно
@@ -178,7 +174,7 @@ async def process_reason(message: Message, state: FSMContext):
 
 
 @router.callback_query(F.data == "skip_reason", ObjectAccessStates.waiting_for_reason)
-async def skip_reason(callback: CallbackQuery, state: FSMContext):
+async def skip_reason(callback: CallbackQuery, state: FSMContext, api: APIClient):
     """Пропуск ввода причины"""
     await callback.answer()
     
@@ -193,13 +189,11 @@ async def skip_reason(callback: CallbackQuery, state: FSMContext):
             return
         
         # Отправляем запрос БЕЗ причины
-        api = APIClient()
         result = await api.request_object_access(
             object_id=selected_object["id"],
             reason=None,
             token=token
         )
-        await api.close()
         
         if result:
             await callback.message.edit_text(
@@ -247,7 +241,7 @@ async def cancel_access_request(callback: CallbackQuery, state: FSMContext):
 
 
 @router.message(Command("my-requests"))
-async def cmd_my_requests(message: Message, state: FSMContext):
+async def cmd_my_requests(message: Message, state: FSMContext, api: APIClient):
     """Команда /my-requests - просмотр своих запросов"""
     data = await state.get_data()
     token = data.get("token")
@@ -261,9 +255,7 @@ async def cmd_my_requests(message: Message, state: FSMContext):
         return
     
     try:
-        api = APIClient(token=token)
         requests = await api.get_my_access_requests(token=token)
-        await api.close()
         
         if not requests:
             await message.answer(
@@ -187,7 +187,7 @@ async def process_role_selection(callback: CallbackQuery, state: FSMContext):
 
 
 @router.callback_query(F.data == "confirm_yes", RegistrationStates.confirm)
-async def confirm_registration(callback: CallbackQuery, state: FSMContext):
+async def confirm_registration(callback: CallbackQuery, state: FSMContext, api: APIClient):
     """Подтверждение и отправка заявки на регистрацию"""
     await callback.answer("Отправка заявки...")
     
@@ -203,10 +203,8 @@ async def confirm_registration(callback: CallbackQuery, state: FSMContext):
         "requested_role": data.get('requested_role')
     }
     
-    api = APIClient()
     try:
         result = await api.create_registration_request(request_data)
-        await api.close()
         
         await callback.message.edit_text(
             "✅ <b>Заявка отправлена!</b>\n\n"
@@ -220,7 +218,6 @@ async def confirm_registration(callback: CallbackQuery, state: FSMContext):
         await state.clear()
         
     except Exception as e:
-        await api.close()
         error_msg = str(e)
         
         if "уже существует" in error_msg.lower() or "already" in error_msg.lower():
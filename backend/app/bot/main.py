@@ -2,12 +2,16 @@
 import asyncio
 import logging
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
 
 from app.bot.config import config
+from app.bot.fsm_storage import SQLStorage, create_fsm_storage
 from app.bot.handlers import common, materials, manager_materials, equipment, manager_equipment, objects, deliveries, registration, admin
+from app.bot.middlewares import APIClientMiddleware, FSMFlushMiddleware, TokenMiddleware
+from app.bot.token_manager import create_token_manager
+from app.bot.utils.api_client import APIClient, close_http_client, start_http_client
 
 from app.bot.notification_worker import start_notification_worker
+from app.bot.webhook import run_webhook
 
 # Настройка логирования
 logging.basicConfig(
@@ -21,8 +25,18 @@ async def main():
     """Основная функция запуска бота"""
     # Инициализация бота
     bot = Bot(token=config.token)
-    storage = MemoryStorage()
+    storage = create_fsm_storage()
     dp = Dispatcher(storage=storage)
+    if isinstance(storage, SQLStorage):
+        # Изменения FSM попадают в БД до ответа на update
+        dp.update.outer_middleware(FSMFlushMiddleware(storage))
+    
+    # Общий APIClient (пул соединений к backend) для всех обработчиков
+    api = APIClient()
+    dp.update.outer_middleware(APIClientMiddleware(api))
+    # Кэш токенов пользователей: вход по Telegram ID только при необходимости
+    token_manager = create_token_manager(api)
+    dp.update.outer_middleware(TokenMiddleware(token_manager))
     
     # Регистрация роутеров
     dp.include_router(common.router)
@@ -37,17 +51,25 @@ async def main():
     dp.include_router(admin.router)
     
     logger.info("🤖 Construction Costs Bot started")
-    logger.info(f"📡 API Base URL: {config.api_base_url}")
+    logger.info(f"📡 API Base URL: {config.api_base_url} (transport: {config.api_transport})")
+    await start_http_client()
     
     # Запуск notification worker
     worker = await start_notification_worker(bot)
     logger.info("📬 Notification Worker started")
     
-    # Запуск polling
+    # Запуск webhook (BOT_MODE=webhook) или polling
     try:
-        await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+        if config.mode == "webhook":
+            logger.info(f"🌐 Webhook mode: {config.webhook_url}")
+            await run_webhook(bot, dp)
+        else:
+            await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
     finally:
         await worker.stop()
+        await token_manager.close()
+        await storage.close()
+        await close_http_client()
         await bot.session.close()
 
 
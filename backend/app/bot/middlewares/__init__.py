@@ -0,0 +1,88 @@
+"""Middleware бота"""
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.fsm.context import FSMContext
+from aiogram.types import TelegramObject, User
+
+from app.bot.fsm_storage import SQLStorage
+from app.bot.token_manager import TokenManager
+from app.bot.utils.api_client import APIClient
+
+__all__ = ["APIClientMiddleware", "TokenMiddleware", "FSMFlushMiddleware"]
+
+
+class APIClientMiddleware(BaseMiddleware):
+    """
+    Передает в обработчики общий APIClient (аргумент api)
+
+    Клиент не привязан к пользователю: токен из FSM передается
+    в методы аргументом token.
+    """
+
+    def __init__(self, api: APIClient | None = None):
+        self.api = api or APIClient()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        data["api"] = self.api
+        return await handler(event, data)
+
+
+class TokenMiddleware(BaseMiddleware):
+    """
+    Подставляет действующий JWT пользователя в FSM (ключ token)
+
+    Токен берется из TokenManager: после перезапуска бота или истечения
+    access токена обработчики получают обновленный токен без /start, а
+    после отвязки аккаунта токен из FSM убирается.
+    Сам менеджер передается в обработчики аргументом token_manager.
+    Регистрируется после FSM middleware диспетчера (нужен state).
+    """
+
+    def __init__(self, token_manager: TokenManager):
+        self.token_manager = token_manager
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        data["token_manager"] = self.token_manager
+        user: User | None = data.get("event_from_user")
+        state: FSMContext | None = data.get("state")
+        if user is not None and state is not None:
+            token = await self.token_manager.get_token(user.id)
+            current = (await state.get_data()).get("token")
+            if current != token and (token or current):
+                # None - токен отозван, а новый вход не удался (аккаунт отвязан)
+                await state.update_data(token=token)
+        return await handler(event, data)
+
+
+class FSMFlushMiddleware(BaseMiddleware):
+    """
+    Записывает изменения FSM update в БД до завершения его обработки
+
+    Для SQLStorage: изменения состояния одного update записываются одной
+    транзакцией, и следующий update чата на любой реплике их видит.
+    """
+
+    def __init__(self, storage: SQLStorage):
+        self.storage = storage
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        try:
+            return await handler(event, data)
+        finally:
+            await self.storage.flush()
@@ -0,0 +1,20 @@
+"""Модели бота"""
+from datetime import datetime
+from sqlalchemy import Column, String, DateTime, JSON
+from app.core.database import Base
+
+
+class BotFSMState(Base):
+    """Состояние диалога aiogram (FSM) одного пользователя в чате"""
+    __tablename__ = "bot_fsm_states"
+
+    # Ключ StorageKey: bot_id:chat_id:user_id[:thread_id]:destiny
+    key = Column(String(255), primary_key=True)
+    state = Column(String(255), nullable=True)
+    data = Column(JSON, nullable=True)
+
+    # По времени последнего изменения удаляются заброшенные диалоги
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<BotFSMState {self.key}: {self.state}>"
@@ -1,16 +1,19 @@
 """Background worker для отправки Telegram уведомлений"""
 import asyncio
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Optional
 
 from aiogram import Bot
-from sqlalchemy import select, and_
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+from sqlalchemy import select, and_, func, or_
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
 from app.core.config import settings
 from app.notifications.models import TelegramNotification
+from app.notifications.dispatch import NOTIFY_CHANNEL, notification_signal
+from app.bot.rate_limiter import TelegramRateLimiter
 
 logger = logging.getLogger(__name__)
 
@@ -18,87 +21,217 @@ logger = logging.getLogger(__name__)
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 
 class NotificationWorker:
-    """Worker для отправки уведомлений через Telegram"""
+    """
+    Worker для отправки уведомлений через Telegram
     
-    def __init__(self, bot: Bot):
+    Просыпается по сигналу о новых уведомлениях (см. app.notifications.dispatch):
+    в процессе - через notification_signal, из других процессов - через
+    LISTEN/NOTIFY PostgreSQL. Пока подписка LISTEN активна, опрос раз в
+    sweep_interval секунд остается страховкой на случай потерянного сигнала.
+    Без подписки (SQLite, обрыв соединения) уведомления из процесса API
+    видны только опросом - раз в poll_interval секунд.
+    
+    Пачка уведомлений отправляется параллельно с учетом лимитов Telegram
+    (TelegramRateLimiter). Строки захватываются FOR UPDATE SKIP LOCKED,
+    поэтому несколько воркеров делят очередь без повторных отправок.
+    Неудачные попытки откладываются на next_attempt_at с экспоненциальной
+    задержкой.
+    """
+    
+    def __init__(self, bot: Bot, engine: Optional[AsyncEngine] = None):
         self.bot = bot
-        self.engine = create_async_engine(settings.database_url, echo=False)
+        # Свой engine закрывается в stop(), переданный - остается вызывающему
+        self._owns_engine = engine is None
+        self.engine = engine or create_async_engine(settings.database_url, echo=False)
         self.async_session = sessionmaker(
             self.engine, class_=AsyncSession, expire_on_commit=False
         )
         self.is_running = False
-        self.retry_delay = 60  # Повтор через 60 секунд для failed
-        self.max_retries = 3
+        self.retry_delay = settings.notification_retry_delay  # первая повторная попытка, далее x2
+        self.max_retry_delay = settings.notification_max_retry_delay
+        self.max_retries = settings.notification_max_attempts
+        self.batch_size = settings.notification_batch_size
+        self.sweep_interval = settings.notification_sweep_interval
+        self.poll_interval = settings.notification_poll_interval
+        self.listen_retry_delay = 5.0
+        self.error_retry_delay = 5.0
+        
+        self.rate_limiter = TelegramRateLimiter(
+            global_rate=settings.notification_global_rate,
+            chat_rate=settings.notification_chat_rate
+        )
+        self._send_slots = asyncio.Semaphore(settings.notification_send_concurrency)
+        self._listen_task: Optional[asyncio.Task] = None
+        self._listening = False
         
     async def start(self):
         """Запуск worker"""
         self.is_running = True
         logger.info("🚀 Notification Worker started")
         
+        if self.engine.dialect.name == "postgresql":
+            self._listen_task = asyncio.create_task(self._listen_notifications())
+        
         while self.is_running:
             try:
-                await self._process_pending_notifications()
+                await self._drain_pending_notifications()
+                timeout = await self._next_wakeup()
             except Exception as e:
                 logger.error(f"❌ Worker error: {e}", exc_info=True)
+                # После сбоя БД пробуем снова раньше страховочного опроса
+                timeout = self.error_retry_delay
             
-            await asyncio.sleep(5)  # Проверка каждые 5 секунд
+            # Сигнал, пришедший во время обработки, не теряется: событие
+            # сбрасывается только после пробуждения
+            await notification_signal.wait(timeout=timeout)
+            notification_signal.clear()
     
     async def stop(self):
         """Остановка worker"""
         self.is_running = False
-        await self.engine.dispose()
+        # Разбудить основной цикл, чтобы он завершился
+        notification_signal.set()
+        if self._listen_task is not None:
+            self._listen_task.cancel()
+            try:
+                await self._listen_task
+            except asyncio.CancelledError:
+                pass
+            self._listen_task = None
+        if self._owns_engine:
+            await self.engine.dispose()
         logger.info("🛑 Notification Worker stopped")
     
-    async def _process_pending_notifications(self):
-        """Обработка pending уведомлений"""
+    async def _next_wakeup(self) -> float:
+        """Секунд до ближайшей отложенной попытки или опроса"""
+        interval = self.sweep_interval if self._listening else self.poll_interval
+        async with self.async_session() as db:
+            next_attempt_at = await db.scalar(
+                select(func.min(TelegramNotification.next_attempt_at)).where(
+                    TelegramNotification.status == "pending"
+                )
+            )
+        if next_attempt_at is None:
+            return interval
+        delay = (next_attempt_at - datetime.utcnow()).total_seconds()
+        return min(interval, max(0.0, delay))
+    
+    async def _listen_notifications(self):
+        """Подписка LISTEN на канал уведомлений (PostgreSQL) с переподключением"""
+        import asyncpg
+        
+        url = self.engine.url.set(drivername="postgresql")
+        dsn = url.render_as_string(hide_password=False)
+        
+        while self.is_running:
+            try:
+                connection = await asyncpg.connect(dsn)
+            except Exception as e:
+                logger.warning(f"⚠️ LISTEN {NOTIFY_CHANNEL} unavailable, polling only: {e}")
+                await asyncio.sleep(self.listen_retry_delay)
+                continue
+            
+            closed = asyncio.Event()
+            connection.add_termination_listener(lambda conn: closed.set())
+            try:
+                await connection.add_listener(NOTIFY_CHANNEL, lambda *args: notification_signal.set())
+                self._listening = True
+                logger.info(f"👂 Listening for {NOTIFY_CHANNEL}")
+                # Сигналы, пропущенные без подписки, подбираем сразу
+                notification_signal.set()
+                await closed.wait()
+                logger.warning(f"⚠️ LISTEN {NOTIFY_CHANNEL} connection lost, reconnecting")
+            finally:
+                self._listening = False
+                if not connection.is_closed():
+                    await connection.close()
+    
+    async def _drain_pending_notifications(self):
+        """Обработка pending уведомлений пачками, пока очередь не опустеет"""
+        while self.is_running and await self._process_pending_notifications() >= self.batch_size:
+            pass
+    
+    async def _process_pending_notifications(self) -> int:
+        """
+        Обработка одной пачки pending уведомлений
+        
+        Returns:
+            Размер выбранной пачки
+        """
         async with self.async_session() as db:
-            # Получить pending уведомления
+            # Уведомления, чья попытка уже наступила; строки, захваченные
+            # другим воркером, пропускаются (PostgreSQL; SQLite игнорирует FOR UPDATE)
             query = select(TelegramNotification).where(
                 and_(
                     TelegramNotification.status == "pending",
-                    TelegramNotification.telegram_chat_id.isnot(None)
+                    TelegramNotification.telegram_chat_id.isnot(None),
+                    or_(
+                        TelegramNotification.next_attempt_at.is_(None),
+                        TelegramNotification.next_attempt_at <= datetime.utcnow()
+                    )
                 )
-            ).limit(50)
+            ).order_by(TelegramNotification.id).limit(self.batch_size).with_for_update(skip_locked=True)
             
             result = await db.execute(query)
             notifications = result.scalars().all()
             
             if not notifications:
-                return
+                return 0
             
             logger.info(f"📬 Processing {len(notifications)} pending notifications")
             
-            for notif in notifications:
-                try:
-                    await self._send_notification(notif)
-                    notif.status = "sent"
-                    notif.sent_at = datetime.now()
-                    logger.info(f"✅ Sent notification {notif.id} to user {notif.user_id}")
-                    
-                except Exception as e:
-                    # Увеличиваем счетчик попыток
-                    retry_count = notif.data.get("retry_count", 0) if notif.data else 0
-                    retry_count += 1
-                    
-                    if retry_count >= self.max_retries:
-                        notif.status = "failed"
-                        logger.error(
-                            f"❌ Failed to send notification {notif.id} after {retry_count} retries: {e}"
-                        )
-                    else:
-                        # Сохраняем счетчик попыток
-                        if not notif.data:
-                            notif.data = {}
-                        notif.data["retry_count"] = retry_count
-                        notif.data["last_error"] = str(e)
-                        logger.warning(
-                            f"⚠️ Failed to send notification {notif.id}, retry {retry_count}/{self.max_retries}: {e}"
-                        )
+            await asyncio.gather(*(self._deliver(notif) for notif in notifications))
             
             await db.commit()
+            return len(notifications)
+    
+    async def _deliver(self, notif: TelegramNotification):
+        """Отправка уведомления с учетом лимитов и обновление его статуса"""
+        async with self._send_slots:
+            await self.rate_limiter.acquire(notif.telegram_chat_id)
+            try:
+                message = await self._send_notification(notif)
+            except TelegramRetryAfter as e:
+                # Flood control: пауза для всего бота, попытка не засчитывается
+                self.rate_limiter.pause(e.retry_after)
+                notif.next_attempt_at = datetime.utcnow() + timedelta(seconds=e.retry_after)
+                logger.warning(f"⚠️ Flood control, notification {notif.id} postponed for {e.retry_after}s")
+                return
+            except (TelegramForbiddenError, TelegramBadRequest) as e:
+                # Бот заблокирован, чат не найден, ошибка разметки - повтор не поможет
+                self._fail(notif, e)
+                return
+            except Exception as e:
+                notif.attempts = (notif.attempts or 0) + 1
+                if notif.attempts >= self.max_retries:
+                    self._fail(notif, e)
+                else:
+                    delay = min(self.max_retry_delay, self.retry_delay * 2 ** (notif.attempts - 1))
+                    notif.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+                    notif.data = {**(notif.data or {}), "last_error": str(e)}
+                    logger.warning(
+                        f"⚠️ Failed to send notification {notif.id}, retry {notif.attempts}/{self.max_retries} "
+                        f"in {delay:g}s: {e}"
+                    )
+                return
+        
+        notif.status = "sent"
+        notif.sent_at = datetime.now()
+        notif.next_attempt_at = None
+        message_id = getattr(message, "message_id", None)
+        if message_id:
+            notif.telegram_message_id = message_id
+        logger.info(f"✅ Sent notification {notif.id} to user {notif.user_id}")
+    
+    def _fail(self, notif: TelegramNotification, error: Exception):
+        notif.status = "failed"
+        notif.next_attempt_at = None
+        # Новый словарь - иначе изменение JSON не попадет в UPDATE
+        notif.data = {**(notif.data or {}), "last_error": str(error)}
+        logger.error(f"❌ Failed to send notification {notif.id} after {notif.attempts} attempts: {error}")
     
     async def _send_notification(self, notif: TelegramNotification):
-        """Отправка одного уведомления"""
+        """Отправка одного уведомления (возвращает Message)"""
         text = self._format_notification(notif)
         
         reply_markup = None
@@ -114,7 +247,7 @@ class NotificationWorker:
             ])
             
         # Отправка через Telegram Bot API
-        await self.bot.send_message(
+        return await self.bot.send_message(
             chat_id=notif.telegram_chat_id,
             text=text,
             parse_mode="HTML",
@@ -0,0 +1,92 @@
+"""
+Ограничение частоты отправки сообщений Telegram Bot API
+
+Telegram ограничивает бота примерно 30 сообщениями в секунду суммарно,
+1 сообщением в секунду в личный чат и 20 сообщениями в минуту в группу.
+Лимиты реализованы корзинами токенов; ответ 429 (retry_after) ставит
+на паузу всю отправку бота.
+"""
+import asyncio
+import time
+from typing import Dict, Optional
+
+
+class TokenBucket:
+    """Корзина токенов: rate токенов в секунду, не больше capacity про запас"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        # Ожидающие обслуживаются по очереди
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    @property
+    def idle(self) -> bool:
+        """Корзина полна и никто не ждет - ее можно удалить"""
+        self._refill(time.monotonic())
+        return self._tokens >= self.capacity and not self._lock.locked()
+
+    async def acquire(self) -> None:
+        """Дождаться и забрать один токен"""
+        async with self._lock:
+            while True:
+                self._refill(time.monotonic())
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class TelegramRateLimiter:
+    """Общий лимит бота, лимиты по чатам и пауза после 429"""
+
+    # Сколько корзин чатов держать до очистки простаивающих
+    MAX_IDLE_CHAT_BUCKETS = 10000
+
+    def __init__(
+        self,
+        global_rate: float = 30.0,
+        chat_rate: float = 1.0,
+        group_rate: float = 20.0 / 60
+    ):
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self._global = TokenBucket(global_rate)
+        self._chats: Dict[int, TokenBucket] = {}
+        self._paused_until = 0.0
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= self.MAX_IDLE_CHAT_BUCKETS:
+                self._chats = {key: value for key, value in self._chats.items() if not value.idle}
+            # Отрицательные id - группы и каналы, у них свой лимит
+            bucket = TokenBucket(self.group_rate if chat_id < 0 else self.chat_rate, capacity=1.0)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    def pause(self, seconds: float) -> None:
+        """Остановить отправку на seconds секунд (ответ 429 retry_after)"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def _wait_pause(self) -> None:
+        while True:
+            delay = self._paused_until - time.monotonic()
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+
+    async def acquire(self, chat_id: int) -> None:
+        """Дождаться разрешения отправить сообщение в чат"""
+        await self._wait_pause()
+        # Сначала лимит чата: ожидая его, не занимаем общий токен
+        await self._chat_bucket(chat_id).acquire()
+        await self._global.acquire()
+        # Пауза могла начаться, пока ждали токены
+        await self._wait_pause()
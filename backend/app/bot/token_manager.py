@@ -0,0 +1,246 @@
+"""
+Кэш JWT токенов пользователей бота
+
+Вместо входа через /auth/telegram/login на каждый /start бот хранит пару
+access/refresh токенов по Telegram ID и заранее (за refresh_margin секунд
+до истечения access токена) обновляет ее через /auth/refresh. Вход по
+Telegram ID нужен только при первом обращении или после истечения
+refresh токена.
+
+Хранилища (BOT_TOKEN_STORE):
+    memory - словарь в памяти процесса (токены теряются при перезапуске)
+    redis  - Redis (переживает перезапуск и редеплой бота)
+
+Для пользователей без привязанного аккаунта результат входа кэшируется
+на unknown_ttl секунд, чтобы их сообщения не превращались в запросы к API.
+
+Токены бота содержат Telegram ID (claim tg), и backend отклоняет их после
+отвязки или перепривязки аккаунта. Ответ 401/403 на запрос с кэшированным
+токеном удаляет его (forget_token, см. set_auth_error_handler), /start и
+/link всегда выполняют новый вход.
+"""
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from jose import JWTError, jwt
+
+from app.bot.config import config
+from app.bot.utils.api_client import APIClient, set_auth_error_handler
+
+logger = logging.getLogger(__name__)
+
+REDIS_KEY_PREFIX = "bot:tokens:"
+
+
+def token_expires_at(token: Optional[str]) -> float:
+    """
+    Время истечения JWT (unix time) без проверки подписи
+
+    Подпись проверяет backend; боту нужен только срок действия.
+    Нечитаемый токен считается истекшим.
+    """
+    if not token:
+        return 0.0
+    try:
+        return float(jwt.get_unverified_claims(token).get("exp", 0))
+    except (JWTError, TypeError, ValueError):
+        return 0.0
+
+
+class TokenStore:
+    """Хранилище токенов в памяти процесса"""
+
+    backend = "memory"
+
+    def __init__(self):
+        self._tokens: Dict[int, Dict[str, Any]] = {}
+
+    async def get(self, telegram_id: int) -> Optional[Dict[str, Any]]:
+        return self._tokens.get(telegram_id)
+
+    async def set(self, telegram_id: int, tokens: Dict[str, Any]) -> None:
+        self._tokens[telegram_id] = tokens
+
+    async def delete(self, telegram_id: int) -> None:
+        self._tokens.pop(telegram_id, None)
+
+    async def close(self) -> None:
+        pass
+
+
+class RedisTokenStore(TokenStore):
+    """Хранилище токенов в Redis: запись живет до истечения refresh токена"""
+
+    backend = "redis"
+
+    def __init__(self, redis_url: str):
+        from redis import asyncio as aioredis
+
+        self._redis = aioredis.from_url(redis_url, socket_timeout=1.0, socket_connect_timeout=1.0)
+
+    @staticmethod
+    def _key(telegram_id: int) -> str:
+        return f"{REDIS_KEY_PREFIX}{telegram_id}"
+
+    async def get(self, telegram_id: int) -> Optional[Dict[str, Any]]:
+        raw = await self._redis.get(self._key(telegram_id))
+        return json.loads(raw) if raw else None
+
+    async def set(self, telegram_id: int, tokens: Dict[str, Any]) -> None:
+        ttl = token_expires_at(tokens.get("refresh_token")) - time.time()
+        if ttl > 0:
+            await self._redis.set(self._key(telegram_id), json.dumps(tokens), px=int(ttl * 1000))
+
+    async def delete(self, telegram_id: int) -> None:
+        await self._redis.delete(self._key(telegram_id))
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+class TokenManager:
+    """Выдача действующего access токена по Telegram ID"""
+
+    def __init__(
+        self,
+        api: APIClient,
+        store: Optional[TokenStore] = None,
+        refresh_margin: float = 300.0,
+        unknown_ttl: float = 60.0
+    ):
+        self.api = api
+        self.store = store or TokenStore()
+        self.refresh_margin = refresh_margin
+        self.unknown_ttl = unknown_ttl
+        # Копия хранилища в памяти: Redis читается один раз на пользователя
+        self._tokens: Dict[int, Dict[str, Any]] = {}
+        self._unknown_until: Dict[int, float] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self.logins = 0
+        self.refreshes = 0
+
+    def _lock(self, telegram_id: int) -> asyncio.Lock:
+        lock = self._locks.get(telegram_id)
+        if lock is None:
+            lock = self._locks[telegram_id] = asyncio.Lock()
+        return lock
+
+    def _fresh(self, tokens: Optional[Dict[str, Any]]) -> bool:
+        return bool(tokens) and token_expires_at(tokens.get("access_token")) - time.time() > self.refresh_margin
+
+    async def _load(self, telegram_id: int) -> Optional[Dict[str, Any]]:
+        tokens = self._tokens.get(telegram_id)
+        if tokens is None:
+            try:
+                tokens = await self.store.get(telegram_id)
+            except Exception as e:
+                # Недоступное хранилище не должно мешать входу
+                logger.warning(f"⚠️ Token store unavailable ({self.store.backend}): {e}")
+                tokens = None
+            if tokens:
+                self._tokens[telegram_id] = tokens
+        return tokens
+
+    async def _save(self, telegram_id: int, tokens: Dict[str, Any]) -> None:
+        self._tokens[telegram_id] = tokens
+        self._unknown_until.pop(telegram_id, None)
+        try:
+            await self.store.set(telegram_id, tokens)
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to persist tokens for {telegram_id} ({self.store.backend}): {e}")
+
+    async def _refresh(self, telegram_id: int, tokens: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if token_expires_at(tokens.get("refresh_token")) <= time.time():
+            return None
+        self.refreshes += 1
+        refreshed = await self.api.refresh_tokens(tokens["refresh_token"])
+        if refreshed and "access_token" in refreshed:
+            await self._save(telegram_id, refreshed)
+            return refreshed
+        return None
+
+    async def _login(self, telegram_id: int) -> Optional[Dict[str, Any]]:
+        self.logins += 1
+        login_data = await self.api.login_telegram(telegram_id)
+        if login_data and "access_token" in login_data:
+            await self._save(telegram_id, login_data)
+            return login_data
+        self._unknown_until[telegram_id] = time.monotonic() + self.unknown_ttl
+        return None
+
+    async def get_tokens(
+        self,
+        telegram_id: int,
+        retry_unknown: bool = False,
+        force_login: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Действующая пара токенов пользователя или None (аккаунт не привязан)
+
+        Args:
+            retry_unknown: повторить вход, даже если недавно пользователь
+                не был найден (например, по команде /start после одобрения)
+            force_login: забыть кэшированные токены и войти заново
+                (/start, /link - аккаунт мог быть отвязан или перепривязан)
+        """
+        tokens = self._tokens.get(telegram_id)
+        if not force_login and self._fresh(tokens):
+            return tokens
+
+        # Параллельные сообщения одного пользователя обновляют токен один раз
+        async with self._lock(telegram_id):
+            if force_login:
+                await self.forget(telegram_id)
+                return await self._login(telegram_id)
+            tokens = await self._load(telegram_id)
+            if self._fresh(tokens):
+                return tokens
+            if tokens:
+                refreshed = await self._refresh(telegram_id, tokens)
+                if refreshed:
+                    return refreshed
+                await self.forget(telegram_id)
+            if not retry_unknown and self._unknown_until.get(telegram_id, 0) > time.monotonic():
+                return None
+            return await self._login(telegram_id)
+
+    async def get_token(self, telegram_id: int, retry_unknown: bool = False) -> Optional[str]:
+        """Действующий access токен пользователя или None"""
+        tokens = await self.get_tokens(telegram_id, retry_unknown=retry_unknown)
+        return tokens["access_token"] if tokens else None
+
+    async def forget(self, telegram_id: int) -> None:
+        """Удалить токены пользователя (например, после отвязки аккаунта)"""
+        self._tokens.pop(telegram_id, None)
+        try:
+            await self.store.delete(telegram_id)
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to delete tokens for {telegram_id} ({self.store.backend}): {e}")
+
+    async def forget_token(self, access_token: str) -> None:
+        """Удалить токены, если backend отклонил access токен (401/403)"""
+        for telegram_id, tokens in list(self._tokens.items()):
+            if tokens.get("access_token") == access_token:
+                logger.info(f"🔑 Cached token rejected by API, forgetting tokens of {telegram_id}")
+                await self.forget(telegram_id)
+                return
+
+    async def close(self) -> None:
+        await self.store.close()
+
+
+def create_token_manager(api: APIClient) -> TokenManager:
+    """TokenManager с хранилищем из конфигурации бота"""
+    store = RedisTokenStore(config.redis_url) if config.token_store == "redis" else TokenStore()
+    logger.info(f"🔑 Token store: {store.backend}")
+    manager = TokenManager(
+        api,
+        store,
+        refresh_margin=config.token_refresh_margin,
+        unknown_ttl=config.token_unknown_ttl
+    )
+    set_auth_error_handler(manager.forget_token)
+    return manager
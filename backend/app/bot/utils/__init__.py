@@ -1,8 +1,11 @@
 """Утилиты бота"""
 
-__all__ = ["APIClient", "format_date", "format_money"]
+__all__ = [
+    "APIClient", "get_http_client", "start_http_client", "close_http_client", "set_auth_error_handler",
+    "format_date", "format_money"
+]
 
-from .api_client import APIClient
+from .api_client import APIClient, close_http_client, get_http_client, set_auth_error_handler, start_http_client
 from datetime import date, datetime
 from decimal import Decimal
 
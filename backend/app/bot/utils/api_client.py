@@ -1,260 +1,340 @@
 """Утилиты для работы с API"""
 import httpx
-from typing import Any, Dict, Optional
+from contextlib import AsyncExitStack
+from typing import Any, Awaitable, Callable, Dict, Optional
 from app.bot.config import config
 
 
+# Общий для процесса HTTP клиент: пул соединений с keep-alive
+_http_client: Optional[httpx.AsyncClient] = None
+# Жизненный цикл FastAPI приложения в режиме asgi
+_app_lifespan: Optional[AsyncExitStack] = None
+# Вызывается с access токеном, который backend отклонил (401/403)
+_auth_error_handler: Optional[Callable[[str], Awaitable[None]]] = None
+
+
+def set_auth_error_handler(handler: Optional[Callable[[str], Awaitable[None]]]) -> None:
+    """Обработчик отклоненных токенов (TokenManager.forget_token)"""
+    global _auth_error_handler
+    _auth_error_handler = handler
+
+
+async def _on_response(response: httpx.Response) -> None:
+    if response.status_code not in (401, 403) or _auth_error_handler is None:
+        return
+    authorization = response.request.headers.get("Authorization", "")
+    if authorization.startswith("Bearer "):
+        await _auth_error_handler(authorization[len("Bearer "):])
+
+
+def _get_asgi_app():
+    """FastAPI приложение backend (импортируется только в режиме asgi)"""
+    from main import app
+    return app
+
+
+def _create_http_client() -> httpx.AsyncClient:
+    if config.api_transport == "asgi":
+        # Запросы уходят прямо в ASGI приложение, без сети и сокетов.
+        # Исключения приложения превращаются в ответ 500, как по HTTP.
+        return httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=_get_asgi_app(), raise_app_exceptions=False),
+            timeout=config.api_timeout,
+            event_hooks={"response": [_on_response]}
+        )
+    return httpx.AsyncClient(
+        timeout=config.api_timeout,
+        event_hooks={"response": [_on_response]},
+        limits=httpx.Limits(
+            max_connections=config.api_max_connections,
+            max_keepalive_connections=config.api_max_keepalive_connections,
+            keepalive_expiry=config.api_keepalive_expiry
+        )
+    )
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Получить общий HTTP клиент бота (создается при первом обращении)"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = _create_http_client()
+    return _http_client
+
+
+async def start_http_client() -> httpx.AsyncClient:
+    """
+    Создать общий HTTP клиент при запуске бота
+
+    В режиме asgi также запускает lifespan FastAPI приложения,
+    чтобы при остановке бота оно корректно освободило ресурсы.
+    """
+    global _app_lifespan
+    if config.api_transport == "asgi" and _app_lifespan is None:
+        app = _get_asgi_app()
+        stack = AsyncExitStack()
+        await stack.enter_async_context(app.router.lifespan_context(app))
+        _app_lifespan = stack
+    return get_http_client()
+
+
+async def close_http_client() -> None:
+    """Закрыть общий HTTP клиент (при остановке бота)"""
+    global _http_client, _app_lifespan
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+    if _app_lifespan is not None:
+        stack, _app_lifespan = _app_lifespan, None
+        await stack.aclose()
+
+
 class APIClient:
-    """Клиент для взаимодействия с backend API"""
-    
-    def __init__(self, token: Optional[str] = None):
+    """
+    Клиент для взаимодействия с backend API
+
+    Все экземпляры работают через общий пул соединений get_http_client(),
+    поэтому создавать клиент на каждый запрос дешево. Токен пользователя
+    передается аргументом token в каждый метод (или один раз в конструктор).
+    Транспорт (по сети или в процессе через ASGI) задает BOT_API_TRANSPORT.
+    """
+
+    def __init__(self, token: Optional[str] = None, client: Optional[httpx.AsyncClient] = None):
         self.base_url = config.api_base_url
         self.token = token
-        self.client = httpx.AsyncClient(timeout=30.0)
-    
+        self._client = client
+
     @property
-    def headers(self) -> Dict[str, str]:
-        """Заголовки запросов"""
+    def client(self) -> httpx.AsyncClient:
+        """HTTP клиент: переданный явно или общий пул процесса"""
+        return self._client or get_http_client()
+
+    def _headers(self, token: Optional[str] = None) -> Dict[str, str]:
+        """Заголовки запроса с токеном вызова или токеном клиента"""
         headers = {"Content-Type": "application/json"}
-        if self.token:
-            headers["Authorization"] = f"Bearer {self.token}"
+        actual_token = token or self.token
+        if actual_token:
+            headers["Authorization"] = f"Bearer {actual_token}"
         return headers
-    
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        """Заголовки запросов"""
+        return self._headers()
+
     async def close(self):
-        """Закрытие клиента"""
-        await self.client.aclose()
-    
+        """
+        Закрытие клиента
+
+        Общий пул не закрывается: его закрывает close_http_client()
+        при остановке бота.
+        """
+
     # ===== Objects =====
     async def get_objects(self, token: Optional[str] = None) -> list[Dict[str, Any]]:
         """Получить список объектов"""
-        headers = {"Content-Type": "application/json"}
-        actual_token = token or self.token
-        if actual_token:
-            headers["Authorization"] = f"Bearer {actual_token}"
         response = await self.client.get(
             f"{self.base_url}/objects/",
-            headers=headers
+            headers=self._headers(token)
         )
         response.raise_for_status()
         return response.json()
-    
+
     async def request_object_access(
-        self, 
-        object_id: int, 
+        self,
+        object_id: int,
         reason: Optional[str] = None,
         token: Optional[str] = None
     ) -> bool:
         """Запросить доступ к объекту"""
-        headers = {"Content-Type": "application/json"}
-        actual_token = token or self.token
-        if actual_token:
-            headers["Authorization"] = f"Bearer {actual_token}"
-        
         try:
             response = await self.client.post(
                 f"{self.base_url}/objects/{object_id}/request-access",
                 json={"reason": reason},
-                headers=headers
+                headers=self._headers(token)
             )
             response.raise_for_status()
             return True
         except Exception:
             return False
-    
+
     async def get_my_access_requests(self, token: Optional[str] = None) -> list[Dict[str, Any]]:
         """Получить свои запросы на доступ"""
-        headers = {"Content-Type": "application/json"}
-        actual_token = token or self.token
-        if actual_token:
-            headers["Authorization"] = f"Bearer {actual_token}"
-        
         try:
             response = await self.client.get(
                 f"{self.base_url}/objects/access-requests/my",
-                headers=headers
+                headers=self._headers(token)
             )
             response.raise_for_status()
             return response.json()
         except Exception:
             return []
-    
+
     # ===== Material Requests =====
-    async def create_material_request(self, data: Dict[str, Any]) -> Dict[str, Any]:
+    async def create_material_request(self, data: Dict[str, Any], token: Optional[str] = None) -> Dict[str, Any]:
         """Создать заявку на материалы"""
-        headers = {"Content-Type": "application/json"}
-        if self.token:
-            headers["Authorization"] = f"Bearer {self.token}"
         response = await self.client.post(
             f"{self.base_url}/material-requests/",
             json=data,
-            headers=headers
+            headers=self._headers(token)
         )
         response.raise_for_status()
         return response.json()
-    
-    async def get_my_material_requests(self) -> list[Dict[str, Any]]:
+
+    async def get_my_material_requests(self, token: Optional[str] = None) -> list[Dict[str, Any]]:
         """Получить мои заявки на материалы"""
-        headers = {"Content-Type": "application/json"}
-        if self.token:
-            headers["Authorization"] = f"Bearer {self.token}"
         response = await self.client.get(
             f"{self.base_url}/material-requests/",
-            headers=headers
+            headers=self._headers(token)
         )
         response.raise_for_status()
         return response.json()
-    
-    async def get_material_request_details(self, request_id: int) -> Dict[str, Any]:
+
+    async def get_material_request_details(self, request_id: int, token: Optional[str] = None) -> Dict[str, Any]:
         """Получить детали заявки на материалы (включая items)"""
-        headers = {"Content-Type": "application/json"}
-        if self.token:
-            headers["Authorization"] = f"Bearer {self.token}"
         response = await self.client.get(
             f"{self.base_url}/material-requests/{request_id}",
-            headers=headers
+            headers=self._headers(token)
         )
         response.raise_for_status()
         return response.json()
-    
-    async def get_material_requests(self, status: Optional[str] = None) -> list[Dict[str, Any]]:
+
+    async def get_material_requests(
+        self,
+        status: Optional[str] = None,
+        token: Optional[str] = None
+    ) -> list[Dict[str, Any]]:
         """Получить список всех заявок (для менеджеров) с фильтрацией"""
-        headers = self.headers
         params = {}
         if status:
             params["status"] = status
-            
+
         response = await self.client.get(
             f"{self.base_url}/material-requests/",
-            headers=headers,
+            headers=self._headers(token),
             params=params
         )
         response.raise_for_status()
         return response.json()
-        
+
     async def update_material_request_status(
-        self, 
-        request_id: int, 
-        status: str, 
-        reason: Optional[str] = None
+        self,
+        request_id: int,
+        status: str,
+        reason: Optional[str] = None,
+        token: Optional[str] = None
     ) -> Dict[str, Any]:
         """Обновить статус заявки на материалы"""
-        headers = self.headers
         data = {"status": status}
         if reason:
             data["rejection_reason"] = reason
-            
+
         response = await self.client.patch(
             f"{self.base_url}/material-requests/{request_id}/status",
             json=data,
-            headers=headers
+            headers=self._headers(token)
         )
         response.raise_for_status()
         return response.json()
-    
+
     # ===== Equipment Requests =====
-    async def create_equipment_request(self, data: Dict[str, Any]) -> Dict[str, Any]:
+    async def create_equipment_request(self, data: Dict[str, Any], token: Optional[str] = None) -> Dict[str, Any]:
         """Создать заявку на технику"""
-        headers = {"Content-Type": "application/json"}
-        if self.token:
-            headers["Authorization"] = f"Bearer {self.token}"
         response = await self.client.post(
             f"{self.base_url}/equipment-orders/",
             json=data,
-            headers=headers
+            headers=self._headers(token)
         )
         response.raise_for_status()
         return response.json()
-    
-    async def get_my_equipment_requests(self) -> list[Dict[str, Any]]:
+
+    async def get_my_equipment_requests(self, token: Optional[str] = None) -> list[Dict[str, Any]]:
         """Получить мои заявки на технику"""
-        headers = {"Content-Type": "application/json"}
-        if self.token:
-            headers["Authorization"] = f"Bearer {self.token}"
         response = await self.client.get(
             f"{self.base_url}/equipment-orders/",
-            headers=headers
+            headers=self._headers(token)
         )
         response.raise_for_status()
         return response.json()
-    
-    async def get_equipment_requests(self, status: Optional[str] = None) -> list[Dict[str, Any]]:
+
+    async def get_equipment_requests(
+        self,
+        status: Optional[str] = None,
+        token: Optional[str] = None
+    ) -> list[Dict[str, Any]]:
         """Получить заявки на технику (для менеджеров) с фильтрацией"""
-        headers = {"Content-Type": "application/json"}
-        if self.token:
-            headers["Authorization"] = f"Bearer {self.token}"
-        
         params = {}
         if status:
             params["status"] = status
-            
+
         response = await self.client.get(
             f"{self.base_url}/equipment-orders/",
-            headers=headers,
+            headers=self._headers(token),
             params=params
         )
         response.raise_for_status()
         return response.json()
 
     async def update_equipment_request_status(
-        self, 
-        order_id: int, 
-        status: str, 
-        reason: Optional[str] = None
+        self,
+        order_id: int,
+        status: str,
+        reason: Optional[str] = None,
+        token: Optional[str] = None
     ) -> Dict[str, Any]:
         """Обновить статус заявки на технику"""
-        headers = self.headers
         data = {"status": status}
         if reason:
             data["rejection_reason"] = reason
-            
+
         response = await self.client.patch(
             f"{self.base_url}/equipment-orders/{order_id}/status",
             json=data,
-            headers=headers
+            headers=self._headers(token)
         )
         response.raise_for_status()
         return response.json()
-        
-    async def request_cancel_equipment(self, order_id: int, reason: str) -> Dict[str, Any]:
+
+    async def request_cancel_equipment(
+        self,
+        order_id: int,
+        reason: str,
+        token: Optional[str] = None
+    ) -> Dict[str, Any]:
         """Запросить отмену заявки на технику"""
-        headers = {"Content-Type": "application/json"}
-        if self.token:
-            headers["Authorization"] = f"Bearer {self.token}"
         response = await self.client.post(
             f"{self.base_url}/equipment-orders/{order_id}/request-cancel",
             json={"reason": reason},
-            headers=headers
+            headers=self._headers(token)
         )
         response.raise_for_status()
         return response.json()
-    
-    async def add_equipment_hours(self, order_id: int, data: Dict[str, Any]) -> Dict[str, Any]:
+
+    async def add_equipment_hours(
+        self,
+        order_id: int,
+        data: Dict[str, Any],
+        token: Optional[str] = None
+    ) -> Dict[str, Any]:
         """Добавить часы работы техники"""
-        headers = {"Content-Type": "application/json"}
-        if self.token:
-            headers["Authorization"] = f"Bearer {self.token}"
         response = await self.client.post(
             f"{self.base_url}/equipment-orders/{order_id}/hours",
             json=data,
-            headers=headers
+            headers=self._headers(token)
         )
         response.raise_for_status()
         return response.json()
-    
+
     # ===== Time Sheets =====
-    async def create_timesheet(self, data: Dict[str, Any]) -> Dict[str, Any]:
+    async def create_timesheet(self, data: Dict[str, Any], token: Optional[str] = None) -> Dict[str, Any]:
         """Создать табель РТБ"""
-        headers = {"Content-Type": "application/json"}
-        if self.token:
-            headers["Authorization"] = f"Bearer {self.token}"
         response = await self.client.post(
             f"{self.base_url}/time-sheets/",
             json=data,
-            headers=headers
+            headers=self._headers(token)
         )
         response.raise_for_status()
         return response.json()
-    
+
     # ===== Auth =====
     async def login_telegram(self, telegram_user_id: int) -> Optional[str]:
         """Авторизация через Telegram"""
@@ -268,12 +348,24 @@ class APIClient:
         except Exception:
             return None
 
-    async def get_me(self) -> Optional[Dict[str, Any]]:
+    async def refresh_tokens(self, refresh_token: str) -> Optional[Dict[str, Any]]:
+        """Обновить пару токенов по refresh токену"""
+        try:
+            response = await self.client.post(
+                f"{self.base_url}/auth/refresh",
+                json={"refresh_token": refresh_token}
+            )
+            response.raise_for_status()
+            return response.json()
+        except Exception:
+            return None
+
+    async def get_me(self, token: Optional[str] = None) -> Optional[Dict[str, Any]]:
         """Получить информацию о текущем пользователе"""
-        headers = self.headers
+        headers = self._headers(token)
         if "Authorization" not in headers:
             return None
-            
+
         try:
             response = await self.client.get(
                 f"{self.base_url}/users/me",
@@ -283,7 +375,7 @@ class APIClient:
             return response.json()
         except Exception:
             return None
-    
+
     async def register_telegram(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """Регистрация нового пользователя через Telegram (прямая)"""
         response = await self.client.post(
@@ -292,7 +384,7 @@ class APIClient:
         )
         response.raise_for_status()
         return response.json()
-    
+
     async def create_registration_request(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """Создание заявки на регистрацию (новый flow)"""
         response = await self.client.post(
@@ -301,7 +393,7 @@ class APIClient:
         )
         response.raise_for_status()
         return response.json()
-    
+
     async def check_registration_request_status(self, telegram_chat_id: str) -> Optional[Dict[str, Any]]:
         """Проверка статуса заявки на регистрацию"""
         try:
@@ -313,7 +405,7 @@ class APIClient:
             return None
         except Exception:
             return None
-    
+
     async def check_username_exists(self, username: str) -> bool:
         """Проверка существования username"""
         try:
@@ -322,43 +414,51 @@ class APIClient:
             )
             return response.status_code == 200
         except Exception:
-            return False    
-    async def approve_registration(self, request_id: int, roles: list[str]) -> Dict[str, Any]:
+            return False
+
+    async def approve_registration(
+        self,
+        request_id: int,
+        roles: list[str],
+        token: Optional[str] = None
+    ) -> Dict[str, Any]:
         """Одобрить заявку на регистрацию"""
-        if not self.token:
+        if not (token or self.token):
             # Требуется токен админа/менеджера
             raise ValueError("Token required for this operation")
-            
-        headers = self.headers
+
         response = await self.client.post(
             f"{self.base_url}/registration-requests/{request_id}/approve",
             json={"roles": roles},
-            headers=headers
+            headers=self._headers(token)
         )
         response.raise_for_status()
         return response.json()
-    
-    async def reject_registration(self, request_id: int, reason: str) -> Dict[str, Any]:
+
+    async def reject_registration(
+        self,
+        request_id: int,
+        reason: str,
+        token: Optional[str] = None
+    ) -> Dict[str, Any]:
         """Отклонить заявку на регистрацию"""
-        if not self.token:
+        if not (token or self.token):
             raise ValueError("Token required for this operation")
-            
-        headers = self.headers
+
         response = await self.client.post(
             f"{self.base_url}/registration-requests/{request_id}/reject",
             json={"reason": reason},
-            headers=headers
+            headers=self._headers(token)
         )
         response.raise_for_status()
         return response.json()
 
     async def link_telegram_account(
-        self, 
-        code: str, 
+        self,
+        code: str,
         telegram_chat_id: str,
         telegram_username: Optional[str] = None
     ) -> Optional[Dict[str, Any]]:
-# ... (rest of link_telegram_account)
         """Привязка Telegram аккаунта по коду"""
         try:
             response = await self.client.post(
@@ -383,4 +483,4 @@ class APIClient:
             return {
                 "success": False,
                 "detail": str(e)
-            }
\ No newline at end of file
+            }
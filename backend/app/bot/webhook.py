@@ -0,0 +1,270 @@
+"""
+Webhook режим Telegram бота
+
+При long polling все updates приходят одним соединением и медленный
+обработчик задерживает остальных. В webhook режиме Telegram присылает
+updates POST запросами; эндпоинт сразу отвечает 200, а update ставится
+в UpdateQueue:
+
+- обработку выполняют workers параллельных задач;
+- updates одного чата обрабатываются строго по очереди (порядок диалога
+  и FSM не нарушается), разные чаты - параллельно;
+- очередь ограничена max_pending: при переполнении эндпоинт отвечает 503,
+  и Telegram повторит доставку позже.
+
+create_webhook_router() можно подключить к любому FastAPI приложению,
+create_webhook_app() - отдельное ASGI приложение бота (bot/main.py,
+если задан TELEGRAM_WEBHOOK_URL).
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from fastapi import APIRouter, FastAPI, Header, HTTPException, Request, status
+
+from app.bot.config import config
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def update_chat_id(update: Update) -> int:
+    """
+    Чат update (ключ порядка обработки)
+
+    Для событий без чата (inline запросы и т.п.) - пользователь,
+    в крайнем случае сам update_id (без гарантий порядка).
+    """
+    try:
+        event = update.event
+    except Exception:
+        return -update.update_id
+    chat = getattr(event, "chat", None)
+    if chat is None and getattr(event, "message", None) is not None:
+        chat = getattr(event.message, "chat", None)
+    if chat is not None:
+        return chat.id
+    user = getattr(event, "from_user", None)
+    if user is not None:
+        return user.id
+    return -update.update_id
+
+
+class UpdateQueue:
+    """Ограниченная очередь updates с параллельной обработкой и порядком по чатам"""
+
+    def __init__(
+        self,
+        process: Callable[[Update], Awaitable[Any]],
+        workers: int = 16,
+        max_pending: int = 1000
+    ):
+        self.process = process
+        self.workers = workers
+        self.max_pending = max_pending
+
+        # Updates каждого чата и очередь чатов, готовых к обработке
+        self._chats: Dict[int, Deque[Tuple[float, Update]]] = {}
+        self._ready: Optional[asyncio.Queue] = None
+        self._tasks: list[asyncio.Task] = []
+        self._pending = 0
+        self._busy = 0
+        self._idle: Optional[asyncio.Event] = None
+
+        self.accepted = 0
+        self.rejected = 0
+        self.processed = 0
+        self.failed = 0
+        self.max_pending_seen = 0
+        self._total_latency = 0.0
+
+    @property
+    def pending(self) -> int:
+        """Updates в очереди и в обработке"""
+        return self._pending
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._ready = asyncio.Queue()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, drain: bool = True) -> None:
+        """Остановить обработку (по умолчанию дождавшись очереди)"""
+        if drain:
+            await self.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def join(self) -> None:
+        """Дождаться обработки всех принятых updates"""
+        if self._idle is not None:
+            await self._idle.wait()
+
+    def submit(self, update: Update) -> bool:
+        """
+        Поставить update в очередь
+
+        Returns:
+            False - очередь переполнена, update не принят
+        """
+        if self._pending >= self.max_pending:
+            self.rejected += 1
+            return False
+        chat_id = update_chat_id(update)
+        updates = self._chats.get(chat_id)
+        if updates is None:
+            # Чат не в обработке и не в очереди - ставим в очередь готовых
+            updates = self._chats[chat_id] = deque()
+            self._ready.put_nowait(chat_id)
+        updates.append((time.monotonic(), update))
+        self._pending += 1
+        self._idle.clear()
+        self.accepted += 1
+        self.max_pending_seen = max(self.max_pending_seen, self._pending)
+        return True
+
+    async def _worker(self) -> None:
+        while True:
+            chat_id = await self._ready.get()
+            updates = self._chats[chat_id]
+            received_at, update = updates.popleft()
+            self._busy += 1
+            try:
+                await self.process(update)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"❌ Update {update.update_id} failed: {e}", exc_info=True)
+            finally:
+                self._busy -= 1
+                self._pending -= 1
+                self._total_latency += time.monotonic() - received_at
+                # Следующий update чата - в конец очереди, чтобы не занимать worker одним чатом
+                if updates:
+                    self._ready.put_nowait(chat_id)
+                else:
+                    del self._chats[chat_id]
+                if self._pending == 0:
+                    self._idle.set()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Состояние очереди и счетчики с момента запуска"""
+        done = self.processed + self.failed
+        return {
+            "workers": self.workers,
+            "busy_workers": self._busy,
+            "pending": self._pending,
+            "max_pending": self.max_pending,
+            "max_pending_seen": self.max_pending_seen,
+            "chats": len(self._chats),
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "processed": self.processed,
+            "failed": self.failed,
+            "avg_latency_ms": round(self._total_latency / done * 1000, 2) if done else 0.0,
+        }
+
+
+def create_webhook_router(
+    bot: Bot,
+    queue: UpdateQueue,
+    path: str = "/bot/webhook",
+    secret_token: Optional[str] = None
+) -> APIRouter:
+    """Эндпоинт приема updates и метрики очереди"""
+    router = APIRouter()
+
+    def check_secret(secret: Optional[str]) -> None:
+        if secret_token and secret != secret_token:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid secret token")
+
+    @router.post(path)
+    async def receive_update(
+        request: Request,
+        secret: Optional[str] = Header(None, alias=SECRET_HEADER)
+    ):
+        check_secret(secret)
+        update = Update.model_validate(await request.json(), context={"bot": bot})
+        if not queue.submit(update):
+            # Telegram повторит доставку
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Update queue is full")
+        return {"ok": True}
+
+    @router.get(f"{path}/metrics")
+    async def webhook_metrics(secret: Optional[str] = Header(None, alias=SECRET_HEADER)):
+        check_secret(secret)
+        return queue.metrics()
+
+    return router
+
+
+def create_webhook_app(
+    bot: Bot,
+    dp: Dispatcher,
+    webhook_url: Optional[str] = None,
+    path: str = "/bot/webhook",
+    secret_token: Optional[str] = None,
+    workers: int = 16,
+    max_pending: int = 1000
+) -> FastAPI:
+    """
+    Отдельное ASGI приложение бота
+
+    При запуске регистрирует webhook в Telegram (если задан webhook_url)
+    и выполняет startup диспетчера, при остановке - дожидается очереди.
+    """
+    async def process(update: Update):
+        await dp.feed_update(bot, update)
+
+    queue = UpdateQueue(process, workers=workers, max_pending=max_pending)
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        queue.start()
+        await dp.emit_startup(bot=bot, dispatcher=dp)
+        if webhook_url:
+            await bot.set_webhook(
+                webhook_url,
+                secret_token=secret_token,
+                allowed_updates=dp.resolve_used_update_types(),
+                max_connections=min(100, max(1, workers))
+            )
+            logger.info(f"🌐 Webhook set: {webhook_url}")
+        try:
+            yield
+        finally:
+            await queue.stop()
+            await dp.emit_shutdown(bot=bot, dispatcher=dp)
+
+    app = FastAPI(title="Construction Costs Bot webhook", lifespan=lifespan)
+    app.include_router(create_webhook_router(bot, queue, path=path, secret_token=secret_token))
+    app.state.update_queue = queue
+    return app
+
+
+async def run_webhook(bot: Bot, dp: Dispatcher) -> None:
+    """Запуск бота в webhook режиме (uvicorn)"""
+    import uvicorn
+
+    app = create_webhook_app(
+        bot,
+        dp,
+        webhook_url=config.webhook_url,
+        path=config.webhook_path,
+        secret_token=config.webhook_secret,
+        workers=config.webhook_workers,
+        max_pending=config.webhook_max_pending
+    )
+    server = uvicorn.Server(uvicorn.Config(app, host=config.webhook_host, port=config.webhook_port))
+    await server.serve()
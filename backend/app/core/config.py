@@ -45,6 +45,59 @@ class Settings(BaseSettings):
     miniapp_url: str = "http://localhost:3000" # Default dev URL
 
     
+    # Пул разбора УПД (хэширование и XML в отдельных процессах)
+    upd_parse_workers: int = 2
+    upd_parse_queue_size: int = 32  # задач в работе и в ожидании
+    upd_parse_queue_wait: float = 5.0  # сек ожидания места в очереди
+    upd_parse_timeout: float = 30.0  # сек на одну задачу
+    
+    # Доставка Telegram уведомлений (NotificationWorker)
+    notification_batch_size: int = 50
+    notification_sweep_interval: float = 30.0  # сек между страховочными опросами при LISTEN (PostgreSQL)
+    notification_poll_interval: float = 5.0  # сек между опросами без LISTEN (SQLite, обрыв подписки)
+    notification_send_concurrency: int = 16
+    notification_global_rate: float = 30.0  # сообщений в секунду на бота
+    notification_chat_rate: float = 1.0  # сообщений в секунду в один чат
+    notification_max_attempts: int = 3
+    notification_retry_delay: float = 30.0  # сек до первой повторной попытки, далее x2
+    notification_max_retry_delay: float = 900.0
+    
+    # Кэш аутентифицированных пользователей: memory | redis | off
+    auth_user_cache_backend: str = "memory"
+    auth_user_cache_ttl: float = 30.0  # сек
+    
+    # Журнал аудита: запись пачками из очереди в памяти
+    audit_batch_size: int = 100
+    audit_flush_interval_ms: int = 500
+    audit_queue_size: int = 10000
+    # Хранение: срок в журнале, архив старых месяцев, партиции PostgreSQL вперед
+    audit_retention_days: int = 365
+    audit_archive_dir: str = "archive/audit"
+    audit_partitions_ahead: int = 2  # месяцев
+    audit_delete_chunk_size: int = 5000  # записей на один DELETE
+    
+    # Импорт сметы из Excel: позиций в одном INSERT
+    estimate_import_chunk_size: int = 1000
+    
+    # Предпросмотр загрузки табелей из Excel: memory | sql | redis
+    timesheet_preview_backend: str = "sql"
+    timesheet_preview_ttl: float = 3600.0  # сек
+    timesheet_preview_max_bytes: int = 2 * 1024 * 1024  # один предпросмотр после сжатия
+    timesheet_preview_memory_max_entries: int = 200  # только memory
+    timesheet_preview_memory_max_total_bytes: int = 64 * 1024 * 1024  # только memory
+    
+    # Фоновые задачи (app/jobs)
+    jobs_run_in_app: bool = True  # исполнитель в процессе API (False - только scripts/run_job_worker.py)
+    jobs_concurrency: int = 2  # задач одновременно в одном исполнителе
+    jobs_poll_interval: float = 1.0  # секунд между опросами очереди
+    jobs_max_attempts: int = 3
+    jobs_retry_delay: float = 30.0  # секунд до первого повтора, далее x2
+    jobs_max_retry_delay: float = 900.0
+    jobs_heartbeat_interval: float = 2.0  # секунд между пульсами (и сохранением прогресса)
+    jobs_stale_after: float = 120.0  # секунд без пульса - задача возвращается в очередь
+    jobs_result_dir: str = "job_results"
+    jobs_result_ttl_hours: int = 24  # хранение завершенных задач и их файлов
+    
     # CORS
     allowed_origins: str = "http://localhost:3000,http://localhost:3001,http://localhost:5173,https://d1sssyaaaa.github.io"
     
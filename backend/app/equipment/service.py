@@ -13,6 +13,7 @@ from app.models import (
 from app.core.models_base import EquipmentOrderStatus, UserRole
 from app.equipment.schemas import EquipmentOrderCreate, EquipmentCostCreate
 from app.notifications.service import NotificationService
+from app.services.cost_rollup_service import CostRollupService
 
 class EquipmentService:
     """Сервис для работы с заявками на технику"""
@@ -304,6 +305,7 @@ class EquipmentService:
             description=f"{order.equipment_type}: {data.hours_worked}ч × {order.hour_rate}₽/ч"
         )
         self.db.add(cost_entry)
+        await CostRollupService(self.db).add_entries([cost_entry])
         
         await self.db.commit()
         await self.db.refresh(equipment_cost)
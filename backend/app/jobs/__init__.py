@@ -0,0 +1,18 @@
+"""
+Фоновые задачи (jobs)
+
+Долгие операции (импорт сметы, пакетная загрузка УПД, Excel-отчеты,
+пересчет бюджетных алертов) выполняются вне HTTP запроса: эндпоинт
+сохраняет входные данные, ставит задачу в таблицу jobs и сразу
+возвращает ее id. Задачи выполняет JobWorker - в процессе API
+(JOBS_RUN_IN_APP) и/или в отдельных процессах (scripts/run_job_worker.py).
+Очередь - сама таблица jobs в основной БД (SQLite/PostgreSQL), внешний
+брокер не нужен.
+
+    models.py   - таблица jobs
+    registry.py - регистрация обработчиков по типу задачи
+    handlers.py - встроенные обработчики
+    service.py  - постановка, захват, завершение и повтор задач
+    worker.py   - исполнитель задач
+    router.py   - статус, прогресс и результат задачи
+"""
@@ -0,0 +1,143 @@
+"""
+Встроенные обработчики фоновых задач
+
+Входные файлы задачи сохраняются эндпоинтом до постановки в очередь
+(в job_dir задачи или, для УПД, в uploads/upd), в payload передаются
+только пути и параметры.
+"""
+import asyncio
+import os
+import shutil
+from datetime import date
+from typing import Any, Dict, Optional
+
+from fastapi import UploadFile
+from sqlalchemy import select
+
+from app.jobs.registry import JobError, job_handler
+from app.jobs.worker import JobContext
+
+ESTIMATE_IMPORT = "estimate_import"
+ANALYTICS_EXPORT = "analytics_export"
+UPD_UPLOAD_BATCH = "upd_upload_batch"
+BUDGET_ALERTS = "budget_alerts"
+
+
+@job_handler(ESTIMATE_IMPORT)
+async def import_estimate(ctx: JobContext, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Импорт сметы из Excel (payload: object_id, filename)"""
+    from app.services.estimate_service import EstimateService
+
+    path = ctx.input_path(payload["filename"])
+    if not path.exists():
+        raise JobError("Файл сметы не найден")
+
+    def progress(rows_read: int, items_count: int) -> None:
+        ctx.set_progress(None, f"Прочитано строк: {rows_read}, позиций: {items_count}")
+
+    with open(path, "rb") as f:
+        upload = UploadFile(file=f, filename=payload["filename"])
+        async with ctx.session() as db:
+            return await EstimateService.parse_and_save_excel(
+                db, payload["object_id"], upload, progress=progress
+            )
+
+
+@job_handler(ANALYTICS_EXPORT)
+async def export_analytics(ctx: JobContext, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Excel-отчет аналитики (payload: period_start, period_end, object_id)"""
+    from app.analytics.service import AnalyticsService
+
+    period_start = date.fromisoformat(payload["period_start"])
+    period_end = date.fromisoformat(payload["period_end"])
+    filename = f"Analytics_Export_{period_start.strftime('%Y%m%d')}_to_{period_end.strftime('%Y%m%d')}.xlsx"
+
+    async with ctx.session() as db:
+        output = await AnalyticsService(db).build_excel_export(period_start, period_end, payload.get("object_id"))
+
+    def save() -> None:
+        with output, open(ctx.result_file(filename), "wb") as f:
+            shutil.copyfileobj(output, f)
+
+    await asyncio.to_thread(save)
+    return {"filename": filename}
+
+
+@job_handler(UPD_UPLOAD_BATCH)
+async def upload_upd_batch(ctx: JobContext, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Пакетная загрузка УПД (payload: files - пары [имя файла, сохраненный путь])"""
+    from app.upd.service import UPDService
+
+    def read_files():
+        batch = []
+        for name, path in payload["files"]:
+            with open(path, "rb") as f:
+                batch.append((name, f.read(), path))
+        return batch
+
+    try:
+        batch = await asyncio.to_thread(read_files)
+    except FileNotFoundError as e:
+        raise JobError(f"Файл пакета не найден: {e.filename}")
+
+    ctx.set_progress(0.0, f"Файлов: {len(batch)}")
+    async with ctx.session() as db:
+        results = await UPDService(db).upload_upd_batch(batch)
+        await db.commit()
+
+    def remove_unused():
+        # Файлы сохранены до постановки задачи; повторы и ошибки не нужны
+        for (_, _, path), result in zip(batch, results):
+            if result["status"] not in ("created", "duplicate") and os.path.exists(path):
+                os.remove(path)
+
+    await asyncio.to_thread(remove_unused)
+
+    counts = {key: sum(1 for r in results if r["status"] == key) for key in ("created", "duplicate", "skipped", "error")}
+    if counts["created"] or counts["duplicate"]:
+        from app.core.models_base import UserRole
+        from app.notifications.service import TelegramNotificationSender
+
+        await TelegramNotificationSender("").broadcast_websocket_to_roles(
+            roles=[UserRole.ACCOUNTANT.value, UserRole.MATERIALS_MANAGER.value],
+            notification_type="upd_batch_uploaded",
+            title="Загружен пакет УПД",
+            message=f"Новых УПД: {counts['created']}, дубликатов: {counts['duplicate']}",
+            data={
+                "upd_ids": [r["upd_id"] for r in results if r["status"] in ("created", "duplicate")],
+                "created": counts["created"],
+                "duplicates": counts["duplicate"]
+            }
+        )
+    return {
+        "total": len(results),
+        "created": counts["created"],
+        "duplicates": counts["duplicate"],
+        "skipped": counts["skipped"],
+        "errors": counts["error"],
+        "results": results,
+    }
+
+
+@job_handler(BUDGET_ALERTS)
+async def check_budget_alerts(ctx: JobContext, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Пересчет бюджетных алертов (payload: object_ids - None для всех активных объектов)"""
+    from app.models import CostObject
+    from app.services.object_service import ObjectService
+
+    object_ids: Optional[list] = payload.get("object_ids")
+    async with ctx.session() as db:
+        if object_ids is None:
+            object_ids = (await db.execute(
+                select(CostObject.id).where(CostObject.is_active == True).order_by(CostObject.id)
+            )).scalars().all()
+
+        alerts = []
+        for i, object_id in enumerate(object_ids, start=1):
+            info = await ObjectService.check_budget_alerts(db, object_id)
+            if info.get("alert_80") or info.get("alert_100"):
+                alerts.append({"object_id": object_id, "percentage": info.get("percentage")})
+            ctx.set_progress(i / len(object_ids), f"Объектов проверено: {i} из {len(object_ids)}")
+        await db.commit()
+
+    return {"checked": len(object_ids), "alerts": alerts}
@@ -0,0 +1,53 @@
+"""Модели фоновых задач"""
+from datetime import datetime
+from enum import Enum as PyEnum
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, JSON
+from app.core.database import Base
+
+
+class JobStatus(str, PyEnum):
+    """Статусы фоновой задачи"""
+    QUEUED = "queued"        # Ждет исполнителя (в т.ч. повтора после ошибки)
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+FINISHED_STATUSES = (JobStatus.SUCCEEDED.value, JobStatus.FAILED.value, JobStatus.CANCELLED.value)
+
+
+class Job(Base):
+    """Фоновая задача: строка таблицы одновременно очередь и хранилище результата"""
+    __tablename__ = "jobs"
+
+    id = Column(String(32), primary_key=True)  # uuid4 hex
+    type = Column(String(50), nullable=False, index=True)
+    status = Column(String(20), nullable=False, default=JobStatus.QUEUED.value, index=True)
+    payload = Column(JSON, nullable=True)
+
+    # Прогресс: доля 0..1 (NULL - неизвестна) и текстовое описание
+    progress = Column(Float, nullable=True)
+    progress_message = Column(String(255), nullable=True)
+
+    # Результат: JSON и/или файл в каталоге задачи (JOBS_RESULT_DIR/<id>/)
+    result = Column(JSON, nullable=True)
+    result_path = Column(String(500), nullable=True)
+    error = Column(Text, nullable=True)
+
+    # Повторы: попытка начинается при захвате, следующая - не раньше run_at
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    run_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    # Исполнитель и его пульс (зависшие задачи возвращаются в очередь)
+    worker_id = Column(String(100), nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+
+    created_by = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<Job {self.id}: {self.type} {self.status}>"
@@ -0,0 +1,30 @@
+"""Регистрация обработчиков фоновых задач по типу"""
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+# handler(ctx: JobContext, payload) -> JSON результат или None
+JobHandler = Callable[[Any, Dict[str, Any]], Awaitable[Optional[Dict[str, Any]]]]
+
+_handlers: Dict[str, JobHandler] = {}
+
+
+class JobError(Exception):
+    """Ошибка задачи, которую бессмысленно повторять (неверные входные данные и т.п.)"""
+
+
+def job_handler(job_type: str) -> Callable[[JobHandler], JobHandler]:
+    """Декоратор: зарегистрировать обработчик задач типа job_type"""
+    def register(handler: JobHandler) -> JobHandler:
+        if job_type in _handlers and _handlers[job_type] is not handler:
+            raise ValueError(f"Обработчик задач {job_type} уже зарегистрирован")
+        _handlers[job_type] = handler
+        return handler
+    return register
+
+
+def get_handler(job_type: str) -> Optional[JobHandler]:
+    return _handlers.get(job_type)
+
+
+def unregister_handler(job_type: str) -> None:
+    """Удалить обработчик (для тестов)"""
+    _handlers.pop(job_type, None)
@@ -0,0 +1,127 @@
+"""API роутер фоновых задач: статус, прогресс, результат, отмена"""
+import os
+from typing import Any, Dict, List
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import FileResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.auth.dependencies import get_current_user
+from app.core.config import settings
+from app.core.database import get_db
+from app.core.models_base import UserRole
+from app.jobs.models import Job, JobStatus
+from app.jobs.service import JobService
+from app.models import User
+
+router = APIRouter()
+
+
+def job_accepted(job: Job) -> Dict[str, Any]:
+    """Ответ 202 эндпоинта, поставившего задачу"""
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"{settings.api_v1_prefix}/jobs/{job.id}",
+    }
+
+
+def job_to_dict(job: Job) -> Dict[str, Any]:
+    return {
+        "id": job.id,
+        "type": job.type,
+        "status": job.status,
+        "progress": job.progress,
+        "progress_message": job.progress_message,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "error": job.error,
+        "has_result_file": job.result_path is not None,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+
+async def _get_own_job(db: AsyncSession, job_id: str, user: User) -> Job:
+    """Задача, доступная пользователю (свои задачи; ADMIN - все)"""
+    job = await JobService.get(db, job_id)
+    if not job or (job.created_by != user.id and UserRole.ADMIN.value not in (user.roles or [])):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Задача не найдена")
+    return job
+
+
+@router.get("/")
+async def list_jobs(
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+) -> List[Dict[str, Any]]:
+    """
+    Последние задачи текущего пользователя
+
+    - Доступно: всем авторизованным пользователям
+    """
+    return [job_to_dict(job) for job in await JobService.list_for_user(db, current_user.id, limit)]
+
+
+@router.get("/{job_id}")
+async def get_job(
+    job_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Статус и прогресс задачи
+
+    - progress: доля выполнения 0..1 (None, если объем работы заранее неизвестен)
+    - progress_message: текущий этап
+    - Доступно: автору задачи и ADMIN
+    """
+    job = await _get_own_job(db, job_id, current_user)
+    return job_to_dict(job)
+
+
+@router.get("/{job_id}/result")
+async def get_job_result(
+    job_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Результат выполненной задачи
+
+    - Файл (Excel-отчет и т.п.), если задача его создала, иначе JSON результата
+    - 409, если задача еще не выполнена
+    """
+    job = await _get_own_job(db, job_id, current_user)
+    if job.status != JobStatus.SUCCEEDED.value:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Задача не выполнена (статус: {job.status})"
+        )
+    if job.result_path:
+        if not os.path.exists(job.result_path):
+            raise HTTPException(status_code=status.HTTP_410_GONE, detail="Файл результата удален")
+        return FileResponse(job.result_path, filename=os.path.basename(job.result_path))
+    return job.result or {}
+
+
+@router.post("/{job_id}/cancel")
+async def cancel_job(
+    job_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Отменить задачу, ожидающую в очереди
+
+    - 409, если задача уже выполняется или завершена
+    """
+    await _get_own_job(db, job_id, current_user)
+    if not await JobService.cancel(db, job_id):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Задача уже выполняется или завершена"
+        )
+    return {"job_id": job_id, "status": JobStatus.CANCELLED.value}
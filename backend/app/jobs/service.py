@@ -0,0 +1,298 @@
+"""
+Очередь фоновых задач в таблице jobs
+
+Захват задачи переносим между SQLite и PostgreSQL: выбирается кандидат,
+затем условный UPDATE ... WHERE status = 'queued' - задачу получает только
+тот исполнитель, чей UPDATE изменил строку. На PostgreSQL кандидаты
+дополнительно выбираются FOR UPDATE SKIP LOCKED, чтобы исполнители не
+соперничали за одну строку.
+
+Исполнители в процессе, где задача поставлена, просыпаются сразу после
+commit (job_signal); исполнители в других процессах - по опросу.
+"""
+import asyncio
+import logging
+import shutil
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, List, Optional
+
+from sqlalchemy import and_, delete, event, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.jobs.models import FINISHED_STATUSES, Job, JobStatus
+
+logger = logging.getLogger(__name__)
+
+_SESSION_FLAG = "jobs_enqueued"
+
+
+class JobSignal:
+    """Сигнал "поставлены новые задачи" внутри процесса"""
+
+    def __init__(self):
+        self._event: Optional[asyncio.Event] = None
+
+    def _get_event(self) -> asyncio.Event:
+        if self._event is None:
+            self._event = asyncio.Event()
+        return self._event
+
+    def set(self) -> None:
+        self._get_event().set()
+
+    async def wait(self, timeout: float) -> bool:
+        """Ждать сигнал не дольше timeout секунд (сбрасывает его)"""
+        event_ = self._get_event()
+        try:
+            await asyncio.wait_for(event_.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            event_.clear()
+
+
+job_signal = JobSignal()
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_after_commit(session: Session) -> None:
+    if session.info.pop(_SESSION_FLAG, False):
+        job_signal.set()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_after_rollback(session: Session) -> None:
+    session.info.pop(_SESSION_FLAG, None)
+
+
+def new_job_id() -> str:
+    return uuid.uuid4().hex
+
+
+def job_dir(job_id: str) -> Path:
+    """Каталог входных файлов и результата задачи"""
+    return Path(settings.jobs_result_dir) / job_id
+
+
+def save_job_input(job_id: str, name: str, source: BinaryIO) -> Path:
+    """Сохранить входной файл задачи до постановки в очередь (вызывается в потоке)"""
+    path = job_dir(job_id) / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    source.seek(0)
+    with open(path, "wb") as f:
+        shutil.copyfileobj(source, f)
+    return path
+
+
+class JobService:
+    """Постановка, захват и завершение фоновых задач"""
+
+    @staticmethod
+    async def enqueue(
+        db: AsyncSession,
+        job_type: str,
+        payload: Optional[Dict[str, Any]] = None,
+        user_id: Optional[int] = None,
+        job_id: Optional[str] = None,
+        max_attempts: Optional[int] = None
+    ) -> Job:
+        """
+        Поставить задачу в очередь (исполнители узнают о ней после commit)
+
+        Args:
+            job_id: заранее выданный id (если входные файлы уже сохранены в job_dir)
+        """
+        job = Job(
+            id=job_id or new_job_id(),
+            type=job_type,
+            status=JobStatus.QUEUED.value,
+            payload=payload or {},
+            attempts=0,
+            max_attempts=max_attempts or settings.jobs_max_attempts,
+            run_at=datetime.utcnow(),
+            created_by=user_id,
+            created_at=datetime.utcnow()
+        )
+        db.add(job)
+        await db.flush()
+        db.sync_session.info[_SESSION_FLAG] = True
+        return job
+
+    @staticmethod
+    async def get(db: AsyncSession, job_id: str) -> Optional[Job]:
+        return await db.get(Job, job_id)
+
+    @staticmethod
+    async def list_for_user(db: AsyncSession, user_id: int, limit: int = 50) -> List[Job]:
+        result = await db.execute(
+            select(Job).where(Job.created_by == user_id).order_by(Job.created_at.desc()).limit(limit)
+        )
+        return result.scalars().all()
+
+    @staticmethod
+    async def cancel(db: AsyncSession, job_id: str) -> bool:
+        """
+        Отменить задачу, которая еще не начала выполняться
+
+        Returns:
+            False - задача уже выполняется или завершена
+        """
+        result = await db.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.status == JobStatus.QUEUED.value)
+            .values(status=JobStatus.CANCELLED.value, finished_at=datetime.utcnow())
+        )
+        await db.commit()
+        return result.rowcount == 1
+
+    @staticmethod
+    async def claim(db: AsyncSession, worker_id: str) -> Optional[Job]:
+        """Захватить следующую готовую задачу; None - очередь пуста"""
+        while True:
+            now = datetime.utcnow()
+            candidate = await db.scalar(
+                select(Job.id)
+                .where(Job.status == JobStatus.QUEUED.value, Job.run_at <= now)
+                .order_by(Job.run_at, Job.created_at)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+            )
+            if candidate is None:
+                await db.commit()
+                return None
+
+            result = await db.execute(
+                update(Job)
+                .where(Job.id == candidate, Job.status == JobStatus.QUEUED.value)
+                .values(
+                    status=JobStatus.RUNNING.value,
+                    attempts=Job.attempts + 1,
+                    worker_id=worker_id,
+                    started_at=now,
+                    heartbeat_at=now,
+                    error=None
+                )
+            )
+            await db.commit()
+            if result.rowcount == 1:
+                job = await db.get(Job, candidate, populate_existing=True)
+                await db.commit()
+                return job
+            # Задачу захватил другой исполнитель - берем следующую
+
+    @staticmethod
+    async def heartbeat(db: AsyncSession, progress: Dict[str, tuple]) -> None:
+        """
+        Отметить живые задачи исполнителя и сохранить их прогресс
+
+        Args:
+            progress: {job_id: (доля или None, сообщение или None)}
+        """
+        now = datetime.utcnow()
+        for job_id, (fraction, message) in progress.items():
+            await db.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.status == JobStatus.RUNNING.value)
+                .values(heartbeat_at=now, progress=fraction, progress_message=message)
+            )
+        await db.commit()
+
+    @staticmethod
+    async def complete(
+        db: AsyncSession,
+        job_id: str,
+        result: Optional[Dict[str, Any]] = None,
+        result_path: Optional[str] = None
+    ) -> None:
+        await db.execute(
+            update(Job).where(Job.id == job_id).values(
+                status=JobStatus.SUCCEEDED.value,
+                result=result,
+                result_path=result_path,
+                progress=1.0,
+                finished_at=datetime.utcnow()
+            )
+        )
+        await db.commit()
+
+    @staticmethod
+    async def fail(db: AsyncSession, job: Job, error: str, retry: bool = True) -> bool:
+        """
+        Зафиксировать ошибку попытки
+
+        Если попытки не исчерпаны (и retry), задача возвращается в очередь
+        с экспоненциальной задержкой jobs_retry_delay * 2^(attempt-1).
+
+        Returns:
+            True - задача будет повторена
+        """
+        now = datetime.utcnow()
+        if retry and job.attempts < job.max_attempts:
+            delay = min(settings.jobs_max_retry_delay, settings.jobs_retry_delay * 2 ** (job.attempts - 1))
+            values = {"status": JobStatus.QUEUED.value, "run_at": now + timedelta(seconds=delay), "worker_id": None}
+        else:
+            values = {"status": JobStatus.FAILED.value, "finished_at": now}
+        await db.execute(update(Job).where(Job.id == job.id).values(error=error[:4000], **values))
+        await db.commit()
+        return values["status"] == JobStatus.QUEUED.value
+
+    @staticmethod
+    async def release(db: AsyncSession, job_id: str) -> None:
+        """Вернуть прерванную задачу в очередь без учета попытки (остановка исполнителя)"""
+        await db.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.status == JobStatus.RUNNING.value)
+            .values(status=JobStatus.QUEUED.value, attempts=Job.attempts - 1, worker_id=None, run_at=datetime.utcnow())
+        )
+        await db.commit()
+
+    @staticmethod
+    async def requeue_stale(db: AsyncSession, stale_after: float) -> int:
+        """
+        Вернуть в очередь задачи, исполнитель которых перестал отвечать
+
+        Задача с исчерпанными попытками помечается failed.
+
+        Returns:
+            Количество найденных зависших задач
+        """
+        now = datetime.utcnow()
+        stale = and_(
+            Job.status == JobStatus.RUNNING.value,
+            or_(Job.heartbeat_at.is_(None), Job.heartbeat_at < now - timedelta(seconds=stale_after))
+        )
+        failed = await db.execute(
+            update(Job)
+            .where(stale, Job.attempts >= Job.max_attempts)
+            .values(status=JobStatus.FAILED.value, error="Исполнитель задачи перестал отвечать", finished_at=now)
+        )
+        requeued = await db.execute(
+            update(Job).where(stale).values(status=JobStatus.QUEUED.value, worker_id=None, run_at=now)
+        )
+        await db.commit()
+        count = failed.rowcount + requeued.rowcount
+        if count:
+            job_signal.set()
+            logger.warning(f"⚠️ Зависших задач: {count} (повтор {requeued.rowcount}, отказ {failed.rowcount})")
+        return count
+
+    @staticmethod
+    async def purge(db: AsyncSession, older_than: timedelta) -> int:
+        """Удалить завершенные задачи старше older_than вместе с их файлами"""
+        threshold = datetime.utcnow() - older_than
+        expired = (await db.execute(
+            select(Job.id).where(Job.status.in_(FINISHED_STATUSES), Job.finished_at < threshold)
+        )).scalars().all()
+        if not expired:
+            return 0
+        await db.execute(delete(Job).where(Job.id.in_(expired)))
+        await db.commit()
+        await asyncio.to_thread(
+            lambda: [shutil.rmtree(job_dir(job_id), ignore_errors=True) for job_id in expired]
+        )
+        return len(expired)
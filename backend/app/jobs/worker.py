@@ -0,0 +1,240 @@
+"""
+Исполнитель фоновых задач
+
+JobWorker выполняет до concurrency задач одновременно в своем event loop.
+CPU-нагрузку задачи выносят в потоки/процессы сами (разбор Excel в потоке,
+пул разбора УПД), а для нескольких ядер запускается несколько процессов
+с исполнителями: scripts/run_job_worker.py --processes N.
+
+Пока задача выполняется, исполнитель раз в heartbeat_interval отмечает ее
+пульс и сохраняет прогресс (JobContext.set_progress). Задачи исполнителя,
+переставшего отвечать дольше stale_after, любой исполнитель возвращает
+в очередь.
+"""
+import asyncio
+import logging
+import os
+import socket
+import time
+import traceback
+from datetime import timedelta
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.jobs.models import Job
+from app.jobs.registry import JobError, get_handler
+from app.jobs.service import JobService, job_dir, job_signal
+
+logger = logging.getLogger(__name__)
+
+
+class JobContext:
+    """Окружение обработчика задачи"""
+
+    def __init__(self, job: Job, session_factory: async_sessionmaker):
+        self.job = job
+        self.job_id = job.id
+        self.session_factory = session_factory
+        self.result_path: Optional[str] = None
+        self._progress: Tuple[Optional[float], Optional[str]] = (None, None)
+
+    def session(self):
+        """Новая сессия БД (обработчик сам делает commit)"""
+        return self.session_factory()
+
+    def set_progress(self, fraction: Optional[float] = None, message: Optional[str] = None) -> None:
+        """Прогресс задачи (сохраняется в БД с очередным пульсом)"""
+        if fraction is not None:
+            fraction = max(0.0, min(1.0, fraction))
+        self._progress = (fraction, message[:255] if message else None)
+
+    @property
+    def progress(self) -> Tuple[Optional[float], Optional[str]]:
+        return self._progress
+
+    def input_path(self, name: str) -> Path:
+        """Входной файл, сохраненный при постановке задачи"""
+        return job_dir(self.job_id) / name
+
+    def result_file(self, filename: str) -> Path:
+        """Путь файла результата задачи (становится result_path задачи)"""
+        path = job_dir(self.job_id) / filename
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.result_path = str(path)
+        return path
+
+
+class JobWorker:
+    """Исполнитель задач из таблицы jobs"""
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker = AsyncSessionLocal,
+        concurrency: Optional[int] = None,
+        poll_interval: Optional[float] = None,
+        heartbeat_interval: Optional[float] = None,
+        stale_after: Optional[float] = None,
+        worker_id: Optional[str] = None
+    ):
+        self.session_factory = session_factory
+        self.concurrency = concurrency or settings.jobs_concurrency
+        self.poll_interval = poll_interval or settings.jobs_poll_interval
+        self.heartbeat_interval = heartbeat_interval or settings.jobs_heartbeat_interval
+        self.stale_after = stale_after or settings.jobs_stale_after
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.maintenance_interval = 60.0
+
+        self.is_running = False
+        self._running: Dict[str, Tuple[asyncio.Task, JobContext]] = {}
+        self._slot_freed = asyncio.Event()
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self.completed = 0
+        self.failed = 0
+
+    async def start(self) -> None:
+        """Основной цикл: захват задач, пока есть свободные слоты"""
+        self.is_running = True
+        self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+        logger.info(f"🚀 Job worker {self.worker_id} started (concurrency {self.concurrency})")
+        while self.is_running:
+            try:
+                await self._fill_slots()
+            except Exception as e:
+                logger.error(f"❌ Job worker error: {e}", exc_info=True)
+            if len(self._running) >= self.concurrency:
+                self._slot_freed.clear()
+                await self._slot_freed.wait()
+            else:
+                await job_signal.wait(timeout=self.poll_interval)
+
+    async def stop(self, grace: float = 10.0) -> None:
+        """Остановка: дождаться текущих задач, незавершенные вернуть в очередь"""
+        self.is_running = False
+        job_signal.set()
+        self._slot_freed.set()
+        tasks = [task for task, _ in self._running.values()]
+        if tasks:
+            _, pending = await asyncio.wait(tasks, timeout=grace)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            await asyncio.gather(self._heartbeat_task, return_exceptions=True)
+            self._heartbeat_task = None
+        logger.info(f"🛑 Job worker {self.worker_id} stopped")
+
+    async def run_once(self) -> bool:
+        """Захватить и выполнить одну задачу (для тестов и скриптов)"""
+        async with self.session_factory() as db:
+            job = await JobService.claim(db, self.worker_id)
+        if job is None:
+            return False
+        await self._run(job)
+        return True
+
+    async def _fill_slots(self) -> None:
+        while self.is_running and len(self._running) < self.concurrency:
+            async with self.session_factory() as db:
+                job = await JobService.claim(db, self.worker_id)
+            if job is None:
+                return
+            ctx = JobContext(job, self.session_factory)
+            task = asyncio.create_task(self._run(job, ctx))
+            self._running[job.id] = (task, ctx)
+            task.add_done_callback(lambda _, job_id=job.id: self._release_slot(job_id))
+
+    def _release_slot(self, job_id: str) -> None:
+        self._running.pop(job_id, None)
+        self._slot_freed.set()
+
+    async def _run(self, job: Job, ctx: Optional[JobContext] = None) -> None:
+        ctx = ctx or JobContext(job, self.session_factory)
+        handler = get_handler(job.type)
+        started = time.perf_counter()
+        logger.info(f"▶️ Job {job.id} ({job.type}) attempt {job.attempts}/{job.max_attempts}")
+        try:
+            if handler is None:
+                raise JobError(f"Неизвестный тип задачи: {job.type}")
+            result = await handler(ctx, job.payload or {})
+        except asyncio.CancelledError:
+            async with self.session_factory() as db:
+                await JobService.release(db, job.id)
+            raise
+        except Exception as e:
+            retry, error = self._describe_error(e)
+            async with self.session_factory() as db:
+                retried = await JobService.fail(db, job, error, retry=retry)
+            self.failed += 1
+            logger.error(f"❌ Job {job.id} ({job.type}) failed{', will retry' if retried else ''}: {error}")
+            return
+
+        async with self.session_factory() as db:
+            await JobService.complete(db, job.id, result, ctx.result_path)
+        self.completed += 1
+        logger.info(f"✅ Job {job.id} ({job.type}) done in {time.perf_counter() - started:.1f}s")
+
+    @staticmethod
+    def _describe_error(error: Exception) -> Tuple[bool, str]:
+        """(повторять ли задачу, текст ошибки)"""
+        if isinstance(error, JobError):
+            return False, str(error)
+        if isinstance(error, HTTPException):
+            # Ошибки входных данных сервисов (404, 400) повтор не исправит
+            return error.status_code >= 500, str(error.detail)
+        return True, "".join(traceback.format_exception_only(type(error), error)).strip()
+
+    async def _heartbeat_loop(self) -> None:
+        last_maintenance = 0.0
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                async with self.session_factory() as db:
+                    if self._running:
+                        await JobService.heartbeat(
+                            db, {job_id: ctx.progress for job_id, (_, ctx) in self._running.items()}
+                        )
+                    if time.monotonic() - last_maintenance >= self.maintenance_interval:
+                        last_maintenance = time.monotonic()
+                        await JobService.requeue_stale(db, self.stale_after)
+                        await JobService.purge(db, timedelta(hours=settings.jobs_result_ttl_hours))
+            except Exception as e:
+                logger.warning(f"⚠️ Job heartbeat failed: {e}")
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "worker_id": self.worker_id,
+            "concurrency": self.concurrency,
+            "running": len(self._running),
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+
+_worker: Optional[JobWorker] = None
+_worker_task: Optional[asyncio.Task] = None
+
+
+async def start_app_worker() -> JobWorker:
+    """Исполнитель в процессе API (JOBS_RUN_IN_APP)"""
+    global _worker, _worker_task
+    import app.jobs.handlers  # noqa: F401 - регистрация встроенных обработчиков
+
+    if _worker is None:
+        _worker = JobWorker()
+        _worker_task = asyncio.create_task(_worker.start())
+    return _worker
+
+
+async def stop_app_worker() -> None:
+    global _worker, _worker_task
+    if _worker is not None:
+        await _worker.stop()
+        _worker_task.cancel()
+        await asyncio.gather(_worker_task, return_exceptions=True)
+        _worker = _worker_task = None
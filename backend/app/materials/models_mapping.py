@@ -9,7 +9,7 @@ ProductAlias — таблица обучения: запоминает связ
 """
 from sqlalchemy import (
     Column, Integer, String, Float, ForeignKey,
-    DateTime, UniqueConstraint
+    DateTime, UniqueConstraint, Index
 )
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -31,7 +31,8 @@ class ProductAlias(Base):
     id = Column(Integer, primary_key=True, index=True)
     
     # Внешнее название (от поставщика / из УПД)
-    supplier_name = Column(String(500), nullable=False, index=True)
+    # (индексируется составным ix_product_aliases_supplier_name_inn)
+    supplier_name = Column(String(500), nullable=False)
     
     # Каноническое название в нашей системе
     canonical_name = Column(String(500), nullable=False, index=True)
@@ -62,6 +63,8 @@ class ProductAlias(Base):
 
     __table_args__ = (
         UniqueConstraint("supplier_name", "canonical_name", "supplier_inn", name="uq_alias"),
+        # Поиск алиасов по названиям строк УПД с учетом поставщика
+        Index("ix_product_aliases_supplier_name_inn", "supplier_name", "supplier_inn"),
     )
 
     # Связи
@@ -1,21 +1,33 @@
 """
 Middleware для аудита действий
 Автоматическое логирование критичных операций
+
+Чистое ASGI middleware (без BaseHTTPMiddleware): тело ответа не
+оборачивается, StreamingResponse и статика проходят без изменений.
+Запросы, метод и путь которых не аудируются, передаются приложению
+без дополнительной работы; для остальных перехватывается только
+статус ответа.
 """
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response
-from sqlalchemy import insert
-from sqlalchemy.ext.asyncio import AsyncSession
-import json
-from typing import Optional
-from datetime import datetime
+import logging
+import re
+from typing import Dict, Optional, Pattern
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.middleware.audit_sink import get_audit_sink
 
-from app.core.database import AsyncSessionLocal
-from app.models import AuditLog
+logger = logging.getLogger(__name__)
+
+
+def compile_prefixes(paths: Dict[str, list]) -> Dict[str, Pattern]:
+    """Префиксы путей по методам -> одно регулярное выражение на метод"""
+    return {
+        method: re.compile("|".join(re.escape(prefix) for prefix in sorted(prefixes, key=len, reverse=True)))
+        for method, prefixes in paths.items()
+    }
 
 
-class AuditMiddleware(BaseHTTPMiddleware):
+class AuditMiddleware:
     """Middleware для аудита HTTP запросов"""
     
     # Действия которые логируем
@@ -29,73 +41,75 @@ class AuditMiddleware(BaseHTTPMiddleware):
         "PATCH": ["/api/v1/users/roles", "/api/v1/users/active"]
     }
     
-    async def dispatch(self, request: Request, call_next):
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._prefixes = compile_prefixes(self.AUDIT_PATHS)
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
         """Обработка запроса"""
+        if scope["type"] != "http" or not self._matches(scope["method"], scope["path"]):
+            await self.app(scope, receive, send)
+            return
         
-        # Выполняем запрос
-        response = await call_next(request)
+        status_code = 500
         
-        # Проверяем нужно ли логировать
-        if self._should_audit(request, response):
-            await self._log_action(request, response)
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
         
-        return response
-    
-    def _should_audit(self, request: Request, response: Response) -> bool:
-        """Проверка нужно ли логировать запрос"""
+        # Выполняем запрос
+        await self.app(scope, receive, send_wrapper)
         
         # Логируем только успешные операции
-        if response.status_code >= 400:
-            return False
-        
-        # Проверяем метод и путь
-        method = request.method
-        path = request.url.path
-        
-        if method not in self.AUDIT_PATHS:
-            return False
-        
-        # Проверяем совпадение пути
-        for audit_path in self.AUDIT_PATHS[method]:
-            if path.startswith(audit_path):
-                return True
-        
-        return False
+        if status_code < 400:
+            self._log_action(scope)
     
-    async def _log_action(self, request: Request, response: Response):
-        """Логирование действия"""
+    def _matches(self, method: str, path: str) -> bool:
+        """Проверка метода и префикса пути"""
+        pattern = self._prefixes.get(method)
+        return pattern is not None and pattern.match(path) is not None
+    
+    def _log_action(self, scope: Scope):
+        """Логирование действия (запись в очередь, в БД - пачками в фоне)"""
         try:
-            async with AsyncSessionLocal() as session:
-                # Получаем пользователя из state (устанавливается в dependencies)
-                user_id = getattr(request.state, "user_id", None)
-                
-                # Определяем тип действия и сущность из пути
-                path = request.url.path
-                method = request.method
-                
-                action, entity_type = self._parse_action(method, path)
-                
-                # Получаем IP и User-Agent
-                ip_address = request.client.host if request.client else None
-                user_agent = request.headers.get("user-agent")
-                
-                # Создаём запись аудита
-                audit_entry = {
-                    "user_id": user_id,
-                    "action": action,
-                    "entity_type": entity_type,
-                    "ip_address": ip_address,
-                    "user_agent": user_agent,
-                    "description": f"{action} {entity_type} via {method} {path}"
-                }
-                
-                stmt = insert(AuditLog).values(**audit_entry)
-                await session.execute(stmt)
-                await session.commit()
+            # Пользователь из request.state (если его установили dependencies)
+            user_id = scope.get("state", {}).get("user_id")
+            
+            # Определяем тип действия и сущность из пути
+            path = scope["path"]
+            method = scope["method"]
+            
+            action, entity_type = self._parse_action(method, path)
+            
+            # Получаем IP и User-Agent
+            client = scope.get("client")
+            ip_address = client[0] if client else None
+            user_agent = self._header(scope, b"user-agent")
+            
+            # Создаём запись аудита
+            audit_entry = {
+                "user_id": user_id,
+                "action": action,
+                "entity_type": entity_type,
+                "ip_address": ip_address,
+                "user_agent": user_agent,
+                "description": f"{action} {entity_type} via {method} {path}"
+            }
+            
+            get_audit_sink().enqueue(audit_entry)
                 
         except Exception as e:
             # Не ломаем запрос если аудит упал
-            print(f"Audit logging failed: {e}")
+            logger.error(f"Audit logging failed: {e}")
+    
+    @staticmethod
+    def _header(scope: Scope, name: bytes) -> Optional[str]:
+        for key, value in scope.get("headers", ()):
+            if key == name:
+                return value.decode("latin-1")
+        return None
     
     def _parse_action(self, method: str, path: str) -> tuple[str, str]:
         """Определение действия и типа сущности из пути"""
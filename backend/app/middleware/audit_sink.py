@@ -0,0 +1,181 @@
+"""
+Асинхронная запись журнала аудита пачками
+
+AuditMiddleware не пишет в БД в ходе запроса: запись ставится в очередь
+в памяти, а фоновая задача сохраняет накопленное одним многострочным
+INSERT - как только набралось batch_size записей или прошло
+flush_interval с момента первой записи в очереди. В той же транзакции
+обновляется дневная статистика (audit_daily_stats).
+
+Очередь ограничена max_queue: при переполнении (например, БД недоступна)
+новые записи отбрасываются и учитываются в счетчике dropped. Пачка,
+которую не удалось записать, возвращается в начало очереди и повторяется.
+При остановке приложения (lifespan) очередь дописывается до конца.
+"""
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models import AuditLog
+from app.services.audit_storage_service import AuditStorageService
+
+logger = logging.getLogger(__name__)
+
+# Пауза перед повтором после ошибки записи
+RETRY_DELAY = 1.0
+
+
+class AuditSink:
+    """Очередь записей аудита с пакетной записью в audit_log"""
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker = AsyncSessionLocal,
+        batch_size: int = 100,
+        flush_interval: float = 0.5,
+        max_queue: int = 10000
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+
+        self._queue: Deque[Dict[str, Any]] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.failed_batches = 0
+
+    def enqueue(self, entry: Dict[str, Any]) -> bool:
+        """
+        Поставить запись в очередь (без ожидания БД)
+
+        Returns:
+            False - очередь переполнена, запись отброшена
+        """
+        if len(self._queue) >= self.max_queue:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                logger.warning(f"Очередь аудита переполнена, отброшено записей: {self.dropped}")
+            return False
+
+        # Время действия, а не записи пачки
+        entry.setdefault("timestamp", datetime.now(timezone.utc))
+        self._queue.append(entry)
+        self.enqueued += 1
+        self._ensure_worker()
+        if len(self._queue) >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def _ensure_worker(self) -> None:
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while self._queue:
+            if len(self._queue) < self.batch_size and not self._closing:
+                # Ждем полную пачку, но не дольше flush_interval
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            if not await self._write_batch():
+                await asyncio.sleep(RETRY_DELAY)
+
+    async def _write_batch(self) -> bool:
+        batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+        if not batch:
+            return True
+        try:
+            async with self.session_factory() as session:
+                await session.execute(insert(AuditLog).values(batch))
+                await AuditStorageService(session).add_entries(batch)
+                await session.commit()
+        except Exception as e:
+            self.failed_batches += 1
+            logger.error(f"Не удалось записать пачку аудита ({len(batch)} записей): {e}")
+            # Вернуть пачку в начало очереди, сколько поместится
+            room = max(0, self.max_queue - len(self._queue))
+            self.dropped += max(0, len(batch) - room)
+            self._queue.extendleft(reversed(batch[:room]))
+            return False
+        self.written += len(batch)
+        self.batches += 1
+        return True
+
+    async def flush(self) -> None:
+        """Записать все накопленное сейчас"""
+        while self._queue:
+            if not await self._write_batch():
+                break
+
+    async def close(self, timeout: float = 10.0) -> None:
+        """Дописать очередь при остановке приложения"""
+        self._closing = True
+        if self._wakeup is not None:
+            self._wakeup.set()
+        if self._task is not None and not self._task.done():
+            try:
+                await asyncio.wait_for(self._task, timeout=timeout)
+            except asyncio.TimeoutError:
+                self._task.cancel()
+        if self._queue:
+            self.dropped += len(self._queue)
+            logger.error(f"Аудит: при остановке не записано {len(self._queue)} записей")
+            self._queue.clear()
+        logger.info(
+            f"Аудит: записано {self.written}, отброшено {self.dropped}, пачек {self.batches}"
+        )
+
+    def metrics(self) -> Dict[str, Any]:
+        """Счетчики очереди этого процесса"""
+        return {
+            "queued": len(self._queue),
+            "max_queue": self.max_queue,
+            "batch_size": self.batch_size,
+            "flush_interval_ms": int(self.flush_interval * 1000),
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+        }
+
+
+_sink: Optional[AuditSink] = None
+
+
+def get_audit_sink() -> AuditSink:
+    """Общая очередь аудита процесса (параметры из настроек)"""
+    global _sink
+    if _sink is None:
+        _sink = AuditSink(
+            batch_size=settings.audit_batch_size,
+            flush_interval=settings.audit_flush_interval_ms / 1000,
+            max_queue=settings.audit_queue_size
+        )
+    return _sink
+
+
+async def close_audit_sink() -> None:
+    """Дописать и закрыть очередь аудита (при завершении приложения)"""
+    global _sink
+    if _sink is not None:
+        await _sink.close()
+        _sink = None
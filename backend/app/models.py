@@ -337,6 +337,23 @@ class CostEntry(Base, TimestampMixin):
     cost_object = relationship("CostObject", back_populates="cost_entries")
 
 
+class CostDailyRollup(Base):
+    """Агрегат затрат по объекту за день и тип (материализованная сводка cost_entries)
+
+    Обновляется инкрементально при каждой записи/удалении CostEntry
+    через CostRollupService, полностью пересобирается скриптом
+    scripts/rebuild_cost_rollup.py.
+    """
+    __tablename__ = "cost_daily_rollup"
+
+    cost_object_id = Column(Integer, ForeignKey("cost_objects.id", ondelete="CASCADE"), primary_key=True)
+    date = Column(Date, primary_key=True, index=True)
+    type = Column(String(50), primary_key=True)
+    amount = Column(Float, nullable=False, default=0.0)
+    entries_count = Column(Integer, nullable=False, default=0)  # Сколько CostEntry свернуто в строку
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+
 class RegistrationRequest(Base, TimestampMixin):
     """Заявки на регистрацию пользователей"""
     __tablename__ = "registration_requests"
@@ -404,6 +421,22 @@ class AuditLog(Base):
     user = relationship("User", foreign_keys=[user_id])
 
 
+class AuditDailyStats(Base):
+    """Количество записей аудита за день по действию, сущности и пользователю
+
+    Обновляется в той же транзакции, что и запись audit_log
+    (AuditSink, AuditService.log_action), и не удаляется при архивации
+    старых месяцев журнала: статистика /audit/stats читается отсюда.
+    """
+    __tablename__ = "audit_daily_stats"
+
+    date = Column(Date, primary_key=True, index=True)
+    action = Column(String(100), primary_key=True)
+    entity_type = Column(String(50), primary_key=True)
+    user_id = Column(Integer, primary_key=True, default=0)  # 0 - система (user_id пуст)
+    count = Column(Integer, nullable=False, default=0)
+
+
 class TelegramLinkCode(Base, TimestampMixin):
     """Временные коды для привязки Telegram аккаунтов"""
     __tablename__ = "telegram_link_codes"
@@ -518,21 +551,28 @@ class EstimateItem(Base, TimestampMixin):
     # Для отслеживания прогресса (Soft Limits)
     ordered_quantity = Column(Float, default=0.0)  # Сколько уже заказано (через MaterialRequest)
     
+    # Мягкое удаление: позиция исчезла из повторно загруженной сметы
+    # (id сохраняется для ссылок из заявок и алиасов)
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
+    
     # Связи
     cost_object = relationship("CostObject", backref="estimate_items")
 
 
 # Импорт дополнительных моделей из отдельных модулей
 from app.notifications.models import TelegramNotification
+from app.bot.models import BotFSMState
+from app.jobs.models import Job
+from app.time_sheets.models import TimeSheetPreview
 
 # Обновление __all__ для полного экспорта
 __all__ = [
     "User", "CostObject", "Brigade", "BrigadeMember", "EquipmentOrder", "EquipmentCost", "MaterialRequest",
-    "MaterialRequestItem", "MaterialCost", "MaterialCostItem", "CostEntry",
-    "RegistrationRequest", "ObjectAccessRequest", "AuditLog", "TelegramNotification",
+    "MaterialRequestItem", "MaterialCost", "MaterialCostItem", "CostEntry", "CostDailyRollup",
+    "RegistrationRequest", "ObjectAccessRequest", "AuditLog", "AuditDailyStats", "TelegramNotification", "BotFSMState", "Job",
     "EstimateItem",
     "TelegramLinkCode", "Delivery",
-    "TimeEntry", "TimeSheet", "TimeSheetItem", "TimeSheetComment",
+    "TimeEntry", "TimeSheet", "TimeSheetItem", "TimeSheetComment", "TimeSheetPreview",
     "RecentWorker",
     "LaborCost", "OtherCost", "DeliveryCost",
     "object_foremen", "UPDDistribution", "SavedWorker"
@@ -0,0 +1,85 @@
+"""
+Сигнал о новых Telegram уведомлениях для NotificationWorker
+
+Производители уведомлений вызывают announce_pending_notifications(db) перед
+commit. Дальше работают два канала:
+
+- в процессе: после commit срабатывает notification_signal (когда воркер
+  запущен в том же процессе, что и производитель);
+- между процессами (PostgreSQL): в транзакции выполняется pg_notify, и
+  PostgreSQL доставляет сигнал слушателям LISTEN только после commit.
+
+Откат транзакции сигнал не отправляет. Между процессами на SQLite сигнала
+нет: воркер бота находит уведомления API опросом раз в
+notification_poll_interval секунд.
+"""
+import asyncio
+import logging
+from typing import Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Канал LISTEN/NOTIFY PostgreSQL
+NOTIFY_CHANNEL = "telegram_notifications"
+
+_SESSION_FLAG = "telegram_notifications_pending"
+
+
+class NotificationSignal:
+    """Сигнал "есть новые уведомления" внутри процесса"""
+
+    def __init__(self):
+        self._event: Optional[asyncio.Event] = None
+
+    def _get_event(self) -> asyncio.Event:
+        if self._event is None:
+            self._event = asyncio.Event()
+        return self._event
+
+    def set(self) -> None:
+        self._get_event().set()
+
+    def clear(self) -> None:
+        self._get_event().clear()
+
+    async def wait(self, timeout: float) -> bool:
+        """
+        Ждать сигнал не дольше timeout секунд
+
+        Returns:
+            True - пришел сигнал, False - истек таймаут
+        """
+        try:
+            await asyncio.wait_for(self._get_event().wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+notification_signal = NotificationSignal()
+
+
+async def announce_pending_notifications(db: AsyncSession) -> None:
+    """
+    Сообщить воркеру о новых уведомлениях (вызывать до commit)
+
+    Сигнал уходит только при успешном commit текущей транзакции.
+    """
+    db.sync_session.info[_SESSION_FLAG] = True
+    if db.bind.dialect.name == "postgresql":
+        await db.execute(text("SELECT pg_notify(:channel, '')"), {"channel": NOTIFY_CHANNEL})
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_after_commit(session: Session) -> None:
+    if session.info.pop(_SESSION_FLAG, False):
+        notification_signal.set()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_after_rollback(session: Session) -> None:
+    session.info.pop(_SESSION_FLAG, None)
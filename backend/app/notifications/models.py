@@ -20,6 +20,10 @@ class TelegramNotification(Base):
     is_read = Column(Boolean, default=False, index=True)
     status = Column(String(20), default="pending", index=True)  # pending, sent, failed
     
+    # Доставка: число неудачных попыток и время следующей (NULL - сразу)
+    attempts = Column(Integer, default=0, nullable=False, server_default="0")
+    next_attempt_at = Column(DateTime, nullable=True, index=True)
+    
     # Telegram специфика
     telegram_message_id = Column(Integer, nullable=True)
     telegram_chat_id = Column(Integer, nullable=True)
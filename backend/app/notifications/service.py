@@ -6,6 +6,7 @@ from sqlalchemy import select, func, and_
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.notifications.models import TelegramNotification
+from app.notifications.dispatch import announce_pending_notifications
 from app.notifications.schemas import NotificationCreate, NotificationSendByRole
 from app.models import User
 from app.core.models_base import UserRole
@@ -38,6 +39,7 @@ class NotificationService:
         )
         
         self.db.add(notification)
+        await announce_pending_notifications(self.db)
         await self.db.commit()
         await self.db.refresh(notification)
         
@@ -89,6 +91,8 @@ class NotificationService:
             self.db.add(notification)
             notifications.append(notification)
         
+        if notifications:
+            await announce_pending_notifications(self.db)
         await self.db.commit()
         
         logger.info(f"Created {len(notifications)} notifications for roles {roles}")
@@ -1,7 +1,7 @@
 """
 Роутер для объектов учета
 """
-from fastapi import APIRouter, Depends, HTTPException, status, Body, Form, File, UploadFile
+from fastapi import APIRouter, Depends, HTTPException, status, Body, Form, File, UploadFile, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, insert, desc, func
 from typing import List, Optional
@@ -16,6 +16,11 @@ from app.services.object_service import ObjectService
 from app.services.estimate_service import EstimateService
 from app.services.estimate_service import EstimateService
 from fastapi import UploadFile, File
+from app.jobs.handlers import BUDGET_ALERTS, ESTIMATE_IMPORT
+from app.jobs.router import job_accepted
+from app.jobs.service import JobService, new_job_id, save_job_input
+import asyncio
+import os
 
 router = APIRouter()
 
@@ -40,7 +45,33 @@ async def upload_estimate(
     
     return result
 
-router = APIRouter()
+
+@router.post("/{object_id}/estimate/jobs", status_code=status.HTTP_202_ACCEPTED)
+async def upload_estimate_job(
+    object_id: int,
+    file: UploadFile = File(...),
+    current_user: User = Depends(require_roles([UserRole.MANAGER, UserRole.ADMIN])),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Загрузка сметы из Excel фоновой задачей
+    
+    Файл сохраняется, импорт выполняет исполнитель задач. Возвращает
+    job_id; прогресс и результат - GET /jobs/{job_id}.
+    """
+    if not file.filename.endswith(('.xlsx', '.xls')):
+         raise HTTPException(status_code=400, detail="Файл должен быть Excel (.xlsx, .xls)")
+    if not await db.get(CostObject, object_id):
+        raise HTTPException(status_code=404, detail="Объект не найден")
+    
+    filename = os.path.basename(file.filename)
+    job_id = new_job_id()
+    await asyncio.to_thread(save_job_input, job_id, filename, file.file)
+    job = await JobService.enqueue(
+        db, ESTIMATE_IMPORT, {"object_id": object_id, "filename": filename},
+        user_id=current_user.id, job_id=job_id
+    )
+    return job_accepted(job)
 
 
 class CreateObjectRequest(BaseModel):
@@ -67,17 +98,27 @@ class UpdateObjectRequest(BaseModel):
 
 @router.get("/")
 async def get_objects(
+    response: Response,
     include_archived: bool = False,
     status_filter: Optional[str] = None,
+    search: Optional[str] = None,
+    sort_by: str = Query("created_at", pattern=f"^({'|'.join(ObjectService.OBJECTS_SORT_FIELDS)})$"),
+    sort_order: str = Query("desc", pattern="^(asc|desc)$"),
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    offset: int = Query(0, ge=0),
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """
-    Получение списка объектов учета
+    Получение списка объектов учета с план/факт показателями
     
     Параметры:
     - include_archived: включить архивные объекты (по умолчанию False)
     - status_filter: фильтр по статусу (Активен, Готовится к закрытию, Закрыт, Архив)
+    - search: поиск по названию, шифру или заказчику
+    - sort_by: created_at, name, code, fact_total, margin, margin_pct
+    - sort_order: asc или desc
+    - limit/offset: пагинация (общее количество - в заголовке X-Total-Count)
     """
     # Преобразуем фильтр статуса
     status_enum = None
@@ -92,42 +133,40 @@ async def get_objects(
     if UserRole.FOREMAN in current_user.roles and UserRole.MANAGER not in current_user.roles:
         foreman_id = current_user.id
     
-    # Получаем объекты через сервис
-    objects = await ObjectService.get_objects(
+    # Объекты и факты одним запросом
+    rows, total = await ObjectService.get_objects_with_stats(
         session=db,
         include_archived=include_archived,
         status=status_enum,
-        foreman_id=foreman_id
+        foreman_id=foreman_id,
+        search=search,
+        sort_by=sort_by,
+        sort_order=sort_order,
+        limit=limit,
+        offset=offset
     )
+    response.headers["X-Total-Count"] = str(total)
     
-    
-    # Calculate detailed stats for table view
     objects_with_stats = []
     
-    for obj in objects:
+    for obj, fact_materials, fact_labor, fact_delivery, fact_other, fact_equipment in rows:
         # Plan
         plan_materials = obj.material_amount or 0
         plan_labor = obj.labor_amount or 0
         plan_total = obj.contract_amount or (plan_materials + plan_labor)
         
-        # Fact - Materials
-        mat_res = await db.execute(
-            select(func.sum(MaterialCost.total_amount))
-            .where(MaterialCost.cost_object_id == obj.id)
-        )
-        fact_materials = mat_res.scalar() or 0
-        
-        # Fact - Labor (Legacy TimeSheet removed)
-        fact_labor = 0
+        # Fact
+        fact_total = fact_materials + fact_labor + fact_delivery + fact_other + fact_equipment
         
         # Balance
         diff_materials = plan_materials - fact_materials
         diff_labor = plan_labor - fact_labor
-        diff_total = plan_total - (fact_materials + fact_labor)
+        diff_total = plan_total - fact_total
         
         # Margin %
         margin_mat_pct = (diff_materials / plan_materials * 100) if plan_materials > 0 else 0
         margin_labor_pct = (diff_labor / plan_labor * 100) if plan_labor > 0 else 0
+        margin_total_pct = (diff_total / plan_total * 100) if plan_total > 0 else 0
 
         objects_with_stats.append({
             "id": obj.id,
@@ -152,7 +191,10 @@ async def get_objects(
                 "fact": {
                     "materials": fact_materials,
                     "labor": fact_labor,
-                    "total": fact_materials + fact_labor
+                    "delivery": fact_delivery,
+                    "other": fact_other,
+                    "equipment": fact_equipment,
+                    "total": fact_total
                 },
                 "balance": {
                     "materials": diff_materials,
@@ -161,7 +203,8 @@ async def get_objects(
                 },
                 "margin_pct": {
                     "materials": margin_mat_pct,
-                    "labor": margin_labor_pct
+                    "labor": margin_labor_pct,
+                    "total": margin_total_pct
                 }
             }
         })
@@ -860,6 +903,21 @@ async def get_object_material_items(
     ]
 
 
+@router.post("/budget-alerts/jobs", status_code=status.HTTP_202_ACCEPTED)
+async def recompute_budget_alerts_job(
+    object_ids: Optional[List[int]] = Body(None, embed=True),
+    current_user: User = Depends(require_roles([UserRole.MANAGER, UserRole.ADMIN])),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Пересчет бюджетных алертов фоновой задачей
+    
+    - object_ids: объекты для проверки (не указано - все активные)
+    """
+    job = await JobService.enqueue(db, BUDGET_ALERTS, {"object_ids": object_ids}, user_id=current_user.id)
+    return job_accepted(job)
+
+
 @router.get("/{object_id}/budget")
 async def get_object_budget(
     object_id: int,
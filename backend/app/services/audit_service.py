@@ -4,10 +4,11 @@
 from sqlalchemy import select, and_, desc
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional, List
-from datetime import datetime, date
+from datetime import datetime, date, timezone
 
 from app.models import AuditLog, User
 from app.core.models_base import UserRole
+from app.services.audit_storage_service import AuditStorageService
 
 
 class AuditService:
@@ -42,6 +43,7 @@ class AuditService:
             user_agent: User-Agent
         """
         audit_entry = AuditLog(
+            timestamp=datetime.now(timezone.utc),
             user_id=user_id,
             action=action,
             entity_type=entity_type,
@@ -55,6 +57,12 @@ class AuditService:
         
         session.add(audit_entry)
         await session.flush()
+        await AuditStorageService(session).add_entries([{
+            "timestamp": audit_entry.timestamp,
+            "action": action,
+            "entity_type": entity_type,
+            "user_id": user_id
+        }])
         
         return audit_entry
     
@@ -148,16 +156,15 @@ class AuditService:
         """
         Удаление старых записей аудита
         
+        Полные месяцы удаляются партициями (PostgreSQL), остальное -
+        порциями с коммитом после каждой, без одного длинного DELETE.
+        Для удаления с архивацией - AuditStorageService.archive_before.
+        
         Returns:
             Количество удалённых записей
         """
         from datetime import timedelta
-        from sqlalchemy import delete
         
         cutoff_date = datetime.now() - timedelta(days=days)
         
-        stmt = delete(AuditLog).where(AuditLog.timestamp < cutoff_date)
-        result = await session.execute(stmt)
-        await session.commit()
-        
-        return result.rowcount
+        return await AuditStorageService(session).delete_before(cutoff_date)
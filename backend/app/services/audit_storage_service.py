@@ -0,0 +1,380 @@
+"""
+Хранение журнала аудита: дневная статистика, партиции и архив
+
+- audit_daily_stats - счетчики записей по (день, действие, сущность,
+  пользователь). Обновляются в той же транзакции, что и audit_log,
+  поэтому /audit/stats суммирует дни периода вместо агрегатов по
+  всему журналу.
+- PostgreSQL: audit_log секционирована по месяцам (миграция 018),
+  ensure_partitions() заранее создает партиции следующих месяцев и
+  переносит в них записи, попавшие в default партицию.
+- Архивация: записи месяца старше срока хранения выгружаются в
+  audit_log_YYYY_MM.jsonl.gz, после чего партиция удаляется целиком
+  (DROP TABLE). Без партиций (SQLite, записи в default партиции)
+  месяц удаляется короткими DELETE по chunk_size записей с коммитом
+  после каждого, не блокируя таблицу надолго.
+
+Статистика архивированных месяцев сохраняется. Обслуживание
+запускается по расписанию: scripts/audit_maintenance.py.
+"""
+import gzip
+import json
+import logging
+import os
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, delete, func, select, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import AuditDailyStats, AuditLog, User
+
+logger = logging.getLogger(__name__)
+
+StatsKey = Tuple[date, str, str, int]
+
+
+def month_start(day: date) -> date:
+    """Первое число месяца"""
+    return day.replace(day=1)
+
+
+def next_month(month: date) -> date:
+    """Первое число следующего месяца"""
+    return (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def partition_name(month: date) -> str:
+    """Имя партиции audit_log за месяц (PostgreSQL)"""
+    return f"audit_log_y{month.year}m{month.month:02d}"
+
+
+def _month_bounds(month: date) -> Tuple[datetime, datetime]:
+    end = next_month(month)
+    return datetime(month.year, month.month, 1), datetime(end.year, end.month, 1)
+
+
+def _entry_day(timestamp: Optional[datetime]) -> date:
+    """День записи аудита (UTC)"""
+    if timestamp is None:
+        return datetime.now(timezone.utc).date()
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc)
+    return timestamp.date()
+
+
+def _json_default(value: Any) -> str:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+class AuditStorageService:
+    """Статистика, партиции и архивация журнала аудита"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    def _dialect(self) -> str:
+        return self.db.get_bind().dialect.name
+
+    # ===== Дневная статистика =====
+
+    async def add_entries(self, entries: Iterable[Dict[str, Any]]) -> None:
+        """
+        Учесть новые записи аудита (вызывать в той же транзакции, где они пишутся)
+
+        Args:
+            entries: значения записей audit_log (timestamp, action, entity_type, user_id)
+        """
+        deltas: Dict[StatsKey, int] = Counter(
+            (_entry_day(entry.get("timestamp")), entry["action"], entry["entity_type"], entry.get("user_id") or 0)
+            for entry in entries
+        )
+        if not deltas:
+            return
+
+        if self._dialect() == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+
+        values = [
+            {'date': day, 'action': action, 'entity_type': entity_type, 'user_id': user_id, 'count': count}
+            for (day, action, entity_type, user_id), count in deltas.items()
+        ]
+        stmt = dialect_insert(AuditDailyStats).values(values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['date', 'action', 'entity_type', 'user_id'],
+            set_={'count': AuditDailyStats.count + stmt.excluded.count}
+        )
+        await self.db.execute(stmt)
+
+    async def rebuild_stats(self, date_from: Optional[date] = None) -> int:
+        """
+        Пересборка статистики из audit_log (backfill)
+
+        Args:
+            date_from: пересобрать дни начиная с этой даты (None - все)
+
+        Returns:
+            Количество строк статистики после пересборки
+        """
+        day = func.date(AuditLog.timestamp)
+        source = select(
+            day.label('day'),
+            AuditLog.action,
+            AuditLog.entity_type,
+            func.coalesce(AuditLog.user_id, 0).label('user_id'),
+            func.count(AuditLog.id).label('count')
+        ).group_by(day, AuditLog.action, AuditLog.entity_type, func.coalesce(AuditLog.user_id, 0))
+        clear = delete(AuditDailyStats)
+        if date_from is not None:
+            source = source.where(AuditLog.timestamp >= datetime.combine(date_from, datetime.min.time()))
+            clear = clear.where(AuditDailyStats.date >= date_from)
+
+        rows = [
+            {
+                # SQLite возвращает date() строкой
+                'date': date.fromisoformat(row.day) if isinstance(row.day, str) else row.day,
+                'action': row.action,
+                'entity_type': row.entity_type,
+                'user_id': row.user_id,
+                'count': row.count
+            }
+            for row in await self.db.execute(source)
+        ]
+        await self.db.execute(clear)
+        if rows:
+            await self.db.execute(AuditDailyStats.__table__.insert(), rows)
+        return len(rows)
+
+    async def get_stats(self, date_from: date, top_users: int = 10) -> Dict[str, Any]:
+        """
+        Статистика журнала начиная с дня date_from
+
+        Returns:
+            total_logs, actions, entities и top_users (как /audit/stats)
+        """
+        result = await self.db.execute(
+            select(
+                AuditDailyStats.action,
+                AuditDailyStats.entity_type,
+                AuditDailyStats.user_id,
+                func.sum(AuditDailyStats.count).label('count')
+            ).where(
+                AuditDailyStats.date >= date_from
+            ).group_by(
+                AuditDailyStats.action, AuditDailyStats.entity_type, AuditDailyStats.user_id
+            )
+        )
+        actions: Counter = Counter()
+        entities: Counter = Counter()
+        users: Counter = Counter()
+        for row in result:
+            actions[row.action] += row.count
+            entities[row.entity_type] += row.count
+            if row.user_id:
+                users[row.user_id] += row.count
+
+        # Удаленные пользователи в топ не попадают
+        names = {}
+        if users:
+            names_result = await self.db.execute(
+                select(User.id, User.username).where(User.id.in_(list(users)))
+            )
+            names = {row.id: row.username for row in names_result}
+        top = [
+            {"user_id": user_id, "username": names[user_id], "actions_count": count}
+            for user_id, count in users.most_common()
+            if user_id in names
+        ][:top_users]
+
+        return {
+            "total_logs": sum(actions.values()),
+            "actions": dict(actions),
+            "entities": dict(entities),
+            "top_users": top,
+        }
+
+    # ===== Партиции (PostgreSQL) =====
+
+    async def is_partitioned(self) -> bool:
+        """audit_log - секционированная таблица PostgreSQL"""
+        if self._dialect() != 'postgresql':
+            return False
+        result = await self.db.execute(text(
+            "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = 'audit_log'"
+        ))
+        return result.first() is not None
+
+    async def _partition_exists(self, name: str) -> bool:
+        return await self.db.scalar(text("SELECT to_regclass(:name)"), {"name": name}) is not None
+
+    async def _create_partition(self, month: date) -> None:
+        """
+        Создать партицию месяца
+
+        Если обслуживание пропускалось, записи месяца уже лежат в
+        audit_log_default, и CREATE TABLE ... PARTITION OF завершится
+        ошибкой. Тогда default партиция отсоединяется, записи месяца
+        переносятся в новую партицию, и default присоединяется обратно -
+        все в одной транзакции.
+        """
+        name = partition_name(month)
+        bounds = {"start": month, "end": next_month(month)}
+        create = (
+            f"CREATE TABLE {name} PARTITION OF audit_log "
+            f"FOR VALUES FROM ('{month}') TO ('{next_month(month)}')"
+        )
+        in_month = "timestamp >= :start AND timestamp < :end"
+        has_rows = await self.db.scalar(
+            text(f"SELECT EXISTS (SELECT 1 FROM audit_log_default WHERE {in_month})"), bounds
+        )
+        if not has_rows:
+            await self.db.execute(text(create))
+            return
+
+        await self.db.execute(text("ALTER TABLE audit_log DETACH PARTITION audit_log_default"))
+        await self.db.execute(text(create))
+        await self.db.execute(text(f"INSERT INTO {name} SELECT * FROM audit_log_default WHERE {in_month}"), bounds)
+        moved = await self.db.execute(text(f"DELETE FROM audit_log_default WHERE {in_month}"), bounds)
+        await self.db.execute(text("ALTER TABLE audit_log ATTACH PARTITION audit_log_default DEFAULT"))
+        logger.info(f"Записи аудита за {month:%Y-%m} перенесены из audit_log_default в {name}: {moved.rowcount}")
+
+    async def ensure_partitions(self, months_ahead: int = 2) -> List[str]:
+        """
+        Создать партиции текущего и следующих months_ahead месяцев
+
+        Ошибка создания партиции одного месяца откатывает только его
+        (SAVEPOINT) и не мешает остальным месяцам и архивации.
+
+        Returns:
+            Имена созданных партиций
+        """
+        if not await self.is_partitioned():
+            return []
+        created = []
+        month = month_start(datetime.now(timezone.utc).date())
+        for _ in range(months_ahead + 1):
+            name = partition_name(month)
+            if not await self._partition_exists(name):
+                try:
+                    async with self.db.begin_nested():
+                        await self._create_partition(month)
+                except SQLAlchemyError as e:
+                    logger.error(f"Не удалось создать партицию {name}: {e}")
+                else:
+                    created.append(name)
+            month = next_month(month)
+        await self.db.commit()
+        return created
+
+    async def _drop_partition(self, month: date) -> bool:
+        """Удалить партицию месяца целиком; False - партиции нет"""
+        name = partition_name(month)
+        if not await self.is_partitioned() or not await self._partition_exists(name):
+            return False
+        await self.db.execute(text(f"ALTER TABLE audit_log DETACH PARTITION {name}"))
+        await self.db.execute(text(f"DROP TABLE {name}"))
+        await self.db.commit()
+        return True
+
+    async def _delete_chunked(self, condition, chunk_size: int) -> int:
+        """DELETE по chunk_size записей с коммитом после каждой порции"""
+        deleted = 0
+        while True:
+            chunk = select(AuditLog.id).where(condition).limit(chunk_size)
+            result = await self.db.execute(delete(AuditLog).where(AuditLog.id.in_(chunk)))
+            await self.db.commit()
+            deleted += result.rowcount
+            if result.rowcount < chunk_size:
+                return deleted
+
+    # ===== Архивация =====
+
+    async def archive_month(self, month: date, archive_dir: str, chunk_size: int = 5000) -> Dict[str, Any]:
+        """
+        Выгрузить записи месяца в gzip JSONL и удалить их из audit_log
+
+        Файл пишется во временный и переименовывается только после
+        выгрузки всех записей, удаление выполняется после этого.
+
+        Returns:
+            month, rows (выгружено записей) и file (путь архива или None)
+        """
+        month = month_start(month)
+        start, end = _month_bounds(month)
+        in_month = and_(AuditLog.timestamp >= start, AuditLog.timestamp < end)
+
+        path = Path(archive_dir) / f"audit_log_{month.year}_{month.month:02d}.jsonl.gz"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+
+        rows = 0
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as archive:
+            result = await self.db.stream(
+                select(AuditLog.__table__).where(in_month).order_by(AuditLog.id)
+                .execution_options(yield_per=chunk_size)
+            )
+            async for partition in result.partitions():
+                for row in partition:
+                    archive.write(json.dumps(dict(row._mapping), ensure_ascii=False, default=_json_default) + "\n")
+                    rows += 1
+
+        if rows == 0:
+            tmp_path.unlink()
+            await self._drop_partition(month)
+            return {"month": month.isoformat(), "rows": 0, "file": None}
+
+        os.replace(tmp_path, path)
+        if not await self._drop_partition(month):
+            await self._delete_chunked(in_month, chunk_size)
+        return {"month": month.isoformat(), "rows": rows, "file": str(path)}
+
+    async def archive_before(self, cutoff: date, archive_dir: str, chunk_size: int = 5000) -> List[Dict[str, Any]]:
+        """
+        Архивировать все полные месяцы, закончившиеся до cutoff
+
+        Returns:
+            Результаты archive_month по месяцам
+        """
+        oldest = await self.db.scalar(select(func.min(AuditLog.timestamp)))
+        await self.db.commit()
+        if oldest is None:
+            return []
+        archived = []
+        month = month_start(oldest.date())
+        while next_month(month) <= cutoff:
+            archived.append(await self.archive_month(month, archive_dir, chunk_size))
+            month = next_month(month)
+        return archived
+
+    async def delete_before(self, cutoff: datetime, chunk_size: int = 5000) -> int:
+        """
+        Удалить записи старше cutoff без архивации
+
+        Полные месяцы удаляются партициями (если они есть), остаток -
+        порциями по chunk_size записей.
+
+        Returns:
+            Количество удаленных записей
+        """
+        deleted = 0
+        oldest = await self.db.scalar(select(func.min(AuditLog.timestamp)))
+        if oldest is not None and await self.is_partitioned():
+            month = month_start(oldest.date())
+            while next_month(month) <= cutoff.date():
+                start, end = _month_bounds(month)
+                count = await self.db.scalar(
+                    select(func.count(AuditLog.id)).where(AuditLog.timestamp >= start, AuditLog.timestamp < end)
+                )
+                if await self._drop_partition(month):
+                    deleted += count
+                month = next_month(month)
+        deleted += await self._delete_chunked(AuditLog.timestamp < cutoff, chunk_size)
+        return deleted
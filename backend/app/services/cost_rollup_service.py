@@ -0,0 +1,146 @@
+"""
+Сервис материализованной сводки затрат (cost_daily_rollup)
+
+Таблица cost_daily_rollup хранит сумму CostEntry по ключу
+(cost_object_id, date, type). Все места, которые пишут или удаляют
+CostEntry, сообщают об изменениях сюда, поэтому аналитика читает
+готовые дневные агрегаты вместо пересчета всей таблицы cost_entries.
+"""
+from collections import defaultdict
+from datetime import date
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import CostDailyRollup, CostEntry
+
+RollupKey = Tuple[int, date, str]
+
+
+class CostRollupService:
+    """Инкрементальное обслуживание таблицы cost_daily_rollup"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def add_entries(self, entries: Iterable[CostEntry]) -> None:
+        """
+        Учесть новые записи затрат (вызывать в той же транзакции, где они создаются)
+
+        Args:
+            entries: добавленные CostEntry (могут быть еще не сброшены в БД)
+        """
+        deltas: Dict[RollupKey, list] = defaultdict(lambda: [0.0, 0])
+        for entry in entries:
+            delta = deltas[(entry.cost_object_id, entry.date, entry.type)]
+            delta[0] += float(entry.amount or 0)
+            delta[1] += 1
+
+        await self._apply_deltas(deltas)
+
+    async def delete_entries(self, *criteria) -> int:
+        """
+        Удалить записи затрат по условию, вычтя их из сводки
+
+        Args:
+            criteria: условия WHERE для CostEntry
+
+        Returns:
+            Количество удаленных записей
+        """
+        grouped = await self.db.execute(
+            select(
+                CostEntry.cost_object_id,
+                CostEntry.date,
+                CostEntry.type,
+                func.sum(CostEntry.amount).label('amount'),
+                func.count(CostEntry.id).label('entries_count')
+            ).where(*criteria).group_by(
+                CostEntry.cost_object_id, CostEntry.date, CostEntry.type
+            )
+        )
+        deltas = {
+            (row.cost_object_id, row.date, row.type): [-float(row.amount or 0), -row.entries_count]
+            for row in grouped
+        }
+        if not deltas:
+            return 0
+
+        result = await self.db.execute(delete(CostEntry).where(*criteria))
+        await self._apply_deltas(deltas)
+        return result.rowcount
+
+    async def rebuild(self, cost_object_id: Optional[int] = None) -> int:
+        """
+        Полная пересборка сводки из cost_entries (backfill)
+
+        Args:
+            cost_object_id: пересобрать только один объект (None - все)
+
+        Returns:
+            Количество строк сводки после пересборки
+        """
+        clear = delete(CostDailyRollup)
+        source = select(
+            CostEntry.cost_object_id,
+            CostEntry.date,
+            CostEntry.type,
+            func.sum(CostEntry.amount),
+            func.count(CostEntry.id)
+        ).group_by(CostEntry.cost_object_id, CostEntry.date, CostEntry.type)
+
+        if cost_object_id is not None:
+            clear = clear.where(CostDailyRollup.cost_object_id == cost_object_id)
+            source = source.where(CostEntry.cost_object_id == cost_object_id)
+
+        await self.db.execute(clear)
+        await self.db.execute(
+            insert(CostDailyRollup).from_select(
+                ['cost_object_id', 'date', 'type', 'amount', 'entries_count'],
+                source
+            )
+        )
+
+        count_query = select(func.count()).select_from(CostDailyRollup)
+        if cost_object_id is not None:
+            count_query = count_query.where(CostDailyRollup.cost_object_id == cost_object_id)
+        return (await self.db.execute(count_query)).scalar_one()
+
+    async def _apply_deltas(self, deltas: Dict[RollupKey, list]) -> None:
+        """Атомарный upsert приращений (amount += delta) по каждому ключу"""
+        if not deltas:
+            return
+
+        dialect = self.db.get_bind().dialect.name
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+
+        values = [
+            {
+                'cost_object_id': object_id,
+                'date': day,
+                'type': cost_type,
+                'amount': amount,
+                'entries_count': count
+            }
+            for (object_id, day, cost_type), (amount, count) in deltas.items()
+        ]
+        stmt = dialect_insert(CostDailyRollup).values(values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['cost_object_id', 'date', 'type'],
+            set_={
+                'amount': CostDailyRollup.amount + stmt.excluded.amount,
+                'entries_count': CostDailyRollup.entries_count + stmt.excluded.entries_count,
+                'updated_at': func.now()
+            }
+        )
+        await self.db.execute(stmt)
+
+        # Строки, в которых не осталось ни одной записи, удаляем
+        if any(count < 0 for _, count in deltas.values()):
+            await self.db.execute(
+                delete(CostDailyRollup).where(CostDailyRollup.entries_count <= 0)
+            )
@@ -1,150 +1,343 @@
-import io
+"""
+Сервис смет объектов
+
+Импорт сметы из Excel работает потоково: книга открывается в режиме
+read_only (строки читаются из XML по одной, без загрузки листа в
+память), разбор идет в отдельном потоке, а готовые позиции пачками по
+chunk_size записываются Core INSERT'ами, пока поток читает следующие.
+Очередь между потоком и записью ограничена, поэтому в памяти не больше
+нескольких пачек независимо от размера сметы.
+
+Повторная загрузка сметы инкрементальна (EstimateDiff): строки
+сопоставляются с текущими позициями по (category, name, unit), и
+записываются только изменения - новые позиции, измененные количества
+и цены, мягкое удаление (deleted_at) исчезнувших. id позиций, а с ними
+ordered_quantity и ссылки из заявок и алиасов, сохраняются; удаленная
+позиция, вернувшаяся в смету, восстанавливается.
+"""
+import asyncio
+import concurrent.futures
 import logging
+import threading
+from collections import defaultdict, deque
+from contextlib import aclosing
+from typing import Any, BinaryIO, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
 import openpyxl
 from fastapi import UploadFile, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import delete
+from sqlalchemy import func, insert, select, update
+from app.core.config import settings
 from app.models import CostObject, EstimateItem
+from app.services.smart_mapping import invalidate_estimate_index_on_commit
 
 logger = logging.getLogger(__name__)
 
+# Колонки сметы: A=№, B=Наименование/Категория, C=Ед., D=Кол-во, E=Цена, F=Сумма
+ESTIMATE_COLUMNS = 6
+
+# Пачек в очереди между потоком разбора и записью в БД
+QUEUE_CHUNKS = 2
+
+# progress(rows_read, items_saved)
+ProgressCallback = Callable[[int, int], Any]
+
+# Ключ сопоставления позиций при повторной загрузке
+EstimateKey = Tuple[Optional[str], str, str]
+
+# Поля, изменение которых обновляет позицию
+COMPARED_FIELDS = ("quantity", "price", "total_amount")
+
+
+def _safe_float(val) -> float:
+    try:
+        if not val:
+            return 0.0
+        return float(val)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def parse_estimate_row(row: tuple, current_category: str) -> Tuple[Optional[Dict[str, Any]], str]:
+    """
+    Разбор одной строки сметы
+
+    Returns:
+        (позиция или None, текущая категория после строки)
+    """
+    # В read_only режиме строки могут быть короче листа
+    if len(row) < ESTIMATE_COLUMNS:
+        row = tuple(row) + (None,) * (ESTIMATE_COLUMNS - len(row))
+
+    col_a = row[0]  # №
+    col_b = row[1]  # Наименование / Категория
+    if not col_b:
+        return None, current_category  # Пустая строка
+
+    name = str(col_b).strip()
+    val_c, val_d, val_e = row[2], row[3], row[4]
+
+    # Strategy 1: Column A is a digit (classic)
+    is_item = bool(col_a and str(col_a).strip().replace('.', '').isdigit())
+
+    # Strategy 2: Heuristic - if it has unit and price/qty, it's likely an item, even without Col A
+    if not is_item and name:
+        has_unit = val_c and len(str(val_c)) < 10  # Unit is usually short
+        has_qty = isinstance(val_d, (int, float)) or (isinstance(val_d, str) and val_d.strip().replace('.', '').isdigit())
+        if has_unit or has_qty:
+            is_item = True
+
+    if is_item:
+        try:
+            qty = _safe_float(val_d)
+            price = _safe_float(val_e)
+            total = _safe_float(row[5])
+            if total == 0 and qty > 0 and price > 0:
+                total = qty * price
+            return {
+                "category": current_category,
+                "name": name,
+                "unit": str(val_c).strip() if val_c else "шт",
+                "quantity": qty,
+                "price": price,
+                "total_amount": total,
+            }, current_category
+        except Exception as e:
+            logger.warning(f"Ошибка парсинга строки {row}: {e}")
+            return None, current_category
+
+    # If it has a name but no valid item data, treat as category
+    is_data_empty = all(not x for x in (row[3], row[4], row[5]))  # qty, price, sum
+    if name and len(name) > 2 and is_data_empty:
+        current_category = name
+    return None, current_category
+
+
+def iter_estimate_items(source: BinaryIO, progress: Optional[Callable[[int], Any]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Позиции сметы из Excel файла (потоково, read_only)
+
+    Args:
+        source: путь или бинарный файл .xlsx
+        progress: вызывается с числом прочитанных строк каждые 1000 строк
+    """
+    wb = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        ws = wb.active
+        current_category = "Общее"
+        rows_read = 0
+        # 1-я строка - шапка
+        for row in ws.iter_rows(min_row=2, max_col=ESTIMATE_COLUMNS, values_only=True):
+            rows_read += 1
+            if progress and rows_read % 1000 == 0:
+                progress(rows_read)
+            item, current_category = parse_estimate_row(row, current_category)
+            if item is not None:
+                yield item
+        if progress:
+            progress(rows_read)
+    finally:
+        wb.close()
+
+
+class _ParseThread:
+    """Разбор сметы в отдельном потоке с передачей пачек в event loop"""
+
+    def __init__(self, source: BinaryIO, chunk_size: int):
+        self.source = source
+        self.chunk_size = chunk_size
+        self.rows_read = 0
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_CHUNKS)
+        self.cancelled = threading.Event()
+
+    def _put(self, message) -> None:
+        # Ждет места в очереди: поток не убегает вперед записи в БД
+        future = asyncio.run_coroutine_threadsafe(self.queue.put(message), self.loop)
+        while not self.cancelled.is_set():
+            try:
+                future.result(timeout=0.1)
+                return
+            except concurrent.futures.TimeoutError:
+                continue
+        future.cancel()
+
+    def _set_rows(self, rows_read: int) -> None:
+        self.rows_read = rows_read
+
+    def run(self) -> None:
+        try:
+            chunk = []
+            for item in iter_estimate_items(self.source, progress=self._set_rows):
+                if self.cancelled.is_set():
+                    return
+                chunk.append(item)
+                if len(chunk) >= self.chunk_size:
+                    self._put(("chunk", chunk))
+                    chunk = []
+            if chunk:
+                self._put(("chunk", chunk))
+            self._put(("done", None))
+        except Exception as e:
+            self._put(("error", e))
+
+    async def chunks(self):
+        """Пачки позиций по мере разбора"""
+        thread = asyncio.create_task(asyncio.to_thread(self.run))
+        try:
+            while True:
+                kind, payload = await self.queue.get()
+                if kind == "chunk":
+                    yield payload
+                elif kind == "error":
+                    logger.error(f"Ошибка загрузки Excel: {payload}", exc_info=payload)
+                    raise HTTPException(status_code=400, detail=f"Ошибка чтения Excel: {str(payload)}")
+                else:
+                    break
+        finally:
+            self.cancelled.set()
+            await asyncio.gather(thread, return_exceptions=True)
+
+
+class EstimateDiff:
+    """Сопоставление загружаемых позиций сметы с текущими по (category, name, unit)"""
+
+    def __init__(self, rows):
+        self._existing: Dict[EstimateKey, Deque] = defaultdict(deque)
+        # Одинаковые строки сопоставляются по порядку; действующие позиции раньше удаленных
+        for row in sorted(rows, key=lambda r: (r.deleted_at is not None, r.id)):
+            self._existing[(row.category, row.name, row.unit)].append(row)
+        self.inserted = 0
+        self.updated = 0
+        self.restored = 0
+        self.unchanged = 0
+
+    def split(self, items: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Разделить пачку на новые позиции и изменения существующих
+
+        Returns:
+            (значения для INSERT, значения для UPDATE по id)
+        """
+        inserts, updates = [], []
+        for item in items:
+            matches = self._existing.get((item["category"], item["name"], item["unit"]))
+            if not matches:
+                inserts.append(item)
+                continue
+            row = matches.popleft()
+            if row.deleted_at is None and all(getattr(row, field) == item[field] for field in COMPARED_FIELDS):
+                self.unchanged += 1
+                continue
+            if row.deleted_at is not None:
+                self.restored += 1
+            updates.append({"id": row.id, "deleted_at": None, **{field: item[field] for field in COMPARED_FIELDS}})
+        self.inserted += len(inserts)
+        self.updated += len(updates)
+        return inserts, updates
+
+    def removed_ids(self) -> List[int]:
+        """Действующие позиции, которых нет в новой смете"""
+        return [row.id for rows in self._existing.values() for row in rows if row.deleted_at is None]
+
+
 class EstimateService:
     @staticmethod
     async def parse_and_save_excel(
         session: AsyncSession,
         object_id: int,
         file: UploadFile,
-        commit: bool = True
+        commit: bool = True,
+        chunk_size: Optional[int] = None,
+        progress: Optional[ProgressCallback] = None
     ):
         """
-        Парсинг Excel сметы и сохранение позиций.
+        Парсинг Excel сметы и сохранение позиций
+
+        Существующая смета обновляется по разнице (см. EstimateDiff);
+        пустой файл текущую смету не меняет.
+
+        Args:
+            chunk_size: позиций в одной пачке записи (по умолчанию из настроек)
+            progress: вызывается после каждой записанной пачки
+                с (прочитано строк, обработано позиций)
         """
-        
+        chunk_size = chunk_size or settings.estimate_import_chunk_size
+
         # 1. Проверка объекта
         obj = await session.get(CostObject, object_id)
         if not obj:
             raise HTTPException(status_code=404, detail="Объект не найден")
-            
-        # 2. Удаление старых позиций
-        await session.execute(delete(EstimateItem).where(EstimateItem.cost_object_id == object_id))
-        
-        # 3. Чтение файла
-        try:
-            logger.info(f"Начинаю чтение файла сметы: {file.filename}")
-            content = await file.read()
-            logger.info(f"Прочитано байт: {len(content)}")
-            
-            # Используем BytesIO для гарантии бинарного режима
-            wb = openpyxl.load_workbook(io.BytesIO(content), data_only=True)
-            ws = wb.active
-        except Exception as e:
-            logger.error(f"Ошибка загрузки Excel: {e}", exc_info=True)
-            raise HTTPException(status_code=400, detail=f"Ошибка чтения Excel: {str(e)}")
-            
-        items_to_create = []
-        current_category = "Общее"
+
+        # 2. Текущие позиции (включая удаленные - их можно восстановить)
+        existing = await session.execute(
+            select(
+                EstimateItem.id, EstimateItem.category, EstimateItem.name, EstimateItem.unit,
+                EstimateItem.quantity, EstimateItem.price, EstimateItem.total_amount,
+                EstimateItem.deleted_at
+            ).where(EstimateItem.cost_object_id == object_id)
+        )
+        diff = EstimateDiff(existing.all())
+
+        # 3. Потоковое чтение и запись пачками
+        logger.info(f"Начинаю чтение файла сметы: {file.filename}")
+        file.file.seek(0)
+        parser = _ParseThread(file.file, chunk_size)
+        items_count = 0
         total_estimate_sum = 0.0
-        
-        # Пропускаем заголовок (обычно 1 строка, но ищем начало данных)
-        # Предполагаем, что данные начинаются, когда в колонке A есть число, 
-        # или в колонке B есть текст (категория)
-        
-        start_row = 2 # Обычно 1-я строка шапка
-        
-        for row in ws.iter_rows(min_row=start_row, values_only=True):
-            # row index is 0-based tuple: A=0, B=1, C=2, D=3, E=4, F=5
-            col_a = row[0] # №
-            col_b = row[1] # Наименование / Категория
-            
-            if not col_b: 
-                continue # Пустая строка
-                
-            # Improved logic:
-            # Check if it looks like an item: has Name (B) and at least Unit (C) or Qty (D) or Price (E)
-            # Row index matches: A=0, B=1, C=2, D=3, E=4, F=5
-            
-            name = str(col_b).strip() if col_b else ""
-            
-            # Helper to safe float
-            def safe_float(val):
-                try:
-                    if not val: return 0.0
-                    return float(val)
-                except:
-                    return 0.0
-
-            is_item = False
-            
-            # Strategy 1: Column A is a digit (classic)
-            if col_a and str(col_a).strip().replace('.', '').isdigit():
-                is_item = True
-            
-            # Strategy 2: Heuristic - if it has unit and price/qty, it's likely an item, even without Col A
-            # Check cols C (unit), D (qty), E (price)
-            val_c = row[2]
-            val_d = row[3]
-            val_e = row[4]
-            
-            if not is_item and name:
-                 # If we have a unit (e.g. "шт", "м2") or generic numeric data in D/E
-                 has_unit = val_c and len(str(val_c)) < 10 # Unit is usually short
-                 has_qty = isinstance(val_d, (int, float)) or (isinstance(val_d, str) and val_d.strip().replace('.', '').isdigit())
-                 
-                 if has_unit or has_qty:
-                     is_item = True
-
-            if is_item:
-                # It is an item
-                try:
-                    unit = str(val_c).strip() if val_c else "шт"
-                    qty = safe_float(val_d)
-                    price = safe_float(val_e)
-                    total = safe_float(row[5])
-                    
-                    if total == 0 and qty > 0 and price > 0:
-                        total = qty * price
-                    
-                    item = EstimateItem(
-                        cost_object_id=object_id,
-                        category=current_category,
-                        name=name,
-                        unit=unit,
-                        quantity=qty,
-                        price=price,
-                        total_amount=total
-                    )
-                    items_to_create.append(item)
-                    total_estimate_sum += total
-                except Exception as e:
-                    logger.warning(f"Ошибка парсинга строки {row}: {e}")
-            else:
-                # It might be a category
-                # If it has a name but no valid item data, treat as category
-                items_in_row = [row[3], row[4], row[5]] # qty, price, sum
-                is_data_empty = all(not x for x in items_in_row)
-                
-                if name and len(name) > 2 and is_data_empty:
-                     current_category = name
-                     
-        # 4. Сохранение
-        if items_to_create:
-            session.add_all(items_to_create)
-            
-            # Обновляем общую сумму материалов в объекте
-            obj.material_amount = total_estimate_sum
-            
-            if commit:
-                await session.commit()
-            else:
-                await session.flush() # Ensure ID is available if needed, but don't commit transaction
-            return {
-                "status": "success", 
-                "items_count": len(items_to_create), 
-                "total_amount": total_estimate_sum
-            }
-        else:
+        async with aclosing(parser.chunks()) as chunks:
+            async for chunk in chunks:
+                total_estimate_sum += sum(item["total_amount"] for item in chunk)
+                inserts, updates = diff.split(chunk)
+                if inserts:
+                    for item in inserts:
+                        item["cost_object_id"] = object_id
+                    await session.execute(insert(EstimateItem), inserts)
+                if updates:
+                    await session.execute(update(EstimateItem), updates)
+                items_count += len(chunk)
+                if progress:
+                    progress(parser.rows_read, items_count)
+
+        if not items_count:
             return {"status": "empty", "message": "Не найдено позиций в файле"}
 
+        # 4. Мягкое удаление позиций, которых нет в новой смете
+        removed = diff.removed_ids()
+        for start in range(0, len(removed), chunk_size):
+            await session.execute(
+                update(EstimateItem)
+                .where(EstimateItem.id.in_(removed[start:start + chunk_size]))
+                .values(deleted_at=func.now())
+                .execution_options(synchronize_session=False)
+            )
+        logger.info(
+            f"Смета {file.filename}: строк {parser.rows_read}, позиций {items_count} "
+            f"(новых {diff.inserted}, изменено {diff.updated}, удалено {len(removed)})"
+        )
+
+        # Индекс нечеткого поиска строится по id и названиям действующих позиций:
+        # изменение количеств и цен его не затрагивает. Сброс - после commit
+        # (при commit=False его выполняет вызывающий)
+        if diff.inserted or diff.restored or removed:
+            invalidate_estimate_index_on_commit(session, object_id)
+
+        # Обновляем общую сумму материалов в объекте
+        obj.material_amount = total_estimate_sum
+        if commit:
+            await session.commit()
+        else:
+            await session.flush()
+        return {
+            "status": "success",
+            "items_count": items_count,
+            "total_amount": total_estimate_sum,
+            "inserted": diff.inserted,
+            "updated": diff.updated,
+            "unchanged": diff.unchanged,
+            "deleted": len(removed)
+        }
+
     @staticmethod
     async def get_estimate_items(session: AsyncSession, object_id: int):
         """
@@ -156,7 +349,7 @@ class EstimateService:
         
         result = await session.execute(
             select(EstimateItem)
-            .where(EstimateItem.cost_object_id == object_id)
-            .order_by(EstimateItem.id) 
+            .where(EstimateItem.cost_object_id == object_id, EstimateItem.deleted_at.is_(None))
+            .order_by(EstimateItem.id)
         )
         return result.scalars().all()
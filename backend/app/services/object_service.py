@@ -1,11 +1,14 @@
 """
 Сервис для управления объектами учёта
 """
-from sqlalchemy import select, update, and_
+from sqlalchemy import select, update, and_, or_, func, case
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import Optional, List
+from typing import Optional, List, Tuple
 
-from app.models import CostObject, MaterialCost, User
+from app.models import (
+    CostObject, MaterialCost, User, CostDailyRollup,
+    LaborCost, DeliveryCost, OtherCost, EquipmentCost, EquipmentOrder
+)
 from app.core.models_base import ObjectStatus, UPDStatus
 from app.services.audit_service import AuditService
 
@@ -119,6 +122,153 @@ class ObjectService:
         result = await session.execute(query)
         return result.scalars().all()
     
+    # Допустимые поля сортировки таблицы объектов
+    OBJECTS_SORT_FIELDS = ("created_at", "name", "code", "fact_total", "margin", "margin_pct")
+
+    @staticmethod
+    async def get_objects_with_stats(
+        session: AsyncSession,
+        include_archived: bool = False,
+        status: Optional[ObjectStatus] = None,
+        foreman_id: Optional[int] = None,
+        search: Optional[str] = None,
+        sort_by: str = "created_at",
+        sort_order: str = "desc",
+        limit: Optional[int] = None,
+        offset: int = 0
+    ) -> Tuple[list, int]:
+        """
+        Список объектов с план/факт показателями одним запросом
+
+        Факт по материалам (УПД), РТБ (табели из cost_daily_rollup + разовые
+        LaborCost), доставке/спецтехнике (DeliveryCost), технике по заявкам
+        (EquipmentCost) и иным затратам считается сгруппированными подзапросами, присоединенными к объектам
+        через LEFT JOIN. Сортировка (в т.ч. по марже) и пагинация выполняются в БД.
+
+        Args:
+            include_archived: Включать ли архивные объекты
+            status: Фильтр по статусу
+            foreman_id: Показать только объекты бригадира
+            search: Поиск по названию, шифру или заказчику
+            sort_by: Поле сортировки (см. OBJECTS_SORT_FIELDS)
+            sort_order: asc или desc
+            limit: Размер страницы (None - без ограничения)
+            offset: Смещение
+
+        Returns:
+            (строки с CostObject и фактами, общее количество объектов по фильтру)
+
+        Raises:
+            ValueError: Поле сортировки не из OBJECTS_SORT_FIELDS
+        """
+        if sort_by not in ObjectService.OBJECTS_SORT_FIELDS:
+            raise ValueError(f"Недопустимое поле сортировки: {sort_by}")
+
+        def per_object_sum(column, object_column, *criteria):
+            return (
+                select(object_column.label("cost_object_id"), func.sum(column).label("amount"))
+                .where(*criteria)
+                .group_by(object_column)
+                .subquery()
+            )
+
+        materials_sq = per_object_sum(MaterialCost.total_amount, MaterialCost.cost_object_id)
+        timesheet_labor_sq = per_object_sum(
+            CostDailyRollup.amount, CostDailyRollup.cost_object_id, CostDailyRollup.type == "labor"
+        )
+        extra_labor_sq = per_object_sum(LaborCost.amount, LaborCost.cost_object_id)
+        delivery_sq = per_object_sum(DeliveryCost.amount, DeliveryCost.cost_object_id)
+        other_sq = per_object_sum(OtherCost.amount, OtherCost.cost_object_id)
+        # Затраты на технику привязаны к объекту через заявку
+        equipment_sq = (
+            select(EquipmentOrder.cost_object_id.label("cost_object_id"), func.sum(EquipmentCost.total_amount).label("amount"))
+            .join(EquipmentOrder, EquipmentOrder.id == EquipmentCost.equipment_order_id)
+            .group_by(EquipmentOrder.cost_object_id)
+            .subquery()
+        )
+
+        fact_materials = func.coalesce(materials_sq.c.amount, 0)
+        fact_labor = func.coalesce(timesheet_labor_sq.c.amount, 0) + func.coalesce(extra_labor_sq.c.amount, 0)
+        fact_delivery = func.coalesce(delivery_sq.c.amount, 0)
+        fact_other = func.coalesce(other_sq.c.amount, 0)
+        fact_equipment = func.coalesce(equipment_sq.c.amount, 0)
+        fact_total = fact_materials + fact_labor + fact_delivery + fact_other + fact_equipment
+
+        plan_total = func.coalesce(
+            func.nullif(CostObject.contract_amount, 0),
+            func.coalesce(CostObject.material_amount, 0) + func.coalesce(CostObject.labor_amount, 0)
+        )
+        margin = plan_total - fact_total
+        margin_pct = case((plan_total > 0, margin * 100.0 / plan_total), else_=0)
+
+        conditions = []
+
+        # По умолчанию скрываем архивные
+        if not include_archived:
+            conditions.append(CostObject.status != ObjectStatus.ARCHIVED.value)
+
+        # Фильтр по статусу
+        if status:
+            conditions.append(CostObject.status == status.value)
+
+        # Поиск
+        if search:
+            pattern = f"%{search.strip()}%"
+            conditions.append(or_(
+                CostObject.name.ilike(pattern),
+                CostObject.code.ilike(pattern),
+                CostObject.customer_name.ilike(pattern)
+            ))
+
+        def apply_filters(query):
+            if foreman_id:
+                from app.models import object_foremen
+                query = query.join(object_foremen, object_foremen.c.object_id == CostObject.id).where(
+                    object_foremen.c.foreman_id == foreman_id
+                )
+            if conditions:
+                query = query.where(and_(*conditions))
+            return query
+
+        query = select(
+            CostObject,
+            fact_materials.label("fact_materials"),
+            fact_labor.label("fact_labor"),
+            fact_delivery.label("fact_delivery"),
+            fact_other.label("fact_other"),
+            fact_equipment.label("fact_equipment")
+        )
+        for subquery in (materials_sq, timesheet_labor_sq, extra_labor_sq, delivery_sq, other_sq, equipment_sq):
+            query = query.outerjoin(subquery, subquery.c.cost_object_id == CostObject.id)
+        query = apply_filters(query)
+
+        sort_columns = {
+            "created_at": CostObject.created_at,
+            "name": CostObject.name,
+            "code": CostObject.code,
+            "fact_total": fact_total,
+            "margin": margin,
+            "margin_pct": margin_pct,
+        }
+        sort_column = sort_columns[sort_by]
+        sort_column = sort_column.asc() if sort_order == "asc" else sort_column.desc()
+        query = query.order_by(sort_column, CostObject.id.desc())
+
+        if limit is not None:
+            query = query.limit(limit).offset(offset)
+
+        result = await session.execute(query)
+        rows = result.all()
+
+        # Общее количество нужно только при пагинации
+        if limit is None:
+            total = len(rows)
+        else:
+            count_query = apply_filters(select(func.count(CostObject.id)))
+            total = (await session.execute(count_query)).scalar_one()
+
+        return rows, total
+
     @staticmethod
     async def calculate_spent_budget(
         session: AsyncSession,
@@ -132,7 +282,7 @@ class ObjectService:
         - Техника (из EquipmentCost)
         - ФОТ (из TimeSheet)
         """
-        from app.models import MaterialCost, EquipmentCost
+        from app.models import MaterialCost, EquipmentCost, EquipmentOrder
         from sqlalchemy import func, select
         
         # Материалы
@@ -143,8 +293,10 @@ class ObjectService:
         materials_total = materials_result.scalar() or 0.0
         
         # Техника
-        equipment_query = select(func.sum(EquipmentCost.total_amount)).where(
-            EquipmentCost.cost_object_id == object_id
+        equipment_query = select(func.sum(EquipmentCost.total_amount)).join(
+            EquipmentOrder, EquipmentOrder.id == EquipmentCost.equipment_order_id
+        ).where(
+            EquipmentOrder.cost_object_id == object_id
         )
         equipment_result = await session.execute(equipment_query)
         equipment_total = equipment_result.scalar() or 0.0
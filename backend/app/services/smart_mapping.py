@@ -1,10 +1,13 @@
 import logging
 import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
 from decimal import Decimal
 from typing import Optional, List, Tuple, Dict, Any
-from sqlalchemy import select, func, desc, or_
+from sqlalchemy import event, select, func, desc, or_
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import Session
 
 from app.models import EstimateItem, CostObject
 from app.materials.models_mapping import ProductAlias
@@ -18,8 +21,74 @@ except ImportError:
     import difflib
     HAS_RAPIDFUZZ = False
 
+# Матричный поиск process.cdist требует numpy
+try:
+    import numpy
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
 logger = logging.getLogger(__name__)
 
+# Кэш индексов смет: сколько объектов держим и сколько секунд индекс считается свежим.
+# Кэш свой у каждого процесса: сброс виден только процессу, изменившему смету, а
+# изменения из других воркеров uvicorn и исполнителя задач (run_job_worker)
+# становятся видны по истечении TTL
+ESTIMATE_INDEX_MAX_OBJECTS = 64
+ESTIMATE_INDEX_TTL = 300.0
+
+_SESSION_FLAG = "estimate_index_invalidate"
+
+
+@dataclass
+class EstimateIndex:
+    """Предобработанные позиции сметы одного объекта для нечеткого поиска"""
+    names: List[str]
+    ids_by_name: Dict[str, int]
+    built_at: float
+
+
+_estimate_indexes: "OrderedDict[int, EstimateIndex]" = OrderedDict()
+# Счетчик сбросов: индекс, построенный во время сброса, в кэш не попадает
+_invalidations = 0
+
+
+def invalidate_estimate_index(cost_object_id: Optional[int] = None) -> None:
+    """
+    Сброс кэша индекса сметы
+
+    Args:
+        cost_object_id: объект, смета которого изменилась (None - все объекты)
+    """
+    global _invalidations
+    _invalidations += 1
+    if cost_object_id is None:
+        _estimate_indexes.clear()
+    else:
+        _estimate_indexes.pop(cost_object_id, None)
+
+
+def invalidate_estimate_index_on_commit(db: AsyncSession, cost_object_id: int) -> None:
+    """
+    Сбросить индекс сметы после commit сессии
+
+    До commit параллельный поиск построил бы индекс по старым позициям
+    (включая удаляемые) и закэшировал его на ESTIMATE_INDEX_TTL.
+    """
+    db.sync_session.info.setdefault(_SESSION_FLAG, set()).add(cost_object_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session: Session) -> None:
+    for cost_object_id in session.info.pop(_SESSION_FLAG, ()):
+        invalidate_estimate_index(cost_object_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_after_rollback(session: Session) -> None:
+    session.info.pop(_SESSION_FLAG, None)
+
+
 class SmartMappingService:
     """
     Сервис для умного маппинга товаров из УПД в позиции сметы.
@@ -39,16 +108,34 @@ class SmartMappingService:
         min_confidence: float = 70.0
     ) -> Optional[Dict[str, Any]]:
         """
-        Поиск лучшего соответствия для товара из УПД.
+        Поиск лучшего соответствия для одного товара (см. find_best_matches)
+        """
+        matches = await self.find_best_matches(
+            [product_name], supplier_inn, cost_object_id, min_confidence
+        )
+        return matches[0]
+
+    async def find_best_matches(
+        self,
+        product_names: List[str],
+        supplier_inn: Optional[str] = None,
+        cost_object_id: Optional[int] = None,
+        min_confidence: float = 70.0
+    ) -> List[Optional[Dict[str, Any]]]:
+        """
+        Поиск лучших соответствий для всех товаров из УПД.
+        
+        Товары без алиаса сопоставляются со сметой объекта одним матричным
+        поиском по закэшированному индексу (см. EstimateIndex).
         
         Args:
-            product_name: Название товара из УПД
+            product_names: Названия товаров из УПД
             supplier_inn: ИНН поставщика (для контекста)
             cost_object_id: ID объекта (для сужения поиска по смете)
             min_confidence: Минимальный порог уверенности (0-100)
             
         Returns:
-            Словарь с результатом или None:
+            Список той же длины, для каждого товара словарь с результатом или None:
             {
                 "estimate_item_id": int,
                 "confidence": float,
@@ -56,64 +143,43 @@ class SmartMappingService:
                 "matched_name": str
             }
         """
-        product_name_clean = product_name.strip()
-        
-        # 1. Поиск точного совпадения в ProductAlias
-        # Сначала с учетом ИНН поставщика
-        if supplier_inn:
-            alias = await self._find_alias(product_name_clean, supplier_inn)
-            if alias and alias.estimate_item_id:
-                obj_id, obj_name = await self._get_item_details(alias.estimate_item_id)
-                return {
-                    "estimate_item_id": alias.estimate_item_id,
-                    "suggested_cost_object_id": obj_id,
-                    "suggested_cost_object_name": obj_name,
-                    "confidence": 100.0,
-                    "source": "alias_exact_supplier",
-                    "matched_name": alias.canonical_name
-                }
+        results: List[Optional[Dict[str, Any]]] = [None] * len(product_names)
+        pending: List[int] = []
         
-        # Затем без учета ИНН (глобальный алиас)
-        alias = await self._find_alias(product_name_clean, None)
-        if alias and alias.estimate_item_id:
-            obj_id, obj_name = await self._get_item_details(alias.estimate_item_id)
-            return {
-                "estimate_item_id": alias.estimate_item_id,
-                "suggested_cost_object_id": obj_id,
-                "suggested_cost_object_name": obj_name,
-                "confidence": 95.0, # Чуть меньше 100, т.к. другой поставщик
-                "source": "alias_exact_global",
-                "matched_name": alias.canonical_name
-            }
+        # 1. Точные совпадения в ProductAlias для всех товаров одним запросом
+        aliases = await self.resolve_aliases(product_names, supplier_inn)
+        for idx, product_name in enumerate(product_names):
+            match = aliases.get(product_name.strip())
+            if match:
+                results[idx] = dict(match)
+            else:
+                pending.append(idx)
 
         # Если объект не указан, мы не можем искать по смете эффективно
-        if not cost_object_id:
-            return None
+        if not cost_object_id or not pending:
+            return results
 
-        # 2. Получаем все позиции сметы для объекта
+        # 2. Индекс позиций сметы объекта (из кэша или одним запросом)
+        index = await self._get_estimate_index(cost_object_id)
+        if not index.names:
+            return results
         # Получаем имя объекта для ответа
         cost_object_name = await self._get_object_name(cost_object_id)
-        estimate_items = await self._get_estimate_items(cost_object_id)
-        if not estimate_items:
-            return None
-            
-        estimate_names = [item.name for item in estimate_items]
-        estimate_map = {item.name: item.id for item in estimate_items}
-        
-        # 3. Нечеткий поиск
-        match_name, score = self._fuzzy_search(product_name_clean, estimate_names)
         
-        if score >= min_confidence:
-            return {
-                "estimate_item_id": estimate_map[match_name],
-                "suggested_cost_object_id": cost_object_id,
-                "suggested_cost_object_name": cost_object_name,
-                "confidence": float(score),
-                "source": "estimate_fuzzy",
-                "matched_name": match_name
-            }
+        # 3. Нечеткий поиск сразу для всех товаров
+        queries = [product_names[idx].strip() for idx in pending]
+        for idx, (match_name, score) in zip(pending, self._fuzzy_search_many(queries, index)):
+            if score >= min_confidence:
+                results[idx] = {
+                    "estimate_item_id": index.ids_by_name[match_name],
+                    "suggested_cost_object_id": cost_object_id,
+                    "suggested_cost_object_name": cost_object_name,
+                    "confidence": float(score),
+                    "source": "estimate_fuzzy",
+                    "matched_name": match_name
+                }
             
-        return None
+        return results
 
     async def learn_mapping(
         self,
@@ -160,34 +226,145 @@ class SmartMappingService:
             
         await self.db.commit()
         await self.db.refresh(alias)
+        
+        # Подтвержденная позиция могла прийти из свежезагруженной сметы
+        if est_item:
+            invalidate_estimate_index(est_item.cost_object_id)
         return alias
 
-    async def _find_alias(self, name: str, inn: Optional[str]) -> Optional[ProductAlias]:
-        query = select(ProductAlias).where(
-            ProductAlias.supplier_name == name,
-            ProductAlias.supplier_inn == inn
+    async def resolve_aliases(
+        self,
+        product_names: List[str],
+        supplier_inn: Optional[str] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Точные совпадения алиасов для списка товаров одним запросом.
+        
+        Алиас поставщика (по ИНН) важнее глобального алиаса (без ИНН).
+        Учитываются только алиасы с привязкой к позиции сметы.
+        
+        Returns:
+            {очищенное название товара: результат в формате find_best_matches}
+        """
+        names = {name.strip() for name in product_names}
+        if not names:
+            return {}
+
+        inn_filter = ProductAlias.supplier_inn.is_(None)
+        if supplier_inn:
+            inn_filter = or_(ProductAlias.supplier_inn == supplier_inn, inn_filter)
+
+        query = (
+            select(
+                ProductAlias.supplier_name,
+                ProductAlias.supplier_inn,
+                ProductAlias.canonical_name,
+                ProductAlias.estimate_item_id,
+                EstimateItem.cost_object_id,
+                CostObject.name.label("cost_object_name"),
+            )
+            .outerjoin(EstimateItem, EstimateItem.id == ProductAlias.estimate_item_id)
+            .outerjoin(CostObject, CostObject.id == EstimateItem.cost_object_id)
+            .where(
+                ProductAlias.supplier_name.in_(names),
+                ProductAlias.estimate_item_id.isnot(None),
+                # Алиас на удаленную из сметы позицию не применяется, но сохраняется
+                EstimateItem.deleted_at.is_(None),
+                inn_filter
+            )
+            .order_by(ProductAlias.id)
         )
-        result = await self.db.execute(query)
-        return result.scalar_one_or_none()
+        rows = (await self.db.execute(query)).all()
 
-    async def _get_item_details(self, estimate_item_id: int) -> Tuple[Optional[int], Optional[str]]:
-        """Получение ID и имени объекта для позиции сметы"""
-        stmt = select(EstimateItem).options(selectinload(EstimateItem.cost_object)).where(EstimateItem.id == estimate_item_id)
-        result = await self.db.execute(stmt)
-        item = result.scalar_one_or_none()
-        if item and item.cost_object:
-            return item.cost_object_id, item.cost_object.name
-        return None, None
+        supplier_hits: Dict[str, Any] = {}
+        global_hits: Dict[str, Any] = {}
+        for row in rows:
+            hits = global_hits if row.supplier_inn is None else supplier_hits
+            hits.setdefault(row.supplier_name, row)
+
+        resolved = {}
+        for name in names:
+            row = supplier_hits.get(name)
+            if row is not None:
+                # Алиас подтвержден для этого поставщика
+                confidence, source = 100.0, "alias_exact_supplier"
+            else:
+                row = global_hits.get(name)
+                if row is None:
+                    continue
+                # Чуть меньше 100, т.к. другой поставщик
+                confidence, source = 95.0, "alias_exact_global"
+
+            has_object = row.cost_object_name is not None
+            resolved[name] = {
+                "estimate_item_id": row.estimate_item_id,
+                "suggested_cost_object_id": row.cost_object_id if has_object else None,
+                "suggested_cost_object_name": row.cost_object_name,
+                "confidence": confidence,
+                "source": source,
+                "matched_name": row.canonical_name
+            }
+        return resolved
 
     async def _get_object_name(self, cost_object_id: int) -> Optional[str]:
         """Получение имени объекта по ID"""
         obj = await self.db.get(CostObject, cost_object_id)
         return obj.name if obj else None
 
-    async def _get_estimate_items(self, cost_object_id: int) -> List[EstimateItem]:
-        query = select(EstimateItem).where(EstimateItem.cost_object_id == cost_object_id)
-        result = await self.db.execute(query)
-        return list(result.scalars().all())
+    async def _get_estimate_index(self, cost_object_id: int) -> EstimateIndex:
+        """Индекс сметы объекта из кэша; при промахе строится одним запросом"""
+        index = _estimate_indexes.get(cost_object_id)
+        if index is not None and time.monotonic() - index.built_at < ESTIMATE_INDEX_TTL:
+            _estimate_indexes.move_to_end(cost_object_id)
+            return index
+
+        invalidations = _invalidations
+        result = await self.db.execute(
+            select(EstimateItem.id, EstimateItem.name)
+            .where(EstimateItem.cost_object_id == cost_object_id, EstimateItem.deleted_at.is_(None))
+            .order_by(EstimateItem.id)
+        )
+        rows = result.all()
+        names = [row.name for row in rows]
+        index = EstimateIndex(
+            names=names,
+            # При совпадающих названиях берется последняя позиция
+            ids_by_name={row.name: row.id for row in rows},
+            built_at=time.monotonic()
+        )
+        if invalidations != _invalidations:
+            # Смета изменилась, пока читались позиции - не кэшируем
+            return index
+
+        _estimate_indexes[cost_object_id] = index
+        _estimate_indexes.move_to_end(cost_object_id)
+        while len(_estimate_indexes) > ESTIMATE_INDEX_MAX_OBJECTS:
+            _estimate_indexes.popitem(last=False)
+        return index
+
+    def _fuzzy_search_many(self, queries: List[str], index: EstimateIndex) -> List[Tuple[str, float]]:
+        """
+        Нечеткий поиск для списка товаров по индексу сметы.
+        
+        Возвращает [(лучшее_совпадение, счет_0_100)] - то же, что _fuzzy_search
+        для каждого товара. С rapidfuzz и numpy считается одна матрица
+        process.cdist тем же scorer, что и _fuzzy_search.
+        """
+        if not HAS_RAPIDFUZZ or not HAS_NUMPY:
+            return [self._fuzzy_search(query, index.names) for query in queries]
+
+        # Токены разбивает сам token_sort_ratio (как в extractOne), поэтому счет
+        # совпадает с построчным поиском и для названий с NBSP из Excel;
+        # argmax, как и extractOne, берет первую позицию с максимальным счетом
+        scores = process.cdist(
+            queries, index.names,
+            scorer=fuzz.token_sort_ratio, dtype=numpy.float64, workers=-1
+        )
+        best = scores.argmax(axis=1)
+        return [
+            (index.names[position], float(scores[row, position]))
+            for row, position in enumerate(best)
+        ]
 
     def _fuzzy_search(self, query: str, choices: List[str]) -> Tuple[str, float]:
         """
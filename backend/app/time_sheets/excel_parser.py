@@ -1,10 +1,18 @@
 """Парсер Excel файлов табелей РТБ"""
+import asyncio
+import io
 import logging
 from datetime import datetime, date
 from decimal import Decimal
-from typing import Optional
+from typing import BinaryIO, Iterable, Iterator, Optional, Tuple, Union
 from openpyxl import load_workbook
-from openpyxl.worksheet.worksheet import Worksheet
+
+# Файл табеля: путь, содержимое или открытый файл (UploadFile.file)
+ExcelSource = Union[str, bytes, BinaryIO]
+
+# Колонки табеля: ФИО, Дата, Объект, Часы
+COLUMNS_COUNT = 4
+DATA_START_ROW = 6
 
 logger = logging.getLogger(__name__)
 
@@ -25,12 +33,19 @@ class TimeSheetExcelParser:
     - Строка 4: Пустая
     - Строка 5: Заголовки столбцов
     - Строки 6+: Данные (ФИО, Дата, Объект, Часы)
+    
+    Книга открывается в режиме read_only и читается одним проходом по
+    строкам, без временного файла: источником может быть содержимое
+    загрузки. parse() блокирующий - из async кода вызывать parse_async().
     """
     
-    def __init__(self, file_path: str):
-        self.file_path = file_path
+    def __init__(self, source: ExcelSource):
+        self.source = io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
         self.workbook = None
-        self.worksheet: Optional[Worksheet] = None
+    
+    async def parse_async(self) -> dict:
+        """parse() в пуле потоков, не блокируя event loop"""
+        return await asyncio.to_thread(self.parse)
     
     def parse(self) -> dict:
         """
@@ -52,15 +67,21 @@ class TimeSheetExcelParser:
             }
         """
         try:
-            self.workbook = load_workbook(self.file_path, data_only=True)
-            self.worksheet = self.workbook.active
-            
-            # Извлечение метаданных
-            brigade_name = self._extract_brigade_name()
-            period_start, period_end = self._extract_period()
+            if hasattr(self.source, 'seek'):
+                self.source.seek(0)
+            self.workbook = load_workbook(self.source, read_only=True, data_only=True)
+            worksheet = self.workbook.active
+            # Размеры листа из файла бывают неверными - читаем все строки
+            worksheet.reset_dimensions()
+            rows = enumerate(worksheet.iter_rows(max_col=COLUMNS_COUNT, values_only=True), start=1)
+            
+            # Извлечение метаданных (строки 1-5)
+            header = {row_num: values for row_num, values in _take_until(rows, DATA_START_ROW - 1)}
+            brigade_name = self._extract_brigade_name(header.get(2, (None,))[0])
+            period_start, period_end = self._extract_period(header.get(3, (None,))[0])
             
             # Извлечение строк данных
-            items = self._extract_items()
+            items = self._extract_items(rows)
             
             if not items:
                 raise TimeSheetExcelParseError("Не найдено ни одной строки с данными")
@@ -80,10 +101,8 @@ class TimeSheetExcelParser:
             if self.workbook:
                 self.workbook.close()
     
-    def _extract_brigade_name(self) -> str:
+    def _extract_brigade_name(self, cell_value) -> str:
         """Извлечение названия бригады из строки 2"""
-        cell_value = self.worksheet.cell(row=2, column=1).value
-        
         if not cell_value:
             raise TimeSheetExcelParseError("Не найдено название бригады (строка 2)")
         
@@ -98,10 +117,8 @@ class TimeSheetExcelParser:
         
         return brigade_name
     
-    def _extract_period(self) -> tuple[date, date]:
+    def _extract_period(self, cell_value) -> tuple[date, date]:
         """Извлечение периода из строки 3"""
-        cell_value = self.worksheet.cell(row=3, column=1).value
-        
         if not cell_value:
             raise TimeSheetExcelParseError("Не найден период (строка 3)")
         
@@ -128,26 +145,22 @@ class TimeSheetExcelParser:
         except Exception as e:
             raise TimeSheetExcelParseError(f"Ошибка парсинга периода: {e}")
     
-    def _extract_items(self) -> list[dict]:
+    def _extract_items(self, rows: Iterable[Tuple[int, tuple]]) -> list[dict]:
         """Извлечение строк данных (начиная с 6-й строки)"""
         items = []
         
-        # Начинаем со строки 6 (после заголовков)
-        row_num = 6
         max_empty_rows = 5  # Остановиться после 5 пустых строк подряд
         empty_count = 0
         
-        while empty_count < max_empty_rows:
-            # Чтение ячеек
-            member_name = self.worksheet.cell(row=row_num, column=1).value
-            date_value = self.worksheet.cell(row=row_num, column=2).value
-            object_name = self.worksheet.cell(row=row_num, column=3).value
-            hours_value = self.worksheet.cell(row=row_num, column=4).value
+        for row_num, values in rows:
+            # Короткие строки дополняются пустыми ячейками
+            member_name, date_value, object_name, hours_value = (tuple(values) + (None,) * COLUMNS_COUNT)[:COLUMNS_COUNT]
             
             # Проверка на пустую строку
             if not any([member_name, date_value, object_name, hours_value]):
                 empty_count += 1
-                row_num += 1
+                if empty_count >= max_empty_rows:
+                    break
                 continue
             
             # Сброс счётчика пустых строк
@@ -156,17 +169,14 @@ class TimeSheetExcelParser:
             # Валидация обязательных полей
             if not member_name:
                 logger.warning(f"Пропущена строка {row_num}: нет ФИО")
-                row_num += 1
                 continue
             
             if not date_value:
                 logger.warning(f"Пропущена строка {row_num}: нет даты")
-                row_num += 1
                 continue
             
             if not hours_value:
                 logger.warning(f"Пропущена строка {row_num}: нет часов")
-                row_num += 1
                 continue
             
             try:
@@ -194,7 +204,15 @@ class TimeSheetExcelParser:
             
             except Exception as e:
                 logger.warning(f"Ошибка парсинга строки {row_num}: {e}")
-            
-            row_num += 1
         
         return items
+
+
+def _take_until(rows: Iterator[Tuple[int, tuple]], last_row: int) -> Iterator[Tuple[int, tuple]]:
+    """Строки до last_row включительно; следующие остаются в rows"""
+    if last_row < 1:
+        return
+    for row_num, values in rows:
+        yield row_num, values
+        if row_num >= last_row:
+            return
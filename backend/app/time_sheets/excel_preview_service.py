@@ -1,25 +1,60 @@
 """Сервис для предпросмотра Excel загрузок табелей"""
 import uuid
-import tempfile
-import os
+import time
 from datetime import datetime, date
 from typing import Dict, List, Optional, Any
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import func, literal, select, union_all
 
 from app.models import Brigade, BrigadeMember, CostObject
 from app.time_sheets.excel_parser import TimeSheetExcelParser, TimeSheetExcelParseError
+from app.time_sheets.preview_store import PreviewStore, get_preview_store
+
+
+async def resolve_names(
+    db: AsyncSession,
+    brigade_id: int,
+    object_keys: set
+) -> tuple[Dict[str, int], Dict[str, int]]:
+    """
+    ID членов бригады и активных объектов по нормализованным названиям
+    
+    Одним запросом (UNION ALL) только колонки id и название. На
+    PostgreSQL объекты отбираются по названиям из файла; lower() SQLite
+    не меняет регистр кириллицы, поэтому там читаются все активные
+    объекты, а сравнение выполняется в Python.
+    
+    Используется предпросмотром и загрузкой табеля из Excel (excel_upload.py).
+    
+    Returns:
+        ({ФИО в нижнем регистре: member_id}, {название объекта: cost_object_id})
+    """
+    members = select(
+        literal('member').label('kind'), BrigadeMember.id, BrigadeMember.full_name.label('name')
+    ).where(BrigadeMember.brigade_id == brigade_id)
+    
+    objects = select(
+        literal('object').label('kind'), CostObject.id, CostObject.name.label('name')
+    ).where(CostObject.is_active == True)
+    if db.get_bind().dialect.name == 'postgresql':
+        objects = objects.where(func.lower(func.trim(CostObject.name)).in_(list(object_keys)))
+    
+    member_map: Dict[str, int] = {}
+    object_map: Dict[str, int] = {}
+    result = await db.execute(union_all(members, objects))
+    for row in result:
+        target = member_map if row.kind == 'member' else object_map
+        target[row.name.strip().lower()] = row.id
+    return member_map, object_map
 
 
 class ExcelPreviewService:
     """Сервис для работы с предпросмотром Excel загрузок"""
     
-    # Временное хранилище preview данных (в памяти)
-    # В продакшене лучше использовать Redis
-    _preview_storage: Dict[str, Dict[str, Any]] = {}
-    
-    def __init__(self, db: AsyncSession):
+    def __init__(self, db: AsyncSession, store: Optional[PreviewStore] = None):
         self.db = db
+        # Общее для воркеров хранилище preview (см. preview_store.py)
+        self.store = store or get_preview_store()
     
     async def create_preview(
         self,
@@ -39,61 +74,48 @@ class ExcelPreviewService:
             dict с данными preview и уникальным ID
             
         Raises:
-            ValueError: если файл не валиден
+            ValueError: если файл не валиден или preview слишком большой
         """
-        # Сохранение во временный файл
-        temp_file_path = None
+        # Проверка бригады
+        brigade = await self.db.get(Brigade, brigade_id)
+        if not brigade:
+            raise ValueError(f"Бригада {brigade_id} не найдена")
+        
+        # Парсинг Excel из памяти в пуле потоков
         try:
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as temp_file:
-                temp_file.write(file_content)
-                temp_file_path = temp_file.name
-            
-            # Парсинг Excel
-            try:
-                parser = TimeSheetExcelParser(temp_file_path)
-                parsed_data = parser.parse()
-            except TimeSheetExcelParseError as e:
-                raise ValueError(f"Ошибка парсинга Excel: {str(e)}")
-            
-            # Проверка бригады
-            brigade = await self.db.get(Brigade, brigade_id)
-            if not brigade:
-                raise ValueError(f"Бригада {brigade_id} не найдена")
-            
-            # Валидация и обогащение данных
-            validated_items = await self._validate_and_enrich(
-                parsed_data['items'],
-                brigade_id
-            )
-            
-            # Подсчёт статистики
-            stats = self._calculate_stats(validated_items)
-            
-            # Генерация уникального ID для preview
-            preview_id = str(uuid.uuid4())
-            
-            # Сохранение в хранилище
-            preview_data = {
-                'preview_id': preview_id,
-                'user_id': user_id,
-                'brigade_id': brigade_id,
-                'brigade_name': brigade.name,
-                'period_start': parsed_data['period_start'].isoformat(),
-                'period_end': parsed_data['period_end'].isoformat(),
-                'items': validated_items,
-                'stats': stats,
-                'created_at': datetime.now().isoformat(),
-                'expires_at': (datetime.now().timestamp() + 3600)  # Истекает через 1 час
-            }
-            
-            self._preview_storage[preview_id] = preview_data
-            
-            return preview_data
+            parsed_data = await TimeSheetExcelParser(file_content).parse_async()
+        except TimeSheetExcelParseError as e:
+            raise ValueError(f"Ошибка парсинга Excel: {str(e)}")
+        
+        # Валидация и обогащение данных
+        validated_items = await self._validate_and_enrich(
+            parsed_data['items'],
+            brigade_id
+        )
+        
+        # Подсчёт статистики
+        stats = self._calculate_stats(validated_items)
         
-        finally:
-            # Удаление временного файла
-            if temp_file_path and os.path.exists(temp_file_path):
-                os.unlink(temp_file_path)
+        # Генерация уникального ID для preview
+        preview_id = str(uuid.uuid4())
+        
+        # Сохранение в хранилище
+        preview_data = {
+            'preview_id': preview_id,
+            'user_id': user_id,
+            'brigade_id': brigade_id,
+            'brigade_name': brigade.name,
+            'period_start': parsed_data['period_start'].isoformat(),
+            'period_end': parsed_data['period_end'].isoformat(),
+            'items': validated_items,
+            'stats': stats,
+            'created_at': datetime.now().isoformat(),
+            'expires_at': time.time() + self.store.ttl
+        }
+        
+        await self.store.save(preview_id, user_id, preview_data)
+        
+        return preview_data
     
     async def _validate_and_enrich(
         self,
@@ -110,22 +132,13 @@ class ExcelPreviewService:
         Returns:
             список обогащённых и провалидированных строк
         """
-        # Получение членов бригады
-        brigade = await self.db.get(Brigade, brigade_id, options=[])
-        stmt = select(BrigadeMember).where(BrigadeMember.brigade_id == brigade_id)
-        result = await self.db.execute(stmt)
-        members = result.scalars().all()
-        member_map = {m.full_name.strip().lower(): m for m in members}
-        
-        # Получение всех объектов
-        stmt = select(CostObject).where(CostObject.is_active == True)
-        result = await self.db.execute(stmt)
-        objects = result.scalars().all()
-        object_map = {o.name.strip().lower(): o for o in objects}
+        member_map, object_map = await resolve_names(
+            self.db,
+            brigade_id,
+            {item['cost_object_name'].strip().lower() for item in items}
+        )
         
         validated_items = []
-        errors = []
-        warnings = []
         
         for idx, item in enumerate(items, start=1):
             row_data = {
@@ -144,8 +157,7 @@ class ExcelPreviewService:
             # Валидация сотрудника
             member_key = item['member_name'].strip().lower()
             if member_key in member_map:
-                member = member_map[member_key]
-                row_data['member_id'] = member.id
+                row_data['member_id'] = member_map[member_key]
                 row_data['member_verified'] = True
             else:
                 row_data['valid'] = False
@@ -154,8 +166,7 @@ class ExcelPreviewService:
             # Валидация объекта
             object_key = item['cost_object_name'].strip().lower()
             if object_key in object_map:
-                obj = object_map[object_key]
-                row_data['cost_object_id'] = obj.id
+                row_data['cost_object_id'] = object_map[object_key]
                 row_data['cost_object_verified'] = True
             else:
                 row_data['valid'] = False
@@ -207,7 +218,7 @@ class ExcelPreviewService:
             'has_warnings': overtime_cases > 0
         }
     
-    def get_preview(self, preview_id: str, user_id: int) -> Optional[Dict]:
+    async def get_preview(self, preview_id: str, user_id: int) -> Optional[Dict]:
         """
         Получение preview по ID
         
@@ -218,36 +229,22 @@ class ExcelPreviewService:
         Returns:
             данные preview или None
         """
-        preview_data = self._preview_storage.get(preview_id)
+        # Истекшие preview хранилище не возвращает
+        preview_data = await self.store.load(preview_id)
         
         if not preview_data:
             return None
         
-        # Проверка истечения времени
-        if datetime.now().timestamp() > preview_data['expires_at']:
-            self.delete_preview(preview_id)
-            return None
-        
         # Проверка прав доступа
         if preview_data['user_id'] != user_id:
             return None
         
         return preview_data
     
-    def delete_preview(self, preview_id: str) -> bool:
+    async def delete_preview(self, preview_id: str) -> bool:
         """Удаление preview из хранилища"""
-        if preview_id in self._preview_storage:
-            del self._preview_storage[preview_id]
-            return True
-        return False
+        return await self.store.delete(preview_id)
     
-    def cleanup_expired(self):
-        """Очистка истекших preview (вызывается периодически)"""
-        now = datetime.now().timestamp()
-        expired = [
-            pid for pid, data in self._preview_storage.items()
-            if data['expires_at'] < now
-        ]
-        for pid in expired:
-            del self._preview_storage[pid]
-        return len(expired)
+    async def cleanup_expired(self) -> int:
+        """Очистка истекших preview (хранилище также чистит их само)"""
+        return await self.store.cleanup()
@@ -1,6 +1,5 @@
 """Endpoint для загрузки табелей из Excel"""
-import tempfile
-import os
+import logging
 from datetime import datetime, timedelta
 from typing import Dict, Any
 from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, status
@@ -17,9 +16,11 @@ from app.core.models_base import UserRole
 from app.models import User, CostObject, Brigade
 from app.time_sheets.service import TimeSheetService
 from app.time_sheets.excel_parser import TimeSheetExcelParser, TimeSheetExcelParseError
-from app.time_sheets.excel_preview_service import ExcelPreviewService
+from app.time_sheets.excel_preview_service import ExcelPreviewService, resolve_names
 from app.time_sheets.schemas import TimeSheetCreate, TimeSheetResponse, TimeSheetItemResponse
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 
@@ -196,19 +197,10 @@ async def upload_timesheet_excel(
             detail="Поддерживаются только файлы .xlsx"
         )
     
-    # Сохранение во временный файл
-    temp_file_path = None
     try:
-        # Создание временного файла
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as temp_file:
-            content = await file.read()
-            temp_file.write(content)
-            temp_file_path = temp_file.name
-        
-        # Парсинг Excel
+        # Парсинг Excel из памяти в пуле потоков (без временного файла)
         try:
-            parser = TimeSheetExcelParser(temp_file_path)
-            parsed_data = parser.parse()
+            parsed_data = await TimeSheetExcelParser(file.file).parse_async()
         except TimeSheetExcelParseError as e:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -226,28 +218,19 @@ async def upload_timesheet_excel(
             )
         
         # Проверка прав (FOREMAN может только для своей бригады)
-        if UserRole.FOREMAN in current_user.role and brigade.foreman_id != current_user.id:
+        if UserRole.FOREMAN.value in current_user.roles and brigade.foreman_id != current_user.id:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Вы можете создавать табели только для своей бригады"
             )
         
-        # Получить ID членов бригады по ФИО
-        member_map = {}  # {full_name: member_id}
-        for member in brigade.members:
-            member_map[member.full_name] = member.id
-        
-        # Получить все объекты учета для поиска по названию
-        objects_result = await db.execute(
-            select(CostObject)
+        # ID членов бригады и активных объектов по названиям без учета регистра
+        # (одним запросом, как в предпросмотре)
+        member_map, object_map = await resolve_names(
+            db,
+            brigade_id,
+            {item['cost_object_name'].strip().lower() for item in parsed_data['items']}
         )
-        cost_objects = objects_result.scalars().all()
-        
-        # Создать маппинг: название → ID (case-insensitive)
-        object_map = {}  # {normalized_name: cost_object_id}
-        for obj in cost_objects:
-            normalized_name = obj.name.strip().lower()
-            object_map[normalized_name] = obj.id
         
         # Преобразование items для API
         items_for_api = []
@@ -258,7 +241,7 @@ async def upload_timesheet_excel(
             member_name = item['member_name']
             
             # Поиск ID члена бригады
-            member_id = member_map.get(member_name)
+            member_id = member_map.get(member_name.strip().lower())
             if not member_id:
                 unknown_members.add(member_name)
                 continue
@@ -346,17 +329,12 @@ async def upload_timesheet_excel(
         
         if warnings:
             # Логируем warnings для отладки
-            print(f"[WARNING] Excel upload warnings: {warnings}")
+            logger.warning(f"Excel upload warnings: {warnings}")
         
         return response
     
     finally:
-        # Удаление временного файла
-        if temp_file_path and os.path.exists(temp_file_path):
-            try:
-                os.unlink(temp_file_path)
-            except:
-                pass
+        await file.close()
 
 
 @router.post("/upload-preview")
@@ -372,7 +350,7 @@ async def upload_excel_preview(
     - Доступно: FOREMAN, HR_MANAGER
     - Формат: .xlsx
     - Возвращает preview_id и данные для проверки
-    - Preview истекает через 1 час
+    - Preview истекает через TIMESHEET_PREVIEW_TTL (по умолчанию 1 час)
     
     Ответ содержит:
     - preview_id — для confirm
@@ -436,7 +414,7 @@ async def confirm_excel_upload(
     preview_service = ExcelPreviewService(db)
     
     # Получение preview
-    preview_data = preview_service.get_preview(preview_id, current_user.id)
+    preview_data = await preview_service.get_preview(preview_id, current_user.id)
     
     if not preview_data:
         raise HTTPException(
@@ -484,7 +462,7 @@ async def confirm_excel_upload(
         timesheet = await service.get_timesheet_by_id(timesheet.id)
         
         # Удаление preview после успешного создания
-        preview_service.delete_preview(preview_id)
+        await preview_service.delete_preview(preview_id)
         
         # Формирование ответа
         response = TimeSheetResponse(
@@ -547,7 +525,7 @@ async def get_preview(
     """
     preview_service = ExcelPreviewService(db)
     
-    preview_data = preview_service.get_preview(preview_id, current_user.id)
+    preview_data = await preview_service.get_preview(preview_id, current_user.id)
     
     if not preview_data:
         raise HTTPException(
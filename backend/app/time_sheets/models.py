@@ -0,0 +1,19 @@
+"""Модели предпросмотра загрузки табелей"""
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, LargeBinary
+from app.core.database import Base
+
+
+class TimeSheetPreview(Base):
+    """Предпросмотр табеля из Excel (хранилище sql, см. preview_store.py)"""
+    __tablename__ = "timesheet_previews"
+
+    id = Column(String(36), primary_key=True)  # preview_id (uuid4)
+    user_id = Column(Integer, nullable=False)
+    # JSON предпросмотра, сжатый zlib
+    data = Column(LargeBinary, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<TimeSheetPreview {self.id}: user {self.user_id}>"
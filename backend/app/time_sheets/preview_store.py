@@ -0,0 +1,299 @@
+"""
+Хранилище предпросмотров загрузки табелей из Excel
+
+Предпросмотр создается в /upload-preview и подтверждается отдельным
+запросом /confirm-upload, который при нескольких воркерах uvicorn может
+попасть в другой процесс. Поэтому предпросмотр хранится вне процесса.
+
+Режимы (timesheet_preview_backend):
+    memory - LRU в памяти процесса (один воркер, разработка)
+    sql    - таблица timesheet_previews в основной БД (SQLite/PostgreSQL)
+    redis  - общий Redis (redis_url), TTL ключей выставляет сам Redis
+
+Предпросмотр хранится как JSON без пробелов, сжатый zlib: повторяющиеся
+ключи строк табеля сжимаются в несколько раз. Сжатый предпросмотр больше
+max_bytes не сохраняется (PreviewTooLarge). Истекшие записи не читаются;
+memory удаляет их при вытеснении, sql - периодической очисткой при записи.
+"""
+import json
+import logging
+import time
+import zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.time_sheets.models import TimeSheetPreview
+
+logger = logging.getLogger(__name__)
+
+REDIS_KEY_PREFIX = "timesheet:preview:"
+
+
+class PreviewTooLarge(ValueError):
+    """Предпросмотр больше допустимого размера"""
+
+
+def encode_preview(data: Dict[str, Any]) -> bytes:
+    """Компактное представление предпросмотра: JSON без пробелов + zlib"""
+    return zlib.compress(json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def decode_preview(blob: bytes) -> Dict[str, Any]:
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+class PreviewStore(ABC):
+    """Базовое хранилище: сериализация, ограничение размера и счетчики"""
+
+    backend = "base"
+
+    def __init__(self, ttl: float, max_bytes: int):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._saved = 0
+        self._hits = 0
+        self._misses = 0
+        self._rejected = 0
+
+    @abstractmethod
+    async def _store(self, preview_id: str, user_id: int, blob: bytes) -> None:
+        """Записать сжатый предпросмотр на ttl секунд"""
+
+    @abstractmethod
+    async def _load(self, preview_id: str) -> Optional[bytes]:
+        """Сжатый предпросмотр или None (нет или истек)"""
+
+    @abstractmethod
+    async def _delete(self, preview_id: str) -> bool:
+        """Удалить предпросмотр; True, если он был"""
+
+    async def save(self, preview_id: str, user_id: int, data: Dict[str, Any]) -> None:
+        """
+        Сохранить предпросмотр на ttl секунд
+
+        Raises:
+            PreviewTooLarge: сжатый предпросмотр больше max_bytes
+        """
+        blob = encode_preview(data)
+        if len(blob) > self.max_bytes:
+            self._rejected += 1
+            raise PreviewTooLarge(
+                f"Файл слишком большой для предпросмотра "
+                f"({len(blob) // 1024} КБ после сжатия, допустимо {self.max_bytes // 1024} КБ)"
+            )
+        await self._store(preview_id, user_id, blob)
+        self._saved += 1
+
+    async def load(self, preview_id: str) -> Optional[Dict[str, Any]]:
+        """Предпросмотр или None (нет или истек)"""
+        blob = await self._load(preview_id)
+        if blob is None:
+            self._misses += 1
+            return None
+        self._hits += 1
+        return decode_preview(blob)
+
+    async def delete(self, preview_id: str) -> bool:
+        return await self._delete(preview_id)
+
+    async def cleanup(self) -> int:
+        """Удалить истекшие предпросмотры; возвращает количество удаленных"""
+        return 0
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend,
+            "ttl": self.ttl,
+            "max_bytes": self.max_bytes,
+            "saved": self._saved,
+            "hits": self._hits,
+            "misses": self._misses,
+            "rejected": self._rejected,
+        }
+
+    async def close(self) -> None:
+        pass
+
+
+class MemoryPreviewStore(PreviewStore):
+    """LRU в памяти процесса, ограниченный числом записей и общим размером"""
+
+    backend = "memory"
+
+    def __init__(self, ttl: float, max_bytes: int, max_entries: int, max_total_bytes: int):
+        super().__init__(ttl, max_bytes)
+        self.max_entries = max_entries
+        self.max_total_bytes = max_total_bytes
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._total_bytes = 0
+        self._evicted = 0
+
+    def _pop(self, preview_id: str) -> Optional[Tuple[float, bytes]]:
+        entry = self._entries.pop(preview_id, None)
+        if entry is not None:
+            self._total_bytes -= len(entry[1])
+        return entry
+
+    async def _store(self, preview_id: str, user_id: int, blob: bytes) -> None:
+        self._pop(preview_id)
+        await self.cleanup()
+        while self._entries and (
+            len(self._entries) >= self.max_entries or self._total_bytes + len(blob) > self.max_total_bytes
+        ):
+            # Вытесняем давно не использованные предпросмотры
+            self._pop(next(iter(self._entries)))
+            self._evicted += 1
+        self._entries[preview_id] = (time.monotonic() + self.ttl, blob)
+        self._total_bytes += len(blob)
+
+    async def _load(self, preview_id: str) -> Optional[bytes]:
+        entry = self._entries.get(preview_id)
+        if entry is None:
+            return None
+        expires_at, blob = entry
+        if expires_at <= time.monotonic():
+            self._pop(preview_id)
+            return None
+        self._entries.move_to_end(preview_id)
+        return blob
+
+    async def _delete(self, preview_id: str) -> bool:
+        return self._pop(preview_id) is not None
+
+    async def cleanup(self) -> int:
+        now = time.monotonic()
+        expired = [pid for pid, (expires_at, _) in self._entries.items() if expires_at <= now]
+        for pid in expired:
+            self._pop(pid)
+        return len(expired)
+
+    def metrics(self) -> Dict[str, Any]:
+        metrics = super().metrics()
+        metrics.update(size=len(self._entries), total_bytes=self._total_bytes, evicted=self._evicted)
+        return metrics
+
+
+class SQLPreviewStore(PreviewStore):
+    """Таблица timesheet_previews; запись сразу коммитится отдельной сессией"""
+
+    backend = "sql"
+
+    def __init__(
+        self,
+        ttl: float,
+        max_bytes: int,
+        session_factory: async_sessionmaker = AsyncSessionLocal,
+        cleanup_interval: float = 300.0
+    ):
+        super().__init__(ttl, max_bytes)
+        self.session_factory = session_factory
+        self.cleanup_interval = cleanup_interval
+        self._last_cleanup = 0.0
+
+    async def _store(self, preview_id: str, user_id: int, blob: bytes) -> None:
+        now = datetime.utcnow()
+        async with self.session_factory() as session:
+            await session.execute(insert(TimeSheetPreview).values(
+                id=preview_id,
+                user_id=user_id,
+                data=blob,
+                expires_at=now + timedelta(seconds=self.ttl),
+                created_at=now
+            ))
+            await session.commit()
+        if time.monotonic() - self._last_cleanup >= self.cleanup_interval:
+            await self.cleanup()
+
+    async def _load(self, preview_id: str) -> Optional[bytes]:
+        async with self.session_factory() as session:
+            return await session.scalar(
+                select(TimeSheetPreview.data).where(
+                    TimeSheetPreview.id == preview_id,
+                    TimeSheetPreview.expires_at > datetime.utcnow()
+                )
+            )
+
+    async def _delete(self, preview_id: str) -> bool:
+        async with self.session_factory() as session:
+            result = await session.execute(delete(TimeSheetPreview).where(TimeSheetPreview.id == preview_id))
+            await session.commit()
+            return result.rowcount > 0
+
+    async def cleanup(self) -> int:
+        self._last_cleanup = time.monotonic()
+        async with self.session_factory() as session:
+            result = await session.execute(
+                delete(TimeSheetPreview).where(TimeSheetPreview.expires_at <= datetime.utcnow())
+            )
+            await session.commit()
+        if result.rowcount:
+            logger.info(f"Удалено истекших предпросмотров табелей: {result.rowcount}")
+        return result.rowcount
+
+
+class RedisPreviewStore(PreviewStore):
+    """Общее хранилище в Redis"""
+
+    backend = "redis"
+
+    def __init__(self, ttl: float, max_bytes: int, redis_url: str):
+        super().__init__(ttl, max_bytes)
+        from redis import asyncio as aioredis
+
+        self._redis = aioredis.from_url(redis_url, socket_timeout=2.0, socket_connect_timeout=2.0)
+
+    @staticmethod
+    def _key(preview_id: str) -> str:
+        return f"{REDIS_KEY_PREFIX}{preview_id}"
+
+    async def _store(self, preview_id: str, user_id: int, blob: bytes) -> None:
+        await self._redis.set(self._key(preview_id), blob, px=int(self.ttl * 1000))
+
+    async def _load(self, preview_id: str) -> Optional[bytes]:
+        return await self._redis.get(self._key(preview_id))
+
+    async def _delete(self, preview_id: str) -> bool:
+        return bool(await self._redis.delete(self._key(preview_id)))
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+_store: Optional[PreviewStore] = None
+
+
+def get_preview_store() -> PreviewStore:
+    """Общее хранилище предпросмотров процесса (режим из настроек)"""
+    global _store
+    if _store is None:
+        backend = settings.timesheet_preview_backend.lower()
+        ttl = settings.timesheet_preview_ttl
+        max_bytes = settings.timesheet_preview_max_bytes
+        if backend == "redis":
+            _store = RedisPreviewStore(ttl, max_bytes, settings.redis_url)
+        elif backend == "memory":
+            _store = MemoryPreviewStore(
+                ttl,
+                max_bytes,
+                max_entries=settings.timesheet_preview_memory_max_entries,
+                max_total_bytes=settings.timesheet_preview_memory_max_total_bytes
+            )
+        else:
+            _store = SQLPreviewStore(ttl, max_bytes)
+        logger.info(f"Хранилище предпросмотров табелей: {_store.backend}, TTL {ttl:g} с")
+    return _store
+
+
+async def close_preview_store() -> None:
+    """Закрыть хранилище (при завершении приложения)"""
+    global _store
+    if _store is not None:
+        await _store.close()
+        _store = None
@@ -13,6 +13,7 @@ from app.models import (
 from app.core.models_base import TimeSheetStatus, UserRole
 from app.time_sheets.schemas import TimeSheetCreate, TimeSheetItemCreate
 from app.notifications.service import NotificationService
+from app.services.cost_rollup_service import CostRollupService
 
 
 class TimeSheetService:
@@ -416,6 +417,7 @@ class TimeSheetService:
                  object_amounts[object_id] += Decimal(str(item.amount))
         
         # Создание записей затрат
+        cost_entries = []
         for object_id, amount in object_amounts.items():
             cost_entry = CostEntry(
                 type="labor",
@@ -425,6 +427,10 @@ class TimeSheetService:
                 description=f"Табель #{timesheet.id} (Бригада {timesheet.brigade.name})"
             )
             self.db.add(cost_entry)
+            cost_entries.append(cost_entry)
+        
+        # Обновление дневной сводки затрат
+        await CostRollupService(self.db).add_entries(cost_entries)
     
     async def cancel_timesheet(
         self,
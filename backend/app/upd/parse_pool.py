@@ -0,0 +1,232 @@
+"""
+Пул процессов для CPU-тяжелой обработки УПД
+
+Разбор XML выполняется в отдельных процессах, чтобы массовая загрузка УПД
+не блокировала event loop; SHA-256 считается заранее в потоке (hash_upd),
+чтобы уже загруженные файлы не разбирались. Очередь ограничена: если все
+места заняты дольше upd_parse_queue_wait секунд, задача отклоняется
+(backpressure), а каждая задача ограничена по времени upd_parse_timeout.
+Задача, прерванная по таймауту во время выполнения, занимает место в
+очереди, пока процесс ее не завершит.
+
+Пакетные загрузки (parse_many) занимают не больше batch_limit мест
+очереди на все пакеты процесса и ждут свободного места без таймаута, поэтому
+одиночные загрузки не получают отказ, пока идет разбор большого пакета.
+"""
+import asyncio
+import hashlib
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, List, Optional, Tuple
+
+from app.core.config import settings
+from app.upd.upd_parser import UPDParser, UPDDocument
+
+logger = logging.getLogger(__name__)
+
+
+class UPDParsePoolBusy(Exception):
+    """Очередь разбора переполнена"""
+    pass
+
+
+class UPDParseTimeout(Exception):
+    """Задача разбора не уложилась в отведенное время"""
+    pass
+
+
+def parse_upd(xml_content: bytes) -> Tuple[UPDDocument, float]:
+    """
+    Разбор УПД (выполняется в процессе пула)
+
+    Returns:
+        (UPDDocument, время разбора в секундах)
+    """
+    started = time.perf_counter()
+    upd_doc = UPDParser().parse(xml_content)
+    return upd_doc, time.perf_counter() - started
+
+
+async def hash_upd(*contents: bytes) -> List[str]:
+    """SHA-256 файлов в потоке (hashlib отпускает GIL на больших данных)"""
+    return await asyncio.to_thread(lambda: [hashlib.sha256(content).hexdigest() for content in contents])
+
+
+class UPDParsePool:
+    """Пул процессов с ограниченной очередью, таймаутами и метриками"""
+
+    def __init__(
+        self,
+        max_workers: int,
+        queue_size: int,
+        job_timeout: float,
+        queue_wait: float
+    ):
+        self.max_workers = max_workers
+        self.queue_size = queue_size
+        self.job_timeout = job_timeout
+        self.queue_wait = queue_wait
+
+        # Пакетам - не больше числа процессов и половины очереди,
+        # остальное место остается одиночным загрузкам
+        self.batch_limit = max(1, min(max_workers, queue_size // 2))
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots = asyncio.Semaphore(queue_size)
+        self._batch_slots = asyncio.Semaphore(self.batch_limit)
+        self._pending = 0
+
+        self._completed = 0
+        self._failed = 0
+        self._timeouts = 0
+        self._rejected = 0
+        self._parse_time_total = 0.0
+        self._parse_time_max = 0.0
+        self._total_time = 0.0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # Процессы стартуют при первой задаче, а не при импорте
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    async def submit(self, fn: Callable, *args, wait: bool = False) -> Any:
+        """
+        Выполнить функцию в пуле процессов
+
+        Args:
+            wait: ждать места в очереди без ограничения (пакетная загрузка)
+
+        Raises:
+            UPDParsePoolBusy: свободное место в очереди не появилось за queue_wait
+            UPDParseTimeout: задача выполнялась дольше job_timeout
+        """
+        if wait:
+            await self._slots.acquire()
+        else:
+            try:
+                await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_wait)
+            except asyncio.TimeoutError:
+                self._rejected += 1
+                logger.warning(f"Очередь разбора УПД переполнена ({self.queue_size}), задача отклонена")
+                raise UPDParsePoolBusy(
+                    f"Очередь разбора УПД переполнена ({self.queue_size}), повторите позже"
+                )
+
+        self._pending += 1
+        enqueued = time.perf_counter()
+        release = True
+        # Пул, в который ушла задача: к моменту ошибки его может сменить новый
+        executor = self._get_executor()
+        try:
+            try:
+                future = executor.submit(fn, *args)
+                result = await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.job_timeout)
+            except asyncio.TimeoutError:
+                # Еще не начатая задача снимается. Начатая дорабатывает в процессе,
+                # и место в очереди освобождается только по ее завершении
+                if not future.cancel():
+                    release = False
+                    loop = asyncio.get_running_loop()
+                    future.add_done_callback(lambda _: loop.call_soon_threadsafe(self._release))
+                self._timeouts += 1
+                logger.warning(f"Разбор УПД прерван по таймауту ({self.job_timeout:g} с)")
+                raise UPDParseTimeout(f"Разбор УПД не уложился в {self.job_timeout:g} с")
+            except BrokenProcessPool:
+                # Процесс пула упал (OOM и т.п.) - следующая задача поднимет новый пул
+                self._failed += 1
+                self._discard_executor(executor)
+                raise
+            except Exception:
+                self._failed += 1
+                raise
+
+            self._completed += 1
+            self._total_time += time.perf_counter() - enqueued
+            return result
+        finally:
+            if release:
+                self._release()
+
+    def _discard_executor(self, executor: ProcessPoolExecutor) -> None:
+        """
+        Убрать сломанный пул, если его еще не заменили
+
+        Задачи пакета падают вместе; поздний обработчик не должен остановить
+        новый пул, поднятый следующей задачей. Без ожидания - не блокирует event loop.
+        """
+        if self._executor is executor:
+            self._executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _release(self) -> None:
+        self._pending -= 1
+        self._slots.release()
+
+    async def parse(self, xml_content: bytes, wait: bool = False) -> UPDDocument:
+        """Разбор УПД в пуле процессов"""
+        upd_doc, parse_time = await self.submit(parse_upd, xml_content, wait=wait)
+        self._parse_time_total += parse_time
+        self._parse_time_max = max(self._parse_time_max, parse_time)
+        return upd_doc
+
+    async def parse_many(self, contents: List[bytes]) -> List[Any]:
+        """
+        Разбор пакета: одновременно не больше batch_limit файлов всех пакетов
+
+        Returns:
+            UPDDocument или исключение - для каждого файла по порядку
+        """
+        async def parse_one(xml_content: bytes) -> UPDDocument:
+            async with self._batch_slots:
+                return await self.parse(xml_content, wait=True)
+
+        return await asyncio.gather(*(parse_one(content) for content in contents), return_exceptions=True)
+
+    def metrics(self) -> dict:
+        """Снимок метрик очереди и времени разбора"""
+        return {
+            "max_workers": self.max_workers,
+            "queue_size": self.queue_size,
+            "batch_limit": self.batch_limit,
+            "queue_depth": self._pending,
+            "completed": self._completed,
+            "failed": self._failed,
+            "timeouts": self._timeouts,
+            "rejected": self._rejected,
+            "avg_parse_ms": round(self._parse_time_total / self._completed * 1000, 2) if self._completed else 0.0,
+            "max_parse_ms": round(self._parse_time_max * 1000, 2),
+            "avg_total_ms": round(self._total_time / self._completed * 1000, 2) if self._completed else 0.0,
+        }
+
+    def shutdown(self) -> None:
+        """Остановить процессы пула"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+
+_pool: Optional[UPDParsePool] = None
+
+
+def get_upd_parse_pool() -> UPDParsePool:
+    """Общий пул разбора УПД процесса приложения"""
+    global _pool
+    if _pool is None:
+        _pool = UPDParsePool(
+            max_workers=settings.upd_parse_workers,
+            queue_size=settings.upd_parse_queue_size,
+            job_timeout=settings.upd_parse_timeout,
+            queue_wait=settings.upd_parse_queue_wait
+        )
+    return _pool
+
+
+def shutdown_upd_parse_pool() -> None:
+    """Остановить общий пул (при завершении приложения)"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown()
+        _pool = None
@@ -1,4 +1,5 @@
 """Роутер для работы с УПД (Универсальные Передаточные Документы)"""
+import asyncio
 import os
 import uuid
 from typing import List
@@ -8,9 +9,14 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.database import get_db
 from app.auth.dependencies import require_roles
 from app.core.models_base import UserRole
-from app.upd.service import UPDService
+from app.upd.service import UPDService, unpack_upd_files
+from app.upd.parse_pool import get_upd_parse_pool, UPDParsePoolBusy, UPDParseTimeout
+from app.jobs.handlers import UPD_UPLOAD_BATCH
+from app.jobs.router import job_accepted
+from app.jobs.service import JobService
 from app.upd.schemas import (
     UPDUploadResponse, UPDDetailResponse, UPDListItem,
+    UPDBatchUploadResponse, UPDBatchFileResult,
     DistributeUPDRequest, DistributeUPDResponse,
     ParsingIssueResponse, UPDItemResponse,
     DistributionSuggestions
@@ -19,6 +25,27 @@ from app.upd.schemas import (
 router = APIRouter()
 
 
+def _save_upload(file_path: str, content: bytes) -> None:
+    """Запись загруженного файла на диск (вызывается в потоке)"""
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, "wb") as f:
+        f.write(content)
+
+
+def _save_uploads(files: List[tuple]) -> None:
+    """Запись пакета файлов на диск (вызывается в потоке)"""
+    for _, content, file_path in files:
+        _save_upload(file_path, content)
+
+
+def _remove_upload(file_path: str) -> None:
+    """Удаление сохраненного файла, по которому УПД не создан"""
+    try:
+        os.remove(file_path)
+    except FileNotFoundError:
+        pass
+
+
 @router.post("/upload", response_model=UPDUploadResponse, status_code=status.HTTP_201_CREATED)
 async def upload_upd(
     file: UploadFile = File(...),
@@ -55,22 +82,33 @@ async def upload_upd(
     filename = f"{uuid.uuid4()}_{file.filename}"
     file_path = f"uploads/upd/{filename}"
     
-    # Создание директории если не существует
-    os.makedirs("uploads/upd", exist_ok=True)
-    
-    # Сохранение файла
-    with open(file_path, "wb") as f:
-        f.write(content)
+    # Сохранение файла (блокирующий I/O - в потоке)
+    await asyncio.to_thread(_save_upload, file_path, content)
     
     # Парсинг и сохранение в БД
     service = UPDService(db)
     try:
-        upd = await service.upload_upd(content, file_path, auto_check_duplicate=True)
+        try:
+            upd = await service.upload_upd(content, file_path, auto_check_duplicate=True)
+        except BaseException:
+            await asyncio.to_thread(_remove_upload, file_path)
+            raise
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         )
+    except UPDParsePoolBusy as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "5"}
+        )
+    except UPDParseTimeout as e:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=str(e)
+        )
     
     # Подготовка ответа
     issues = service._deserialize_issues(upd.parsing_issues)
@@ -128,6 +166,132 @@ async def upload_upd(
     )
 
 
+@router.post("/upload-batch", response_model=UPDBatchUploadResponse, status_code=status.HTTP_201_CREATED)
+async def upload_upd_batch(
+    files: List[UploadFile] = File(...),
+    db: AsyncSession = Depends(get_db),
+    current_user = Depends(require_roles([UserRole.ACCOUNTANT, UserRole.MATERIALS_MANAGER]))
+):
+    """
+    Пакетная загрузка УПД: несколько XML и/или ZIP-архивов с XML
+    
+    - Файлы разбираются параллельно
+    - Повторно загруженные файлы (по хэшу) пропускаются
+    - Дубликаты по номеру/дате/ИНН сохраняются со статусом DUPLICATE
+    - Все документы сохраняются в одной транзакции
+    - Возвращает отчет по каждому файлу
+    """
+    try:
+        uploads = [(file.filename or "", await file.read()) for file in files]
+        xml_files = await asyncio.to_thread(unpack_upd_files, uploads)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    if not xml_files:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="В пакете нет XML файлов"
+        )
+    
+    batch = [
+        (name, content, f"uploads/upd/{uuid.uuid4()}_{os.path.basename(name)}")
+        for name, content in xml_files
+    ]
+    service = UPDService(db)
+    results = [UPDBatchFileResult(**result) for result in await service.upload_upd_batch(batch)]
+    
+    # На диск - только файлы, по которым создан УПД (повторы и ошибки не сохраняются)
+    await asyncio.to_thread(
+        _save_uploads,
+        [f for f, r in zip(batch, results) if r.status in ("created", "duplicate")]
+    )
+    
+    counts = {key: sum(1 for r in results if r.status == key) for key in ("created", "duplicate", "skipped", "error")}
+    
+    if counts["created"] or counts["duplicate"]:
+        from app.notifications.service import TelegramNotificationSender
+        
+        notifier = TelegramNotificationSender("")
+        await notifier.broadcast_websocket_to_roles(
+            roles=[UserRole.ACCOUNTANT.value, UserRole.MATERIALS_MANAGER.value],
+            notification_type="upd_batch_uploaded",
+            title="Загружен пакет УПД",
+            message=f"Новых УПД: {counts['created']}, дубликатов: {counts['duplicate']}",
+            data={
+                "upd_ids": [r.upd_id for r in results if r.status in ("created", "duplicate")],
+                "created": counts["created"],
+                "duplicates": counts["duplicate"]
+            }
+        )
+    
+    return UPDBatchUploadResponse(
+        total=len(results),
+        created=counts["created"],
+        duplicates=counts["duplicate"],
+        skipped=counts["skipped"],
+        errors=counts["error"],
+        results=results
+    )
+
+
+@router.post("/upload-batch/jobs", status_code=status.HTTP_202_ACCEPTED)
+async def upload_upd_batch_job(
+    files: List[UploadFile] = File(...),
+    db: AsyncSession = Depends(get_db),
+    current_user = Depends(require_roles([UserRole.ACCOUNTANT, UserRole.MATERIALS_MANAGER]))
+):
+    """
+    Пакетная загрузка УПД фоновой задачей
+    
+    - Файлы распаковываются и сохраняются сразу, разбор и запись
+      выполняет исполнитель задач
+    - Возвращает job_id; отчет по файлам - GET /jobs/{job_id}/result
+    """
+    try:
+        uploads = [(file.filename or "", await file.read()) for file in files]
+        xml_files = await asyncio.to_thread(unpack_upd_files, uploads)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    if not xml_files:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="В пакете нет XML файлов"
+        )
+    
+    batch = [
+        (name, content, f"uploads/upd/{uuid.uuid4()}_{os.path.basename(name)}")
+        for name, content in xml_files
+    ]
+    await asyncio.to_thread(_save_uploads, batch)
+    
+    job = await JobService.enqueue(
+        db, UPD_UPLOAD_BATCH, {"files": [[name, path] for name, _, path in batch]}, user_id=current_user.id
+    )
+    return job_accepted(job)
+
+
+@router.get("/parse-pool/metrics")
+async def get_parse_pool_metrics(
+    current_user = Depends(require_roles([UserRole.ADMIN]))
+):
+    """
+    Метрики пула разбора УПД
+    
+    - queue_depth: задач в работе и в ожидании
+    - completed / failed / timeouts / rejected: счетчики задач
+    - avg_parse_ms / max_parse_ms: время разбора в процессе
+    - avg_total_ms: среднее время от постановки в очередь до результата
+    """
+    return get_upd_parse_pool().metrics()
+
+
 @router.get("/unprocessed", response_model=List[UPDListItem])
 async def get_unprocessed_upds(
     db: AsyncSession = Depends(get_db),
@@ -1,5 +1,5 @@
 """Схемы данных для модуля UPD"""
-from datetime import datetime
+from datetime import date, datetime
 from decimal import Decimal
 from typing import List, Optional
 from pydantic import BaseModel, Field
@@ -49,6 +49,31 @@ class UPDUploadResponse(BaseModel):
     parsing_issues: List[ParsingIssueResponse] = []
 
 
+class UPDBatchFileResult(BaseModel):
+    """Результат загрузки одного файла из пакета"""
+    filename: str
+    status: str  # created / duplicate / skipped / error
+    upd_id: Optional[int] = None
+    duplicate_of_id: Optional[int] = None
+    document_number: Optional[str] = None
+    document_date: Optional[date] = None
+    supplier_name: Optional[str] = None
+    total_with_vat: Optional[Decimal] = None
+    items_count: int = 0
+    parsing_issues_count: int = 0
+    detail: Optional[str] = None
+
+
+class UPDBatchUploadResponse(BaseModel):
+    """Отчет о пакетной загрузке УПД"""
+    total: int
+    created: int
+    duplicates: int
+    skipped: int
+    errors: int
+    results: List[UPDBatchFileResult]
+
+
 class UPDDetailResponse(BaseModel):
     """Детальная информация об УПД"""
     id: int
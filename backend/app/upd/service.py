@@ -1,10 +1,12 @@
 """Бизнес-логика модуля UPD"""
-import hashlib
+import io
 import json
+import os
+import zipfile
 from datetime import datetime
 from decimal import Decimal
-from typing import List, Optional
-from sqlalchemy import select
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import select, insert, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
@@ -12,7 +14,9 @@ from app.models import (
     MaterialCost, MaterialCostItem, UPDDistribution, UPDDistributionHistory,
     CostEntry, MaterialRequest, CostObject, UPDStatus
 )
-from app.upd.upd_parser import UPDParser, UPDDocument, ParsingIssue
+from app.upd.upd_parser import UPDParser, UPDDocument, ParsingIssue, UPDParseError
+from app.upd.parse_pool import get_upd_parse_pool, hash_upd
+from app.services.cost_rollup_service import CostRollupService
 from app.upd.schemas import (
     DistributionItemCreate, 
     DistributionSuggestions, 
@@ -20,6 +24,55 @@ from app.upd.schemas import (
 )
 
 
+# Ограничения пакетной загрузки (защита от zip-бомб и слишком больших пакетов)
+BATCH_MAX_FILES = 500
+BATCH_MAX_UNPACKED_SIZE = 200 * 1024 * 1024
+
+
+def unpack_upd_files(uploads: List[Tuple[str, bytes]]) -> List[Tuple[str, bytes]]:
+    """
+    Развернуть загруженные файлы пакета: XML берутся как есть, из ZIP - все *.xml
+
+    Args:
+        uploads: пары (имя файла, содержимое)
+
+    Returns:
+        Пары (имя XML-файла, содержимое); для ZIP имя вида "архив.zip/файл.xml"
+
+    Raises:
+        ValueError: неподдерживаемый файл, битый архив или превышены лимиты пакета
+    """
+    files = []
+    unpacked_size = 0
+    for filename, content in uploads:
+        lower_name = filename.lower()
+        if lower_name.endswith('.xml'):
+            files.append((filename, content))
+            unpacked_size += len(content)
+        elif lower_name.endswith('.zip'):
+            try:
+                archive = zipfile.ZipFile(io.BytesIO(content))
+            except zipfile.BadZipFile:
+                raise ValueError(f"Файл {filename} не является ZIP-архивом")
+            with archive:
+                for info in archive.infolist():
+                    if info.is_dir() or not info.filename.lower().endswith('.xml'):
+                        continue
+                    unpacked_size += info.file_size
+                    if unpacked_size > BATCH_MAX_UNPACKED_SIZE:
+                        raise ValueError("Превышен допустимый размер распакованного пакета")
+                    files.append((f"{filename}/{os.path.basename(info.filename)}", archive.read(info)))
+        else:
+            raise ValueError(f"Файл {filename}: поддерживаются только XML и ZIP")
+
+        if len(files) > BATCH_MAX_FILES:
+            raise ValueError(f"В пакете больше {BATCH_MAX_FILES} файлов")
+        if unpacked_size > BATCH_MAX_UNPACKED_SIZE:
+            raise ValueError("Превышен допустимый размер распакованного пакета")
+
+    return files
+
+
 class UPDService:
     """Сервис для работы с УПД документами"""
     
@@ -44,8 +97,8 @@ class UPDService:
         Returns:
             MaterialCost объект с распарсенными данными
         """
-        # Вычисление SHA-256 хэша файла для дедупликации
-        file_hash = hashlib.sha256(xml_content).hexdigest()
+        # SHA-256 хэш для дедупликации - в потоке, до разбора
+        (file_hash,) = await hash_upd(xml_content)
         
         # Быстрая проверка по хэшу: если точно такой файл уже загружен — отклоняем
         existing_by_hash = await self._check_file_hash(file_hash)
@@ -55,10 +108,11 @@ class UPDService:
                 f"от {existing_by_hash.document_date.strftime('%d.%m.%Y')})"
             )
         
-        # Парсинг XML
+        # Парсинг XML - в пуле процессов, чтобы не блокировать event loop
+        # (см. app.upd.parse_pool)
         try:
-            upd_doc = self.parser.parse(xml_content)
-        except ValueError as e:
+            upd_doc = await get_upd_parse_pool().parse(xml_content)
+        except (ValueError, UPDParseError) as e:
             raise ValueError(f"Ошибка парсинга УПД: {str(e)}")
         
         # Проверка на дубликаты по номеру/дате/ИНН
@@ -116,6 +170,187 @@ class UPDService:
         result = await self.db.execute(stmt)
         return result.scalar_one()
     
+    async def upload_upd_batch(
+        self,
+        files: List[Tuple[str, bytes, str]]
+    ) -> List[dict]:
+        """
+        Пакетная загрузка УПД в одной транзакции
+
+        Сначала считаются SHA-256 и одним запросом отсеиваются уже
+        загруженные файлы и повторы внутри пакета. Остальные файлы
+        разбираются параллельно в пуле процессов (не занимая всю очередь,
+        см. UPDParsePool.parse_many), дубликаты по (номер, дата, ИНН) ищутся
+        одним запросом на весь пакет, а MaterialCost/MaterialCostItem
+        вставляются пакетными INSERT.
+
+        Args:
+            files: тройки (имя файла, содержимое, путь сохраненного файла)
+
+        Returns:
+            Отчет по каждому файлу в исходном порядке: status = created /
+            duplicate (загружен со статусом DUPLICATE) / skipped (такой файл
+            уже загружен) / error
+        """
+        results: List[dict] = [{"filename": name} for name, _, _ in files]
+        file_hashes = await hash_upd(*(content for _, content, _ in files))
+
+        # Повторы по хэшу (сначала в БД, затем внутри пакета) не разбираются
+        loaded = {}
+        if file_hashes:
+            rows = await self.db.execute(
+                select(MaterialCost.id, MaterialCost.file_hash).where(MaterialCost.file_hash.in_(set(file_hashes)))
+            )
+            loaded = {row.file_hash: row.id for row in rows}
+
+        seen_hashes = {}
+        new_files: List[int] = []
+        for idx, file_hash in enumerate(file_hashes):
+            if file_hash in loaded:
+                results[idx].update(
+                    status="skipped", upd_id=loaded[file_hash], detail="Этот файл уже загружен"
+                )
+            elif file_hash in seen_hashes:
+                results[idx].update(
+                    status="skipped", detail=f"Повтор файла {files[seen_hashes[file_hash]][0]} в пакете"
+                )
+            else:
+                seen_hashes[file_hash] = idx
+                new_files.append(idx)
+
+        parsed = await get_upd_parse_pool().parse_many([files[idx][1] for idx in new_files])
+
+        documents: Dict[int, Tuple[str, UPDDocument]] = {}
+        accepted: List[int] = []
+        for idx, outcome in zip(new_files, parsed):
+            if isinstance(outcome, BaseException):
+                results[idx].update(status="error", detail=f"Ошибка парсинга УПД: {outcome}")
+            else:
+                documents[idx] = (file_hashes[idx], outcome)
+                accepted.append(idx)
+
+        # Дубликаты по реквизитам документа - одним запросом на весь пакет
+        def doc_date(upd_doc: UPDDocument):
+            value = upd_doc.document_date
+            return value.date() if isinstance(value, datetime) else value
+
+        keys = {(documents[idx][1].document_number, doc_date(documents[idx][1])) for idx in accepted}
+        existing: Dict[tuple, List[Tuple[int, Optional[str]]]] = {}
+        if keys:
+            rows = await self.db.execute(
+                select(
+                    MaterialCost.id, MaterialCost.document_number,
+                    MaterialCost.document_date, MaterialCost.supplier_inn
+                ).where(
+                    tuple_(MaterialCost.document_number, MaterialCost.document_date).in_(list(keys)),
+                    MaterialCost.status != UPDStatus.DUPLICATE
+                ).order_by(MaterialCost.id)
+            )
+            for row in rows:
+                existing.setdefault((row.document_number, row.document_date), []).append(
+                    (row.id, row.supplier_inn)
+                )
+
+        def find_original(candidates, supplier_inn):
+            # Та же логика, что в check_duplicate: при наличии ИНН он должен совпасть
+            for candidate_id, candidate_inn in candidates:
+                if not supplier_inn or candidate_inn == supplier_inn:
+                    return candidate_id
+            return None
+
+        checked_at = datetime.utcnow()
+
+        def material_cost_values(idx: int, duplicate_of_id: Optional[int]) -> dict:
+            file_hash, upd_doc = documents[idx]
+            return {
+                "supplier_name": upd_doc.supplier_name,
+                "supplier_inn": upd_doc.supplier_inn,
+                "document_number": upd_doc.document_number,
+                "document_date": doc_date(upd_doc),
+                "total_amount": float(upd_doc.total_amount),
+                "vat_amount": float(upd_doc.total_vat),
+                "xml_file_path": files[idx][2],
+                "file_hash": file_hash,
+                "status": (UPDStatus.DUPLICATE if duplicate_of_id else UPDStatus.NEW).value,
+                "duplicate_of_id": duplicate_of_id,
+                "duplicate_checked_at": checked_at,
+                "parsing_issues": self._serialize_issues(upd_doc.parsing_issues),
+                "generator": upd_doc.generator,
+            }
+
+        async def bulk_insert(indexes: List[int], duplicate_of: Dict[int, Optional[int]]) -> Dict[int, int]:
+            if not indexes:
+                return {}
+            result = await self.db.execute(
+                insert(MaterialCost).returning(MaterialCost.id, sort_by_parameter_order=True),
+                [material_cost_values(idx, duplicate_of.get(idx)) for idx in indexes]
+            )
+            return dict(zip(indexes, result.scalars().all()))
+
+        # Первый проход: оригиналы и дубликаты уже загруженных документов.
+        # Документы, повторяющие более ранний документ этого же пакета,
+        # вставляются вторым проходом, когда известен id оригинала.
+        first_pass, second_pass = [], []
+        duplicate_of: Dict[int, Optional[int]] = {}
+        batch_originals: Dict[tuple, List[Tuple[int, Optional[str]]]] = {}
+        for idx in accepted:
+            upd_doc = documents[idx][1]
+            key = (upd_doc.document_number, doc_date(upd_doc))
+            original_id = find_original(existing.get(key, []), upd_doc.supplier_inn)
+            if original_id:
+                duplicate_of[idx] = original_id
+                first_pass.append(idx)
+                continue
+            original_idx = find_original(batch_originals.get(key, []), upd_doc.supplier_inn)
+            if original_idx is not None:
+                duplicate_of[idx] = original_idx
+                second_pass.append(idx)
+            else:
+                batch_originals.setdefault(key, []).append((idx, upd_doc.supplier_inn))
+                first_pass.append(idx)
+
+        ids = await bulk_insert(first_pass, duplicate_of)
+        ids.update(await bulk_insert(
+            second_pass, {idx: ids[duplicate_of[idx]] for idx in second_pass}
+        ))
+        for idx in second_pass:
+            duplicate_of[idx] = ids[duplicate_of[idx]]
+
+        item_rows = [
+            {
+                "material_cost_id": ids[idx],
+                "product_name": item.product_name,
+                "quantity": float(item.quantity),
+                "unit": item.unit,
+                "price": float(item.price),
+                "amount": float(item.amount),
+                "vat_rate": float(item.vat_rate),
+                "vat_amount": float(item.vat_amount),
+            }
+            for idx in accepted
+            for item in documents[idx][1].items
+        ]
+        if item_rows:
+            await self.db.execute(insert(MaterialCostItem), item_rows)
+
+        await self.db.commit()
+
+        for idx in accepted:
+            upd_doc = documents[idx][1]
+            results[idx].update(
+                status="duplicate" if duplicate_of.get(idx) else "created",
+                upd_id=ids[idx],
+                duplicate_of_id=duplicate_of.get(idx),
+                document_number=upd_doc.document_number,
+                document_date=doc_date(upd_doc),
+                supplier_name=upd_doc.supplier_name,
+                total_with_vat=upd_doc.total_with_vat,
+                items_count=len(upd_doc.items),
+                parsing_issues_count=len(upd_doc.parsing_issues),
+            )
+
+        return results
+
     async def get_upd_by_id(self, upd_id: int) -> Optional[MaterialCost]:
         """Получение УПД по ID с загрузкой строк"""
         query = (
@@ -171,6 +406,7 @@ class UPDService:
         # Создание записей распределения
         total_distributed = Decimal("0")
         cost_entries_count = 0
+        cost_entries = []
         
         for dist in distributions:
             # Получение строки УПД
@@ -210,10 +446,14 @@ class UPDService:
                     description=f"УПД {upd.document_number}: {item.product_name}"
                 )
                 self.db.add(cost_entry)
+                cost_entries.append(cost_entry)
                 cost_entries_count += 1
             
             total_distributed += dist.distributed_amount
         
+        # Обновление дневной сводки затрат
+        await CostRollupService(self.db).add_entries(cost_entries)
+        
         # Обновление статуса УПД
         upd.status = UPDStatus.DISTRIBUTED
         upd.cost_object_id = distributions[0].cost_object_id if distributions else None
@@ -560,17 +800,16 @@ class UPDService:
         for old_dist in old_distributions:
             await self.db.delete(old_dist)
         
-        # Удаление старых записей затрат
-        from sqlalchemy import delete
-        await self.db.execute(
-            delete(CostEntry).where(
-                CostEntry.reference_type == "MaterialCost",
-                CostEntry.reference_id == upd_id
-            )
+        # Удаление старых записей затрат (с вычитанием из дневной сводки)
+        rollup = CostRollupService(self.db)
+        await rollup.delete_entries(
+            CostEntry.reference_type == "MaterialCost",
+            CostEntry.reference_id == upd_id
         )
         
         # Создание новых распределений
         total_distributed = Decimal("0")
+        cost_entries = []
         
         for dist in new_distributions:
             # Получение строки УПД
@@ -611,9 +850,12 @@ class UPDService:
                     reference_id=upd.id
                 )
                 self.db.add(cost_entry)
+                cost_entries.append(cost_entry)
             
             total_distributed += dist.distributed_amount
         
+        await rollup.add_entries(cost_entries)
+        
         # Новое распределение для истории
         new_distribution_data = {
             "distributions": [
@@ -658,13 +900,14 @@ class UPDService:
         # Если объект не передан, попробуем взять из УПД (если уже был распределен частично)
         target_object_id = cost_object_id or upd.cost_object_id
 
-        for item in upd.items:
-            match = await mapping_service.find_best_match(
-                product_name=item.product_name,
-                supplier_inn=upd.supplier_inn,
-                cost_object_id=target_object_id
-            )
-            
+        # Все строки УПД сопоставляются со сметой за один проход
+        matches = await mapping_service.find_best_matches(
+            product_names=[item.product_name for item in upd.items],
+            supplier_inn=upd.supplier_inn,
+            cost_object_id=target_object_id
+        )
+
+        for item, match in zip(upd.items, matches):
             if match:
                 suggestions.append(DistributionSuggestionItem(
                     material_cost_item_id=item.id,
@@ -2,10 +2,11 @@
 Парсер УПД (Универсальный Передаточный Документ) XML
 Поддерживает форматы 5.01 и 5.03, различные генераторы
 """
+import re
 import xml.etree.ElementTree as ET
 from datetime import datetime
 from decimal import Decimal, InvalidOperation
-from typing import Dict, List, Optional, Any
+from typing import Callable, Dict, List, Optional, Any
 from dataclasses import dataclass, field
 from enum import Enum
 
@@ -100,6 +101,101 @@ def convert_okei_to_unit(okei_code: Optional[str]) -> str:
     return okei_code
 
 
+# Атрибуты заголовка, для которых нужен первый элемент документа (аналог root.find(".//*[@...]"))
+_HEADER_ATTRS = ("НомерСчФ", "НомерДок", "ДатаСчФ", "ДатаДок", "ВерсФорм", "НаимЭконСубСост")
+# Атрибуты участника (продавца/покупателя) внутри СвПрод / СвПродавец / СвПокуп
+_PARTY_ATTRS = ("НаимОрг", "НаимЮЛ", "ИННЮЛ", "ИНН")
+_PARTY_TAGS = ("СвПрод", "СвПродавец", "СвПокуп")
+# Маркеры генераторов в тексте элементов, в порядке проверки
+_GENERATOR_MARKERS = (
+    (("Elewise", "LegalDoc"), "Elewise LegalDoc"),
+    (("1С:Бухгалтерия", "1C:"), "1С:Бухгалтерия"),
+    (("Diadoc",), "Diadoc"),
+    (("VO2_xslt",), "VO2_xslt"),
+)
+_GENERATOR_MARKERS_RE = re.compile(
+    "|".join(re.escape(marker) for markers, _ in _GENERATOR_MARKERS for marker in markers)
+)
+# Размер порции байтов, подаваемой в expat
+_FEED_CHUNK_SIZE = 64 * 1024
+
+
+class _UPDStreamTarget:
+    """
+    Приемник событий expat для однопроходного разбора УПД
+
+    Дерево не строится: за один проход запоминаются первые вхождения
+    атрибутов заголовка и участников, текст элементов проверяется на маркеры
+    генератора, а строки товаров сразу передаются в on_row.
+    Корневой элемент, как и в поиске ".//*", в расчет не берется.
+    """
+
+    def __init__(self, on_row: Callable[[str, Dict[str, str]], None]):
+        self.on_row = on_row
+        self.depth = 0
+        self.header: Dict[str, Optional[str]] = {}
+        self._missing_header = _HEADER_ATTRS
+        # Первый элемент-участник каждого вида: {атрибут: (значения атрибутов элемента)}
+        self.parties: Dict[str, Dict[str, Dict[str, Optional[str]]]] = {}
+        self._open_parties: List[tuple] = []
+        self.generator: Optional[str] = None
+        self._text_parts: Optional[List[str]] = None
+
+    def _check_text(self) -> None:
+        # Текст элемента (до первого дочернего) завершен - ищем маркер генератора
+        parts = self._text_parts
+        self._text_parts = None
+        if not parts:
+            return
+        text = "".join(parts)
+        if not _GENERATOR_MARKERS_RE.search(text):
+            return
+        for markers, generator in _GENERATOR_MARKERS:
+            if any(marker in text for marker in markers):
+                self.generator = generator
+                return
+
+    def start(self, tag: str, attrib: Dict[str, str]) -> None:
+        self._check_text()
+        if self.generator is None:
+            self._text_parts = []
+        self.depth += 1
+        if self.depth == 1:
+            return
+
+        if attrib:
+            found = [name for name in self._missing_header if name in attrib]
+            if found:
+                for name in found:
+                    self.header[name] = attrib[name]
+                self._missing_header = tuple(name for name in _HEADER_ATTRS if name not in self.header)
+
+            for party_tag, _ in self._open_parties:
+                party = self.parties[party_tag]
+                for name in _PARTY_ATTRS:
+                    if name in attrib and name not in party:
+                        party[name] = {key: attrib.get(key) for key in _PARTY_ATTRS}
+
+        if tag in _PARTY_TAGS and tag not in self.parties:
+            self.parties[tag] = {}
+            self._open_parties.append((tag, self.depth))
+        elif tag == "СведТов" or tag == "СведТовУслСч":
+            self.on_row(tag, attrib)
+
+    def end(self, tag: str) -> None:
+        self._check_text()
+        if self._open_parties and self._open_parties[-1][1] == self.depth:
+            self._open_parties.pop()
+        self.depth -= 1
+
+    def data(self, data: str) -> None:
+        if self._text_parts is not None:
+            self._text_parts.append(data)
+
+    def close(self) -> None:
+        return None
+
+
 class UPDParser:
     """Парсер XML файлов УПД"""
     
@@ -109,7 +205,82 @@ class UPDParser:
     
     def parse(self, xml_content: bytes) -> UPDDocument:
         """
-        Парсинг XML УПД документа
+        Парсинг XML УПД документа за один потоковый проход
+        
+        Байты подаются в expat порциями (кодировка windows-1251, как и в
+        parse_tree), дерево не строится. Результат совпадает с parse_tree.
+        
+        Args:
+            xml_content: содержимое XML файла в байтах
+            
+        Returns:
+            UPDDocument с распарсенными данными
+            
+        Raises:
+            UPDParseError: если XML невалидный или критические поля отсутствуют
+        """
+        self.issues = []
+        self.generator = None
+        
+        # Строки разбираются по мере чтения; проблемы копятся отдельно по видам
+        # строк, чтобы сохранить порядок issues как в parse_tree
+        rows = {"СведТов": ([], []), "СведТовУслСч": ([], [])}
+        row_parsers = {"СведТов": self._parse_sved_tov, "СведТовУслСч": self._parse_sved_tov_usl_sch}
+        
+        def on_row(tag: str, attrib: Dict[str, str]) -> None:
+            row_items, row_issues = rows[tag]
+            header_issues, self.issues = self.issues, row_issues
+            try:
+                item = row_parsers[tag](ET.Element(tag, attrib))
+            finally:
+                self.issues = header_issues
+            if item:
+                row_items.append(item)
+        
+        target = _UPDStreamTarget(on_row)
+        try:
+            parser = ET.XMLParser(target=target, encoding='windows-1251')
+            view = memoryview(xml_content)
+            for offset in range(0, len(view), _FEED_CHUNK_SIZE):
+                parser.feed(view[offset:offset + _FEED_CHUNK_SIZE])
+            parser.close()
+        except Exception as e:
+            raise UPDParseError(f"Ошибка парсинга XML: {str(e)}")
+        
+        # Генератор: маркер в тексте или признак формата 5.01
+        if target.generator:
+            self.generator = target.generator
+        else:
+            self._set_unknown_generator(target.header.get("НаимЭконСубСост") is not None)
+        
+        header = target.header
+        document_number = self._pick_document_number(header.get("НомерСчФ"), header.get("НомерДок"))
+        document_date = self._pick_document_date(header.get("ДатаСчФ"), header.get("ДатаДок"))
+        
+        supplier = target.parties.get("СвПрод")
+        if supplier is None:
+            supplier = target.parties.get("СвПродавец")
+        supplier_name, supplier_inn = self._resolve_party(supplier, split_1c_name=True)
+        buyer_name, buyer_inn = self._resolve_party(target.parties.get("СвПокуп"))
+        
+        # Строки: сначала СведТов, при их отсутствии - СведТовУслСч
+        items, item_issues = rows["СведТов"]
+        self.issues.extend(item_issues)
+        if not items:
+            items, item_issues = rows["СведТовУслСч"]
+            self.issues.extend(item_issues)
+        
+        return self._build_document(
+            document_number, document_date, supplier_name, supplier_inn,
+            buyer_name, buyer_inn, items, header.get("ВерсФорм")
+        )
+    
+    def parse_tree(self, xml_content: bytes) -> UPDDocument:
+        """
+        Парсинг XML УПД документа через полное дерево ElementTree
+        
+        Прежняя реализация: несколько проходов по дереву. Оставлена для
+        сверки результатов и бенчмарка (scripts/bench_upd_parser.py).
         
         Args:
             xml_content: содержимое XML файла в байтах
@@ -140,6 +311,23 @@ class UPDParser:
         buyer_name, buyer_inn = self._extract_buyer(root)
         items = self._extract_items(root)
         
+        return self._build_document(
+            document_number, document_date, supplier_name, supplier_inn,
+            buyer_name, buyer_inn, items, self._extract_format_version(root)
+        )
+    
+    def _build_document(
+        self,
+        document_number: Optional[str],
+        document_date: Optional[datetime],
+        supplier_name: Optional[str],
+        supplier_inn: Optional[str],
+        buyer_name: Optional[str],
+        buyer_inn: Optional[str],
+        items: List[UPDItem],
+        format_version: Optional[str]
+    ) -> UPDDocument:
+        """Валидация обязательных полей и сборка UPDDocument"""
         # Валидация обязательных полей
         if not document_number:
             raise UPDParseError("Не найден номер документа")
@@ -166,7 +354,7 @@ class UPDParser:
             items=items,
             parsing_issues=self.issues,
             generator=self.generator,
-            format_version=self._extract_format_version(root)
+            format_version=format_version
         )
     
     def _detect_generator(self, root: ET.Element) -> None:
@@ -189,7 +377,11 @@ class UPDParser:
                 return
         
         # Проверка по атрибутам
-        if root.find(".//*[@НаимЭконСубСост]") is not None:
+        self._set_unknown_generator(root.find(".//*[@НаимЭконСубСост]") is not None)
+    
+    def _set_unknown_generator(self, has_format_501_attrs: bool) -> None:
+        """Генератор не распознан по тексту - определяем по признакам формата"""
+        if has_format_501_attrs:
             self.generator = "Unknown (формат 5.01)"
         else:
             self.generator = "Unknown"
@@ -201,6 +393,70 @@ class UPDParser:
             generator=self.generator
         ))
     
+    def _pick_document_number(self, number: Optional[str], fallback: Optional[str]) -> Optional[str]:
+        """Номер документа из НомерСчФ или НомерДок (fallback)"""
+        if number:
+            return number
+        if fallback:
+            self.issues.append(ParsingIssue(
+                severity=IssueSeverity.WARNING,
+                element="document_number",
+                message="Номер извлечен из НомерДок (fallback)",
+                value=fallback
+            ))
+            return fallback
+        return None
+    
+    def _pick_document_date(self, date_str: Optional[str], fallback: Optional[str]) -> Optional[datetime]:
+        """Дата документа из ДатаСчФ или ДатаДок (fallback)"""
+        if date_str:
+            try:
+                return datetime.strptime(date_str, "%d.%m.%Y")
+            except ValueError:
+                pass
+        if fallback:
+            self.issues.append(ParsingIssue(
+                severity=IssueSeverity.WARNING,
+                element="document_date",
+                message="Дата извлечена из ДатаДок (fallback)",
+                value=fallback
+            ))
+            try:
+                return datetime.strptime(fallback, "%d.%m.%Y")
+            except ValueError:
+                pass
+        return None
+    
+    def _resolve_party(
+        self,
+        party: Optional[Dict[str, Dict[str, Optional[str]]]],
+        split_1c_name: bool = False
+    ) -> tuple[Optional[str], Optional[str]]:
+        """Имя и ИНН участника по первым найденным атрибутам (см. _UPDStreamTarget)"""
+        if party is None:
+            return None, None
+        
+        name_attrs = party.get("НаимОрг") or party.get("НаимЮЛ")
+        name = None
+        if name_attrs is not None:
+            name = name_attrs["НаимОрг"] or name_attrs["НаимЮЛ"]
+        
+        inn = None
+        if split_1c_name and name and self.generator == "1С:Бухгалтерия":
+            if ", ИНН" in name or ",ИНН" in name:
+                name = name.split(",")[0].strip()
+                # Как и в _extract_supplier, ИНН ищется уже в обрезанном имени
+                inn_match = re.search(r'ИНН[:\s]*(\d{10,12})', name)
+                if inn_match:
+                    inn = inn_match.group(1)
+        
+        if not inn:
+            inn_attrs = party.get("ИННЮЛ") or party.get("ИНН")
+            if inn_attrs is not None:
+                inn = inn_attrs["ИННЮЛ"] or inn_attrs["ИНН"]
+        
+        return name, inn
+    
     def _extract_format_version(self, root: ET.Element) -> Optional[str]:
         """Извлечение версии формата"""
         version_elem = root.find(".//*[@ВерсФорм]")
@@ -13,6 +13,7 @@ from app.core.database import get_db
 from app.models import User, RegistrationRequest
 from app.auth.dependencies import get_current_user, require_roles
 from app.auth.security import get_password_hash
+from app.auth.user_cache import invalidate_cached_user
 from app.core.models_base import RegistrationRequestStatus, UserRole
 
 logger = logging.getLogger(__name__)
@@ -262,6 +263,8 @@ async def approve_registration(
     request.created_user_id = new_user.id
     
     await db.commit()
+    # id мог остаться в кэше от ранее удаленного пользователя
+    await invalidate_cached_user(new_user.id)
     
     logger.info(f"Approved registration request #{request_id}, created user #{new_user.id}")
     
@@ -8,6 +8,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..core.database import get_db
 from ..auth.dependencies import get_current_user, require_roles
+from ..auth.user_cache import invalidate_cached_user
 from ..models import User
 from .schemas import (
     UserListResponse,
@@ -92,6 +93,7 @@ async def update_user_roles(
     
     user.roles = request.roles
     await db.commit()
+    await invalidate_cached_user(user.id)
     await db.refresh(user)
     
     return UserResponse(
@@ -134,6 +136,7 @@ async def update_user_active_status(
     
     user.is_active = request.is_active
     await db.commit()
+    await invalidate_cached_user(user.id)
     await db.refresh(user)
     
     return UserResponse(
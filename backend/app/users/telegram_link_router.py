@@ -14,6 +14,7 @@ from pydantic import BaseModel
 from app.core.database import get_db
 from app.models import User, TelegramLinkCode
 from app.auth.dependencies import get_current_user
+from app.auth.user_cache import invalidate_cached_user
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -215,6 +216,7 @@ async def link_telegram_account(
     link_code.used_at = datetime.now()
     
     await db.commit()
+    await invalidate_cached_user(user.id)
     await db.refresh(user)
     
     logger.info(
@@ -251,6 +253,7 @@ async def unlink_telegram_account(
     current_user.telegram_chat_id = None
     
     await db.commit()
+    await invalidate_cached_user(current_user.id)
     
     logger.info(
         f"Telegram аккаунт {old_chat_id} отвязан от пользователя "
@@ -31,11 +31,24 @@ async def lifespan(app: FastAPI):
     logger.info(f"Starting {settings.project_name} v{settings.version}")
     logger.info(f"Environment: {settings.environment}")
     logger.info(f"Debug mode: {settings.debug}")
+    if settings.jobs_run_in_app:
+        from app.jobs.worker import start_app_worker
+        await start_app_worker()
     
     yield
     
     # Shutdown
     logger.info(f"Shutting down {settings.project_name}")
+    from app.jobs.worker import stop_app_worker
+    await stop_app_worker()
+    from app.upd.parse_pool import shutdown_upd_parse_pool
+    shutdown_upd_parse_pool()
+    from app.auth.user_cache import close_user_cache
+    await close_user_cache()
+    from app.middleware.audit_sink import close_audit_sink
+    await close_audit_sink()
+    from app.time_sheets.preview_store import close_preview_store
+    await close_preview_store()
 
 
 # Создание приложения
@@ -109,6 +122,7 @@ from app.users.telegram_link_router import router as telegram_link_router
 from app.api.routes.audit import router as audit_router
 from app.websocket.router import router as websocket_router
 from app.costs.router import router as costs_router
+from app.jobs.router import router as jobs_router
 from app.api.v2.timesheets import router as timesheets_v2_router
 
 # Audit middleware (должен быть после CORS)
@@ -133,6 +147,7 @@ app.include_router(registration_router, prefix=f"{settings.api_v1_prefix}/regist
 app.include_router(users_router, prefix=f"{settings.api_v1_prefix}/users", tags=["Users"])
 app.include_router(telegram_link_router, prefix=f"{settings.api_v1_prefix}/users", tags=["Telegram Link"])
 app.include_router(audit_router, prefix=f"{settings.api_v1_prefix}/audit", tags=["Audit Log"])
+app.include_router(jobs_router, prefix=f"{settings.api_v1_prefix}/jobs", tags=["Jobs"])
 app.include_router(timesheets_v2_router, prefix="/api/v2/miniapp", tags=["Mini App Timesheets"])
 app.include_router(websocket_router, prefix=f"{settings.api_v1_prefix}", tags=["WebSocket"])
 
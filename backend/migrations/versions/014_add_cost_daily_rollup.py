@@ -0,0 +1,47 @@
+"""Add cost_daily_rollup table
+
+Revision ID: 014
+Revises: afe18e5a2aa4
+Create Date: 2026-10-16 10:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '014'
+down_revision = 'afe18e5a2aa4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Дневная сводка затрат по объекту и типу (материализация cost_entries)
+    op.create_table(
+        'cost_daily_rollup',
+        sa.Column('cost_object_id', sa.Integer(), nullable=False),
+        sa.Column('date', sa.Date(), nullable=False),
+        sa.Column('type', sa.String(length=50), nullable=False),
+        sa.Column('amount', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('entries_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint('cost_object_id', 'date', 'type'),
+        sa.ForeignKeyConstraint(['cost_object_id'], ['cost_objects.id'], ondelete='CASCADE'),
+    )
+    op.create_index('ix_cost_daily_rollup_date', 'cost_daily_rollup', ['date'])
+
+    # Первичное заполнение из существующих записей затрат
+    op.execute(
+        """
+        INSERT INTO cost_daily_rollup (cost_object_id, date, type, amount, entries_count)
+        SELECT cost_object_id, date, type, SUM(amount), COUNT(id)
+        FROM cost_entries
+        GROUP BY cost_object_id, date, type
+        """
+    )
+
+
+def downgrade():
+    op.drop_index('ix_cost_daily_rollup_date', table_name='cost_daily_rollup')
+    op.drop_table('cost_daily_rollup')
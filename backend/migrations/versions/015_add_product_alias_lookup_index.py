@@ -0,0 +1,44 @@
+"""Add composite (supplier_name, supplier_inn) index to product_aliases
+
+Revision ID: 015
+Revises: 014
+Create Date: 2026-10-16 12:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '015'
+down_revision = '014'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Таблица создается через create_all, поэтому может отсутствовать
+    if not sa.inspect(op.get_bind()).has_table('product_aliases'):
+        return
+
+    # Составной индекс покрывает и поиск только по supplier_name
+    op.create_index(
+        'ix_product_aliases_supplier_name_inn',
+        'product_aliases',
+        ['supplier_name', 'supplier_inn'],
+        if_not_exists=True,
+    )
+    op.drop_index('ix_product_aliases_supplier_name', table_name='product_aliases', if_exists=True)
+
+
+def downgrade():
+    if not sa.inspect(op.get_bind()).has_table('product_aliases'):
+        return
+
+    op.create_index(
+        'ix_product_aliases_supplier_name',
+        'product_aliases',
+        ['supplier_name'],
+        if_not_exists=True,
+    )
+    op.drop_index('ix_product_aliases_supplier_name_inn', table_name='product_aliases', if_exists=True)
@@ -0,0 +1,42 @@
+"""Add delivery attempt fields to telegram_notifications
+
+Revision ID: 016
+Revises: 015
+Create Date: 2026-10-16 14:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '016'
+down_revision = '015'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        'telegram_notifications',
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0')
+    )
+    op.add_column('telegram_notifications', sa.Column('next_attempt_at', sa.DateTime(), nullable=True))
+    op.create_index(
+        'ix_telegram_notifications_next_attempt_at', 'telegram_notifications', ['next_attempt_at']
+    )
+
+    # Счетчик попыток раньше хранился в data->retry_count
+    op.execute(
+        """
+        UPDATE telegram_notifications
+        SET attempts = CAST(data->>'retry_count' AS INTEGER)
+        WHERE data->>'retry_count' IS NOT NULL
+        """
+    )
+
+
+def downgrade():
+    op.drop_index('ix_telegram_notifications_next_attempt_at', table_name='telegram_notifications')
+    op.drop_column('telegram_notifications', 'next_attempt_at')
+    op.drop_column('telegram_notifications', 'attempts')
@@ -0,0 +1,33 @@
+"""Add bot_fsm_states table for persistent aiogram FSM storage
+
+Revision ID: 017
+Revises: 016
+Create Date: 2026-10-16 16:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '017'
+down_revision = '016'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'bot_fsm_states',
+        sa.Column('key', sa.String(length=255), nullable=False),
+        sa.Column('state', sa.String(length=255), nullable=True),
+        sa.Column('data', sa.JSON(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index('ix_bot_fsm_states_updated_at', 'bot_fsm_states', ['updated_at'])
+
+
+def downgrade():
+    op.drop_index('ix_bot_fsm_states_updated_at', table_name='bot_fsm_states')
+    op.drop_table('bot_fsm_states')
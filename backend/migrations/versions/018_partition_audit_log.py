@@ -0,0 +1,134 @@
+"""Add audit_daily_stats and partition audit_log by month (PostgreSQL)
+
+Revision ID: 018
+Revises: 017
+Create Date: 2026-10-17 10:00:00
+
+"""
+from datetime import date, timedelta
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '018'
+down_revision = '017'
+branch_labels = None
+depends_on = None
+
+AUDIT_LOG_COLUMNS = """
+    timestamp TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+    user_id INTEGER REFERENCES users(id) ON DELETE SET NULL,
+    action VARCHAR(100) NOT NULL,
+    entity_type VARCHAR(50) NOT NULL,
+    entity_id INTEGER,
+    old_value TEXT,
+    new_value TEXT,
+    ip_address VARCHAR(45),
+    user_agent TEXT,
+    description TEXT
+"""
+COLUMN_NAMES = (
+    "id, timestamp, user_id, action, entity_type, entity_id, "
+    "old_value, new_value, ip_address, user_agent, description"
+)
+INDEXED_COLUMNS = ['id', 'timestamp', 'user_id', 'action', 'entity_type', 'entity_id']
+
+
+def _next_month(month: date) -> date:
+    return (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _create_indexes():
+    for column in INDEXED_COLUMNS:
+        op.create_index(f'ix_audit_log_{column}', 'audit_log', [column])
+
+
+def _partition_audit_log():
+    """audit_log -> секционированная по месяцам таблица с переносом записей"""
+    bind = op.get_bind()
+    op.execute("ALTER TABLE audit_log RENAME TO audit_log_legacy")
+    op.execute("ALTER TABLE audit_log_legacy RENAME CONSTRAINT audit_log_pkey TO audit_log_legacy_pkey")
+    op.execute("ALTER SEQUENCE audit_log_id_seq OWNED BY NONE")
+
+    # Ключ партиции должен входить в первичный ключ
+    op.execute(f"""
+        CREATE TABLE audit_log (
+            id INTEGER NOT NULL DEFAULT nextval('audit_log_id_seq'),
+            {AUDIT_LOG_COLUMNS},
+            PRIMARY KEY (id, timestamp)
+        ) PARTITION BY RANGE (timestamp)
+    """)
+    op.execute("ALTER SEQUENCE audit_log_id_seq OWNED BY audit_log.id")
+
+    # Партиции месяцев существующих записей и двух следующих месяцев
+    oldest = bind.execute(sa.text("SELECT min(timestamp) FROM audit_log_legacy")).scalar()
+    month = (oldest.date() if oldest else date.today()).replace(day=1)
+    last = _next_month(_next_month(date.today().replace(day=1)))
+    while month <= last:
+        op.execute(
+            f"CREATE TABLE audit_log_y{month.year}m{month.month:02d} PARTITION OF audit_log "
+            f"FOR VALUES FROM ('{month}') TO ('{_next_month(month)}')"
+        )
+        month = _next_month(month)
+    op.execute("CREATE TABLE audit_log_default PARTITION OF audit_log DEFAULT")
+
+    op.execute(f"INSERT INTO audit_log ({COLUMN_NAMES}) SELECT {COLUMN_NAMES} FROM audit_log_legacy")
+    op.execute("DROP TABLE audit_log_legacy")
+    _create_indexes()
+
+
+def _unpartition_audit_log():
+    op.execute("ALTER TABLE audit_log RENAME TO audit_log_partitioned")
+    op.execute("ALTER TABLE audit_log_partitioned RENAME CONSTRAINT audit_log_pkey TO audit_log_partitioned_pkey")
+    op.execute("ALTER SEQUENCE audit_log_id_seq OWNED BY NONE")
+    for column in INDEXED_COLUMNS:
+        op.execute(f"ALTER INDEX ix_audit_log_{column} RENAME TO ix_audit_log_partitioned_{column}")
+
+    op.execute(f"""
+        CREATE TABLE audit_log (
+            id INTEGER NOT NULL DEFAULT nextval('audit_log_id_seq') PRIMARY KEY,
+            {AUDIT_LOG_COLUMNS}
+        )
+    """)
+    op.execute("ALTER SEQUENCE audit_log_id_seq OWNED BY audit_log.id")
+    op.execute(f"INSERT INTO audit_log ({COLUMN_NAMES}) SELECT {COLUMN_NAMES} FROM audit_log_partitioned")
+    op.execute("DROP TABLE audit_log_partitioned CASCADE")
+    _create_indexes()
+
+
+def upgrade():
+    # Дневная статистика журнала аудита (для /audit/stats и после архивации)
+    op.create_table(
+        'audit_daily_stats',
+        sa.Column('date', sa.Date(), nullable=False),
+        sa.Column('action', sa.String(length=100), nullable=False),
+        sa.Column('entity_type', sa.String(length=50), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('count', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('date', 'action', 'entity_type', 'user_id'),
+    )
+    op.create_index('ix_audit_daily_stats_date', 'audit_daily_stats', ['date'])
+
+    # Первичное заполнение из существующих записей
+    op.execute(
+        """
+        INSERT INTO audit_daily_stats (date, action, entity_type, user_id, count)
+        SELECT date(timestamp), action, entity_type, COALESCE(user_id, 0), COUNT(id)
+        FROM audit_log
+        GROUP BY date(timestamp), action, entity_type, COALESCE(user_id, 0)
+        """
+    )
+
+    # На SQLite таблица остается обычной: старые месяцы удаляются порциями
+    if op.get_bind().dialect.name == 'postgresql':
+        _partition_audit_log()
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        _unpartition_audit_log()
+
+    op.drop_index('ix_audit_daily_stats_date', table_name='audit_daily_stats')
+    op.drop_table('audit_daily_stats')
@@ -0,0 +1,26 @@
+"""Add deleted_at to estimate_items for incremental estimate re-import
+
+Revision ID: 019
+Revises: 018
+Create Date: 2026-10-17 12:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '019'
+down_revision = '018'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Позиции, исчезнувшие из повторно загруженной сметы, помечаются, а не удаляются
+    op.add_column('estimate_items', sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade():
+    op.execute("DELETE FROM estimate_items WHERE deleted_at IS NOT NULL")
+    op.drop_column('estimate_items', 'deleted_at')
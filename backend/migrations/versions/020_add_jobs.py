@@ -0,0 +1,54 @@
+"""Add jobs table for background imports, exports and recomputations
+
+Revision ID: 020
+Revises: 019
+Create Date: 2026-10-17 14:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '020'
+down_revision = '019'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'jobs',
+        sa.Column('id', sa.String(length=32), nullable=False),
+        sa.Column('type', sa.String(length=50), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('payload', sa.JSON(), nullable=True),
+        sa.Column('progress', sa.Float(), nullable=True),
+        sa.Column('progress_message', sa.String(length=255), nullable=True),
+        sa.Column('result', sa.JSON(), nullable=True),
+        sa.Column('result_path', sa.String(length=500), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('max_attempts', sa.Integer(), nullable=False, server_default='3'),
+        sa.Column('run_at', sa.DateTime(), nullable=False),
+        sa.Column('worker_id', sa.String(length=100), nullable=True),
+        sa.Column('heartbeat_at', sa.DateTime(), nullable=True),
+        sa.Column('created_by', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['created_by'], ['users.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_jobs_type', 'jobs', ['type'])
+    op.create_index('ix_jobs_status', 'jobs', ['status'])
+    op.create_index('ix_jobs_run_at', 'jobs', ['run_at'])
+    op.create_index('ix_jobs_created_by', 'jobs', ['created_by'])
+
+
+def downgrade():
+    op.drop_index('ix_jobs_created_by', table_name='jobs')
+    op.drop_index('ix_jobs_run_at', table_name='jobs')
+    op.drop_index('ix_jobs_status', table_name='jobs')
+    op.drop_index('ix_jobs_type', table_name='jobs')
+    op.drop_table('jobs')
@@ -0,0 +1,34 @@
+"""Add timesheet_previews table for Excel upload previews shared between workers
+
+Revision ID: 021
+Revises: 020
+Create Date: 2026-10-17 16:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '021'
+down_revision = '020'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'timesheet_previews',
+        sa.Column('id', sa.String(length=36), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('data', sa.LargeBinary(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_timesheet_previews_expires_at', 'timesheet_previews', ['expires_at'])
+
+
+def downgrade():
+    op.drop_index('ix_timesheet_previews_expires_at', table_name='timesheet_previews')
+    op.drop_table('timesheet_previews')
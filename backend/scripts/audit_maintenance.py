@@ -0,0 +1,56 @@
+"""
+Обслуживание журнала аудита (запуск по расписанию, например раз в сутки)
+
+- создает партиции audit_log на следующие месяцы (PostgreSQL);
+- выгружает полные месяцы старше AUDIT_RETENTION_DAYS в
+  AUDIT_ARCHIVE_DIR/audit_log_YYYY_MM.jsonl.gz и удаляет их из БД.
+
+Запуск:
+    python scripts/audit_maintenance.py
+    python scripts/audit_maintenance.py --rebuild-stats   # пересобрать audit_daily_stats
+"""
+import argparse
+import asyncio
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Добавляем корневую директорию в путь
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.services.audit_storage_service import AuditStorageService
+
+
+async def maintain(rebuild_stats: bool = False):
+    async with AsyncSessionLocal() as session:
+        service = AuditStorageService(session)
+
+        if rebuild_stats:
+            rows = await service.rebuild_stats()
+            await session.commit()
+            print(f"✅ Статистика аудита пересобрана: {rows} строк")
+
+        created = await service.ensure_partitions(settings.audit_partitions_ahead)
+        for name in created:
+            print(f"✅ Создана партиция {name}")
+
+        cutoff = (datetime.utcnow() - timedelta(days=settings.audit_retention_days)).date()
+        archived = await service.archive_before(
+            cutoff,
+            settings.audit_archive_dir,
+            chunk_size=settings.audit_delete_chunk_size
+        )
+        for result in archived:
+            print(f"📦 {result['month']}: {result['rows']} записей -> {result['file']}")
+
+    if not created and not archived:
+        print("Журнал аудита не требует обслуживания")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Партиции и архивация журнала аудита")
+    parser.add_argument("--rebuild-stats", action="store_true", help="Пересобрать audit_daily_stats из audit_log")
+    args = parser.parse_args()
+    asyncio.run(maintain(args.rebuild_stats))
@@ -0,0 +1,110 @@
+"""
+Бенчмарк сводки по объектам (AnalyticsService.get_all_objects_summary)
+
+Сравнивает прежнюю схему "запрос на каждый объект" с одним сгруппированным
+запросом. Печатает количество SQL-запросов и время для разного числа объектов.
+
+Запуск:
+    python scripts/bench_analytics_summary.py
+"""
+import asyncio
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+# Добавляем корневую директорию в путь
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy import event, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.core.database import Base
+from app.models import CostEntry, CostObject
+import app.auth.models_rbac  # noqa: F401
+import app.materials.models_mapping  # noqa: F401
+from app.analytics.service import AnalyticsService
+from app.services.cost_rollup_service import CostRollupService
+
+OBJECT_COUNTS = [10, 100, 500, 1000]
+ENTRIES_PER_OBJECT = 30
+ROUNDS = 5
+
+
+async def legacy_summary(service: AnalyticsService, period_start, period_end):
+    """Прежняя реализация: get_object_costs для каждого объекта"""
+    objects = (await service.db.execute(select(CostObject))).scalars().all()
+    return [
+        await service.get_object_costs(obj.id, period_start, period_end)
+        for obj in objects
+    ]
+
+
+async def seed(session: AsyncSession, count: int):
+    today = date.today()
+    await session.execute(insert(CostObject), [
+        {"name": f"Объект {i}", "code": f"BENCH-{i:05d}", "contract_amount": 1_000_000.0}
+        for i in range(count)
+    ])
+    await session.execute(insert(CostEntry), [
+        {
+            "type": ("labor", "equipment", "material")[j % 3],
+            "cost_object_id": i + 1,
+            "date": today - timedelta(days=j),
+            "amount": 100.0 + j,
+        }
+        for i in range(count)
+        for j in range(ENTRIES_PER_OBJECT)
+    ])
+    await CostRollupService(session).rebuild()
+    await session.commit()
+
+
+async def measure(session: AsyncSession, func):
+    counter = {"count": 0}
+
+    def before_cursor_execute(*args, **kwargs):
+        counter["count"] += 1
+
+    sync_engine = session.bind.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", before_cursor_execute)
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        await func()
+    elapsed_ms = (time.perf_counter() - started) * 1000 / ROUNDS
+    event.remove(sync_engine, "before_cursor_execute", before_cursor_execute)
+    return counter["count"] // ROUNDS, elapsed_ms
+
+
+async def run():
+    period_start = date.today() - timedelta(days=14)
+    period_end = date.today()
+
+    print(f"{'objects':>8} | {'legacy q':>8} | {'legacy ms':>10} | {'set q':>6} | {'set ms':>8}")
+    print("-" * 52)
+    for count in OBJECT_COUNTS:
+        engine = create_async_engine(
+            "sqlite+aiosqlite:///:memory:",
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool,
+        )
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+        async with async_sessionmaker(engine, class_=AsyncSession)() as session:
+            await seed(session, count)
+            service = AnalyticsService(session)
+            legacy_q, legacy_ms = await measure(
+                session, lambda: legacy_summary(service, period_start, period_end)
+            )
+            set_q, set_ms = await measure(
+                session, lambda: service.get_all_objects_summary(period_start, period_end)
+            )
+        await engine.dispose()
+
+        print(f"{count:>8} | {legacy_q:>8} | {legacy_ms:>10.1f} | {set_q:>6} | {set_ms:>8.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
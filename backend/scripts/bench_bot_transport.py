@@ -0,0 +1,129 @@
+"""
+Бенчмарк транспорта APIClient бота: HTTP против ASGI в процессе
+
+Backend поднимается через uvicorn на локальном порту, а бот вызывает его
+тремя способами:
+- legacy - новый httpx.AsyncClient на каждый запрос (как было раньше);
+- http   - общий пул соединений с keep-alive (BOT_API_TRANSPORT=http);
+- asgi   - прямой вызов FastAPI приложения в процессе (BOT_API_TRANSPORT=asgi).
+
+Одно "нажатие кнопки" - вход по Telegram ID и список объектов.
+Печатает среднюю и p95 задержку на нажатие.
+
+Запуск:
+    python scripts/bench_bot_transport.py [нажатий]
+"""
+import asyncio
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Добавляем корневую директорию в путь
+sys.path.append(str(Path(__file__).parent.parent))
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_tmp.name}/bench.db"
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "bench-token")
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+from main import app  # noqa: E402
+from app.bot.config import config  # noqa: E402
+from app.bot.utils import api_client  # noqa: E402
+from app.bot.utils.api_client import APIClient, close_http_client  # noqa: E402
+from app.core.database import AsyncSessionLocal, Base, engine  # noqa: E402
+from app.models import CostObject, User  # noqa: E402
+
+TELEGRAM_ID = 424242
+OBJECTS = 20
+
+
+async def seed():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSessionLocal() as session:
+        await session.execute(insert(User), [{
+            "username": "bench", "phone": "+79990000000", "hashed_password": "x",
+            "roles": ["ADMIN"], "telegram_chat_id": TELEGRAM_ID, "is_active": True
+        }])
+        await session.execute(insert(CostObject), [
+            {"name": f"Объект {i}", "code": f"BENCH-{i:03d}", "contract_amount": 1_000_000.0}
+            for i in range(OBJECTS)
+        ])
+        await session.commit()
+
+
+async def press(api: APIClient):
+    """Одно нажатие кнопки в боте"""
+    login = await api.login_telegram(TELEGRAM_ID)
+    objects = await api.get_objects(token=login["access_token"])
+    assert len(objects) == OBJECTS
+
+
+async def legacy_press():
+    """Прежняя схема: свой клиент (и свое TCP соединение) на каждый вызов"""
+    async with httpx.AsyncClient(timeout=30.0) as client:
+        login = await APIClient(client=client).login_telegram(TELEGRAM_ID)
+    async with httpx.AsyncClient(timeout=30.0) as client:
+        await APIClient(client=client).get_objects(token=login["access_token"])
+
+
+async def measure(name: str, call, presses: int):
+    await call()  # прогрев
+    samples = []
+    for _ in range(presses):
+        started = time.perf_counter()
+        await call()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{name:>8} | {statistics.mean(samples):>8.2f} | {p95:>8.2f}")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run(presses: int):
+    await seed()
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="off"))
+    serve_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    config.api_base_url = f"http://127.0.0.1:{port}/api/v1"
+    print(f"{presses} нажатий (вход + список из {OBJECTS} объектов), мс на нажатие")
+    print(f"{'mode':>8} | {'mean':>8} | {'p95':>8}")
+    print("-" * 30)
+    try:
+        await measure("legacy", legacy_press, presses)
+
+        config.api_transport = "http"
+        api = APIClient()
+        await measure("http", lambda: press(api), presses)
+        await close_http_client()
+
+        config.api_transport = "asgi"
+        await measure("asgi", lambda: press(api), presses)
+        assert isinstance(api_client.get_http_client()._transport, httpx.ASGITransport)
+        await close_http_client()
+    finally:
+        server.should_exit = True
+        await serve_task
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    presses = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    asyncio.run(run(presses))
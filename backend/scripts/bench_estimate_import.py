@@ -0,0 +1,126 @@
+"""
+Бенчмарк импорта сметы из Excel (EstimateService.parse_and_save_excel)
+
+Сравнивает прежний импорт (полная загрузка книги openpyxl, ORM объект на
+каждую позицию, session.add_all) с потоковым (read_only, разбор в потоке,
+пачки Core INSERT) на синтетических сметах, а также повторную загрузку
+той же сметы (reimport - записываются только отличия). Печатает время,
+пик памяти Python (tracemalloc) и максимальную задержку event loop.
+
+Запуск:
+    python scripts/bench_estimate_import.py [строк ...]
+"""
+import asyncio
+import io
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+# Добавляем корневую директорию в путь
+sys.path.append(str(Path(__file__).parent.parent))
+
+import openpyxl
+from fastapi import UploadFile
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core.database import Base
+import app.auth.models_rbac  # noqa: F401
+import app.materials.models_mapping  # noqa: F401
+from app.models import CostObject, EstimateItem
+from app.services.estimate_service import EstimateService, parse_estimate_row
+
+
+def make_workbook(path: Path, rows: int) -> None:
+    """Синтетическая смета: раздел на каждые 50 позиций"""
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(["№", "Наименование", "Ед.", "Кол-во", "Цена", "Сумма"])
+    for i in range(rows):
+        if i % 50 == 0:
+            ws.append([None, f"Раздел {i // 50 + 1}", None, None, None, None])
+        qty, price = i % 17 + 1, 100 + i % 900
+        ws.append([i + 1, f"Материал {i} (ГОСТ 1234-{i % 90})", "шт", qty, price, qty * price])
+    wb.save(path)
+
+
+async def legacy_import(session: AsyncSession, object_id: int, file: UploadFile):
+    """Прежний импорт: книга целиком в памяти и ORM объект на позицию"""
+    obj = await session.get(CostObject, object_id)
+    await session.execute(delete(EstimateItem).where(EstimateItem.cost_object_id == object_id))
+    content = await file.read()
+    wb = openpyxl.load_workbook(io.BytesIO(content), data_only=True)
+    items, category, total_sum = [], "Общее", 0.0
+    for row in wb.active.iter_rows(min_row=2, values_only=True):
+        item, category = parse_estimate_row(row, category)
+        if item is not None:
+            items.append(EstimateItem(cost_object_id=object_id, **item))
+            total_sum += item["total_amount"]
+    session.add_all(items)
+    obj.material_amount = total_sum
+    await session.commit()
+    return {"items_count": len(items)}
+
+
+async def streaming_import(session: AsyncSession, object_id: int, file: UploadFile):
+    return await EstimateService.parse_and_save_excel(session, object_id, file)
+
+
+async def measure(factory, object_id: int, path: Path, do_import, fresh: bool = True):
+    if fresh:
+        async with factory() as session:
+            await session.execute(delete(EstimateItem))
+            await session.commit()
+    stalls = []
+
+    async def ticker():
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(0.01)
+            stalls.append(time.perf_counter() - started - 0.01)
+
+    tick = asyncio.create_task(ticker())
+    tracemalloc.start()
+    started = time.perf_counter()
+    with open(path, "rb") as fh:
+        async with factory() as session:
+            result = await do_import(session, object_id, UploadFile(file=fh, filename=path.name))
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    tick.cancel()
+    return result["items_count"], elapsed, peak / 1024 / 1024, max(stalls or [0.0]) * 1000
+
+
+async def run(sizes):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp}/estimate.db")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        async with factory() as session:
+            obj = CostObject(name="Бенчмарк", code="BENCH-1")
+            session.add(obj)
+            await session.commit()
+
+        print(f"{'строк':>7} | {'импорт':>9} | {'позиций':>7} | {'время, с':>8} | {'пик, МБ':>8} | {'max stall, мс':>13}")
+        print("-" * 68)
+        for rows in sizes:
+            path = Path(tmp) / f"estimate_{rows}.xlsx"
+            make_workbook(path, rows)
+            for name, do_import, fresh in (
+                ("legacy", legacy_import, True),
+                ("streaming", streaming_import, True),
+                ("reimport", streaming_import, False),
+            ):
+                items, elapsed, peak, stall = await measure(factory, obj.id, path, do_import, fresh)
+                print(f"{rows:>7} | {name:>9} | {items:>7} | {elapsed:>8.2f} | {peak:>8.1f} | {stall:>13.0f}")
+
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10000, 50000]
+    asyncio.run(run(sizes))
@@ -0,0 +1,107 @@
+"""
+Бенчмарк FSM хранилищ бота: задержка чтения/записи состояния на update
+
+Один update диалога - как в обработчиках: проверка состояния фильтром,
+get_data, update_data и переход в следующее состояние. Сравниваются:
+- memory     - MemoryStorage aiogram;
+- sql-direct - таблица bot_fsm_states без кэша, запись на каждый update;
+- sql        - SQLStorage с кэшем чтений и пакетной записью;
+- redis      - RedisStorage aiogram (если доступен REDIS_URL).
+
+Запуск:
+    python scripts/bench_fsm_storage.py [пользователей] [updates_на_пользователя]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Добавляем корневую директорию в путь
+sys.path.append(str(Path(__file__).parent.parent))
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "bench-token")
+
+from aiogram.fsm.context import FSMContext  # noqa: E402
+from aiogram.fsm.storage.base import StorageKey  # noqa: E402
+from aiogram.fsm.storage.memory import MemoryStorage  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine  # noqa: E402
+
+from app.core.database import Base  # noqa: E402
+from app.bot.fsm_storage import SQLStorage  # noqa: E402
+from app.bot.models import BotFSMState  # noqa: E402
+from app.bot.states import MaterialRequestStates  # noqa: E402
+
+STEPS = [
+    MaterialRequestStates.select_object,
+    MaterialRequestStates.select_material_type,
+    MaterialRequestStates.input_delivery_time,
+]
+
+
+async def one_update(storage, user_id: int, step: int):
+    state = FSMContext(storage=storage, key=StorageKey(bot_id=1, chat_id=user_id, user_id=user_id))
+    await state.get_state()
+    data = await state.get_data()
+    await state.update_data(step=step, token="jwt", items=data.get("items", []) + [{"name": "Цемент"}])
+    await state.set_state(STEPS[step % len(STEPS)])
+
+
+async def measure(name: str, storage, users: int, updates: int, flush_each: bool = False):
+    samples = []
+    started = time.perf_counter()
+    for step in range(updates):
+        for user_id in range(users):
+            t0 = time.perf_counter()
+            await one_update(storage, user_id, step)
+            if flush_each:
+                await storage.flush()
+            samples.append((time.perf_counter() - t0) * 1_000_000)
+    if isinstance(storage, SQLStorage):
+        await storage.flush()
+    elapsed = time.perf_counter() - started
+    samples.sort()
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{name:>10} | {statistics.mean(samples):>9.0f} | {p95:>9.0f} | {len(samples) / elapsed:>9.0f}")
+    await storage.close()
+
+
+async def redis_storage():
+    try:
+        from aiogram.fsm.storage.redis import RedisStorage
+
+        storage = RedisStorage.from_url(os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+        await storage.redis.ping()
+        return storage
+    except Exception as e:
+        print(f"{'redis':>10} | недоступен: {e}")
+        return None
+
+
+async def run(users: int, updates: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp}/fsm.db")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all, tables=[BotFSMState.__table__])
+        factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+        print(f"{users} пользователей x {updates} updates, мкс на update")
+        print(f"{'storage':>10} | {'mean':>9} | {'p95':>9} | {'upd/s':>9}")
+        print("-" * 48)
+        await measure("memory", MemoryStorage(), users, updates)
+        await measure("sql-direct", SQLStorage(factory, cache_ttl=0), users, updates, flush_each=True)
+        await measure("sql", SQLStorage(factory, flush_interval=0.2, cache_ttl=5), users, updates)
+
+        storage = await redis_storage()
+        if storage is not None:
+            await measure("redis", storage, users, updates)
+
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    updates = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    asyncio.run(run(users, updates))
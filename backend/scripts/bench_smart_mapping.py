@@ -0,0 +1,102 @@
+"""
+Бенчмарк подбора позиций сметы для строк УПД (SmartMappingService)
+
+Сравнивает прежнюю схему "загрузка сметы и extractOne на каждую строку"
+с пакетным find_best_matches по закэшированному индексу. Печатает время
+для УПД из 200 строк на сметах разного размера.
+
+Запуск:
+    python scripts/bench_smart_mapping.py
+"""
+import asyncio
+import random
+import sys
+import time
+from pathlib import Path
+
+# Добавляем корневую директорию в путь
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.core.database import Base
+from app.models import CostObject, EstimateItem
+import app.auth.models_rbac  # noqa: F401
+from app.materials.models_mapping import ProductAlias
+from app.services.smart_mapping import SmartMappingService, invalidate_estimate_index
+
+ESTIMATE_SIZES = [500, 2000, 5000]
+UPD_LINES = 200
+ROUNDS = 3
+
+WORDS = [
+    "Кабель", "ВВГнг-LS", "3х2,5", "3х1,5", "Труба", "ПНД", "ПЭ100", "32мм", "Саморез", "4,2х75",
+    "Профиль", "ПП", "60х27", "Гипсокартон", "12,5мм", "Кирпич", "М150", "Бетон", "B25", "Арматура", "А500С",
+]
+
+
+def random_names(rng: random.Random, count: int):
+    return [" ".join(rng.sample(WORDS, rng.randint(2, 5))) for _ in range(count)]
+
+
+async def legacy_matches(service: SmartMappingService, names, cost_object_id):
+    """Прежняя реализация: смета читается и сканируется для каждой строки"""
+    results = []
+    for name in names:
+        await service.db.execute(select(ProductAlias).where(
+            ProductAlias.supplier_name == name.strip(), ProductAlias.supplier_inn.is_(None)
+        ))
+        items = (await service.db.execute(
+            select(EstimateItem).where(EstimateItem.cost_object_id == cost_object_id)
+        )).scalars().all()
+        results.append(service._fuzzy_search(name.strip(), [item.name for item in items]))
+    return results
+
+
+async def measure(func):
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        await func()
+    return (time.perf_counter() - started) * 1000 / ROUNDS
+
+
+async def run():
+    rng = random.Random(42)
+    print(f"{'estimate':>8} | {'legacy ms':>10} | {'cold ms':>8} | {'warm ms':>8}")
+    print("-" * 44)
+    for size in ESTIMATE_SIZES:
+        engine = create_async_engine(
+            "sqlite+aiosqlite:///:memory:",
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool,
+        )
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+        async with async_sessionmaker(engine, class_=AsyncSession)() as session:
+            await session.execute(insert(CostObject), [{"name": "Объект", "code": "BENCH-1"}])
+            await session.execute(insert(EstimateItem), [
+                {"cost_object_id": 1, "name": name, "unit": "шт", "quantity": 1.0, "price": 1.0, "total_amount": 1.0}
+                for name in random_names(rng, size)
+            ])
+            await session.commit()
+
+            service = SmartMappingService(session)
+            names = random_names(rng, UPD_LINES)
+            legacy_ms = await measure(lambda: legacy_matches(service, names, 1))
+
+            async def cold():
+                invalidate_estimate_index(1)
+                await service.find_best_matches(names, cost_object_id=1)
+
+            cold_ms = await measure(cold)
+            warm_ms = await measure(lambda: service.find_best_matches(names, cost_object_id=1))
+        await engine.dispose()
+
+        print(f"{size:>8} | {legacy_ms:>10.1f} | {cold_ms:>8.1f} | {warm_ms:>8.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
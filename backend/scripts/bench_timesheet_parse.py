@@ -0,0 +1,175 @@
+"""
+Бенчмарк предпросмотра Excel табеля
+
+1. Разбор (TimeSheetExcelParser): прежний - временный файл, полная
+   загрузка книги openpyxl и чтение ячеек по одной в event loop; текущий -
+   read_only, один проход по строкам из памяти в пуле потоков. Печатает
+   время, пик памяти Python (tracemalloc) и максимальную задержку event loop.
+2. Сопоставление сотрудников и объектов (_validate_and_enrich): прежнее -
+   ORM объекты бригады и всех активных объектов двумя запросами; текущее -
+   id и названия одним запросом UNION ALL.
+
+Запуск:
+    python scripts/bench_timesheet_parse.py [сотрудников ...]
+"""
+import asyncio
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+from pathlib import Path
+
+# Добавляем корневую директорию в путь
+sys.path.append(str(Path(__file__).parent.parent))
+
+from openpyxl import Workbook, load_workbook
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core.database import Base
+import app.auth.models_rbac  # noqa: F401
+import app.materials.models_mapping  # noqa: F401
+from app.models import Brigade, BrigadeMember, CostObject, User
+from app.time_sheets.excel_parser import TimeSheetExcelParser
+from app.time_sheets.excel_preview_service import resolve_names
+
+DAYS = 31
+OBJECTS = 5000
+
+
+def make_timesheet(members: int) -> bytes:
+    """Табель бригады за месяц: строка на сотрудника и день"""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(["Табель рабочего времени бригады"])
+    ws.append(["Бригада: Синтетическая"])
+    ws.append(["Период: 01.10.2026 - 31.10.2026"])
+    ws.append([])
+    ws.append(["ФИО", "Дата", "Объект", "Часы"])
+    for day in range(DAYS):
+        work_date = date(2026, 10, 1) + timedelta(days=day)
+        for m in range(members):
+            ws.append([f"Сотрудник {m} Иванович", work_date, f"Объект {m % 7}", 8 + m % 4])
+    output = io.BytesIO()
+    wb.save(output)
+    return output.getvalue()
+
+
+async def legacy_parse(content: bytes) -> int:
+    """Прежний разбор: временный файл, полная книга, cell() по строкам в event loop"""
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as temp_file:
+        temp_file.write(content)
+        path = temp_file.name
+    try:
+        wb = load_workbook(path, data_only=True)
+        ws = wb.active
+        rows, row_num, empty = 0, 6, 0
+        while empty < 5:
+            values = [ws.cell(row=row_num, column=col).value for col in range(1, 5)]
+            if any(values):
+                empty = 0
+                rows += 1
+            else:
+                empty += 1
+            row_num += 1
+        wb.close()
+        return rows
+    finally:
+        os.unlink(path)
+
+
+async def current_parse(content: bytes) -> int:
+    return len((await TimeSheetExcelParser(content).parse_async())["items"])
+
+
+async def measure(parse, content: bytes):
+    stalls = []
+
+    async def ticker():
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(0.005)
+            stalls.append(time.perf_counter() - started - 0.005)
+
+    tick = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    tracemalloc.start()
+    started = time.perf_counter()
+    rows = await parse(content)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # Дать тикеру заметить блокировку, если она была
+    await asyncio.sleep(0.01)
+    tick.cancel()
+    return rows, elapsed, peak / 1024 / 1024, max(stalls, default=0) * 1000
+
+
+async def legacy_resolve(session: AsyncSession, brigade_id: int, object_keys: set):
+    """Прежнее сопоставление: ORM объекты членов бригады и всех активных объектов"""
+    members = (await session.execute(
+        select(BrigadeMember).where(BrigadeMember.brigade_id == brigade_id)
+    )).scalars().all()
+    objects = (await session.execute(
+        select(CostObject).where(CostObject.is_active == True)
+    )).scalars().all()
+    return (
+        {m.full_name.strip().lower(): m.id for m in members},
+        {o.name.strip().lower(): o.id for o in objects}
+    )
+
+
+async def current_resolve(session: AsyncSession, brigade_id: int, object_keys: set):
+    return await resolve_names(session, brigade_id, object_keys)
+
+
+async def bench_resolve(members: int) -> None:
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with factory() as session:
+        foreman = User(username="bench", phone="+70000000000", hashed_password="x", roles=[])
+        session.add(foreman)
+        await session.flush()
+        brigade = Brigade(foreman_id=foreman.id, name="Синтетическая")
+        session.add(brigade)
+        await session.flush()
+        session.add_all(BrigadeMember(brigade_id=brigade.id, full_name=f"Сотрудник {m} Иванович") for m in range(members))
+        session.add_all(CostObject(name=f"Объект {i}", code=f"B-{i}") for i in range(OBJECTS))
+        await session.commit()
+
+    object_keys = {f"объект {i}" for i in range(7)}
+    for name, resolve in (("legacy", legacy_resolve), ("current", current_resolve)):
+        timings = []
+        for _ in range(5):
+            async with factory() as session:
+                started = time.perf_counter()
+                await resolve(session, brigade.id, object_keys)
+                timings.append(time.perf_counter() - started)
+        print(f"{members:>6} | {OBJECTS:>8} | {name:>8} | {min(timings) * 1000:>10.1f}")
+    await engine.dispose()
+
+
+async def run(sizes):
+    print(f"{'сотр.':>6} | {'строк':>6} | {'разбор':>8} | {'время, с':>8} | {'пик, МБ':>8} | {'max stall, мс':>13}")
+    print("-" * 66)
+    for members in sizes:
+        content = make_timesheet(members)
+        for name, parse in (("legacy", legacy_parse), ("current", current_parse)):
+            rows, elapsed, peak, stall = await measure(parse, content)
+            print(f"{members:>6} | {rows:>6} | {name:>8} | {elapsed:>8.2f} | {peak:>8.1f} | {stall:>13.0f}")
+
+    print()
+    print(f"{'сотр.':>6} | {'объектов':>8} | {'поиск':>8} | {'время, мс':>10}")
+    print("-" * 42)
+    for members in sizes:
+        await bench_resolve(members)
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [20, 100]
+    asyncio.run(run(sizes))
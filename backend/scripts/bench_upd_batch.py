@@ -0,0 +1,91 @@
+"""
+Бенчмарк пакетной загрузки УПД (UPDService.upload_upd_batch)
+
+Сравнивает загрузку файлов из xml/ по одному (upload_upd, коммит на каждый
+документ) с пакетной загрузкой. Печатает время и количество SQL-запросов.
+
+Запуск:
+    python scripts/bench_upd_batch.py
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# Добавляем корневую директорию в путь
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.core.database import Base
+import app.auth.models_rbac  # noqa: F401
+import app.materials.models_mapping  # noqa: F401
+from app.upd.parse_pool import get_upd_parse_pool, shutdown_upd_parse_pool
+from app.upd.service import UPDService
+
+XML_DIR = Path(__file__).parent.parent.parent / "xml"
+ROUNDS = 5
+
+
+async def new_session():
+    engine = create_async_engine(
+        "sqlite+aiosqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    return engine, async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)()
+
+
+async def measure(files, upload):
+    elapsed, queries = [], 0
+    for _ in range(ROUNDS):
+        engine, session = await new_session()
+        counter = {"count": 0}
+
+        def before_cursor_execute(*args, **kwargs):
+            counter["count"] += 1
+
+        event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+        started = time.perf_counter()
+        await upload(UPDService(session), files)
+        elapsed.append((time.perf_counter() - started) * 1000)
+        queries = counter["count"]
+        await session.close()
+        await engine.dispose()
+    return queries, min(elapsed), sum(elapsed) / len(elapsed)
+
+
+async def one_by_one(service, files):
+    for _, content, file_path in files:
+        try:
+            await service.upload_upd(content, file_path)
+        except ValueError:
+            pass
+
+
+async def batch(service, files):
+    await service.upload_upd_batch(files)
+
+
+async def run():
+    files = [
+        (path.name, path.read_bytes(), f"uploads/upd/{path.name}")
+        for path in sorted(XML_DIR.glob("*.xml"))
+    ]
+    print(f"Файлов: {len(files)}, раундов: {ROUNDS}")
+    print(f"{'mode':>12} | {'queries':>7} | {'min ms':>8} | {'avg ms':>8}")
+    print("-" * 45)
+    # Прогрев пула процессов
+    await get_upd_parse_pool().parse(files[0][1])
+    for name, upload in (("one-by-one", one_by_one), ("batch", batch)):
+        queries, best, avg = await measure(files, upload)
+        print(f"{name:>12} | {queries:>7} | {best:>8.1f} | {avg:>8.1f}")
+    shutdown_upd_parse_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
@@ -0,0 +1,89 @@
+"""
+Бенчмарк парсера УПД: потоковый UPDParser.parse против parse_tree
+
+Для файлов из xml/ и для синтетических документов на тысячи строк СведТов
+печатает время разбора и пиковую память (tracemalloc), а также проверяет,
+что оба режима дают одинаковый UPDDocument.
+
+Запуск:
+    python scripts/bench_upd_parser.py
+"""
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+# Добавляем корневую директорию в путь
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.upd.upd_parser import UPDParser
+
+XML_DIR = Path(__file__).parent.parent.parent / "xml"
+SYNTHETIC_ROWS = [1000, 5000, 20000]
+ROUNDS = 5
+
+
+def synthetic_upd(rows: int) -> bytes:
+    """УПД формата 5.01 с заданным числом строк товаров"""
+    items = "".join(
+        f'<СведТов НомСтр="{i}" НаимТов="Материал строительный, позиция {i}" ОКЕИ_Тов="796" '
+        f'КолТов="{i % 50 + 1}" ЦенаТов="125,50" СтТовБезНДС="{(i % 50 + 1) * 125.5:.2f}" '
+        f'НалСт="20%" СтТовУчНал="{(i % 50 + 1) * 150.6:.2f}">'
+        f'<Акциз><БезАкциз>без акциза</БезАкциз></Акциз>'
+        f'<СумНал><СумНал>{(i % 50 + 1) * 25.1:.2f}</СумНал></СумНал>'
+        f'<ДопСведТов ПрТовРаб="1" НаимЕдИзм="шт"/></СведТов>'
+        for i in range(1, rows + 1)
+    )
+    return (
+        '<?xml version="1.0" encoding="windows-1251"?>'
+        '<Файл ИдФайл="BENCH" ВерсФорм="5.01"><Документ КНД="1115131" НаимЭконСубСост="ООО Поставщик">'
+        '<СвСчФакт НомерСчФ="B-1" ДатаСчФ="01.02.2024"><СвПрод><ИдСв>'
+        '<СвЮЛУч НаимОрг="ООО Поставщик" ИННЮЛ="7700000000" КПП="770001001"/></ИдСв></СвПрод>'
+        '<СвПокуп><ИдСв><СвЮЛУч НаимОрг="ООО Покупатель" ИННЮЛ="2300000000"/></ИдСв></СвПокуп>'
+        f'</СвСчФакт><ТаблСчФакт>{items}</ТаблСчФакт></Документ></Файл>'
+    ).encode('windows-1251')
+
+
+def measure(parse, payload: bytes):
+    """Лучшее время (мс) из ROUNDS запусков и пиковая память (КБ)"""
+    best = float("inf")
+    for _ in range(ROUNDS):
+        started = time.perf_counter()
+        parse(payload)
+        best = min(best, (time.perf_counter() - started) * 1000)
+
+    tracemalloc.start()
+    parse(payload)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak / 1024
+
+
+def report(name: str, payload: bytes):
+    streamed = UPDParser().parse(payload)
+    assert streamed == UPDParser().parse_tree(payload), f"{name}: результаты различаются"
+
+    tree_ms, tree_kb = measure(lambda data: UPDParser().parse_tree(data), payload)
+    stream_ms, stream_kb = measure(lambda data: UPDParser().parse(data), payload)
+    print(
+        f"{name:>18} | {len(payload) / 1024:>8.0f} | {len(streamed.items):>6} | "
+        f"{tree_ms:>8.1f} | {stream_ms:>8.1f} | {tree_kb:>9.0f} | {stream_kb:>9.0f}"
+    )
+
+
+def run():
+    print(f"{'document':>18} | {'size KB':>8} | {'items':>6} | {'tree ms':>8} | {'strm ms':>8} | {'tree KB':>9} | {'strm KB':>9}")
+    print("-" * 86)
+    samples = sorted(XML_DIR.glob("*.xml"))
+    largest = max(samples, key=lambda path: path.stat().st_size)
+    report("xml/ (largest)", largest.read_bytes())
+    all_samples = b"".join(path.read_bytes() for path in samples)
+    total_tree = sum(measure(lambda d: UPDParser().parse_tree(d), p.read_bytes())[0] for p in samples)
+    total_stream = sum(measure(lambda d: UPDParser().parse(d), p.read_bytes())[0] for p in samples)
+    print(f"{'xml/ all ' + str(len(samples)):>18} | {len(all_samples) / 1024:>8.0f} | {'':>6} | {total_tree:>8.1f} | {total_stream:>8.1f} |")
+    for rows in SYNTHETIC_ROWS:
+        report(f"synthetic {rows}", synthetic_upd(rows))
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,134 @@
+"""
+Нагрузочный тест отправки Telegram уведомлений (NotificationWorker)
+
+Рассылка на N получателей отправляется через заглушку Bot API с задержкой
+ответа и лимитами Telegram (30 сообщений/с на бота, 1 сообщение/с в чат).
+Сравнивается прежняя последовательная отправка с параллельной отправкой
+через корзины токенов. Печатает время, скорость и число ответов 429.
+
+Запуск:
+    python scripts/load_test_notifications.py [получателей] [сообщений_на_чат] [задержка_мс]
+"""
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Добавляем корневую директорию в путь
+sys.path.append(str(Path(__file__).parent.parent))
+
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendMessage
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core.database import Base
+from app.models import User
+import app.auth.models_rbac  # noqa: F401
+import app.materials.models_mapping  # noqa: F401
+from app.bot.notification_worker import NotificationWorker
+from app.bot.rate_limiter import TokenBucket
+from app.notifications.models import TelegramNotification
+
+TELEGRAM_GLOBAL_RATE = 30.0
+TELEGRAM_CHAT_RATE = 1.0
+
+
+class FakeTelegramBot:
+    """Заглушка Bot API: задержка ответа и 429 при превышении лимитов"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self._global = TokenBucket(TELEGRAM_GLOBAL_RATE)
+        self._chats = {}
+        self.sent = 0
+        self.rejected = 0
+
+    @staticmethod
+    def _take(bucket: TokenBucket) -> bool:
+        bucket._refill(time.monotonic())
+        # Небольшой допуск на задержку доставки запроса
+        if bucket._tokens < 0.75:
+            return False
+        bucket._tokens -= 1
+        return True
+
+    async def send_message(self, chat_id, text, **kwargs):
+        await asyncio.sleep(self.latency)
+        chat_bucket = self._chats.setdefault(chat_id, TokenBucket(TELEGRAM_CHAT_RATE, capacity=1.0))
+        if not (self._take(chat_bucket) and self._take(self._global)):
+            self.rejected += 1
+            raise TelegramRetryAfter(SendMessage(chat_id=chat_id, text=text), "Too Many Requests", 1)
+        self.sent += 1
+
+
+async def seed(session: AsyncSession, recipients: int, per_chat: int):
+    await session.execute(insert(User), [
+        {"username": f"user{i}", "phone": f"+7902{i:07d}", "hashed_password": "x",
+         "roles": ["FOREMAN"], "telegram_chat_id": 10000 + i, "is_active": True}
+        for i in range(recipients)
+    ])
+    await session.execute(insert(TelegramNotification), [
+        {"user_id": i + 1, "notification_type": "load", "title": "Рассылка", "message": f"Сообщение {j}",
+         "telegram_chat_id": 10000 + i, "status": "pending", "is_read": False}
+        for j in range(per_chat)
+        for i in range(recipients)
+    ])
+    await session.commit()
+
+
+async def legacy_send(session: AsyncSession, bot: FakeTelegramBot):
+    """Прежняя схема: по одному сообщению, без учета лимитов"""
+    notifications = (await session.execute(
+        select(TelegramNotification).where(TelegramNotification.status == "pending")
+    )).scalars().all()
+    for notif in notifications:
+        try:
+            await bot.send_message(chat_id=notif.telegram_chat_id, text=notif.message)
+        except TelegramRetryAfter:
+            pass
+    await session.execute(update(TelegramNotification).values(status="pending"))
+    await session.commit()
+
+
+async def run(recipients: int, per_chat: int, latency: float):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp}/load.db")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+        async with async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)() as session:
+            await seed(session, recipients, per_chat)
+            total = recipients * per_chat
+
+            print(f"{total} сообщений, {recipients} чатов, задержка API {latency * 1000:.0f} мс")
+            print(f"{'mode':>10} | {'sec':>7} | {'msg/s':>7} | {'sent':>5} | {'429':>5}")
+            print("-" * 46)
+
+            bot = FakeTelegramBot(latency)
+            started = time.perf_counter()
+            await legacy_send(session, bot)
+            elapsed = time.perf_counter() - started
+            print(f"{'legacy':>10} | {elapsed:>7.1f} | {total / elapsed:>7.1f} | {bot.sent:>5} | {bot.rejected:>5}")
+
+            bot = FakeTelegramBot(latency)
+            worker = NotificationWorker(bot, engine=engine)
+            worker.is_running = True
+            started = time.perf_counter()
+            while bot.sent < total:
+                await worker._drain_pending_notifications()
+                if bot.sent < total:
+                    await asyncio.sleep(await worker._next_wakeup())
+            elapsed = time.perf_counter() - started
+            print(f"{'limited':>10} | {elapsed:>7.1f} | {total / elapsed:>7.1f} | {bot.sent:>5} | {bot.rejected:>5}")
+
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    args = [float(arg) for arg in sys.argv[1:]]
+    recipients = int(args[0]) if len(args) > 0 else 300
+    per_chat = int(args[1]) if len(args) > 1 else 1
+    latency_ms = args[2] if len(args) > 2 else 100.0
+    asyncio.run(run(recipients, per_chat, latency_ms / 1000))
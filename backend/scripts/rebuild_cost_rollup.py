@@ -0,0 +1,42 @@
+"""
+Пересборка дневной сводки затрат (cost_daily_rollup) из cost_entries
+
+Используется для первичного заполнения (backfill) и для восстановления
+сводки после ручных правок таблицы cost_entries.
+
+Запуск:
+    python scripts/rebuild_cost_rollup.py               # все объекты
+    python scripts/rebuild_cost_rollup.py --object 42   # один объект
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+# Добавляем корневую директорию в путь
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.core.database import AsyncSessionLocal, engine, Base
+from app.models import CostDailyRollup
+from app.services.cost_rollup_service import CostRollupService
+
+
+async def rebuild(object_id=None):
+    """Пересборка сводки в одной транзакции"""
+    # Таблица могла еще не существовать (БД без миграции 014)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all, tables=[CostDailyRollup.__table__])
+
+    async with AsyncSessionLocal() as session:
+        rows = await CostRollupService(session).rebuild(object_id)
+        await session.commit()
+
+    scope = f"объекта {object_id}" if object_id else "всех объектов"
+    print(f"✅ Сводка затрат для {scope} пересобрана: {rows} строк")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Пересборка cost_daily_rollup")
+    parser.add_argument("--object", type=int, default=None, help="ID объекта учета")
+    args = parser.parse_args()
+    asyncio.run(rebuild(args.object))
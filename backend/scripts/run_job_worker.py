@@ -0,0 +1,75 @@
+"""
+Отдельные процессы исполнителей фоновых задач
+
+Каждый процесс выполняет до --concurrency задач одновременно; несколько
+процессов (--processes) распределяют тяжелые задачи (разбор Excel,
+пакеты УПД) по ядрам. Задачи берутся из таблицы jobs, поэтому процессы
+могут работать и на других машинах с доступом к той же БД.
+
+Если исполнители запускаются только этим скриптом, в API отключите
+встроенный исполнитель: JOBS_RUN_IN_APP=false.
+
+Запуск:
+    python scripts/run_job_worker.py
+    python scripts/run_job_worker.py --processes 4 --concurrency 2
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import signal
+import sys
+from pathlib import Path
+
+# Добавляем корневую директорию в путь
+sys.path.append(str(Path(__file__).parent.parent))
+
+
+async def run_worker(concurrency: int) -> None:
+    import app.jobs.handlers  # noqa: F401 - регистрация обработчиков
+    from app.jobs.worker import JobWorker
+
+    worker = JobWorker(concurrency=concurrency)
+    loop = asyncio.get_running_loop()
+    stopped = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopped.set)
+
+    task = asyncio.create_task(worker.start())
+    await stopped.wait()
+    await worker.stop()
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+def worker_process(concurrency: int) -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(process)d] %(levelname)s %(message)s")
+    asyncio.run(run_worker(concurrency))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Исполнители фоновых задач")
+    parser.add_argument("--processes", type=int, default=1, help="Количество процессов")
+    parser.add_argument("--concurrency", type=int, default=None, help="Задач одновременно в процессе (JOBS_CONCURRENCY)")
+    args = parser.parse_args()
+
+    if args.processes <= 1:
+        worker_process(args.concurrency)
+        return
+
+    ctx = multiprocessing.get_context("spawn")
+    processes = [ctx.Process(target=worker_process, args=(args.concurrency,)) for _ in range(args.processes)]
+    for process in processes:
+        process.start()
+    print(f"🚀 Запущено исполнителей: {len(processes)}")
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        # SIGINT получают все процессы группы, дожидаемся их остановки
+        for process in processes:
+            process.join()
+
+
+if __name__ == "__main__":
+    main()
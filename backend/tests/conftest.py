@@ -3,7 +3,9 @@ import pytest_asyncio
 import asyncio
 from httpx import AsyncClient
 from typing import AsyncGenerator
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy.pool import StaticPool
 from main import app
 from app.core.database import Base, get_db
 from app.core.config import settings
@@ -44,6 +46,74 @@ async def db_session(test_engine) -> AsyncGenerator[AsyncSession, None]:
         # No rollback here, relying on manual cleanup or test logic. 
         # For ruthless testing, we often want persistence.
 
+@pytest_asyncio.fixture(scope="function")
+async def sqlite_session() -> AsyncGenerator[AsyncSession, None]:
+    """Изолированная in-memory SQLite БД со всеми таблицами (для unit-тестов сервисов)"""
+    import app.auth.models_rbac  # noqa: F401 - регистрация таблиц в Base.metadata
+    import app.materials.models_mapping  # noqa: F401
+
+    engine = create_async_engine(
+        TEST_DATABASE_URL,
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with async_session() as session:
+        yield session
+
+    await engine.dispose()
+
+@pytest_asyncio.fixture(scope="function")
+async def sqlite_file_session(tmp_path) -> AsyncGenerator[AsyncSession, None]:
+    """Файловая SQLite: в отличие от sqlite_session, у каждой сессии engine свое соединение
+    (для тестов фоновых воркеров, работающих параллельно с тестом)"""
+    import app.auth.models_rbac  # noqa: F401 - регистрация таблиц в Base.metadata
+    import app.materials.models_mapping  # noqa: F401
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with async_session() as session:
+        yield session
+
+    await engine.dispose()
+
+@pytest_asyncio.fixture(scope="function")
+async def session_factory(sqlite_file_session) -> async_sessionmaker:
+    """Фабрика сессий к БД sqlite_file_session (для воркеров, открывающих свои сессии)"""
+    return async_sessionmaker(sqlite_file_session.bind, class_=AsyncSession, expire_on_commit=False)
+
+@pytest.fixture
+def count_queries():
+    """Счетчик SQL запросов сессии: counter, stop = count_queries(session)"""
+    listeners = []
+
+    def start(session):
+        counter = {"count": 0}
+
+        def before_cursor_execute(*args, **kwargs):
+            counter["count"] += 1
+
+        sync_engine = session.bind.sync_engine
+        event.listen(sync_engine, "before_cursor_execute", before_cursor_execute)
+        listeners.append((sync_engine, before_cursor_execute))
+
+        def stop():
+            if (sync_engine, before_cursor_execute) in listeners:
+                listeners.remove((sync_engine, before_cursor_execute))
+                event.remove(sync_engine, "before_cursor_execute", before_cursor_execute)
+
+        return counter, stop
+
+    yield start
+    for sync_engine, listener in listeners:
+        event.remove(sync_engine, "before_cursor_execute", listener)
+
 @pytest_asyncio.fixture(scope="function")
 async def async_client(db_session) -> AsyncGenerator[AsyncClient, None]:
     # Override get_db dependency
@@ -0,0 +1,64 @@
+"""Тесты потокового Excel-экспорта AnalyticsService.build_excel_export"""
+from datetime import date, timedelta
+
+import pytest
+from openpyxl import load_workbook
+
+from app.analytics.service import AnalyticsService
+from app.models import CostEntry, CostObject
+from app.services.cost_rollup_service import CostRollupService
+
+
+async def _seed(session, days: int):
+    start = date(2023, 1, 1)
+    rollup = CostRollupService(session)
+    for name in ("Б-объект", "А-объект"):
+        obj = CostObject(name=name, code=f"XLS-{name}", contract_amount=1_000_000.0)
+        session.add(obj)
+        await session.flush()
+        entries = [
+            CostEntry(type=("labor", "material", "equipment")[day % 3], cost_object_id=obj.id,
+                      date=start + timedelta(days=day), amount=100.0)
+            for day in range(days)
+        ]
+        session.add_all(entries)
+        await rollup.add_entries(entries)
+    await session.commit()
+    return start
+
+
+@pytest.mark.asyncio
+async def test_excel_export_sheets(sqlite_session):
+    """Все три листа заполнены, динамика идет по дням"""
+    start = await _seed(sqlite_session, 30)
+    service = AnalyticsService(sqlite_session)
+
+    output = await service.build_excel_export(start, start + timedelta(days=29))
+    wb = load_workbook(output)
+    output.close()
+
+    assert wb.sheetnames == ["Сводка по объектам", "Динамика по датам", "Детализация по видам"]
+
+    summary = [row for row in wb["Сводка по объектам"].iter_rows(min_row=5, values_only=True)]
+    assert [row[0] for row in summary] == ["А-объект", "Б-объект", "ИТОГО:"]
+    assert summary[-1][4] == 6000.0
+
+    dynamics = list(wb["Динамика по датам"].iter_rows(min_row=3, values_only=True))
+    assert len(dynamics) == 30
+    assert dynamics[0][0].date() == start
+    assert dynamics[0][1] == 200.0 and dynamics[0][4] == 200.0
+
+    details = list(wb["Детализация по видам"].iter_rows(min_row=3, values_only=True))
+    assert [row[1] for row in details] == [2000.0, 2000.0, 2000.0]
+
+
+@pytest.mark.asyncio
+async def test_iter_daily_costs_streams_filtered_rows(sqlite_session):
+    """Динамика фильтруется по периоду и объекту"""
+    start = await _seed(sqlite_session, 10)
+    service = AnalyticsService(sqlite_session)
+
+    rows = [row async for row in service.iter_daily_costs(start, start + timedelta(days=4), object_id=1)]
+
+    assert [row.date for row in rows] == [start + timedelta(days=d) for d in range(5)]
+    assert all(row.total == 100.0 for row in rows)
@@ -0,0 +1,94 @@
+"""Тесты set-based сводки AnalyticsService.get_all_objects_summary"""
+from datetime import date, timedelta
+
+import pytest
+
+from app.analytics.service import AnalyticsService
+from app.models import CostEntry, CostObject
+from app.services.cost_rollup_service import CostRollupService
+
+
+async def _seed_objects(session, count: int, start_index: int = 0):
+    today = date.today()
+    rollup = CostRollupService(session)
+    for i in range(start_index, start_index + count):
+        obj = CostObject(
+            name=f"Объект {i}",
+            code=f"SUM-{i:04d}",
+            contract_amount=100000.0 if i % 2 == 0 else None,
+        )
+        session.add(obj)
+        await session.flush()
+        entries = [
+            CostEntry(type="labor", cost_object_id=obj.id, date=today, amount=1000.0),
+            CostEntry(type="material", cost_object_id=obj.id, date=today, amount=2500.0),
+            CostEntry(type="equipment", cost_object_id=obj.id, date=today - timedelta(days=40), amount=500.0),
+        ]
+        session.add_all(entries)
+        await rollup.add_entries(entries)
+    await session.commit()
+
+
+@pytest.mark.asyncio
+async def test_summary_matches_per_object_costs(sqlite_session):
+    """Сводка совпадает с построчным расчетом get_object_costs"""
+    await _seed_objects(sqlite_session, 5)
+    # Объект без затрат тоже должен попасть в сводку
+    sqlite_session.add(CostObject(name="Пустой", code="EMPTY-1", contract_amount=5000.0))
+    await sqlite_session.commit()
+
+    service = AnalyticsService(sqlite_session)
+    period_start = date.today() - timedelta(days=7)
+    summary = await service.get_all_objects_summary(period_start, date.today())
+
+    assert len(summary) == 6
+    for item in summary:
+        costs = await service.get_object_costs(item["object_id"], period_start, date.today())
+        assert float(item["total_labor_cost"]) == float(costs["labor"])
+        assert float(item["total_equipment_cost"]) == float(costs["equipment"])
+        assert float(item["total_material_cost"]) == float(costs["material"])
+        assert float(item["total_cost"]) == float(costs["total"])
+
+    empty = next(item for item in summary if item["object_name"] == "Пустой")
+    assert empty["total_cost"] == 0
+    assert empty["remaining_budget"] == 5000.0
+    assert empty["budget_utilization_percent"] == 0
+
+    first = next(item for item in summary if item["object_name"] == "Объект 0")
+    assert first["remaining_budget"] == 100000.0 - 3500.0
+    assert first["budget_utilization_percent"] == pytest.approx(3.5)
+
+
+@pytest.mark.asyncio
+async def test_summary_filter_by_object(sqlite_session):
+    """Фильтр object_id применяется в запросе"""
+    await _seed_objects(sqlite_session, 3)
+    service = AnalyticsService(sqlite_session)
+
+    full = await service.get_all_objects_summary()
+    target = full[1]["object_id"]
+    filtered = await service.get_all_objects_summary(object_id=target)
+
+    assert [item["object_id"] for item in filtered] == [target]
+    assert filtered[0]["total_cost"] == 4000.0
+
+
+@pytest.mark.asyncio
+async def test_summary_query_count_is_flat(sqlite_session, count_queries):
+    """Количество запросов не растет с числом объектов"""
+    service = AnalyticsService(sqlite_session)
+
+    await _seed_objects(sqlite_session, 5)
+    counter, stop = count_queries(sqlite_session)
+    await service.get_all_objects_summary()
+    small_count = counter["count"]
+    stop()
+
+    await _seed_objects(sqlite_session, 100, start_index=5)
+    counter, stop = count_queries(sqlite_session)
+    summary = await service.get_all_objects_summary()
+    large_count = counter["count"]
+    stop()
+
+    assert len(summary) == 105
+    assert small_count == large_count == 1
@@ -0,0 +1,85 @@
+"""Тесты ASGI middleware аудита"""
+import httpx
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+
+from app.middleware import audit
+from app.middleware.audit import AuditMiddleware
+
+
+class RecordingSink:
+    def __init__(self):
+        self.entries = []
+
+    def enqueue(self, entry):
+        self.entries.append(entry)
+        return True
+
+
+@pytest.fixture
+def sink(monkeypatch):
+    recorder = RecordingSink()
+    monkeypatch.setattr(audit, "get_audit_sink", lambda: recorder)
+    return recorder
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+
+    @app.post("/api/v1/time-sheets/{sheet_id}/approve")
+    async def approve(sheet_id: int):
+        return {"id": sheet_id}
+
+    @app.delete("/api/v1/material-requests/{request_id}")
+    async def delete_request(request_id: int):
+        raise HTTPException(status_code=404, detail="Not found")
+
+    @app.get("/api/v1/time-sheets/export")
+    async def export():
+        async def chunks():
+            for i in range(3):
+                yield f"row{i}\n".encode()
+        return StreamingResponse(chunks(), media_type="text/csv")
+
+    app.add_middleware(AuditMiddleware)
+    transport = httpx.ASGITransport(app=app, client=("10.0.0.1", 1234))
+    return httpx.AsyncClient(transport=transport, base_url="http://test")
+
+
+@pytest.mark.asyncio
+async def test_successful_audited_request_is_logged(client, sink):
+    async with client:
+        response = await client.post("/api/v1/time-sheets/5/approve", headers={"User-Agent": "pytest"})
+
+    assert response.status_code == 200
+    assert sink.entries == [{
+        "user_id": None,
+        "action": "APPROVE",
+        "entity_type": "TimeSheet",
+        "ip_address": "10.0.0.1",
+        "user_agent": "pytest",
+        "description": "APPROVE TimeSheet via POST /api/v1/time-sheets/5/approve",
+    }]
+
+
+@pytest.mark.asyncio
+async def test_failed_and_not_audited_requests_are_skipped(client, sink):
+    async with client:
+        assert (await client.delete("/api/v1/material-requests/1")).status_code == 404
+        response = await client.get("/api/v1/time-sheets/export")
+
+    # Потоковый ответ проходит без изменений
+    assert response.text == "row0\nrow1\nrow2\n"
+    assert sink.entries == []
+
+
+def test_prefix_lookup():
+    middleware = AuditMiddleware(app=None)
+
+    assert middleware._matches("PATCH", "/api/v1/users/roles/7")
+    assert middleware._matches("PUT", "/api/v1/objects/3")
+    assert not middleware._matches("PATCH", "/api/v1/users/7")
+    assert not middleware._matches("POST", "/uploads/photo.jpg")
+    assert not middleware._matches("GET", "/api/v1/time-sheets")
@@ -0,0 +1,91 @@
+"""Тесты пакетной записи журнала аудита (AuditSink)"""
+import asyncio
+
+import pytest
+from sqlalchemy import event, func, select
+
+from app.middleware import audit_sink
+from app.middleware.audit_sink import AuditSink
+from app.models import AuditLog
+
+
+def _entry(i: int) -> dict:
+    return {"user_id": None, "action": "CREATE", "entity_type": "TimeSheet", "description": f"запись {i}"}
+
+
+async def _count(session_factory) -> int:
+    async with session_factory() as session:
+        return await session.scalar(select(func.count()).select_from(AuditLog))
+
+
+@pytest.mark.asyncio
+async def test_full_batches_are_written_with_one_insert(session_factory):
+    inserts = []
+    engine = session_factory.kw["bind"].sync_engine
+    listener = lambda conn, cursor, statement, *args: inserts.append(statement) if statement.startswith("INSERT INTO audit_log ") else None
+    event.listen(engine, "before_cursor_execute", listener)
+    sink = AuditSink(session_factory, batch_size=10, flush_interval=60)
+    try:
+        for i in range(25):
+            assert sink.enqueue(_entry(i))
+        await asyncio.sleep(0.2)
+
+        # Две полные пачки записаны сразу, остаток ждет интервала
+        assert await _count(session_factory) == 20
+        assert sink.metrics()["queued"] == 5
+        assert len(inserts) == 2
+
+        await sink.close()
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+    assert await _count(session_factory) == 25
+    assert sink.metrics()["written"] == 25
+    assert sink.metrics()["batches"] == 3
+
+
+@pytest.mark.asyncio
+async def test_partial_batch_is_flushed_after_interval(session_factory):
+    sink = AuditSink(session_factory, batch_size=100, flush_interval=0.05)
+    for i in range(3):
+        sink.enqueue(_entry(i))
+    assert await _count(session_factory) == 0
+
+    await asyncio.sleep(0.3)
+
+    assert await _count(session_factory) == 3
+    assert sink.batches == 1
+    await sink.close()
+
+
+@pytest.mark.asyncio
+async def test_overflow_is_dropped_and_counted(session_factory):
+    sink = AuditSink(session_factory, batch_size=100, flush_interval=60, max_queue=5)
+    accepted = [sink.enqueue(_entry(i)) for i in range(8)]
+
+    assert accepted == [True] * 5 + [False] * 3
+    assert sink.metrics()["dropped"] == 3
+    await sink.close()
+    assert await _count(session_factory) == 5
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_retried(session_factory, monkeypatch):
+    monkeypatch.setattr(audit_sink, "RETRY_DELAY", 0.01)
+    calls = {"n": 0}
+
+    def flaky_factory():
+        calls["n"] += 1
+        if calls["n"] == 1:
+            raise ConnectionError("БД недоступна")
+        return session_factory()
+
+    sink = AuditSink(flaky_factory, batch_size=2, flush_interval=0.01)
+    for i in range(4):
+        sink.enqueue(_entry(i))
+    await sink.close()
+
+    assert sink.failed_batches == 1
+    assert sink.written == 4
+    assert sink.dropped == 0
+    assert await _count(session_factory) == 4
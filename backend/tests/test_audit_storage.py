@@ -0,0 +1,98 @@
+"""Тесты статистики и архивации журнала аудита"""
+import gzip
+import json
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import func, insert, select
+
+from app.models import AuditDailyStats, AuditLog, User
+from app.services.audit_service import AuditService
+from app.services.audit_storage_service import AuditStorageService
+
+
+async def _create_user(session, username="admin"):
+    user = User(
+        username=username, phone="+79000000001", hashed_password="x",
+        roles=["ADMIN"], birth_date=date(1990, 5, 17)
+    )
+    session.add(user)
+    await session.commit()
+    return user
+
+
+async def _add_logs(session, *timestamps, action="CREATE", user_id=None):
+    entries = [
+        {"timestamp": ts, "action": action, "entity_type": "TimeSheet", "user_id": user_id}
+        for ts in timestamps
+    ]
+    await session.execute(insert(AuditLog).values(entries))
+    await AuditStorageService(session).add_entries(entries)
+    await session.commit()
+
+
+async def _log_count(session) -> int:
+    return await session.scalar(select(func.count()).select_from(AuditLog))
+
+
+@pytest.mark.asyncio
+async def test_stats_are_counted_on_write(sqlite_session):
+    user = await _create_user(sqlite_session)
+    await AuditService.log_action(sqlite_session, user.id, "APPROVE", "TimeSheet", entity_id=1)
+    await AuditService.log_action(sqlite_session, user.id, "APPROVE", "TimeSheet", entity_id=2)
+    await AuditService.log_action(sqlite_session, None, "CREATE", "User")
+    await _add_logs(sqlite_session, datetime(2020, 1, 5), user_id=user.id)
+    await sqlite_session.commit()
+
+    service = AuditStorageService(sqlite_session)
+    stats = await service.get_stats(date(2026, 1, 1))
+
+    assert stats == {
+        "total_logs": 3,
+        "actions": {"APPROVE": 2, "CREATE": 1},
+        "entities": {"TimeSheet": 2, "User": 1},
+        "top_users": [{"user_id": user.id, "username": "admin", "actions_count": 2}],
+    }
+
+    # Пересборка из audit_log дает те же счетчики
+    before = set((await sqlite_session.execute(select(AuditDailyStats.__table__))).all())
+    await service.rebuild_stats()
+    after = set((await sqlite_session.execute(select(AuditDailyStats.__table__))).all())
+    assert before == after
+
+
+@pytest.mark.asyncio
+async def test_archive_old_months_to_jsonl(sqlite_session, tmp_path):
+    await _add_logs(sqlite_session, datetime(2025, 1, 3), datetime(2025, 1, 31, 23, 59))
+    await _add_logs(sqlite_session, datetime(2025, 2, 10), action="DELETE")
+    await _add_logs(sqlite_session, datetime(2025, 3, 1), datetime(2025, 3, 20))
+
+    service = AuditStorageService(sqlite_session)
+    archived = await service.archive_before(date(2025, 3, 15), str(tmp_path), chunk_size=1)
+
+    # Март еще не закончился к cutoff - остается в журнале
+    assert [(r["month"], r["rows"]) for r in archived] == [("2025-01-01", 2), ("2025-02-01", 1)]
+    assert await _log_count(sqlite_session) == 2
+
+    with gzip.open(tmp_path / "audit_log_2025_02.jsonl.gz", "rt", encoding="utf-8") as archive:
+        rows = [json.loads(line) for line in archive]
+    assert len(rows) == 1
+    assert rows[0]["action"] == "DELETE"
+    assert rows[0]["timestamp"].startswith("2025-02-10")
+    assert not list(tmp_path.glob("*.tmp"))
+
+    # Статистика архивированных месяцев сохраняется
+    stats = await service.get_stats(date(2025, 1, 1))
+    assert stats["total_logs"] == 5
+
+
+@pytest.mark.asyncio
+async def test_cleanup_deletes_in_chunks(sqlite_session):
+    await _add_logs(sqlite_session, *[datetime(2020, 1, day) for day in range(1, 8)])
+    await _add_logs(sqlite_session, datetime.utcnow())
+
+    deleted = await AuditService.cleanup_old_logs(sqlite_session, days=30)
+
+    assert deleted == 7
+    assert await _log_count(sqlite_session) == 1
+    assert not await AuditStorageService(sqlite_session).is_partitioned()
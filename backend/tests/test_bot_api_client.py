@@ -0,0 +1,93 @@
+"""Тесты общего HTTP клиента бота и middleware APIClient"""
+import os
+
+import httpx
+import pytest
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "test-token")
+
+from app.bot.middlewares import APIClientMiddleware  # noqa: E402
+from app.bot.utils.api_client import APIClient, close_http_client, get_http_client  # noqa: E402
+
+
+@pytest.mark.asyncio
+async def test_clients_share_one_pool():
+    """Все APIClient работают через один httpx.AsyncClient"""
+    first, second = APIClient("a"), APIClient("b")
+    shared = get_http_client()
+    try:
+        assert first.client is second.client is shared
+        # close() экземпляра не закрывает общий пул
+        await first.close()
+        assert not shared.is_closed
+    finally:
+        await close_http_client()
+    assert shared.is_closed
+    # После закрытия пул создается заново
+    assert first.client is not shared
+    await close_http_client()
+
+
+@pytest.mark.asyncio
+async def test_token_is_passed_per_call():
+    """Токен вызова важнее токена клиента, без токена заголовка нет"""
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request.headers.get("Authorization"))
+        return httpx.Response(200, json=[])
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        api = APIClient(client=client)
+        await api.get_my_material_requests(token="user-1")
+        await api.get_my_material_requests(token="user-2")
+        await api.get_my_material_requests()
+        await APIClient("default", client=client).get_objects()
+
+    assert seen == ["Bearer user-1", "Bearer user-2", None, "Bearer default"]
+
+
+@pytest.mark.asyncio
+async def test_middleware_injects_shared_api():
+    """Middleware передает один и тот же APIClient во все обработчики"""
+    middleware = APIClientMiddleware()
+    received = []
+
+    async def handler(event, data):
+        received.append(data["api"])
+
+    await middleware(handler, object(), {})
+    await middleware(handler, object(), {})
+
+    assert received[0] is received[1] is middleware.api
+
+
+@pytest.mark.asyncio
+async def test_asgi_transport_calls_app_in_process(sqlite_session, monkeypatch):
+    """В режиме asgi запросы обрабатывает FastAPI приложение без сети"""
+    from main import app
+    from app.bot.config import config
+    from app.core.database import get_db
+    from app.models import User
+
+    sqlite_session.add(User(
+        username="bot_user", phone="+79000000001", hashed_password="x",
+        roles=["FOREMAN"], telegram_chat_id=777
+    ))
+    await sqlite_session.commit()
+
+    async def override_get_db():
+        yield sqlite_session
+
+    monkeypatch.setattr(config, "api_transport", "asgi")
+    app.dependency_overrides[get_db] = override_get_db
+    await close_http_client()
+    try:
+        api = APIClient()
+        assert isinstance(api.client._transport, httpx.ASGITransport)
+        login = await api.login_telegram(777)
+        assert login["access_token"]
+        assert await api.login_telegram(778) is None
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+        await close_http_client()
@@ -0,0 +1,131 @@
+"""Тесты FSM хранилища бота в таблице bot_fsm_states"""
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+from sqlalchemy import func, select, update
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "test-token")
+
+from app.bot.fsm_storage import SQLStorage  # noqa: E402
+from app.bot.models import BotFSMState  # noqa: E402
+from app.bot.states import MaterialRequestStates  # noqa: E402
+
+
+def _key(user_id: int) -> StorageKey:
+    return StorageKey(bot_id=1, chat_id=user_id, user_id=user_id)
+
+
+async def _rows(session_factory) -> int:
+    async with session_factory() as session:
+        return await session.scalar(select(func.count()).select_from(BotFSMState))
+
+
+@pytest.mark.asyncio
+async def test_state_survives_restart(session_factory):
+    """Диалог продолжается после перезапуска бота"""
+    storage = SQLStorage(session_factory)
+    state = FSMContext(storage=storage, key=_key(1))
+    await state.set_state(MaterialRequestStates.select_object)
+    await state.update_data(token="jwt", items=[{"name": "Цемент", "quantity": 2}])
+    await storage.close()
+
+    restarted = FSMContext(storage=SQLStorage(session_factory), key=_key(1))
+    assert await restarted.get_state() == MaterialRequestStates.select_object.state
+    assert await restarted.get_data() == {"token": "jwt", "items": [{"name": "Цемент", "quantity": 2}]}
+
+
+@pytest.mark.asyncio
+async def test_writes_are_batched(session_factory):
+    """Много изменений - одна транзакция при flush"""
+    storage = SQLStorage(session_factory, flush_interval=60)
+    for user_id in range(20):
+        state = FSMContext(storage=storage, key=_key(user_id))
+        await state.set_state(MaterialRequestStates.select_object)
+        await state.update_data(step=1)
+        await state.update_data(step=2)
+
+    # До flush в БД ничего нет, чтения идут из буфера
+    assert await _rows(session_factory) == 0
+    assert await FSMContext(storage=storage, key=_key(3)).get_data() == {"step": 2}
+
+    assert await storage.flush() == 20
+    assert storage.flushes == 1
+    assert await _rows(session_factory) == 20
+    await storage.close()
+
+
+@pytest.mark.asyncio
+async def test_cleared_dialog_is_deleted(session_factory):
+    storage = SQLStorage(session_factory)
+    state = FSMContext(storage=storage, key=_key(1))
+    await state.set_state(MaterialRequestStates.select_object)
+    await state.update_data(step=1)
+    await storage.flush()
+
+    await state.clear()
+    await storage.flush()
+
+    assert await _rows(session_factory) == 0
+    await storage.close()
+
+
+@pytest.mark.asyncio
+async def test_stale_dialogs_expire(session_factory):
+    """Диалоги старше ttl не читаются и удаляются"""
+    storage = SQLStorage(session_factory, ttl=3600)
+    for user_id in (1, 2):
+        await FSMContext(storage=storage, key=_key(user_id)).update_data(step=1)
+    await storage.flush()
+    async with session_factory() as session:
+        await session.execute(
+            update(BotFSMState)
+            .where(BotFSMState.key.like("1:1:%"))
+            .values(updated_at=datetime.utcnow() - timedelta(hours=2))
+        )
+        await session.commit()
+
+    fresh = SQLStorage(session_factory, ttl=3600)
+    assert await FSMContext(storage=fresh, key=_key(1)).get_data() == {}
+    assert await FSMContext(storage=fresh, key=_key(2)).get_data() == {"step": 1}
+    assert await fresh.evict_expired() == 1
+    assert await _rows(session_factory) == 1
+    await storage.close()
+    await fresh.close()
+
+
+@pytest.mark.asyncio
+async def test_reads_are_cached_within_update(session_factory):
+    """Повторные чтения одного диалога не ходят в БД"""
+    writer = SQLStorage(session_factory)
+    await FSMContext(storage=writer, key=_key(1)).update_data(step=1)
+    await writer.close()
+    storage = SQLStorage(session_factory, cache_ttl=5)
+    state = FSMContext(storage=storage, key=_key(1))
+    for _ in range(5):
+        await state.get_state()
+        await state.get_data()
+    assert storage.reads == 1
+
+
+@pytest.mark.asyncio
+async def test_update_changes_are_visible_to_other_replica(session_factory):
+    """После обработки update изменения в БД: другая реплика видит их сразу"""
+    from app.bot.middlewares import FSMFlushMiddleware
+
+    replica_a = SQLStorage(session_factory, flush_interval=60)
+    replica_b = SQLStorage(session_factory, flush_interval=60)
+    await FSMContext(storage=replica_b, key=_key(1)).get_data()
+
+    async def handler(event, data):
+        await FSMContext(storage=replica_a, key=_key(1)).update_data(step=1)
+        await FSMContext(storage=replica_a, key=_key(1)).update_data(step=2)
+
+    await FSMFlushMiddleware(replica_a)(handler, object(), {})
+
+    assert replica_a.flushes == 1
+    assert await FSMContext(storage=replica_b, key=_key(1)).get_data() == {"step": 2}
+    await replica_a.close()
+    await replica_b.close()
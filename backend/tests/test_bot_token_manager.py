@@ -0,0 +1,137 @@
+"""Тесты кэша токенов бота (TokenManager)"""
+import asyncio
+import os
+import time
+
+import pytest
+from jose import jwt
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "test-token")
+
+from app.bot.token_manager import TokenManager, TokenStore, token_expires_at  # noqa: E402
+
+
+def _jwt(kind: str, ttl: float) -> str:
+    return jwt.encode({"sub": "1", "type": kind, "exp": int(time.time() + ttl), "n": time.perf_counter_ns()}, "k")
+
+
+class FakeAPI:
+    """API backend: выдает токены с заданным сроком действия"""
+
+    def __init__(self, known=(1,), access_ttl: float = 1800, refresh_ttl: float = 7 * 86400):
+        self.known = set(known)
+        self.access_ttl = access_ttl
+        self.refresh_ttl = refresh_ttl
+        self.logins = 0
+        self.refreshes = 0
+
+    def _pair(self):
+        return {
+            "access_token": _jwt("access", self.access_ttl),
+            "refresh_token": _jwt("refresh", self.refresh_ttl),
+            "token_type": "bearer",
+        }
+
+    async def login_telegram(self, telegram_user_id):
+        self.logins += 1
+        await asyncio.sleep(0.01)
+        return self._pair() if telegram_user_id in self.known else None
+
+    async def refresh_tokens(self, refresh_token):
+        self.refreshes += 1
+        if token_expires_at(refresh_token) <= time.time():
+            return None
+        return self._pair()
+
+
+@pytest.mark.asyncio
+async def test_token_is_cached_between_messages():
+    api = FakeAPI()
+    manager = TokenManager(api)
+
+    first = await manager.get_token(1)
+    assert first and await manager.get_token(1) == first
+    assert api.logins == 1
+
+
+@pytest.mark.asyncio
+async def test_expiring_token_is_refreshed_not_relogged():
+    """За refresh_margin до истечения токен обновляется через /auth/refresh"""
+    api = FakeAPI(access_ttl=60)
+    manager = TokenManager(api, refresh_margin=300)
+
+    first = await manager.get_token(1)
+    second = await manager.get_token(1)
+
+    assert second != first
+    assert (api.logins, api.refreshes) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_expired_refresh_token_falls_back_to_login():
+    api = FakeAPI(access_ttl=-10, refresh_ttl=-10)
+    manager = TokenManager(api)
+
+    await manager.get_token(1)
+    await manager.get_token(1)
+
+    assert (api.logins, api.refreshes) == (2, 0)
+
+
+@pytest.mark.asyncio
+async def test_tokens_survive_restart_via_store():
+    """После перезапуска бота токены берутся из хранилища без входа"""
+    api = FakeAPI()
+    store = TokenStore()
+    token = await TokenManager(api, store).get_token(1)
+
+    restarted = TokenManager(api, store)
+    assert await restarted.get_token(1) == token
+    assert api.logins == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_messages_login_once():
+    """Шквал сообщений после редеплоя: один вход на пользователя"""
+    api = FakeAPI(known=range(10))
+    manager = TokenManager(api)
+
+    tokens = await asyncio.gather(*(manager.get_token(user_id % 10) for user_id in range(200)))
+
+    assert all(tokens)
+    assert api.logins == 10
+
+
+@pytest.mark.asyncio
+async def test_unknown_user_is_not_retried_until_start():
+    api = FakeAPI(known=())
+    manager = TokenManager(api, unknown_ttl=60)
+
+    assert await manager.get_token(5) is None
+    assert await manager.get_token(5) is None
+    assert api.logins == 1
+
+    api.known.add(5)
+    assert await manager.get_token(5, retry_unknown=True)
+    assert api.logins == 2
+
+
+@pytest.mark.asyncio
+async def test_start_forces_login_and_rejected_token_is_forgotten():
+    """/start входит заново; отклоненный API токен удаляется из кэша и хранилища"""
+    api = FakeAPI()
+    store = TokenStore()
+    manager = TokenManager(api, store)
+
+    first = await manager.get_token(1)
+    relogged = (await manager.get_tokens(1, force_login=True))["access_token"]
+    assert relogged != first
+    assert api.logins == 2
+
+    await manager.forget_token("unknown-token")
+    assert await store.get(1)
+
+    await manager.forget_token(relogged)
+    assert await store.get(1) is None
+    assert await manager.get_token(1) not in (None, relogged)
+    assert api.logins == 3
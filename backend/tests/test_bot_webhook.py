@@ -0,0 +1,183 @@
+"""Тесты webhook режима бота: параллельная обработка и порядок по чатам"""
+import asyncio
+import itertools
+import os
+import time
+from collections import defaultdict
+
+import httpx
+import pytest
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import Message
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "test-token")
+
+from app.bot.config import BotConfig  # noqa: E402
+from app.bot.webhook import SECRET_HEADER, create_webhook_app  # noqa: E402
+
+PATH = "/bot/webhook"
+SECRET = "s3cret"
+
+
+class FakeUpdates:
+    """Генератор updates в формате Telegram Bot API (сообщения из личных чатов)"""
+
+    def __init__(self):
+        self._ids = itertools.count(1)
+
+    def message(self, chat_id: int, text: str) -> dict:
+        update_id = next(self._ids)
+        return {
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "from": {"id": chat_id, "is_bot": False, "first_name": f"User {chat_id}"},
+                "text": text,
+            },
+        }
+
+    def burst(self, chats: int, per_chat: int) -> list[dict]:
+        """Сообщения 0..per_chat-1 от каждого чата вперемешку"""
+        return [self.message(chat_id, str(seq)) for seq in range(per_chat) for chat_id in range(1, chats + 1)]
+
+
+class Recorder:
+    """Обработчик сообщений: запоминает порядок и параллельность"""
+
+    def __init__(self, delay: float = 0.02, slow_chats=(), gate: asyncio.Event = None):
+        self.delay = delay
+        self.slow_chats = set(slow_chats)
+        self.gate = gate
+        self.seen = defaultdict(list)
+        self.finished = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.chat_in_flight = defaultdict(int)
+        self.max_chat_in_flight = 0
+
+    async def __call__(self, message: Message):
+        chat_id = message.chat.id
+        self.in_flight += 1
+        self.chat_in_flight[chat_id] += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        self.max_chat_in_flight = max(self.max_chat_in_flight, self.chat_in_flight[chat_id])
+        try:
+            if self.gate is not None:
+                await self.gate.wait()
+            await asyncio.sleep(0.5 if chat_id in self.slow_chats else self.delay)
+            self.seen[chat_id].append(int(message.text))
+            self.finished.append(chat_id)
+        finally:
+            self.in_flight -= 1
+            self.chat_in_flight[chat_id] -= 1
+
+
+def _app(recorder: Recorder, workers: int = 8, max_pending: int = 1000):
+    router = Router()
+
+    @router.message()
+    async def handle(message: Message):
+        await recorder(message)
+
+    dp = Dispatcher()
+    dp.include_router(router)
+    bot = Bot("42:TEST")
+    return create_webhook_app(bot, dp, path=PATH, secret_token=SECRET, workers=workers, max_pending=max_pending)
+
+
+async def _post_all(client: httpx.AsyncClient, updates: list[dict]) -> list[int]:
+    responses = await asyncio.gather(*(
+        client.post(PATH, json=update, headers={SECRET_HEADER: SECRET}) for update in updates
+    ))
+    return [response.status_code for response in responses]
+
+
+def _client(app) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bot")
+
+
+@pytest.mark.asyncio
+async def test_updates_run_concurrently_in_chat_order():
+    recorder = Recorder(delay=0.02)
+    app = _app(recorder, workers=8)
+    updates = FakeUpdates().burst(chats=20, per_chat=5)
+
+    started = time.perf_counter()
+    async with app.router.lifespan_context(app), _client(app) as client:
+        assert set(await _post_all(client, updates)) == {200}
+        await app.state.update_queue.join()
+        metrics = (await client.get(f"{PATH}/metrics", headers={SECRET_HEADER: SECRET})).json()
+    elapsed = time.perf_counter() - started
+
+    assert all(seqs == [0, 1, 2, 3, 4] for seqs in recorder.seen.values())
+    assert len(recorder.seen) == 20
+    assert recorder.max_chat_in_flight == 1
+    assert recorder.max_in_flight == 8
+    # Последовательно: 100 * 20 мс = 2 с; 8 workers - около 0.25 с
+    assert elapsed < 1.5
+    assert metrics["processed"] == 100
+    assert metrics["pending"] == 0
+    assert metrics["failed"] == 0
+
+
+@pytest.mark.asyncio
+async def test_slow_chat_does_not_block_others():
+    recorder = Recorder(delay=0.01, slow_chats={1})
+    app = _app(recorder, workers=4)
+    updates = FakeUpdates().burst(chats=10, per_chat=2)
+
+    async with app.router.lifespan_context(app), _client(app) as client:
+        await _post_all(client, updates)
+        await app.state.update_queue.join()
+
+    # Оба сообщения медленного чата - последними, остальные не ждали его
+    assert recorder.finished[-2:] == [1, 1]
+    assert recorder.seen[1] == [0, 1]
+
+
+@pytest.mark.asyncio
+async def test_full_queue_rejects_with_503():
+    gate = asyncio.Event()
+    recorder = Recorder(delay=0, gate=gate)
+    app = _app(recorder, workers=1, max_pending=3)
+    generator = FakeUpdates()
+
+    async with app.router.lifespan_context(app), _client(app) as client:
+        statuses = [
+            (await client.post(PATH, json=generator.message(chat_id, "0"), headers={SECRET_HEADER: SECRET})).status_code
+            for chat_id in range(1, 6)
+        ]
+        metrics = (await client.get(f"{PATH}/metrics", headers={SECRET_HEADER: SECRET})).json()
+        gate.set()
+        await app.state.update_queue.join()
+
+    assert statuses == [200, 200, 200, 503, 503]
+    assert metrics["rejected"] == 2
+    assert metrics["max_pending_seen"] == 3
+    assert len(recorder.finished) == 3
+
+
+@pytest.mark.asyncio
+async def test_secret_token_is_checked():
+    app = _app(Recorder())
+    async with app.router.lifespan_context(app), _client(app) as client:
+        response = await client.post(PATH, json=FakeUpdates().message(1, "0"), headers={SECRET_HEADER: "wrong"})
+        metrics = await client.get(f"{PATH}/metrics")
+    assert response.status_code == 403
+    assert metrics.status_code == 403
+
+
+def test_webhook_url_alone_keeps_polling(monkeypatch):
+    """Webhook включается только BOT_MODE=webhook, а не адресом из примера .env"""
+    monkeypatch.delenv("BOT_MODE", raising=False)
+    monkeypatch.setenv("TELEGRAM_WEBHOOK_URL", "https://your-domain.com/bot/webhook")
+    assert BotConfig.from_env().mode == "polling"
+
+    monkeypatch.setenv("BOT_MODE", "webhook")
+    assert BotConfig.from_env().mode == "webhook"
+
+    monkeypatch.setenv("TELEGRAM_WEBHOOK_URL", "")
+    with pytest.raises(ValueError):
+        BotConfig.from_env()
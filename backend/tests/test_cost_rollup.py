@@ -0,0 +1,113 @@
+"""Тесты дневной сводки затрат cost_daily_rollup"""
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from app.analytics.service import AnalyticsService
+from app.models import CostDailyRollup, CostEntry, CostObject
+from app.services.cost_rollup_service import CostRollupService
+
+
+async def _rollup_rows(session):
+    result = await session.execute(
+        select(CostDailyRollup).order_by(CostDailyRollup.date, CostDailyRollup.type)
+    )
+    return [(r.cost_object_id, r.date, r.type, r.amount, r.entries_count) for r in result.scalars()]
+
+
+@pytest.fixture
+def today():
+    return date(2026, 3, 10)
+
+
+@pytest.mark.asyncio
+async def test_add_entries_accumulates_per_day_and_type(sqlite_session, today):
+    """Записи за один день и тип сворачиваются в одну строку"""
+    obj = CostObject(name="Объект", code="ROLL-1")
+    sqlite_session.add(obj)
+    await sqlite_session.flush()
+
+    rollup = CostRollupService(sqlite_session)
+    first = [
+        CostEntry(type="material", cost_object_id=obj.id, date=today, amount=100.0),
+        CostEntry(type="material", cost_object_id=obj.id, date=today, amount=50.0),
+        CostEntry(type="labor", cost_object_id=obj.id, date=today, amount=10.0),
+    ]
+    sqlite_session.add_all(first)
+    await rollup.add_entries(first)
+
+    second = [CostEntry(type="material", cost_object_id=obj.id, date=today, amount=25.0)]
+    sqlite_session.add_all(second)
+    await rollup.add_entries(second)
+    await sqlite_session.commit()
+
+    assert await _rollup_rows(sqlite_session) == [
+        (obj.id, today, "labor", 10.0, 1),
+        (obj.id, today, "material", 175.0, 3),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_delete_entries_subtracts_and_drops_empty_rows(sqlite_session, today):
+    """Удаление записей вычитается из сводки, пустые строки удаляются"""
+    obj = CostObject(name="Объект", code="ROLL-2")
+    sqlite_session.add(obj)
+    await sqlite_session.flush()
+
+    rollup = CostRollupService(sqlite_session)
+    entries = [
+        CostEntry(type="material", cost_object_id=obj.id, date=today, amount=100.0,
+                  reference_type="MaterialCost", reference_id=7),
+        CostEntry(type="material", cost_object_id=obj.id, date=today, amount=40.0),
+        CostEntry(type="labor", cost_object_id=obj.id, date=today - timedelta(days=1), amount=5.0,
+                  reference_type="MaterialCost", reference_id=7),
+    ]
+    sqlite_session.add_all(entries)
+    await rollup.add_entries(entries)
+    await sqlite_session.flush()
+
+    deleted = await rollup.delete_entries(
+        CostEntry.reference_type == "MaterialCost",
+        CostEntry.reference_id == 7
+    )
+    await sqlite_session.commit()
+
+    assert deleted == 2
+    assert await _rollup_rows(sqlite_session) == [(obj.id, today, "material", 40.0, 1)]
+
+
+@pytest.mark.asyncio
+async def test_rebuild_matches_incremental_and_feeds_analytics(sqlite_session, today):
+    """Пересборка дает тот же результат, аналитика читает сводку"""
+    obj = CostObject(name="Объект", code="ROLL-3", contract_amount=1000.0)
+    sqlite_session.add(obj)
+    await sqlite_session.flush()
+
+    rollup = CostRollupService(sqlite_session)
+    entries = [
+        CostEntry(type=cost_type, cost_object_id=obj.id, date=today - timedelta(days=day), amount=amount)
+        for day in range(10)
+        for cost_type, amount in (("labor", 10.0), ("equipment", 20.0), ("material", 30.0))
+    ]
+    sqlite_session.add_all(entries)
+    await rollup.add_entries(entries)
+    await sqlite_session.commit()
+    incremental = await _rollup_rows(sqlite_session)
+
+    rows = await rollup.rebuild()
+    await sqlite_session.commit()
+
+    assert rows == 30
+    assert await _rollup_rows(sqlite_session) == incremental
+
+    service = AnalyticsService(sqlite_session)
+    costs = await service.get_object_costs(obj.id, today - timedelta(days=4), today)
+    assert costs["labor"] == 50.0
+    assert costs["equipment"] == 100.0
+    assert costs["material"] == 150.0
+    assert costs["total"] == 300.0
+
+    dynamics = await service.get_cost_dynamics(obj.id, today - timedelta(days=9), today, grouping="day")
+    assert len(dynamics.data_points) == 10
+    assert all(point.total_cost == 60 for point in dynamics.data_points)
@@ -0,0 +1,147 @@
+"""Тесты потокового импорта сметы из Excel"""
+import io
+
+import openpyxl
+import pytest
+from fastapi import HTTPException, UploadFile
+from sqlalchemy import event, select
+
+from app.models import CostObject, EstimateItem
+from app.services import smart_mapping
+from app.services.estimate_service import EstimateService
+
+ROWS = [
+    ("№", "Наименование", "Ед.", "Кол-во", "Цена", "Сумма"),
+    (None, "Кабельные линии", None, None, None, None),
+    (1, "Кабель ВВГ 3x2.5", "м", 100, 50, 5000),
+    (2, "Гофра 20мм", "м", 100, 10, None),
+    (None, "Муфта", "шт", 4, 250.0, None),
+    (None, "Освещение", None, None, None, None),
+    ("3", "Светильник LED", None, "10", "1200", None),
+    (None, None, None, None, None, None),
+]
+
+
+def _upload(rows=ROWS) -> UploadFile:
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    for row in rows:
+        ws.append(row)
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    buffer.seek(0)
+    return UploadFile(file=buffer, filename="estimate.xlsx")
+
+
+async def _create_object(session) -> CostObject:
+    obj = CostObject(name="Объект", code="EST-1")
+    session.add(obj)
+    await session.commit()
+    return obj
+
+
+@pytest.mark.asyncio
+async def test_import_parses_items_and_inserts_in_chunks(sqlite_session):
+    obj = await _create_object(sqlite_session)
+    inserts = []
+    engine = sqlite_session.bind.sync_engine
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        if statement.startswith("INSERT INTO estimate_items"):
+            inserts.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    progress = []
+    try:
+        result = await EstimateService.parse_and_save_excel(
+            sqlite_session, obj.id, _upload(), chunk_size=2,
+            progress=lambda rows, saved: progress.append(saved)
+        )
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+    assert result["status"] == "success"
+    assert result["items_count"] == result["inserted"] == 4
+    assert result["total_amount"] == 19000.0
+    assert len(inserts) == 2
+    assert progress == [2, 4]
+
+    items = (await sqlite_session.execute(
+        select(EstimateItem).where(EstimateItem.cost_object_id == obj.id).order_by(EstimateItem.id)
+    )).scalars().all()
+    assert [(i.category, i.name, i.unit, i.quantity, i.total_amount) for i in items] == [
+        ("Кабельные линии", "Кабель ВВГ 3x2.5", "м", 100.0, 5000.0),
+        ("Кабельные линии", "Гофра 20мм", "м", 100.0, 1000.0),
+        ("Кабельные линии", "Муфта", "шт", 4.0, 1000.0),
+        ("Освещение", "Светильник LED", "шт", 10.0, 12000.0),
+    ]
+    assert items[0].ordered_quantity == 0.0
+    assert obj.material_amount == 19000.0
+
+
+@pytest.mark.asyncio
+async def test_reimport_replaces_items(sqlite_session):
+    obj = await _create_object(sqlite_session)
+    await EstimateService.parse_and_save_excel(sqlite_session, obj.id, _upload())
+
+    result = await EstimateService.parse_and_save_excel(sqlite_session, obj.id, _upload(ROWS[:3]))
+
+    assert result["items_count"] == 1
+    items = await EstimateService.get_estimate_items(sqlite_session, obj.id)
+    assert [i.name for i in items] == ["Кабель ВВГ 3x2.5"]
+
+
+@pytest.mark.asyncio
+async def test_invalid_file_is_rejected(sqlite_session):
+    obj = await _create_object(sqlite_session)
+    upload = UploadFile(file=io.BytesIO(b"not an excel file"), filename="estimate.xlsx")
+
+    with pytest.raises(HTTPException) as exc_info:
+        await EstimateService.parse_and_save_excel(sqlite_session, obj.id, upload)
+
+    assert exc_info.value.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_reimport_applies_diff_and_keeps_item_ids(sqlite_session, monkeypatch):
+    obj = await _create_object(sqlite_session)
+    await EstimateService.parse_and_save_excel(sqlite_session, obj.id, _upload())
+    items = {i.name: i for i in await EstimateService.get_estimate_items(sqlite_session, obj.id)}
+    items["Муфта"].ordered_quantity = 3
+    await sqlite_session.commit()
+
+    invalidated = []
+    monkeypatch.setattr(smart_mapping, "invalidate_estimate_index", invalidated.append)
+
+    # Цена кабеля изменилась, гофра исчезла, добавлен щит
+    changed = list(ROWS)
+    changed[2] = (1, "Кабель ВВГ 3x2.5", "м", 100, 55, 5500)
+    changed[3] = (None, "Щит ЩРН-12", "шт", 1, 3000, None)
+    result = await EstimateService.parse_and_save_excel(sqlite_session, obj.id, _upload(changed))
+
+    assert {key: result[key] for key in ("inserted", "updated", "unchanged", "deleted")} == {
+        "inserted": 1, "updated": 1, "unchanged": 2, "deleted": 1
+    }
+    current = {i.name: i for i in await EstimateService.get_estimate_items(sqlite_session, obj.id)}
+    assert set(current) == {"Кабель ВВГ 3x2.5", "Муфта", "Светильник LED", "Щит ЩРН-12"}
+    assert current["Кабель ВВГ 3x2.5"].id == items["Кабель ВВГ 3x2.5"].id
+    assert current["Муфта"].id == items["Муфта"].id
+    assert current["Муфта"].ordered_quantity == 3
+    assert invalidated == [obj.id]
+
+    # Вернувшаяся позиция восстанавливается с прежним id
+    result = await EstimateService.parse_and_save_excel(sqlite_session, obj.id, _upload())
+    assert result["inserted"] == 0
+    restored = {i.name: i.id for i in await EstimateService.get_estimate_items(sqlite_session, obj.id)}
+    assert restored["Гофра 20мм"] == items["Гофра 20мм"].id
+
+    # Изменились только цены - индекс поиска по смете не сбрасывается
+    invalidated.clear()
+    await EstimateService.parse_and_save_excel(sqlite_session, obj.id, _upload(changed[:3] + ROWS[3:]))
+    assert invalidated == []
+
+    # Без commit индекс сбрасывается только после commit вызывающего
+    await EstimateService.parse_and_save_excel(sqlite_session, obj.id, _upload(changed), commit=False)
+    assert invalidated == []
+    await sqlite_session.commit()
+    assert invalidated == [obj.id]
@@ -0,0 +1,159 @@
+"""Тесты очереди фоновых задач и JobWorker"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from app.core.config import settings
+from app.jobs.models import Job, JobStatus
+from app.jobs.registry import JobError, job_handler, unregister_handler
+from app.jobs.service import JobService
+from app.jobs.worker import JobWorker
+
+
+@pytest.fixture(autouse=True)
+def jobs_result_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "jobs_result_dir", str(tmp_path / "jobs"))
+
+
+@pytest.fixture
+def test_handlers():
+    calls = []
+
+    @job_handler("test_ok")
+    async def ok(ctx, payload):
+        calls.append(payload)
+        ctx.set_progress(0.5, "половина")
+        # Дать исполнителю сохранить прогресс пульсом
+        await asyncio.sleep(0.1)
+        with open(ctx.result_file("result.txt"), "w") as f:
+            f.write("done")
+        return {"value": payload["value"] * 2}
+
+    @job_handler("test_flaky")
+    async def flaky(ctx, payload):
+        raise RuntimeError("временная ошибка")
+
+    @job_handler("test_invalid")
+    async def invalid(ctx, payload):
+        raise JobError("неверные данные")
+
+    yield calls
+    for job_type in ("test_ok", "test_flaky", "test_invalid"):
+        unregister_handler(job_type)
+
+
+async def _get(session_factory, job_id) -> Job:
+    async with session_factory() as db:
+        return await JobService.get(db, job_id)
+
+
+async def _wait_for_status(session_factory, job_id, statuses, timeout: float = 3.0) -> Job:
+    deadline = asyncio.get_running_loop().time() + timeout
+    while True:
+        job = await _get(session_factory, job_id)
+        if job.status in statuses or asyncio.get_running_loop().time() > deadline:
+            return job
+        await asyncio.sleep(0.02)
+
+
+@pytest.mark.asyncio
+async def test_worker_runs_job_with_progress_and_result_file(session_factory, test_handlers):
+    async with session_factory() as db:
+        job = await JobService.enqueue(db, "test_ok", {"value": 21})
+        await db.commit()
+
+    worker = JobWorker(session_factory, concurrency=2, poll_interval=0.05, heartbeat_interval=0.03)
+    task = asyncio.create_task(worker.start())
+    try:
+        running = await _wait_for_status(session_factory, job.id, {JobStatus.SUCCEEDED.value})
+    finally:
+        await worker.stop()
+        await asyncio.wait_for(task, timeout=1)
+
+    assert test_handlers == [{"value": 21}]
+    assert running.status == JobStatus.SUCCEEDED.value
+    assert running.result == {"value": 42}
+    assert running.progress == 1.0
+    assert running.progress_message == "половина"
+    assert running.attempts == 1
+    with open(running.result_path) as f:
+        assert f.read() == "done"
+
+
+@pytest.mark.asyncio
+async def test_failed_attempt_is_retried_with_backoff(session_factory, test_handlers, monkeypatch):
+    monkeypatch.setattr(settings, "jobs_retry_delay", 30.0)
+    async with session_factory() as db:
+        job = await JobService.enqueue(db, "test_flaky", max_attempts=2)
+        await db.commit()
+
+    worker = JobWorker(session_factory, concurrency=1)
+    assert await worker.run_once()
+    retried = await _get(session_factory, job.id)
+    assert retried.status == JobStatus.QUEUED.value
+    assert retried.attempts == 1
+    assert "временная ошибка" in retried.error
+    assert retried.run_at > datetime.utcnow() + timedelta(seconds=25)
+
+    # Повтор еще не наступил
+    assert not await worker.run_once()
+
+    async with session_factory() as db:
+        await db.execute(update(Job).where(Job.id == job.id).values(run_at=datetime.utcnow()))
+        await db.commit()
+    assert await worker.run_once()
+    failed = await _get(session_factory, job.id)
+    assert failed.status == JobStatus.FAILED.value
+    assert failed.attempts == 2
+
+
+@pytest.mark.asyncio
+async def test_job_error_and_unknown_type_are_not_retried(session_factory, test_handlers):
+    async with session_factory() as db:
+        invalid = await JobService.enqueue(db, "test_invalid")
+        unknown = await JobService.enqueue(db, "no_such_type")
+        await db.commit()
+
+    worker = JobWorker(session_factory, concurrency=1)
+    assert await worker.run_once()
+    assert await worker.run_once()
+
+    invalid = await _get(session_factory, invalid.id)
+    assert invalid.status == JobStatus.FAILED.value
+    assert invalid.attempts == 1
+    assert invalid.error == "неверные данные"
+    assert (await _get(session_factory, unknown.id)).status == JobStatus.FAILED.value
+
+
+@pytest.mark.asyncio
+async def test_cancel_only_queued_job(session_factory, test_handlers):
+    async with session_factory() as db:
+        job = await JobService.enqueue(db, "test_ok", {"value": 1})
+        await db.commit()
+        assert await JobService.cancel(db, job.id)
+        assert not await JobService.cancel(db, job.id)
+
+    assert not await JobWorker(session_factory).run_once()
+    assert test_handlers == []
+
+
+@pytest.mark.asyncio
+async def test_stale_running_job_is_requeued(session_factory):
+    async with session_factory() as db:
+        job = await JobService.enqueue(db, "test_ok", {"value": 1})
+        await db.commit()
+        claimed = await JobService.claim(db, "dead-worker")
+        assert claimed.id == job.id
+        assert await JobService.claim(db, "other-worker") is None
+
+        await db.execute(
+            update(Job).where(Job.id == job.id).values(heartbeat_at=datetime.utcnow() - timedelta(minutes=10))
+        )
+        await db.commit()
+        assert await JobService.requeue_stale(db, stale_after=60) == 1
+
+    requeued = await _get(session_factory, job.id)
+    assert requeued.status == JobStatus.QUEUED.value
+    assert requeued.worker_id is None
@@ -0,0 +1,159 @@
+"""Нагрузочные тесты параллельной отправки уведомлений с лимитами Telegram"""
+import asyncio
+import time
+
+import pytest
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+from aiogram.methods import SendMessage
+from sqlalchemy import insert, select
+
+from app.bot.notification_worker import NotificationWorker
+from app.bot.rate_limiter import TelegramRateLimiter, TokenBucket
+from app.models import User
+from app.notifications.models import TelegramNotification
+
+
+class FakeTelegramBot:
+    """
+    Заглушка Bot API: задержка ответа и лимиты на стороне "сервера"
+
+    Лимиты считаются такими же корзинами токенов, как у клиента; при
+    превышении возвращается 429 (TelegramRetryAfter).
+    """
+
+    # Допуск в долях токена: запрос доходит до "сервера" позже, чем клиент взял токен
+    TOLERANCE = 0.25
+
+    def __init__(self, global_rate: float, chat_rate: float, latency: float = 0.01,
+                 retry_after: int = 1, blocked_chats=()):
+        self.latency = latency
+        self.retry_after = retry_after
+        self.blocked_chats = set(blocked_chats)
+        self._global = TokenBucket(global_rate)
+        self._chat_rate = chat_rate
+        self._chats = {}
+        self.sent = []
+        self.rejected = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def _take(self, bucket: TokenBucket) -> bool:
+        bucket._refill(time.monotonic())
+        if bucket._tokens < 1 - self.TOLERANCE:
+            return False
+        bucket._tokens -= 1
+        return True
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            if chat_id in self.blocked_chats:
+                raise TelegramForbiddenError(SendMessage(chat_id=chat_id, text=text), "bot was blocked by the user")
+            chat_bucket = self._chats.setdefault(chat_id, TokenBucket(self._chat_rate, capacity=1.0))
+            if not (self._take(chat_bucket) and self._take(self._global)):
+                self.rejected += 1
+                raise TelegramRetryAfter(SendMessage(chat_id=chat_id, text=text), "Too Many Requests", self.retry_after)
+            self.sent.append(chat_id)
+        finally:
+            self.in_flight -= 1
+
+
+async def _seed(session, chats: int, per_chat: int):
+    users = [
+        User(username=f"user{i}", phone=f"+7901{i:07d}", hashed_password="x", roles=["FOREMAN"], telegram_chat_id=5000 + i)
+        for i in range(chats)
+    ]
+    session.add_all(users)
+    await session.flush()
+    await session.execute(insert(TelegramNotification), [
+        {
+            "user_id": user.id, "notification_type": "test", "title": "Заголовок", "message": f"Текст {j}",
+            "telegram_chat_id": user.telegram_chat_id, "status": "pending"
+        }
+        for j in range(per_chat)
+        for user in users
+    ])
+    await session.commit()
+
+
+async def _statuses(session):
+    session.expire_all()
+    rows = (await session.execute(select(TelegramNotification.status, TelegramNotification.attempts))).all()
+    return sorted(set(rows))
+
+
+def _worker(bot, session, global_rate: float, chat_rate: float) -> NotificationWorker:
+    worker = NotificationWorker(bot, engine=session.bind)
+    worker.rate_limiter = TelegramRateLimiter(global_rate=global_rate, chat_rate=chat_rate)
+    # Пачки обрабатываются напрямую, без основного цикла start()
+    worker.is_running = True
+    return worker
+
+
+@pytest.mark.asyncio
+async def test_burst_is_sent_concurrently_within_limits(sqlite_file_session):
+    """300 сообщений в 100 чатов: параллельно и без единого 429"""
+    await _seed(sqlite_file_session, chats=100, per_chat=3)
+    bot = FakeTelegramBot(global_rate=200, chat_rate=10, latency=0.02)
+    worker = _worker(bot, sqlite_file_session, global_rate=200, chat_rate=10)
+
+    started = time.perf_counter()
+    await worker._drain_pending_notifications()
+    elapsed = time.perf_counter() - started
+
+    assert len(bot.sent) == 300
+    assert bot.rejected == 0
+    assert bot.max_in_flight > 1
+    # Последовательно было бы не быстрее 300 * 20 мс = 6 с; по лимиту 200/с - около 0.5 с
+    assert elapsed < 3
+    assert await _statuses(sqlite_file_session) == [("sent", 0)]
+
+
+@pytest.mark.asyncio
+async def test_per_chat_limit_spaces_messages(sqlite_file_session):
+    """Сообщения в один чат идут не чаще chat_rate"""
+    await _seed(sqlite_file_session, chats=1, per_chat=4)
+    bot = FakeTelegramBot(global_rate=100, chat_rate=20, latency=0)
+    worker = _worker(bot, sqlite_file_session, global_rate=100, chat_rate=20)
+
+    started = time.perf_counter()
+    await worker._drain_pending_notifications()
+
+    assert len(bot.sent) == 4
+    assert bot.rejected == 0
+    assert time.perf_counter() - started >= 3 / 20 * 0.9
+
+
+@pytest.mark.asyncio
+async def test_retry_after_pauses_and_postpones(sqlite_file_session):
+    """429 ставит отправку на паузу retry_after и не считается неудачной попыткой"""
+    await _seed(sqlite_file_session, chats=10, per_chat=1)
+    # "Сервер" строже клиента: часть сообщений получит 429
+    bot = FakeTelegramBot(global_rate=5, chat_rate=10, latency=0, retry_after=1)
+    worker = _worker(bot, sqlite_file_session, global_rate=1000, chat_rate=10)
+
+    await worker._process_pending_notifications()
+    assert 0 < len(bot.sent) < 10
+    postponed = await _statuses(sqlite_file_session)
+    assert ("pending", 0) in postponed
+    assert 0 < await worker._next_wakeup() <= 1
+
+    await asyncio.sleep(await worker._next_wakeup())
+    await worker._drain_pending_notifications()
+    assert len(bot.sent) == 10
+    assert await _statuses(sqlite_file_session) == [("sent", 0)]
+
+
+@pytest.mark.asyncio
+async def test_blocked_chat_fails_without_retries(sqlite_file_session):
+    """Бот заблокирован пользователем - уведомление сразу failed"""
+    await _seed(sqlite_file_session, chats=2, per_chat=1)
+    bot = FakeTelegramBot(global_rate=100, chat_rate=10, latency=0, blocked_chats={5000})
+    worker = _worker(bot, sqlite_file_session, global_rate=100, chat_rate=10)
+
+    await worker._drain_pending_notifications()
+
+    assert bot.sent == [5001]
+    assert await _statuses(sqlite_file_session) == [("failed", 0), ("sent", 0)]
@@ -0,0 +1,186 @@
+"""Тесты доставки уведомлений NotificationWorker по сигналу"""
+import asyncio
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import select
+
+from app.bot.notification_worker import NotificationWorker
+from app.bot.rate_limiter import TelegramRateLimiter
+from app.core.models_base import UserRole
+from app.models import User
+from app.notifications.dispatch import announce_pending_notifications, notification_signal
+from app.notifications.models import TelegramNotification
+from app.notifications.service import NotificationService
+
+
+# Производитель уведомлений в отдельном процессе - как API при воркере в процессе бота
+PRODUCER = """
+import asyncio, sys
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from app.core.models_base import UserRole
+from app.notifications.service import NotificationService
+
+async def main(url):
+    engine = create_async_engine(url)
+    async with async_sessionmaker(engine, class_=AsyncSession)() as session:
+        await NotificationService(session).send_notification_by_roles([UserRole.FOREMAN], "test", "Заголовок", "Текст")
+    await engine.dispose()
+
+asyncio.run(main(sys.argv[1]))
+"""
+
+
+class RecordingBot:
+    """Бот, который запоминает отправленные сообщения вместо Telegram API"""
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.sent = []
+        self.attempts = 0
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.attempts += 1
+        if self.fail:
+            raise RuntimeError("Telegram недоступен")
+        self.sent.append((chat_id, text))
+
+
+@pytest_asyncio.fixture
+async def foremen(sqlite_file_session):
+    users = [
+        User(
+            username=f"foreman{i}", phone=f"+7900000000{i}", hashed_password="x",
+            roles=[UserRole.FOREMAN.value], telegram_chat_id=1000 + i
+        )
+        for i in range(3)
+    ]
+    sqlite_file_session.add_all(users)
+    await sqlite_file_session.commit()
+    notification_signal.clear()
+    return users
+
+
+async def _run_worker(worker: NotificationWorker):
+    task = asyncio.create_task(worker.start())
+    # Дать воркеру выполнить первый (пустой) проход и уснуть
+    await asyncio.sleep(0.05)
+    return task
+
+
+async def _stop_worker(worker: NotificationWorker, task):
+    await worker.stop()
+    await asyncio.wait_for(task, timeout=1)
+
+
+async def _wait_for(predicate, timeout: float = 2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline, "условие не выполнено"
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.asyncio
+async def test_worker_wakes_up_on_new_notifications(sqlite_file_session, foremen):
+    """Рассылка по ролям доставляется сразу, без ожидания опроса"""
+    bot = RecordingBot()
+    worker = NotificationWorker(bot, engine=sqlite_file_session.bind)
+    worker.poll_interval = 60
+    task = await _run_worker(worker)
+    try:
+        await NotificationService(sqlite_file_session).send_notification_by_roles(
+            [UserRole.FOREMAN], "test", "Заголовок", "Текст"
+        )
+        await _wait_for(lambda: len(bot.sent) == 3)
+    finally:
+        await _stop_worker(worker, task)
+
+    assert sorted(chat_id for chat_id, _ in bot.sent) == [1000, 1001, 1002]
+    statuses = (await sqlite_file_session.execute(select(TelegramNotification.status))).scalars().all()
+    assert statuses == ["sent"] * 3
+
+
+@pytest.mark.asyncio
+async def test_worker_drains_bursts_larger_than_batch(sqlite_file_session, foremen):
+    """Пачки выбираются подряд, пока очередь не опустеет"""
+    bot = RecordingBot()
+    worker = NotificationWorker(bot, engine=sqlite_file_session.bind)
+    worker.poll_interval = 60
+    worker.batch_size = 2
+    # Три сообщения в один чат не должны упираться в лимит 1 сообщение/с
+    worker.rate_limiter = TelegramRateLimiter(global_rate=1000, chat_rate=1000)
+    task = await _run_worker(worker)
+    try:
+        service = NotificationService(sqlite_file_session)
+        for _ in range(3):
+            await service.send_notification_by_roles([UserRole.FOREMAN], "test", "Заголовок", "Текст")
+        await _wait_for(lambda: len(bot.sent) == 9)
+    finally:
+        await _stop_worker(worker, task)
+
+
+@pytest.mark.asyncio
+async def test_rollback_does_not_signal(sqlite_file_session, foremen):
+    """Сигнал уходит только после успешного commit"""
+    sqlite_file_session.add(TelegramNotification(
+        user_id=foremen[0].id, notification_type="test", title="t", message="m", telegram_chat_id=1000
+    ))
+    await announce_pending_notifications(sqlite_file_session)
+    await sqlite_file_session.rollback()
+    assert not await notification_signal.wait(timeout=0.01)
+
+    await announce_pending_notifications(sqlite_file_session)
+    await sqlite_file_session.commit()
+    assert await notification_signal.wait(timeout=0.01)
+
+
+@pytest.mark.asyncio
+async def test_failed_send_is_retried_after_delay(sqlite_file_session, foremen):
+    """Неудачная отправка сохраняет счетчик попыток и не зацикливает воркер"""
+    bot = RecordingBot(fail=True)
+    worker = NotificationWorker(bot, engine=sqlite_file_session.bind)
+    worker.poll_interval = 60
+    task = await _run_worker(worker)
+    try:
+        await NotificationService(sqlite_file_session).send_notification_by_roles(
+            [UserRole.FOREMAN], "test", "Заголовок", "Текст", exclude_user_ids=[foremen[1].id, foremen[2].id]
+        )
+        await _wait_for(lambda: bot.attempts == 1)
+        await asyncio.sleep(0.1)
+    finally:
+        await _stop_worker(worker, task)
+
+    assert bot.attempts == 1
+    sqlite_file_session.expire_all()
+    notification = (await sqlite_file_session.execute(select(TelegramNotification))).scalar_one()
+    assert notification.status == "pending"
+    assert notification.attempts == 1
+    assert notification.data["last_error"] == "Telegram недоступен"
+    delay = (notification.next_attempt_at - datetime.utcnow()).total_seconds()
+    assert worker.retry_delay - 5 < delay <= worker.retry_delay
+
+
+@pytest.mark.asyncio
+async def test_worker_polls_notifications_from_another_process_on_sqlite(sqlite_file_session, foremen):
+    """На SQLite сигнал между процессами не доходит - уведомления API находит опрос"""
+    bot = RecordingBot()
+    worker = NotificationWorker(bot, engine=sqlite_file_session.bind)
+    # Без LISTEN действует poll_interval, а не страховочный sweep_interval
+    assert await worker._next_wakeup() == worker.poll_interval <= 5
+    worker.sweep_interval = 60
+    worker.poll_interval = 0.2
+    task = await _run_worker(worker)
+    try:
+        url = sqlite_file_session.bind.url.render_as_string(hide_password=False)
+        producer = await asyncio.create_subprocess_exec(
+            sys.executable, "-c", PRODUCER, url, cwd=Path(__file__).parent.parent
+        )
+        assert await producer.wait() == 0
+        await _wait_for(lambda: len(bot.sent) == 3)
+    finally:
+        await _stop_worker(worker, task)
+
+    assert sorted(chat_id for chat_id, _ in bot.sent) == [1000, 1001, 1002]
@@ -0,0 +1,99 @@
+"""Тесты агрегированного списка объектов ObjectService.get_objects_with_stats"""
+from datetime import date
+
+import pytest
+
+from app.models import (
+    CostObject, CostEntry, MaterialCost, LaborCost, DeliveryCost, OtherCost, User,
+    EquipmentOrder, EquipmentCost
+)
+from app.services.cost_rollup_service import CostRollupService
+from app.services.object_service import ObjectService
+
+
+async def _seed(session, count: int, start_index: int = 0):
+    today = date.today()
+    user = User(username=f"manager{start_index}", phone=f"+7900{start_index:07d}", hashed_password="x")
+    session.add(user)
+    await session.flush()
+
+    rollup = CostRollupService(session)
+    objects = []
+    for i in range(start_index, start_index + count):
+        obj = CostObject(name=f"Объект {i}", code=f"OBJ-{i:04d}", contract_amount=10000.0)
+        session.add(obj)
+        await session.flush()
+        # Чем больше индекс, тем больше затрат и меньше маржа
+        session.add(MaterialCost(
+            cost_object_id=obj.id, document_number=f"UPD-{i}", document_date=today,
+            supplier_name="Поставщик", total_amount=1000.0 * (i + 1)
+        ))
+        session.add(LaborCost(cost_object_id=obj.id, date=today, amount=200.0, created_by_id=user.id))
+        session.add(DeliveryCost(
+            cost_object_id=obj.id, date=today, amount=300.0, cost_type="delivery", created_by_id=user.id
+        ))
+        session.add(OtherCost(cost_object_id=obj.id, date=today, amount=50.0, created_by_id=user.id))
+        order = EquipmentOrder(
+            cost_object_id=obj.id, foreman_id=user.id, equipment_type="Экскаватор", start_date=today, end_date=today
+        )
+        order.costs.append(EquipmentCost(work_date=today, hours_worked=2, hour_rate=50.0, total_amount=100.0))
+        session.add(order)
+        entry = CostEntry(type="labor", cost_object_id=obj.id, date=today, amount=400.0)
+        session.add(entry)
+        await rollup.add_entries([entry])
+        objects.append(obj)
+    await session.commit()
+    return objects
+
+
+@pytest.mark.asyncio
+async def test_objects_with_stats_facts(sqlite_session):
+    """Факты по всем видам затрат, включая РТБ из табелей"""
+    await _seed(sqlite_session, 2)
+    sqlite_session.add(CostObject(name="Пустой", code="EMPTY-1"))
+    await sqlite_session.commit()
+
+    rows, total = await ObjectService.get_objects_with_stats(sqlite_session, sort_by="name", sort_order="asc")
+
+    assert total == 3
+    by_name = {obj.name: tuple(facts) for obj, *facts in rows}
+    assert by_name["Объект 1"] == (2000.0, 600.0, 300.0, 50.0, 100.0)
+    assert by_name["Пустой"] == (0, 0, 0, 0, 0)
+    assert await ObjectService.calculate_spent_budget(sqlite_session, rows[0][0].id) == 1100.0
+
+
+@pytest.mark.asyncio
+async def test_objects_with_stats_sort_and_pagination(sqlite_session):
+    """Сортировка по марже и пагинация выполняются в БД"""
+    await _seed(sqlite_session, 5)
+
+    rows, total = await ObjectService.get_objects_with_stats(
+        sqlite_session, sort_by="margin", sort_order="asc", limit=2, offset=1
+    )
+    assert total == 5
+    assert [row[0].name for row in rows] == ["Объект 3", "Объект 2"]
+
+    rows, _ = await ObjectService.get_objects_with_stats(sqlite_session, search="obj-0001")
+    assert [row[0].name for row in rows] == ["Объект 1"]
+
+    with pytest.raises(ValueError):
+        await ObjectService.get_objects_with_stats(sqlite_session, sort_by="hashed_password")
+
+
+@pytest.mark.asyncio
+async def test_objects_with_stats_query_count_is_flat(sqlite_session, count_queries):
+    """Количество запросов не растет с числом объектов"""
+    await _seed(sqlite_session, 3)
+    counter, stop = count_queries(sqlite_session)
+    await ObjectService.get_objects_with_stats(sqlite_session)
+    small_count = counter["count"]
+    stop()
+
+    await _seed(sqlite_session, 50, start_index=3)
+    counter, stop = count_queries(sqlite_session)
+    rows, _ = await ObjectService.get_objects_with_stats(sqlite_session)
+    large_count = counter["count"]
+    stop()
+
+    assert len(rows) == 53
+    assert small_count == large_count == 1
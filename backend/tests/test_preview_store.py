@@ -0,0 +1,78 @@
+"""Тесты хранилищ предпросмотра загрузки табелей"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from app.time_sheets.models import TimeSheetPreview
+from app.time_sheets.preview_store import (
+    MemoryPreviewStore, PreviewTooLarge, SQLPreviewStore, decode_preview, encode_preview
+)
+
+
+def _preview(rows: int = 50) -> dict:
+    return {
+        "preview_id": "p",
+        "user_id": 1,
+        "items": [
+            {
+                "row_number": i, "member_name": f"Иванов {i % 5}", "date": "2026-10-01",
+                "cost_object_name": "Объект", "hours": 8.0, "valid": True, "errors": [], "warnings": []
+            }
+            for i in range(rows)
+        ],
+    }
+
+
+def test_encoding_is_compact_and_lossless():
+    data = _preview(500)
+    blob = encode_preview(data)
+    assert decode_preview(blob) == data
+    # Повторяющиеся ключи строк сжимаются многократно
+    assert len(blob) * 5 < len(str(data).encode("utf-8"))
+
+
+@pytest.mark.asyncio
+async def test_memory_store_lru_ttl_and_size_cap():
+    store = MemoryPreviewStore(ttl=60, max_bytes=10_000, max_entries=2, max_total_bytes=1_000_000)
+    await store.save("a", 1, _preview(1))
+    await store.save("b", 1, _preview(1))
+    assert await store.load("a") is not None  # "a" использован последним
+    await store.save("c", 1, _preview(1))
+
+    assert await store.load("b") is None
+    assert await store.load("a") is not None
+    assert store.metrics()["evicted"] == 1
+
+    with pytest.raises(PreviewTooLarge):
+        await store.save("big", 1, {"noise": [str(i) * 7 for i in range(20000)]})
+
+    expiring = MemoryPreviewStore(ttl=0.05, max_bytes=10_000, max_entries=10, max_total_bytes=1_000_000)
+    await expiring.save("x", 1, _preview(1))
+    await asyncio.sleep(0.06)
+    assert await expiring.load("x") is None
+    assert expiring.metrics()["size"] == 0
+
+
+@pytest.mark.asyncio
+async def test_sql_store_is_shared_between_instances(session_factory):
+    factory = session_factory
+    # Два экземпляра - как два воркера uvicorn с общей БД
+    worker_a = SQLPreviewStore(ttl=60, max_bytes=100_000, session_factory=factory)
+    worker_b = SQLPreviewStore(ttl=60, max_bytes=100_000, session_factory=factory)
+
+    await worker_a.save("p1", 1, _preview())
+    await worker_a.save("p2", 1, _preview())
+    assert await worker_b.load("p1") == _preview()
+    assert await worker_b.delete("p1")
+    assert await worker_a.load("p1") is None
+
+    async with factory() as session:
+        await session.execute(
+            update(TimeSheetPreview).where(TimeSheetPreview.id == "p2")
+            .values(expires_at=datetime.utcnow() - timedelta(seconds=1))
+        )
+        await session.commit()
+    assert await worker_b.load("p2") is None
+    assert await worker_b.cleanup() == 1
@@ -0,0 +1,156 @@
+"""Тесты пакетного нечеткого поиска SmartMappingService.find_best_matches"""
+import random
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import insert
+
+from app.models import CostObject, EstimateItem
+from app.services import smart_mapping
+from app.services.smart_mapping import SmartMappingService, invalidate_estimate_index
+
+WORDS = ["Кабель", "ВВГнг", "3х2,5", "Труба", "ПНД", "32мм", "Саморез", "4,2х75", "Профиль", "ПП", "60х27", "Гипсокартон"]
+
+
+@pytest_asyncio.fixture(autouse=True)
+async def _clear_index_cache():
+    # Каждый тест создает новую БД с теми же id объектов
+    invalidate_estimate_index()
+    yield
+    invalidate_estimate_index()
+
+
+async def _seed_estimate(session, names):
+    obj = CostObject(name="Объект", code="MAP-1")
+    session.add(obj)
+    await session.flush()
+    await session.execute(insert(EstimateItem), [
+        {"cost_object_id": obj.id, "name": name, "unit": "шт", "quantity": 1.0, "price": 1.0, "total_amount": 1.0}
+        for name in names
+    ])
+    await session.commit()
+    return obj
+
+
+def _random_names(rng, count):
+    return [" ".join(rng.sample(WORDS, rng.randint(1, 4))) for _ in range(count)]
+
+
+@pytest.mark.asyncio
+async def test_batch_matches_single_item_search(sqlite_session):
+    """Пакетный поиск дает тот же результат, что построчный _fuzzy_search"""
+    rng = random.Random(8)
+    estimate_names = _random_names(rng, 300)
+    obj = await _seed_estimate(sqlite_session, estimate_names)
+    queries = _random_names(rng, 50) + ["", estimate_names[10]]
+
+    service = SmartMappingService(sqlite_session)
+    matches = await service.find_best_matches(queries, cost_object_id=obj.id, min_confidence=0.0)
+
+    ids_by_name = {}
+    for item_id, name in enumerate(estimate_names, start=1):
+        ids_by_name[name] = item_id
+    for query, match in zip(queries, matches):
+        expected_name, expected_score = service._fuzzy_search(query, estimate_names)
+        assert match["matched_name"] == expected_name
+        assert match["confidence"] == pytest.approx(expected_score)
+        assert match["estimate_item_id"] == ids_by_name[expected_name]
+        assert match["source"] == "estimate_fuzzy"
+        assert match["suggested_cost_object_name"] == "Объект"
+
+    single = await service.find_best_match(queries[0], cost_object_id=obj.id, min_confidence=0.0)
+    assert single == matches[0]
+
+
+@pytest.mark.asyncio
+async def test_batch_scores_match_token_sort_ratio_with_nbsp(sqlite_session):
+    """Названия из Excel с неразрывными пробелами оцениваются как fuzz.token_sort_ratio"""
+    fuzz = pytest.importorskip("rapidfuzz.fuzz")
+    estimate_names = ["Кабель\xa0ВВГнг 3х2,5", "Труба ПНД\xa032мм", "Саморез 4,2х75"]
+    obj = await _seed_estimate(sqlite_session, estimate_names)
+    queries = ["ВВГнг\xa0Кабель 3х2,5", "32мм Труба\xa0ПНД", "Саморез\xa04,2х75"]
+
+    service = SmartMappingService(sqlite_session)
+    matches = await service.find_best_matches(queries, cost_object_id=obj.id, min_confidence=0.0)
+
+    for query, expected_name, match in zip(queries, estimate_names, matches):
+        assert match["matched_name"] == expected_name
+        assert match["confidence"] == pytest.approx(fuzz.token_sort_ratio(query, expected_name))
+        assert match["confidence"] == pytest.approx(service._fuzzy_search(query, estimate_names)[1])
+
+
+@pytest.mark.asyncio
+async def test_alias_has_priority_and_threshold_applies(sqlite_session):
+    """Алиас важнее сметы; совпадения ниже порога не возвращаются"""
+    obj = await _seed_estimate(sqlite_session, ["Кабель ВВГнг 3х2,5", "Труба ПНД 32мм"])
+    service = SmartMappingService(sqlite_session)
+    await service.learn_mapping("кабель от поставщика", estimate_item_id=2, supplier_inn="7700000000")
+
+    matches = await service.find_best_matches(
+        ["кабель от поставщика", "3х2,5 ВВГнг Кабель", "Совсем другое"],
+        supplier_inn="7700000000",
+        cost_object_id=obj.id
+    )
+
+    assert matches[0]["source"] == "alias_exact_supplier"
+    assert matches[0]["estimate_item_id"] == 2
+    assert matches[1]["estimate_item_id"] == 1
+    assert matches[1]["confidence"] == 100.0
+    assert matches[2] is None
+
+
+@pytest.mark.asyncio
+async def test_estimate_index_is_cached_and_invalidated(sqlite_session, count_queries):
+    """Смета читается один раз и перечитывается после сброса кэша"""
+    obj = await _seed_estimate(sqlite_session, ["Кабель ВВГнг 3х2,5"])
+    service = SmartMappingService(sqlite_session)
+
+    await service.find_best_matches(["Кабель"], cost_object_id=obj.id)
+    counter, stop = count_queries(sqlite_session)
+    matches = await service.find_best_matches(["Труба ПНД 32мм"] * 20, cost_object_id=obj.id, min_confidence=90.0)
+    stop()
+    # Только поиск алиасов - позиции сметы берутся из кэша
+    assert counter["count"] == 1
+    assert matches == [None] * 20
+
+    sqlite_session.add(EstimateItem(
+        cost_object_id=obj.id, name="Труба ПНД 32мм", unit="шт", quantity=1.0, price=1.0, total_amount=1.0
+    ))
+    await sqlite_session.commit()
+    invalidate_estimate_index(obj.id)
+
+    matches = await service.find_best_matches(["Труба ПНД 32мм"], cost_object_id=obj.id, min_confidence=90.0)
+    assert matches[0]["matched_name"] == "Труба ПНД 32мм"
+    assert obj.id in smart_mapping._estimate_indexes
+
+
+@pytest.mark.asyncio
+async def test_resolve_aliases_in_one_query(sqlite_session, count_queries):
+    """Алиасы всех строк УПД находятся одним запросом, алиас поставщика важнее глобального"""
+    obj = await _seed_estimate(sqlite_session, ["Кабель ВВГнг 3х2,5", "Труба ПНД 32мм", "Саморез 4,2х75"])
+    service = SmartMappingService(sqlite_session)
+    await service.learn_mapping("Кабель 3*2.5", estimate_item_id=1)
+    await service.learn_mapping("Кабель 3*2.5", estimate_item_id=2, supplier_inn="7700000000")
+    await service.learn_mapping("Саморез", estimate_item_id=3, supplier_inn="5000000000")
+    await service.learn_mapping("Труба 32", estimate_item_id=2)
+
+    names = [" Кабель 3*2.5 ", "Саморез", "Труба 32", "Неизвестно"] * 50
+    counter, stop = count_queries(sqlite_session)
+    resolved = await service.resolve_aliases(names, supplier_inn="7700000000")
+    stop()
+
+    assert counter["count"] == 1
+    assert set(resolved) == {"Кабель 3*2.5", "Труба 32"}
+    assert resolved["Кабель 3*2.5"]["estimate_item_id"] == 2
+    assert resolved["Кабель 3*2.5"]["source"] == "alias_exact_supplier"
+    assert resolved["Кабель 3*2.5"]["confidence"] == 100.0
+    assert resolved["Труба 32"]["source"] == "alias_exact_global"
+    assert resolved["Труба 32"]["confidence"] == 95.0
+    assert resolved["Труба 32"]["suggested_cost_object_id"] == obj.id
+    assert resolved["Труба 32"]["suggested_cost_object_name"] == "Объект"
+    assert resolved["Труба 32"]["matched_name"] == "Труба ПНД 32мм"
+
+    # Без ИНН поставщика учитываются только глобальные алиасы
+    resolved = await service.resolve_aliases(names)
+    assert resolved["Кабель 3*2.5"]["estimate_item_id"] == 1
+    assert "Саморез" not in resolved
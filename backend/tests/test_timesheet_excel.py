@@ -0,0 +1,160 @@
+"""Тесты разбора Excel табеля из памяти и предпросмотра загрузки"""
+import io
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from fastapi import UploadFile
+from openpyxl import Workbook
+from sqlalchemy import event
+
+from app.core.models_base import UserRole
+from app.models import Brigade, BrigadeMember, CostObject, User
+from app.time_sheets.excel_parser import TimeSheetExcelParser, TimeSheetExcelParseError
+from app.time_sheets.excel_preview_service import ExcelPreviewService
+from app.time_sheets.excel_upload import upload_timesheet_excel
+from app.time_sheets.preview_store import MemoryPreviewStore
+from app.time_sheets.service import TimeSheetService
+
+
+def make_timesheet(rows, gap_after: int = None) -> bytes:
+    """Табель в формате шаблона: метаданные в строках 1-3, данные с 6-й"""
+    wb = Workbook()
+    ws = wb.active
+    ws["A1"] = "Табель рабочего времени бригады"
+    ws["A2"] = "Бригада: Монтажники"
+    ws["A3"] = "Период: 01.10.2026 - 31.10.2026"
+    ws.append([])
+    ws.append(["ФИО", "Дата", "Объект", "Часы"])
+    for i, row in enumerate(rows):
+        if gap_after is not None and i == gap_after:
+            for _ in range(5):
+                ws.append([])
+        ws.append(list(row))
+    output = io.BytesIO()
+    wb.save(output)
+    return output.getvalue()
+
+
+def test_parse_from_bytes_and_stream():
+    content = make_timesheet([
+        ("Иванов Иван", date(2026, 10, 1), "Склад", 8),
+        ("Петров Петр", "02.10.2026", "Склад", 10.5),
+        ("", date(2026, 10, 3), "Склад", 8),          # нет ФИО - пропуск
+        ("Сидоров", date(2026, 10, 3), None, 8),      # объект не указан
+        ("Иванов Иван", date(2026, 10, 4), "Склад", 30),  # некорректные часы - пропуск
+    ])
+
+    for source in (content, io.BytesIO(content)):
+        parsed = TimeSheetExcelParser(source).parse()
+        assert parsed["brigade_name"] == "Монтажники"
+        assert parsed["period_start"] == date(2026, 10, 1)
+        assert parsed["period_end"] == date(2026, 10, 31)
+        assert parsed["items"] == [
+            {"member_name": "Иванов Иван", "date": date(2026, 10, 1), "cost_object_name": "Склад", "hours": Decimal("8")},
+            {"member_name": "Петров Петр", "date": date(2026, 10, 2), "cost_object_name": "Склад", "hours": Decimal("10.5")},
+            {"member_name": "Сидоров", "date": date(2026, 10, 3), "cost_object_name": "Не указан", "hours": Decimal("8")},
+        ]
+
+
+@pytest.mark.asyncio
+async def test_parse_async_stops_after_empty_rows():
+    content = make_timesheet(
+        [("Иванов Иван", date(2026, 10, 1), "Склад", 8), ("Петров Петр", date(2026, 10, 2), "Склад", 8)],
+        gap_after=1
+    )
+    parsed = await TimeSheetExcelParser(content).parse_async()
+    # Строки после 5 пустых подряд не читаются
+    assert [item["member_name"] for item in parsed["items"]] == ["Иванов Иван"]
+
+    with pytest.raises(TimeSheetExcelParseError):
+        await TimeSheetExcelParser(make_timesheet([])).parse_async()
+
+
+@pytest.mark.asyncio
+async def test_preview_resolves_members_and_objects_in_one_query(sqlite_session):
+    foreman = User(username="foreman", phone="+79000000000", hashed_password="x", roles=[UserRole.FOREMAN.value])
+    sqlite_session.add(foreman)
+    await sqlite_session.flush()
+    brigade = Brigade(foreman_id=foreman.id, name="Монтажники")
+    other = Brigade(foreman_id=foreman.id, name="Другая")
+    sqlite_session.add_all([brigade, other])
+    await sqlite_session.flush()
+    ivanov = BrigadeMember(brigade_id=brigade.id, full_name="Иванов Иван")
+    stranger = BrigadeMember(brigade_id=other.id, full_name="Петров Петр")
+    warehouse = CostObject(name="Склад", code="OBJ-1")
+    closed = CostObject(name="Закрытый", code="OBJ-2", is_active=False)
+    sqlite_session.add_all([ivanov, stranger, warehouse, closed])
+    await sqlite_session.commit()
+
+    statements = []
+    sync_engine = sqlite_session.bind.sync_engine
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    content = make_timesheet([
+        (" иванов иван ", date(2026, 10, 1), "СКЛАД", 8),
+        ("Петров Петр", date(2026, 10, 1), "Склад", 8),
+        ("Иванов Иван", date(2026, 10, 2), "Закрытый", 8),
+    ])
+    service = ExcelPreviewService(
+        sqlite_session, store=MemoryPreviewStore(ttl=60, max_bytes=100_000, max_entries=10, max_total_bytes=1_000_000)
+    )
+    event.listen(sync_engine, "before_cursor_execute", count)
+    try:
+        preview = await service.create_preview(content, brigade.id, foreman.id)
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", count)
+
+    assert sum(1 for s in statements if "UNION ALL" in s) == 1
+    assert sum(1 for s in statements if "FROM cost_objects" in s) == 1
+
+    first, second, third = preview["items"]
+    assert (first["member_id"], first["cost_object_id"], first["valid"]) == (ivanov.id, warehouse.id, True)
+    assert second["member_id"] is None and not second["valid"]
+    assert third["cost_object_id"] is None and not third["valid"]
+    assert preview["stats"]["valid_rows"] == 1
+
+    assert await service.get_preview(preview["preview_id"], foreman.id) == preview
+    assert await service.get_preview(preview["preview_id"], foreman.id + 1) is None
+
+
+@pytest.mark.asyncio
+async def test_upload_excel_matches_names_case_insensitively_and_skips_inactive_objects(sqlite_session, monkeypatch):
+    """/upload-excel: ФИО и объекты без учета регистра, закрытые объекты не сопоставляются"""
+    foreman = User(username="foreman", phone="+79000000000", hashed_password="x", roles=[UserRole.FOREMAN.value])
+    sqlite_session.add(foreman)
+    await sqlite_session.flush()
+    brigade = Brigade(foreman_id=foreman.id, name="Монтажники")
+    sqlite_session.add(brigade)
+    await sqlite_session.flush()
+    ivanov = BrigadeMember(brigade_id=brigade.id, full_name="Иванов Иван")
+    warehouse = CostObject(name="Склад", code="OBJ-1")
+    closed = CostObject(name="Закрытый", code="OBJ-2", is_active=False)
+    sqlite_session.add_all([ivanov, warehouse, closed])
+    await sqlite_session.commit()
+
+    created = []
+
+    class Created(Exception):
+        pass
+
+    async def create_timesheet(self, data, user_id):
+        created.append(data)
+        raise Created
+
+    monkeypatch.setattr(TimeSheetService, "create_timesheet", create_timesheet)
+    content = make_timesheet([
+        (" иванов иван ", date(2026, 10, 1), "склад", 8),
+        ("ИВАНОВ ИВАН", date(2026, 10, 2), "Закрытый", 8),
+        ("Петров Петр", date(2026, 10, 3), "Склад", 8),
+    ])
+    file = UploadFile(file=io.BytesIO(content), filename="timesheet.xlsx")
+
+    with pytest.raises(Created):
+        await upload_timesheet_excel(file=file, brigade_id=brigade.id, db=sqlite_session, current_user=foreman)
+
+    assert created[0].items == [
+        {"member_id": ivanov.id, "date": "2026-10-01", "cost_object_id": warehouse.id, "hours": 8.0}
+    ]
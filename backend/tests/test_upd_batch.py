@@ -0,0 +1,73 @@
+"""Тесты пакетной загрузки УПД"""
+import io
+import zipfile
+from datetime import date
+from pathlib import Path
+
+import pytest
+from sqlalchemy import func, select
+
+from app.models import MaterialCost, MaterialCostItem
+from app.upd.parse_pool import get_upd_parse_pool, shutdown_upd_parse_pool
+from app.upd.service import UPDService, unpack_upd_files
+
+XML_DIR = Path(__file__).parent.parent.parent / "xml"
+
+
+@pytest.fixture
+def sample_files():
+    files = sorted(XML_DIR.glob("*.xml"))
+    yield [(path.name, path.read_bytes(), f"uploads/upd/{path.name}") for path in files]
+    shutdown_upd_parse_pool()
+
+
+def test_unpack_zip_and_xml():
+    """XML берутся как есть, из ZIP - только *.xml"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("folder/a.xml", b"<a/>")
+        archive.writestr("readme.txt", b"skip")
+    files = unpack_upd_files([("pack.zip", buffer.getvalue()), ("b.xml", b"<b/>")])
+
+    assert files == [("pack.zip/a.xml", b"<a/>"), ("b.xml", b"<b/>")]
+    with pytest.raises(ValueError):
+        unpack_upd_files([("doc.pdf", b"%PDF")])
+
+
+@pytest.mark.asyncio
+async def test_batch_upload_report(sqlite_session, sample_files):
+    """Пакет сохраняется одной транзакцией, повторы и ошибки попадают в отчет"""
+    first = sample_files[0]
+    # Документ с теми же реквизитами, но другим файлом
+    sqlite_session.add(MaterialCost(
+        supplier_name="Поставщик", supplier_inn="2312096164", document_number="9888",
+        document_date=date(2025, 12, 12), total_amount=1.0, status="NEW"
+    ))
+    await sqlite_session.commit()
+
+    batch = sample_files + [
+        ("copy.xml", first[1], "uploads/upd/copy.xml"),
+        # Другой файл с реквизитами документа из этого же пакета
+        ("variant.xml", sample_files[1][1] + b"\n", "uploads/upd/variant.xml"),
+        ("broken.xml", b"<broken", "uploads/upd/broken.xml"),
+    ]
+    results = await UPDService(sqlite_session).upload_upd_batch(batch)
+
+    statuses = [r["status"] for r in results]
+    assert len(results) == len(batch)
+    assert statuses[0] == "duplicate"
+    assert statuses[-3:] == ["skipped", "duplicate", "error"]
+    assert results[-2]["duplicate_of_id"] == results[1]["upd_id"]
+    assert statuses.count("created") == len(sample_files) - 1
+
+    created_ids = [r["upd_id"] for r in results if r["status"] in ("created", "duplicate")]
+    items_count = sum(r["items_count"] for r in results if r["status"] in ("created", "duplicate"))
+    assert (await sqlite_session.execute(
+        select(func.count(MaterialCostItem.id)).where(MaterialCostItem.material_cost_id.in_(created_ids))
+    )).scalar_one() == items_count
+
+    # Повторная загрузка того же пакета ничего не создает и не разбирается
+    parsed_before = get_upd_parse_pool().metrics()["completed"] + get_upd_parse_pool().metrics()["failed"]
+    again = await UPDService(sqlite_session).upload_upd_batch(sample_files)
+    assert {r["status"] for r in again} == {"skipped"}
+    assert get_upd_parse_pool().metrics()["completed"] + get_upd_parse_pool().metrics()["failed"] == parsed_before
@@ -0,0 +1,121 @@
+"""Тесты пула разбора УПД"""
+import asyncio
+import hashlib
+import os
+import time
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+import pytest
+
+from app.upd.parse_pool import UPDParsePool, UPDParsePoolBusy, UPDParseTimeout, hash_upd
+from app.upd.upd_parser import UPDParseError
+
+# Пример УПД из корня backend хранится в UTF-8, парсер ожидает windows-1251
+UPD_XML = (
+    (Path(__file__).parent.parent / "test_upd_sample.xml").read_text(encoding="utf-8")
+    .replace('encoding="UTF-8"', 'encoding="windows-1251"')
+    .encode("windows-1251")
+)
+
+
+@pytest.fixture
+def pool():
+    pool = UPDParsePool(max_workers=1, queue_size=1, job_timeout=10, queue_wait=0.05)
+    yield pool
+    pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_hash_and_parse_in_process(pool):
+    """Хэш считается в потоке, документ - в процессе пула, метрики обновляются"""
+    assert await hash_upd(UPD_XML, b"") == [hashlib.sha256(UPD_XML).hexdigest(), hashlib.sha256(b"").hexdigest()]
+    upd_doc = await pool.parse(UPD_XML)
+
+    assert upd_doc.document_number == '1234'
+    assert len(upd_doc.items) == 3
+
+    metrics = pool.metrics()
+    assert metrics["completed"] == 1
+    assert metrics["queue_depth"] == 0
+    assert metrics["max_parse_ms"] > 0
+
+
+@pytest.mark.asyncio
+async def test_parse_error_is_propagated(pool):
+    """Ошибка парсинга из процесса доходит до вызывающего"""
+    with pytest.raises(UPDParseError):
+        await pool.parse("<invalid>test</invalid>".encode('windows-1251'))
+    assert pool.metrics()["failed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_full_queue_rejects_job(pool):
+    """При заполненной очереди новая задача отклоняется"""
+    slow = asyncio.create_task(pool.submit(time.sleep, 0.5))
+    await asyncio.sleep(0)
+
+    with pytest.raises(UPDParsePoolBusy):
+        await pool.submit(time.sleep, 0)
+
+    await slow
+    assert pool.metrics()["rejected"] == 1
+
+
+@pytest.mark.asyncio
+async def test_job_timeout():
+    """Задача дольше job_timeout прерывается для вызывающего, но держит место до завершения"""
+    pool = UPDParsePool(max_workers=1, queue_size=1, job_timeout=0.2, queue_wait=0.05)
+    try:
+        with pytest.raises(UPDParseTimeout):
+            await pool.submit(time.sleep, 1)
+        assert pool.metrics()["timeouts"] == 1
+        # Процесс еще выполняет задачу - новая не встает в очередь к нему
+        assert pool.metrics()["queue_depth"] == 1
+        with pytest.raises(UPDParsePoolBusy):
+            await pool.submit(time.sleep, 0)
+
+        await asyncio.sleep(1)
+        assert pool.metrics()["queue_depth"] == 0
+        await pool.submit(time.sleep, 0)
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_batch_leaves_queue_for_single_uploads():
+    """Пакет занимает не больше batch_limit мест и ждет без отказа"""
+    pool = UPDParsePool(max_workers=1, queue_size=2, job_timeout=10, queue_wait=0.05)
+    try:
+        assert pool.batch_limit == 1
+        batch = asyncio.create_task(pool.parse_many([UPD_XML] * 4))
+        await asyncio.sleep(0.05)
+
+        # Одиночная задача получает свободное место, пока идет пакет
+        await pool.submit(time.sleep, 0)
+
+        parsed = await batch
+        assert [upd_doc.document_number for upd_doc in parsed] == ['1234'] * 4
+        assert pool.metrics()["rejected"] == 0
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_broken_pool_is_replaced_without_stopping_new_one():
+    """Упавший пул заменяется; поздний обработчик ошибки не трогает новый пул"""
+    pool = UPDParsePool(max_workers=2, queue_size=4, job_timeout=10, queue_wait=0.05)
+    try:
+        broken = pool._get_executor()
+        results = await asyncio.gather(*(pool.submit(os._exit, 1) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(result, BrokenProcessPool) for result in results)
+        assert pool._executor is None
+
+        assert await pool.submit(abs, -1) == 1
+        fresh = pool._executor
+        pool._discard_executor(broken)
+        assert pool._executor is fresh
+        assert await pool.submit(abs, -2) == 2
+        assert pool.metrics()["queue_depth"] == 0
+    finally:
+        pool.shutdown()
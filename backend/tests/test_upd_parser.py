@@ -189,3 +189,66 @@ def test_parsing_issues_tracking():
     # Проверить что единица измерения вернулась как код
     item = data['items'][0]
     assert item['unit'] == '999'
+
+
+def _assert_same_as_tree(xml_bytes: bytes):
+    """Потоковый разбор дает тот же UPDDocument, что и разбор дерева"""
+    streamed = UPDParser().parse(xml_bytes)
+    tree = UPDParser().parse_tree(xml_bytes)
+    assert streamed == tree
+    return streamed
+
+
+def test_streaming_parse_matches_tree_on_samples():
+    """Реальные УПД из xml/ разбираются одинаково"""
+    from pathlib import Path
+
+    files = sorted((Path(__file__).parent.parent.parent / "xml").glob("*.xml"))
+    assert files
+    for path in files:
+        _assert_same_as_tree(path.read_bytes())
+
+
+def test_streaming_parse_matches_tree_on_fallbacks():
+    """Fallback-поля, генератор 1С в тексте после продавца и строки услуг"""
+    xml = '''<?xml version="1.0" encoding="windows-1251"?>
+<Файл НомерСчФ="root-ignored">
+    <Документ НомерДок="77" ДатаДок="05.03.2024" ВерсФорм="5.03">
+        <СвПрод>
+            <ИдСв>
+                <СвЮЛУч НаимОрг="ООО Ромашка, ИНН 1234567890" ИННЮЛ="1111111111"/>
+            </ИдСв>
+        </СвПрод>
+        <СвПокуп><ИдСв><СвЮЛУч НаимЮЛ="ООО Покупатель" ИНН="2222222222"/></ИдСв></СвПокуп>
+        <ПрогОбр>1С:Бухгалтерия 3.0</ПрогОбр>
+    </Документ>
+    <ТаблСчФакт>
+        <СведТовУслСч НаимТовУслСч="Монтаж" СтТовБезНДС="1000" СумНал="200" СтТовУчНал="1200"/>
+        <СведТовУслСч НаимТовУслСч="Доставка" СтТовБезНДС="abc"/>
+    </ТаблСчФакт>
+</Файл>'''.encode('windows-1251')
+
+    doc = _assert_same_as_tree(xml)
+    assert doc.document_number == '77'
+    assert doc.generator == '1С:Бухгалтерия'
+    assert doc.supplier_name == 'ООО Ромашка'
+    assert doc.buyer_inn == '2222222222'
+    assert doc.format_version == '5.03'
+    assert len(doc.items) == 1
+
+
+def test_streaming_parse_large_document():
+    """Тысячи строк СведТов разбираются без расхождений"""
+    rows = "".join(
+        f'<СведТов НомСтр="{i}" НаимТов="Товар {i}" ОКЕИ="796" КолТов="{i}" ЦенаТов="10,5" '
+        f'СтТовБезНДС="{i * 10.5}" НалСт="20%" СумНал="1" СтТовУчНал="2"/>'
+        for i in range(1, 3001)
+    )
+    xml = (
+        '<?xml version="1.0" encoding="windows-1251"?><Файл>'
+        '<СвСчФакт НомерСчФ="1" ДатаСчФ="01.02.2024"><СвПрод><СвЮЛУч НаимОрг="ООО" ИННЮЛ="1"/></СвПрод></СвСчФакт>'
+        f'<ТаблСчФакт>{rows}</ТаблСчФакт></Файл>'
+    ).encode('windows-1251')
+
+    doc = _assert_same_as_tree(xml)
+    assert len(doc.items) == 3000
@@ -0,0 +1,161 @@
+"""Тесты кэша аутентифицированных пользователей (get_current_user)"""
+from datetime import date
+
+import pytest
+import pytest_asyncio
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy import select
+
+from app.auth import user_cache
+from app.auth.dependencies import get_current_user
+from app.auth.security import create_access_token
+from app.auth.user_cache import MemoryUserCache, RedisUserCache, invalidate_cached_user
+from app.models import User
+
+
+@pytest_asyncio.fixture
+async def memory_cache():
+    user_cache._cache = MemoryUserCache(ttl=30.0)
+    yield user_cache._cache
+    user_cache._cache = None
+
+
+async def _create_user(session, **fields):
+    user = User(
+        username="foreman", phone="+79000000001", hashed_password="x",
+        roles=["FOREMAN"], birth_date=date(1990, 5, 17), **fields
+    )
+    session.add(user)
+    await session.commit()
+    return user
+
+
+def _credentials(user_id: int) -> HTTPAuthorizationCredentials:
+    token = create_access_token(data={"sub": str(user_id)})
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+
+@pytest.mark.asyncio
+async def test_cached_user_skips_database(sqlite_session, memory_cache, count_queries):
+    """Повторный запрос берет пользователя из кэша без SELECT"""
+    user = await _create_user(sqlite_session)
+    credentials = _credentials(user.id)
+
+    await get_current_user(credentials, sqlite_session)
+    sqlite_session.expunge_all()
+
+    counter, stop = count_queries(sqlite_session)
+    cached = await get_current_user(credentials, sqlite_session)
+    stop()
+
+    assert counter["count"] == 0
+    assert cached.id == user.id
+    assert cached.roles == ["FOREMAN"]
+    assert cached.birth_date == date(1990, 5, 17)
+    assert memory_cache.metrics()["hits"] == 1
+    assert memory_cache.metrics()["misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_changes_to_cached_user_are_saved(sqlite_session, memory_cache):
+    """Пользователь из кэша присоединен к сессии - изменения сохраняются commit"""
+    user = await _create_user(sqlite_session)
+    credentials = _credentials(user.id)
+    await get_current_user(credentials, sqlite_session)
+    sqlite_session.expunge_all()
+
+    cached = await get_current_user(credentials, sqlite_session)
+    cached.full_name = "Иванов Иван"
+    await sqlite_session.commit()
+    await invalidate_cached_user(user.id)
+    sqlite_session.expunge_all()
+
+    stored = (await sqlite_session.execute(select(User).where(User.id == user.id))).scalar_one()
+    assert stored.full_name == "Иванов Иван"
+    assert stored.roles == ["FOREMAN"]
+
+
+@pytest.mark.asyncio
+async def test_invalidation_applies_role_and_active_changes(sqlite_session, memory_cache):
+    """После сброса кэша видны новые роли и деактивация"""
+    user = await _create_user(sqlite_session)
+    credentials = _credentials(user.id)
+    await get_current_user(credentials, sqlite_session)
+
+    user.roles = ["ACCOUNTANT"]
+    await sqlite_session.commit()
+    await invalidate_cached_user(user.id)
+    sqlite_session.expunge_all()
+    assert (await get_current_user(credentials, sqlite_session)).roles == ["ACCOUNTANT"]
+
+    stored = (await sqlite_session.execute(select(User).where(User.id == user.id))).scalar_one()
+    stored.is_active = False
+    await sqlite_session.commit()
+    await invalidate_cached_user(user.id)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await get_current_user(credentials, sqlite_session)
+    assert exc_info.value.status_code == 403
+    assert memory_cache.metrics()["invalidations"] == 2
+
+
+@pytest.mark.asyncio
+async def test_memory_cache_expires_entries():
+    """Записи старше TTL не возвращаются"""
+    cache = MemoryUserCache(ttl=0.0)
+    await cache.set(1, "{}")
+    assert await cache.get(1) is None
+    assert cache.metrics()["size"] == 0
+
+
+@pytest.mark.asyncio
+async def test_unavailable_redis_falls_back_to_database(sqlite_session):
+    """Недоступный Redis не ломает аутентификацию"""
+    user_cache._cache = RedisUserCache(ttl=30.0, redis_url="redis://127.0.0.1:1/0")
+    try:
+        user = await _create_user(sqlite_session)
+        current = await get_current_user(_credentials(user.id), sqlite_session)
+        metrics = user_cache._cache.metrics()
+    finally:
+        await user_cache.close_user_cache()
+
+    assert current.id == user.id
+    assert metrics["backend"] == "redis"
+    assert metrics["misses"] == 1
+    assert metrics["errors"] == 2
+
+
+@pytest.mark.asyncio
+async def test_snapshot_excludes_password_hash(sqlite_session, memory_cache):
+    """В кэш попадают только поля SNAPSHOT_FIELDS; остальные дочитываются из БД"""
+    user = await _create_user(sqlite_session)
+    credentials = _credentials(user.id)
+    await get_current_user(credentials, sqlite_session)
+
+    snapshot = await memory_cache.get(user.id)
+    assert "hashed_password" not in snapshot
+    assert "created_at" not in snapshot
+
+    sqlite_session.expunge_all()
+    cached = await get_current_user(credentials, sqlite_session)
+    await sqlite_session.refresh(cached, ["hashed_password"])
+    assert cached.hashed_password == "x"
+    assert cached.username == "foreman"
+
+
+@pytest.mark.asyncio
+async def test_bot_token_is_rejected_after_telegram_unlink(sqlite_session, memory_cache):
+    """Токен входа бота (claim tg) перестает действовать после отвязки Telegram"""
+    user = await _create_user(sqlite_session, telegram_chat_id=555)
+    token = create_access_token(data={"sub": str(user.id), "tg": 555})
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    assert (await get_current_user(credentials, sqlite_session)).id == user.id
+
+    user.telegram_chat_id = None
+    await sqlite_session.commit()
+    await invalidate_cached_user(user.id)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await get_current_user(credentials, sqlite_session)
+    assert exc_info.value.status_code == 401